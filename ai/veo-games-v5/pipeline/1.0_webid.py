@@ -5,13 +5,14 @@ Queries database games and lets user select which one they're analyzing.
 Creates website_game_id.txt mapping file.
 """
 
-import json
 import sys
 import os
 from pathlib import Path
 import psycopg2
 from psycopg2.extras import RealDictCursor
 
+from stage_journal import atomic_write_json, atomic_write_text
+
 def load_env_vars():
     """Load database connection from environment"""
     env_file = Path(__file__).parent.parent.parent.parent / "web-apps/1-clann-webapp/backend/.env"
@@ -122,7 +123,7 @@ def save_website_game_id(match_id, game_id, game_title):
     
     # Save game ID
     id_file = output_dir / "website_game_id.txt"
-    id_file.write_text(game_id)
+    atomic_write_text(id_file, game_id)
     
     # Save game info for reference
     info_file = output_dir / "1.0_website_link.json"
@@ -132,7 +133,7 @@ def save_website_game_id(match_id, game_id, game_title):
         "pipeline_match_id": match_id,
         "linked_at": "2025-08-27T16:30:00Z"
     }
-    info_file.write_text(json.dumps(info, indent=2))
+    atomic_write_json(info_file, info)
     
     print(f"✅ Website game ID saved: {id_file}")
     print(f"📄 Link info saved: {info_file}")
@@ -11,15 +11,14 @@ This script calls VEO API to get ground truth events.
 from __future__ import annotations
 
 import argparse
-import json
 import os
 import re
-import shutil
 from dataclasses import dataclass
 from pathlib import Path
 from typing import Optional
 
 from veo_extractor import VeoEventExtractor
+from stage_journal import atomic_write_json, atomic_write_text
 
 
 @dataclass
@@ -61,8 +60,7 @@ def ensure_dirs(paths: Paths) -> None:
 def copy_ground_truth_if_available(paths: Paths) -> bool:
     src = paths.v1_data_dir / "1_veo_ground_truth.json"
     if src.exists():
-        dst = paths.outputs_dir / "1_veo_ground_truth.json"
-        shutil.copy2(src, dst)
+        atomic_write_text(paths.outputs_dir / "1_veo_ground_truth.json", src.read_text(encoding="utf-8"))
         return True
     return False
 
@@ -73,7 +71,7 @@ def write_match_meta(meta_dir: Path, match_id: str, veo_url_or_id: str, used_v1:
         "input": veo_url_or_id,
         "source": "v1_reuse" if used_v1 else "manual",
     }
-    (meta_dir / "match_meta.json").write_text(json.dumps(meta, indent=2), encoding="utf-8")
+    atomic_write_json(meta_dir / "match_meta.json", meta)
 
 
 def extract_ground_truth(veo_url: str, gt_path: Path) -> bool:
@@ -101,16 +99,19 @@ def main() -> int:
     parser.add_argument("veo_url_or_match_id", help="Veo match URL (required for ground truth extraction)")
     parser.add_argument("--out", dest="out_dir", default=None, help="Override outputs directory")
     args = parser.parse_args()
+    return fetch_match(args.veo_url_or_match_id, args.out_dir)
 
+
+def fetch_match(veo_url: str, out_dir: Optional[str] = None) -> int:
+    """Create the outputs directory for a Veo URL and write ground truth + metadata."""
     # For v3, we require a full VEO URL for ground truth extraction
-    veo_url = args.veo_url_or_match_id
     if not veo_url.startswith("http"):
         print("❌ v3 requires full VEO URL for ground truth extraction")
         print("Example: python3 1.1_fetch_veo.py 'https://app.veo.co/matches/cookstown-youth.../")
         return 1
 
     match_id = derive_match_id(veo_url)
-    paths = compute_paths(match_id, args.out_dir)
+    paths = compute_paths(match_id, out_dir)
     ensure_dirs(paths)
 
     # Try to copy existing v1 ground truth first (for backwards compatibility)
@@ -0,0 +1,198 @@
+#!/usr/bin/env python3
+"""
+1.25 Make HLS Ladder
+Packages video.mp4 as adaptive HLS (360p / 720p / 1080p) right after the download
+
+One ffmpeg process decodes the source once, splits the frames and encodes
+every rendition at the same time (separate encoder threads, x264 threading
+within each). Keyframes are forced on the same timestamps in every
+rendition - every SEGMENT_SECONDS, no scene-cut keyframes - so segments line
+up and players can switch quality at any boundary. Renditions taller than the
+source are left out.
+
+Writes 1.25_hls/master.m3u8, 1.25_hls/<rendition>/index.m3u8 + seg_NNNNN.ts
+and 1.25_hls/hls.json. 3.5 uploads the ladder next to the MP4 and 3.8 points
+the game's HLS URL at the master playlist, so the webapp streams it without a
+MediaConvert job. CLANN_HLS=0 leaves the stage out of pipeline runs.
+
+Usage:
+    python3 1.25_make_hls.py <match-id> [--preset veryfast]
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import subprocess
+from pathlib import Path
+
+import budgets
+from stage_journal import atomic_write_json
+
+HLS_DIRNAME = "1.25_hls"
+MASTER_PLAYLIST = "master.m3u8"
+SEGMENT_SECONDS = 4
+
+HLS_LADDER = (
+    {"name": "360p", "height": 360, "video_bitrate": "800k", "maxrate": "856k", "bufsize": "1200k",
+     "audio_bitrate": "96k"},
+    {"name": "720p", "height": 720, "video_bitrate": "2800k", "maxrate": "2996k", "bufsize": "4200k",
+     "audio_bitrate": "128k"},
+    {"name": "1080p", "height": 1080, "video_bitrate": "5000k", "maxrate": "5350k", "bufsize": "7500k",
+     "audio_bitrate": "128k"},
+)
+DEFAULT_PRESET = os.getenv('CLANN_HLS_PRESET', 'veryfast')
+
+
+def probe_source(video_path: Path) -> dict:
+    """{"height", "duration", "audio"} of the source; height None when ffprobe can't tell"""
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', str(video_path)]
+    try:
+        info = json.loads(subprocess.run(cmd, capture_output=True, text=True, timeout=60).stdout or '{}')
+    except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        info = {}
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    return {
+        "height": video.get("height"),
+        "duration": float(info.get("format", {}).get("duration") or 0),
+        # Assume audio if ffprobe gave nothing useful - VEO downloads have it
+        "audio": any(s.get("codec_type") == "audio" for s in streams) if streams else True,
+    }
+
+
+def select_ladder(source_height) -> list:
+    """Renditions up to the source height (never upscale); at least the smallest one"""
+    if not source_height:
+        return list(HLS_LADDER)
+    return [r for r in HLS_LADDER if r["height"] <= source_height] or [HLS_LADDER[0]]
+
+
+def hls_command(video_path, out_dir, ladder, audio=True, preset=DEFAULT_PRESET):
+    """Single decode, one encoder per rendition, HLS muxer writing every playlist + master"""
+    split = f"[0:v]split={len(ladder)}" + "".join(f"[s{i}]" for i in range(len(ladder)))
+    scales = "".join(f";[s{i}]scale=-2:{r['height']}[v{i}]" for i, r in enumerate(ladder))
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+        '-i', str(video_path),
+        '-filter_complex', split + scales,
+    ]
+    for i in range(len(ladder)):
+        cmd += ['-map', f'[v{i}]']
+    if audio:
+        cmd += [arg for _ in ladder for arg in ('-map', '0:a:0')]
+    cmd += [
+        '-c:v', 'libx264', '-preset', preset, '-profile:v', 'main', '-pix_fmt', 'yuv420p',
+        # Same keyframe timestamps in every rendition, nothing in between
+        '-force_key_frames', f'expr:gte(t,n_forced*{SEGMENT_SECONDS})', '-sc_threshold', '0',
+    ]
+    for i, rendition in enumerate(ladder):
+        cmd += [f'-b:v:{i}', rendition['video_bitrate'], f'-maxrate:v:{i}', rendition['maxrate'],
+                f'-bufsize:v:{i}', rendition['bufsize']]
+        if audio:
+            cmd += [f'-b:a:{i}', rendition['audio_bitrate']]
+    if audio:
+        cmd += ['-c:a', 'aac', '-ac', '2', '-ar', '48000']
+    stream_map = " ".join(f"v:{i}" + (f",a:{i}" if audio else "") + f",name:{r['name']}"
+                          for i, r in enumerate(ladder))
+    return cmd + [
+        '-f', 'hls', '-hls_time', str(SEGMENT_SECONDS), '-hls_playlist_type', 'vod',
+        '-hls_flags', 'independent_segments',
+        '-hls_segment_filename', str(out_dir / '%v' / 'seg_%05d.ts'),
+        '-master_pl_name', MASTER_PLAYLIST,
+        '-var_stream_map', stream_map,
+        str(out_dir / '%v' / 'index.m3u8'),
+    ]
+
+
+def _estimated_bytes(ladder, duration) -> int:
+    kbps = sum(int(r["video_bitrate"].rstrip('k')) + int(r["audio_bitrate"].rstrip('k')) for r in ladder)
+    return int(kbps * 1000 / 8 * (duration or 90 * 60) * 1.1)
+
+
+def make_hls(match_id: str, preset: str = DEFAULT_PRESET) -> bool:
+    """Encode the HLS ladder for a match's video.mp4"""
+    print(f"📺 Step 1.25: Making HLS ladder for {match_id}")
+
+    data_dir = Path("../outputs") / match_id
+    video_path = data_dir / "video.mp4"
+    hls_dir = data_dir / HLS_DIRNAME
+    if not video_path.exists():
+        print(f"❌ Video not found: {video_path}")
+        print("Run Step 1.2 first: python 1.2_download_video.py")
+        return False
+
+    source = probe_source(video_path)
+    ladder = select_ladder(source["height"])
+    print(f"🎞️  {' / '.join(r['name'] for r in ladder)} from {source['height'] or '?'}p source, "
+          f"{SEGMENT_SECONDS}s segments, preset {preset}, audio {'on' if source['audio'] else 'off'}")
+
+    # Encode next to the final folder and swap it in, so a crash never leaves half a ladder
+    tmp_dir = data_dir / f"tmp_{HLS_DIRNAME}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    for rendition in ladder:
+        (tmp_dir / rendition["name"]).mkdir(parents=True)
+
+    started = time.time()
+    with budgets.disk_reservation(data_dir, _estimated_bytes(ladder, source["duration"])), budgets.ffmpeg_slot():
+        result = subprocess.run(hls_command(video_path, tmp_dir, ladder, source["audio"], preset),
+                                capture_output=True, text=True)
+    encode_seconds = time.time() - started
+    if result.returncode != 0 or not (tmp_dir / MASTER_PLAYLIST).exists():
+        print(f"❌ HLS encode failed: {result.stderr.strip()[-500:]}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+    renditions = []
+    for rendition in ladder:
+        segments = sorted((tmp_dir / rendition["name"]).glob("seg_*.ts"))
+        renditions.append({
+            **rendition,
+            "playlist": f"{rendition['name']}/index.m3u8",
+            "segments": len(segments),
+            "bytes": sum(s.stat().st_size for s in segments),
+        })
+    report = {
+        "master_playlist": MASTER_PLAYLIST,
+        "segment_seconds": SEGMENT_SECONDS,
+        "preset": preset,
+        "source_height": source["height"],
+        "source_duration_seconds": round(source["duration"], 1),
+        "encode_seconds": round(encode_seconds, 1),
+        "realtime_factor": round(source["duration"] / encode_seconds, 2) if source["duration"] else None,
+        "total_bytes": sum(r["bytes"] for r in renditions),
+        "renditions": renditions,
+    }
+    atomic_write_json(tmp_dir / "hls.json", report)
+
+    shutil.rmtree(hls_dir, ignore_errors=True)
+    os.replace(tmp_dir, hls_dir)
+
+    print(f"\n✅ HLS COMPLETE ({report['encode_seconds']}s"
+          + (f", {report['realtime_factor']}x realtime)" if report["realtime_factor"] else ")"))
+    print("=" * 50)
+    for rendition in renditions:
+        print(f"   📶 {rendition['name']}: {rendition['segments']} segments, {rendition['bytes'] / 1024**2:.1f}MB")
+    print(f"📁 Master playlist: {hls_dir / MASTER_PLAYLIST}")
+
+    return True
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) < 1:
+        print("Usage: python 1.25_make_hls.py <match-id> [--preset veryfast]")
+        sys.exit(1)
+
+    preset = DEFAULT_PRESET
+    if '--preset' in sys.argv:
+        preset = sys.argv[sys.argv.index('--preset') + 1]
+        args = [arg for arg in args if arg != preset]
+
+    if not make_hls(args[0], preset):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -13,6 +13,16 @@ from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 import re
+import shutil
+import threading
+
+import budgets
+from video_ingest import DownloadJournal, resumable_download, ingest_video
+
+# Rough size of a 90-minute standard-1080p Veo download, reserved before downloading
+EXPECTED_VIDEO_BYTES = 3 * 1024 ** 3
+VIDEO_FORMAT = 'standard-1080p'
+SAMPLE_START_SECONDS = 300  # sample clip is the 15s starting at 05:00
 
 # Load environment variables
 load_dotenv()
@@ -77,7 +87,8 @@ def create_sample_clip(video_path, match_id):
             str(sample_path)
         ]
         
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        with budgets.ffmpeg_slot():
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
         
         if sample_path.exists():
             size_mb = sample_path.stat().st_size / 1024 / 1024
@@ -121,8 +132,76 @@ def create_readable_match_id(veo_match_id, veo_url=""):
         # If anything fails, use original ID
         return veo_match_id
 
-def download_video_with_sample(veo_url, match_id=None):
-    """Download video, create sample clip, upload to S3, print URL"""
+def upload_sample(sample_path, match_id):
+    """Upload the sample clip and print where to watch it"""
+    try:
+        uploader = S3SampleUploader()
+        s3_url = uploader.upload_sample_clip(sample_path, match_id)
+        
+        if s3_url:
+            print(f"\n🎯 SAMPLE CLIP READY!")
+            print(f"📹 Clip: sample_clip.mp4")
+            print(f"🌐 URL: {s3_url}")
+            print(f"📊 Check this clip to verify:")
+            print(f"   - Is it zoomed footage (not panoramic)?")
+            print(f"   - Is it the correct Edinburgh United game?")
+            print(f"   - Is the quality good for AI analysis?")
+            return True
+        else:
+            print("❌ S3 upload failed")
+            return False
+            
+    except Exception as e:
+        print(f"❌ S3 setup failed: {e}")
+        return False
+
+def ingest_with_sample(veo_url, match_id, data_dir):
+    """Download while segmenting into 1.4_clips; the 05:00 clip becomes the sample as soon as it exists"""
+    video_path = data_dir / "video.mp4"
+    sample_path = data_dir / "sample_clip.mp4"
+    sample = {}
+    
+    def upload():
+        sample["uploaded"] = upload_sample(sample_path, match_id)
+    
+    def on_clip(clip):
+        if "thread" in sample or clip["start_seconds"] < SAMPLE_START_SECONDS:
+            return
+        # Same 15s stream copy create_sample_clip would cut, available minutes earlier
+        shutil.copyfile(clip["path"], sample_path)
+        print(f"✂️  Sample clip taken from {clip['filename']} while the download continues")
+        sample["thread"] = threading.Thread(target=upload)
+        sample["thread"].start()
+    
+    with budgets.disk_reservation(data_dir, EXPECTED_VIDEO_BYTES * 2), budgets.ffmpeg_slot():
+        downloaded, segmented = ingest_video(veo_url, data_dir, VIDEO_FORMAT, on_clip=on_clip)
+    
+    if not downloaded:
+        print("❌ Download failed - re-run to resume from video_download.json")
+        return False
+    
+    size_mb = video_path.stat().st_size / (1024 * 1024)
+    print(f"✅ Video downloaded: {size_mb:.1f}MB")
+    if segmented:
+        print(f"✅ 1.4_clips already cut - 1.4_make_clips will reuse them")
+    
+    if "thread" in sample:
+        sample["thread"].join()
+        return sample.get("uploaded", False)
+    
+    # Video shorter than 5 minutes or streaming was not possible - cut the sample from the file
+    sample_path = create_sample_clip(video_path, match_id)
+    if not sample_path:
+        print("❌ Sample clip creation failed")
+        return False
+    return upload_sample(sample_path, match_id)
+
+def download_video_with_sample(veo_url, match_id=None, ingest=False):
+    """Download video, create sample clip, upload to S3, print URL
+
+    With `ingest`, clips are cut into 1.4_clips while the video downloads.
+    Either way the download resumes from video.mp4.part after a dropped connection.
+    """
     print(f"📥 Step 2: Downloading video from {veo_url}")
     
     if not match_id:
@@ -149,22 +228,21 @@ def download_video_with_sample(veo_url, match_id=None):
     print(f"📹 Downloading video to {video_path}")
     print(f"🎯 Using yt-dlp to download zoomed footage from: {veo_url}")
     
-    # Step 1: Download the video
-    try:
-        result = subprocess.run([
-            'yt-dlp', '-f', 'standard-1080p', '-o', str(video_path), veo_url
-        ], check=True)
-        
-        if not (video_path.exists() and video_path.stat().st_size > 0):
-            print("❌ Download failed - file missing or empty")
-            return False
-            
-        size_mb = video_path.stat().st_size / (1024 * 1024)
-        print(f"✅ Video downloaded: {size_mb:.1f}MB")
-        
-    except subprocess.CalledProcessError as e:
-        print(f"❌ Download failed: {e}")
+    if ingest:
+        print(f"⚡ Ingest mode: cutting 1.4_clips while the video downloads")
+        return ingest_with_sample(veo_url, match_id, data_dir)
+    
+    # Step 1: Download the video (resumes video.mp4.part after a dropped connection)
+    journal = DownloadJournal(data_dir, veo_url, VIDEO_FORMAT)
+    with budgets.disk_reservation(data_dir, EXPECTED_VIDEO_BYTES):
+        downloaded = resumable_download(veo_url, video_path, journal, VIDEO_FORMAT)
+    
+    if not downloaded:
+        print("❌ Download failed - re-run to resume from video_download.json")
         return False
+        
+    size_mb = video_path.stat().st_size / (1024 * 1024)
+    print(f"✅ Video downloaded: {size_mb:.1f}MB")
     
     # Step 2: Create sample clip
     sample_path = create_sample_clip(video_path, match_id)
@@ -173,37 +251,20 @@ def download_video_with_sample(veo_url, match_id=None):
         return False
     
     # Step 3: Upload to S3
-    try:
-        uploader = S3SampleUploader()
-        s3_url = uploader.upload_sample_clip(sample_path, match_id)
-        
-        if s3_url:
-            print(f"\n🎯 SAMPLE CLIP READY!")
-            print(f"📹 Clip: sample_clip.mp4")
-            print(f"🌐 URL: {s3_url}")
-            print(f"📊 Check this clip to verify:")
-            print(f"   - Is it zoomed footage (not panoramic)?")
-            print(f"   - Is it the correct Edinburgh United game?")
-            print(f"   - Is the quality good for AI analysis?")
-            return True
-        else:
-            print("❌ S3 upload failed")
-            return False
-            
-    except Exception as e:
-        print(f"❌ S3 setup failed: {e}")
-        return False
+    return upload_sample(sample_path, match_id)
 
 if __name__ == "__main__":
-    if len(sys.argv) not in [2, 3]:
-        print("Usage: python 2_download_video.py <veo-url> [match-id]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) not in [1, 2]:
+        print("Usage: python 2_download_video.py <veo-url> [match-id] [--ingest]")
         print("Example: python 2_download_video.py 'https://app.veo.co/matches/20250726-edinburgh-united-vs-cowdenbeath-central-75b2c59d/'")
+        print("  --ingest  cut 1.4_clips while the video is still downloading")
         sys.exit(1)
     
-    veo_url = sys.argv[1]
-    match_id = sys.argv[2] if len(sys.argv) == 3 else None
+    veo_url = args[0]
+    match_id = args[1] if len(args) == 2 else None
     
-    success = download_video_with_sample(veo_url, match_id)
+    success = download_video_with_sample(veo_url, match_id, ingest='--ingest' in sys.argv)
     
     if success:
         print(f"\n✅ COMPLETE! Sample clip uploaded and ready for verification")
@@ -5,9 +5,11 @@ Manual team configuration for 5-a-side games
 """
 
 import sys
-import json
 from pathlib import Path
 
+from stage_journal import atomic_write_json
+
+
 def main():
     if len(sys.argv) < 2 or len(sys.argv) > 3:
         print("Usage: python 1_setup_teams.py <match-id> [game-type]")
@@ -61,8 +63,7 @@ def main():
     
     # Save configuration
     config_file = outputs_dir / '1_team_config.json'
-    with open(config_file, 'w') as f:
-        json.dump(team_config, f, indent=2)
+    atomic_write_json(config_file, team_config)
     
     print(f"\n✅ Team setup complete!")
     print(f"📄 Configuration saved to: {config_file}")
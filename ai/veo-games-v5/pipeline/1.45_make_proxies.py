@@ -0,0 +1,219 @@
+#!/usr/bin/env python3
+"""
+1.45 Make Proxy Clips
+Re-encodes 1.4_clips into small analysis proxies before they are uploaded to Gemini
+
+Gemini samples video at ~1 frame/second, so 1080p/25fps stream copies mostly
+pay for upload bytes nobody looks at. Each profile sets resolution, fps,
+bitrate and how much audio to keep, plus the Gemini media resolution used
+when 1.5 analyzes the proxy. 1.5 uploads 1.45_proxies/clip_XXmYYs.mp4 when
+it exists and falls back to the original clip otherwise.
+
+Writes 1.45_proxies/proxies.json with per-clip and total byte / token savings.
+
+Usage:
+    python3 1.45_make_proxies.py <match-id> [--profile balanced|lean|tiny]
+"""
+
+import sys
+import os
+import json
+import time
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, as_completed
+
+import budgets
+from clip_stream import SEGMENT_SECONDS, load_segments
+from stage_journal import atomic_write_json
+
+# Gemini video tokens: ~258 per sampled frame (66 at low media resolution) + 32/s of audio
+GEMINI_SAMPLE_FPS = 1
+TOKENS_PER_FRAME = {None: 258, "MEDIA_RESOLUTION_LOW": 66}
+AUDIO_TOKENS_PER_SECOND = 32
+
+PROXY_PROFILES = {
+    # Close to what Gemini sees from the originals, a fraction of the bytes
+    "balanced": {"height": 720, "fps": 10, "video_bitrate": "1500k", "audio_bitrate": "32k",
+                 "media_resolution": None},
+    # Enough to follow the ball and read team colours; Gemini's low media resolution matches 480p
+    "lean": {"height": 480, "fps": 5, "video_bitrate": "600k", "audio_bitrate": "24k",
+             "media_resolution": "MEDIA_RESOLUTION_LOW"},
+    # Cheapest: no audio, low media resolution - for triage-level descriptions
+    "tiny": {"height": 360, "fps": 2, "video_bitrate": "300k", "audio_bitrate": None,
+             "media_resolution": "MEDIA_RESOLUTION_LOW"},
+}
+DEFAULT_PROFILE = os.getenv('CLANN_PROXY_PROFILE', 'balanced')
+
+
+def tokens_per_second(media_resolution=None, audio=True, fps=None) -> float:
+    """Estimated Gemini tokens per second of video for these settings"""
+    frames = min(fps, GEMINI_SAMPLE_FPS) if fps else GEMINI_SAMPLE_FPS
+    return frames * TOKENS_PER_FRAME[media_resolution] + (AUDIO_TOKENS_PER_SECOND if audio else 0)
+
+
+def proxy_command(input_path, output_path, profile):
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error',
+        '-i', str(input_path),
+        '-vf', f"scale=-2:{profile['height']},fps={profile['fps']}",
+        '-c:v', 'libx264', '-preset', 'veryfast',
+        '-b:v', profile['video_bitrate'], '-maxrate', profile['video_bitrate'],
+        '-bufsize', profile['video_bitrate'],
+        '-pix_fmt', 'yuv420p',
+        '-movflags', '+faststart',
+    ]
+    if profile['audio_bitrate']:
+        # Mono 16kHz keeps whistles and crowd reactions, drops everything else
+        cmd += ['-c:a', 'aac', '-ac', '1', '-ar', '16000', '-b:a', profile['audio_bitrate']]
+    else:
+        cmd += ['-an']
+    return cmd + ['-y', str(output_path)]
+
+
+def make_proxy(input_path, output_path, profile):
+    """Process-pool worker: encode one proxy, return its stats"""
+    started = time.time()
+    if not (output_path.exists() and output_path.stat().st_size > 0):
+        tmp_path = output_path.with_name(f"tmp_{output_path.name}")
+        result = subprocess.run(proxy_command(input_path, tmp_path, profile), capture_output=True, text=True)
+        if result.returncode != 0:
+            tmp_path.unlink(missing_ok=True)
+            return {"filename": input_path.name, "ok": False, "error": result.stderr.strip()[-300:]}
+        os.replace(tmp_path, output_path)
+    return {
+        "filename": input_path.name,
+        "ok": True,
+        "original_bytes": input_path.stat().st_size,
+        "proxy_bytes": output_path.stat().st_size,
+        "encode_seconds": round(time.time() - started, 2),
+    }
+
+
+def gemini_generation_config(profile) -> dict:
+    """Passed to Gemini by 1.5 when it analyzes proxies made with this profile"""
+    return {"mediaResolution": profile["media_resolution"]} if profile["media_resolution"] else {}
+
+
+def clear_stale_proxies(proxies_dir: Path, profile_name: str):
+    """A different profile means every existing proxy is stale"""
+    report_path = proxies_dir / "proxies.json"
+    if report_path.exists():
+        with open(report_path, 'r') as f:
+            if json.load(f).get("profile") != profile_name:
+                for old in proxies_dir.glob("clip_*.mp4"):
+                    old.unlink()
+    proxies_dir.mkdir(exist_ok=True)
+
+
+def write_report(proxies_dir: Path, profile_name: str, results: list, failed: int, start_time: float) -> dict:
+    """proxies.json from the per-clip make_proxy results (each with its duration_seconds)"""
+    profile = PROXY_PROFILES[profile_name]
+    report_path = proxies_dir / "proxies.json"
+    original_bytes = sum(r["original_bytes"] for r in results)
+    proxy_bytes = sum(r["proxy_bytes"] for r in results)
+    seconds = sum(r["duration_seconds"] for r in results)
+    original_tokens = int(seconds * tokens_per_second())
+    proxy_tokens = int(seconds * tokens_per_second(profile["media_resolution"],
+                                                   bool(profile["audio_bitrate"]), profile["fps"]))
+
+    report = {
+        "profile": profile_name,
+        "settings": profile,
+        "gemini_generation_config": gemini_generation_config(profile),
+        "clips": len(results),
+        "failed": failed,
+        "encode_wall_seconds": round(time.time() - start_time, 1),
+        "original_bytes": original_bytes,
+        "proxy_bytes": proxy_bytes,
+        "bytes_saved_percent": round((1 - proxy_bytes / original_bytes) * 100, 1) if original_bytes else 0,
+        "estimated_original_tokens": original_tokens,
+        "estimated_proxy_tokens": proxy_tokens,
+        "tokens_saved_percent": round((1 - proxy_tokens / original_tokens) * 100, 1) if original_tokens else 0,
+        "per_clip": sorted(results, key=lambda r: r["filename"]),
+    }
+    atomic_write_json(report_path, report)
+
+    print(f"\n✅ PROXIES COMPLETE ({report['encode_wall_seconds']}s)")
+    print("=" * 50)
+    print(f"📦 Upload bytes: {original_bytes / 1024**2:.0f}MB → {proxy_bytes / 1024**2:.0f}MB "
+          f"({report['bytes_saved_percent']}% smaller)")
+    print(f"🪙 Est. Gemini tokens: {original_tokens:,} → {proxy_tokens:,} "
+          f"({report['tokens_saved_percent']}% fewer)")
+    print(f"📁 Report saved: {report_path}")
+    return report
+
+
+def make_proxies(match_id: str, profile_name: str = DEFAULT_PROFILE) -> bool:
+    """Encode a proxy for every clip and report the savings"""
+    print(f"🗜️  Step 1.45: Making '{profile_name}' proxy clips for {match_id}")
+
+    if profile_name not in PROXY_PROFILES:
+        print(f"❌ Unknown profile '{profile_name}' (choose from {', '.join(PROXY_PROFILES)})")
+        return False
+    profile = PROXY_PROFILES[profile_name]
+
+    data_dir = Path("../outputs") / match_id
+    clips_dir = data_dir / "1.4_clips"
+    proxies_dir = data_dir / "1.45_proxies"
+
+    clip_files = sorted(clips_dir.glob("clip_*.mp4"))
+    if not clip_files:
+        print(f"❌ No clips found in {clips_dir}")
+        print("Run Step 1.4 first: python 1.4_make_clips.py")
+        return False
+
+    clear_stale_proxies(proxies_dir, profile_name)
+
+    num_workers = budgets.ffmpeg_worker_count()
+    print(f"📹 {len(clip_files)} clips → {profile['height']}p @ {profile['fps']}fps, "
+          f"{profile['video_bitrate']} video, audio {profile['audio_bitrate'] or 'off'} ({num_workers} processes)")
+
+    segments = load_segments(clips_dir)
+    results = []
+    start_time = time.time()
+
+    # Each encode holds a shared ffmpeg slot, so a batch of matches stays within the budget
+    with ProcessPoolExecutor(max_workers=num_workers) as executor:
+        futures = {
+            budgets.submit_ffmpeg(executor, make_proxy, clip_path, proxies_dir / clip_path.name, profile): clip_path
+            for clip_path in clip_files
+        }
+        for i, future in enumerate(as_completed(futures), 1):
+            result = future.result()
+            if not result["ok"]:
+                print(f"❌ {result['filename']}: {result['error']}")
+                continue
+            result["duration_seconds"] = segments.get(futures[future].stem, {}).get("duration", SEGMENT_SECONDS)
+            results.append(result)
+            if i % 50 == 0:
+                print(f"  📊 {i}/{len(clip_files)} proxies | {i / (time.time() - start_time):.1f} clips/sec")
+
+    if not results:
+        print("❌ No proxies were created")
+        return False
+
+    report = write_report(proxies_dir, profile_name, results, len(clip_files) - len(results), start_time)
+    if report["failed"]:
+        print(f"⚠️  {report['failed']} clips failed - 1.5 will upload their originals")
+
+    return True
+
+
+def main():
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if len(args) < 1:
+        print("Usage: python 1.45_make_proxies.py <match-id> [--profile balanced|lean|tiny]")
+        sys.exit(1)
+
+    profile_name = DEFAULT_PROFILE
+    if '--profile' in sys.argv:
+        profile_name = sys.argv[sys.argv.index('--profile') + 1]
+        args = [arg for arg in args if arg != profile_name]
+
+    if not make_proxies(args[0], profile_name):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -12,13 +12,27 @@ import time
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
 
+import budgets
+from clip_stream import SEGMENT_SECONDS, clip_stem, grid_slot, load_segments, stream_segments, write_segments_json
+from keyframe_index import load_keyframe_index, plan_clips, keyframe_at_or_before
+from analysis_windows import WINDOWING_MODES, load_veo_events, plan_windows, summarize_windows
+from stage_journal import StageJournal, atomic_write_json
+from clip_triage import triage_clips
+import video_thumbnails
+
+JOURNAL_STAGE = "1.4_make_clips"
+
 def extract_clip_fast(video_path, start_time, duration, output_path):
-    """Extract a single clip using GPU-accelerated processing - ULTRA FAST!"""
+    """Extract a single clip using GPU-accelerated processing - ULTRA FAST!
+
+    `start_time` should be a keyframe (see keyframe_index) so the input seek
+    lands exactly on it.
+    """
     cmd = [
         'ffmpeg',
         '-hwaccel', 'cuda',  # Use Tesla T4 GPU acceleration!
+        '-ss', str(start_time),  # Input seek: stream copy starts on the keyframe at start_time
         '-i', str(video_path),
-        '-ss', str(start_time),
         '-t', str(duration),
         '-c', 'copy',  # Copy streams without re-encoding - FAST!
         '-avoid_negative_ts', 'make_zero',
@@ -27,14 +41,15 @@ def extract_clip_fast(video_path, start_time, duration, output_path):
     ]
     
     try:
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
+        with budgets.ffmpeg_slot():
+            subprocess.run(cmd, capture_output=True, text=True, check=True)
         return True
     except subprocess.CalledProcessError:
         # Fallback to CPU if GPU fails
         cmd_fallback = [
             'ffmpeg',
-            '-i', str(video_path),
             '-ss', str(start_time),
+            '-i', str(video_path),
             '-t', str(duration),
             '-c', 'copy',
             '-avoid_negative_ts', 'make_zero',
@@ -42,7 +57,8 @@ def extract_clip_fast(video_path, start_time, duration, output_path):
             str(output_path)
         ]
         try:
-            subprocess.run(cmd_fallback, capture_output=True, text=True, check=True)
+            with budgets.ffmpeg_slot():
+                subprocess.run(cmd_fallback, capture_output=True, text=True, check=True)
             return True
         except subprocess.CalledProcessError:
             return False
@@ -66,67 +82,83 @@ def get_video_duration(video_path):
         print("⚠️  Could not determine video duration, using 90 minutes default")
         return 5400  # 90 minutes default
 
-def generate_clips_ultra_fast(video_path, clips_dir, video_duration):
-    """ULTRA FAST: Single ffmpeg command to generate all clips at once"""
+def generate_clips_ultra_fast(video_path, clips_dir, video_duration, on_clip=None):
+    """ULTRA FAST: Single ffmpeg command to generate all clips at once
+
+    Clips are renamed and handed to `on_clip` as ffmpeg finishes each one,
+    so analysis can start before segmentation ends.
+    """
     print("🚀 ULTRA FAST MODE: Using ffmpeg segment (10-50x faster!)")
     
     try:
-        # Single GPU-accelerated command to create ALL clips
-        cmd = [
-            'ffmpeg',
-            '-hwaccel', 'cuda',  # GPU acceleration
-            '-i', str(video_path),
-            '-f', 'segment',  # Segment mode - creates all clips in one pass!
-            '-segment_time', '15',  # 15-second segments
-            '-segment_format', 'mp4',
-            '-c', 'copy',  # Stream copy - no re-encoding
-            '-reset_timestamps', '1',  # Reset timestamps for each clip
-            '-segment_start_number', '0',
-            '-y',  # Overwrite
-            str(clips_dir / 'temp_clip_%04d.mp4')  # Temporary naming
-        ]
-        
         print("⚡ Running single ffmpeg command for all clips...")
         start_time = time.time()
+        clips = []
         
-        subprocess.run(cmd, capture_output=True, text=True, check=True)
-        
-        segment_time = time.time() - start_time
-        print(f"✅ Segmentation complete in {segment_time:.1f} seconds!")
+        with budgets.ffmpeg_slot():
+            for clip in stream_segments(video_path, clips_dir, SEGMENT_SECONDS):
+                clips.append(clip)
+                if on_clip:
+                    on_clip(clip)
+                if len(clips) == 1:
+                    print(f"🎬 First clip ready after {time.time() - start_time:.1f} seconds")
+                elif len(clips) % 50 == 0:
+                    elapsed = time.time() - start_time
+                    print(f"  📊 {len(clips)} clips | {len(clips)/elapsed:.1f} clips/sec")
         
-        # Rename clips to our time-based format
-        print("🔄 Renaming clips to time-based format...")
-        rename_start = time.time()
-        
-        temp_clips = sorted(clips_dir.glob('temp_clip_*.mp4'))
-        renamed_count = 0
-        
-        for i, temp_clip in enumerate(temp_clips):
-            start_seconds = i * 15
-            minutes = int(start_seconds // 60)
-            seconds = int(start_seconds % 60)
-            
-            new_name = f"clip_{minutes:02d}m{seconds:02d}s.mp4"
-            new_path = clips_dir / new_name
-            
-            temp_clip.rename(new_path)
-            renamed_count += 1
-        
-        rename_time = time.time() - rename_start
         total_time = time.time() - start_time
+        write_segments_json(clips_dir, clips, video_duration, SEGMENT_SECONDS)
         
-        print(f"✅ Renamed {renamed_count} clips in {rename_time:.1f} seconds")
-        print(f"🚀 TOTAL TIME: {total_time:.1f} seconds ({renamed_count/total_time:.1f} clips/sec)")
+        print(f"✅ Segmentation complete in {total_time:.1f} seconds!")
+        print(f"🚀 TOTAL TIME: {total_time:.1f} seconds ({len(clips)/max(total_time, 0.001):.1f} clips/sec)")
         
-        return renamed_count
+        return len(clips)
         
     except subprocess.CalledProcessError as e:
         print(f"❌ Ultra-fast mode failed: {e}")
         print("🔄 Falling back to parallel processing...")
         return None
 
-def generate_clips(match_id):
-    """Generate 15-second clips from FULL GAME using time-based naming"""
+def load_ingested_clips(clips_dir):
+    """Clips already cut by 1.2 --ingest, if segments.json says so and every clip is on disk"""
+    segments_path = clips_dir / "segments.json"
+    if not segments_path.exists():
+        return None
+    try:
+        with open(segments_path) as f:
+            info = json.load(f)
+    except json.JSONDecodeError:
+        return None
+    if not info.get("segmented_during_download"):
+        return None
+    if not all((clips_dir / clip["filename"]).exists() for clip in info["clips"]):
+        return None
+    return info
+
+def clear_other_windowing(clips_dir, windowing):
+    """Fixed clips and VEO windows share names but not lengths - never mix them"""
+    segments_path = clips_dir / "segments.json"
+    if not segments_path.exists():
+        return
+    try:
+        with open(segments_path) as f:
+            previous = (json.load(f).get("windowing") or {}).get("mode", "fixed")
+    except json.JSONDecodeError:
+        return
+    if previous != windowing:
+        print(f"🧹 Removing {previous} clips before cutting {windowing} clips")
+        for old in clips_dir.glob("clip_*.mp4"):
+            old.unlink()
+        segments_path.unlink()
+
+def generate_clips(match_id, on_clip=None, windowing=None):
+    """Generate 15-second clips from FULL GAME using time-based naming
+
+    `on_clip` (optional) is called with each clip's info dict as soon as that
+    clip is on disk - 1.5 --stream uses it to analyze while segmenting.
+    `windowing='veo'` cuts variable, overlapping windows around the VEO goals
+    and shots instead (see analysis_windows.py; default CLANN_WINDOWS or fixed).
+    """
     print(f"✂️ Step 3: Generating clips for {match_id} (FULL GAME)")
     
     data_dir = Path("../outputs") / match_id
@@ -138,18 +170,65 @@ def generate_clips(match_id):
         print("Run Step 2 first: python 2_download_video.py")
         return False
     
+    windowing = windowing or os.getenv('CLANN_WINDOWS', 'fixed')
+    veo_events = None
+    if windowing == 'veo':
+        veo_events = load_veo_events(data_dir)
+        if veo_events is None:
+            print("⚠️  1_veo_ground_truth.json not found (run 1.1) - using fixed 15s clips")
+            windowing = 'fixed'
+    
     # Create clips directory
     clips_dir.mkdir(exist_ok=True)
+    clear_other_windowing(clips_dir, windowing)
+    
+    ingested = load_ingested_clips(clips_dir) if windowing == 'fixed' else None
+    if ingested:
+        print(f"♻️  {ingested['total_clips']} clips were already cut during download (1.2 --ingest)")
+        if on_clip:
+            for clip in ingested["clips"]:
+                on_clip({
+                    "filename": clip["filename"],
+                    "path": clips_dir / clip["filename"],
+                    "index": grid_slot(clip["start_seconds"]),
+                    "start_seconds": clip["start_seconds"],
+                    "end_seconds": clip["end_seconds"],
+                })
+        if "triage" not in ingested:
+            run_triage(match_id, clips_dir, video_path)
+        return True
     
     print(f"📹 Processing video: {video_path}")
-    print("⚡ Attempting ULTRA FAST mode with GPU acceleration...")
     
     # Get actual video duration
     video_duration = get_video_duration(video_path)
     print(f"📊 Full video duration: {video_duration/60:.1f} minutes")
     
+    # Stream-copied clips take about as much space as the source video
+    with budgets.disk_reservation(clips_dir, video_path.stat().st_size):
+        if windowing == 'veo':
+            success = _generate_windows_into(video_path, clips_dir, video_duration, veo_events, on_clip)
+        else:
+            print("⚡ Attempting ULTRA FAST mode with GPU acceleration...")
+            success = _generate_clips_into(video_path, clips_dir, video_duration, on_clip)
+    if success:
+        run_triage(match_id, clips_dir, video_path)
+    return success
+
+def run_triage(match_id, clips_dir, video_path):
+    """Score clip activity into segments.json for 1.5 --triage (CLANN_TRIAGE=0 to skip)"""
+    if os.getenv('CLANN_TRIAGE', '1') == '0':
+        return
+    # Advisory only - a failed triage leaves the clips untouched and 1.5 analyzes everything
+    # The triage decode also makes 3.15's scrubber sprites, saving it a full decode
+    sprites_dir = clips_dir.parent / "1.4_sprites" if video_thumbnails.enabled() else None
+    with budgets.ffmpeg_slot():
+        triage_clips(match_id, clips_dir, video_path, sprites_dir)
+
+def _generate_clips_into(video_path, clips_dir, video_duration, on_clip=None):
+    """Ultra-fast segmentation with a parallel per-clip fallback"""
     # Try ultra-fast mode first
-    ultra_fast_result = generate_clips_ultra_fast(video_path, clips_dir, video_duration)
+    ultra_fast_result = generate_clips_ultra_fast(video_path, clips_dir, video_duration, on_clip)
     if ultra_fast_result:
         print(f"🎯 ULTRA FAST SUCCESS! Created {ultra_fast_result} clips")
         return True
@@ -161,14 +240,77 @@ def generate_clips(match_id):
     # PROCESS FULL GAME (no time limit)
     processing_duration = video_duration
     
-    # Calculate number of clips for full game
-    clip_duration = 15
-    num_clips = int(processing_duration // clip_duration)
+    # Cut on real keyframe boundaries so recorded start/end times are exact
+    clip_duration = SEGMENT_SECONDS
+    index = load_keyframe_index(video_path)
+    if index:
+        planned = plan_clips(index, clip_duration, processing_duration)
+        print(f"🔑 Keyframe index: {index['keyframe_count']} keyframes")
+    else:
+        planned = [
+            {"index": i, "start_seconds": i * clip_duration,
+             "end_seconds": min((i + 1) * clip_duration, processing_duration)}
+            for i in range(int(processing_duration // clip_duration))
+        ]
+    num_clips = len(planned)
     
     print(f"🎯 Processing FULL GAME: {processing_duration/60:.1f} minutes")
     print(f"📊 Will create {num_clips} clips of {clip_duration} seconds each")
     print()
     
+    return cut_planned_clips(video_path, clips_dir, planned, video_duration, processing_duration,
+                             keyframe_aligned=bool(index), on_clip=on_clip)
+
+def _generate_windows_into(video_path, clips_dir, video_duration, veo_events, on_clip=None):
+    """Dense overlapping windows around VEO goals/shots, coarse windows elsewhere"""
+    windows = plan_windows(veo_events, video_duration)
+    summary = summarize_windows(windows, veo_events, video_duration, SEGMENT_SECONDS)
+    print(f"🪟 VEO windows: {len(windows)} clips instead of {summary['fixed_clip_count']} "
+          f"({summary['focus_windows']} focus windows around {summary['veo_events']} goals/shots, "
+          f"{summary['coarse_windows']} coarse)")
+    
+    # Overlapping windows can't come from one segment muxer - cut each one, starting on
+    # the keyframe input seeking lands on
+    index = load_keyframe_index(video_path)
+    planned = []
+    for window in windows:
+        start = window["nominal_start_seconds"]
+        if index:
+            start = keyframe_at_or_before(index["keyframes"], start)
+        planned.append({
+            "index": grid_slot(start),
+            "start_seconds": start,
+            "end_seconds": round(window["nominal_end_seconds"], 3),
+            **window,
+        })
+    
+    # A changed VEO plan leaves clips with the wrong length or no window at all
+    previous = load_segments(clips_dir)
+    wanted = {clip_stem(w["nominal_start_seconds"]): w for w in windows}
+    for old in clips_dir.glob("clip_*.mp4"):
+        record = previous.get(old.stem, {})
+        window = wanted.get(old.stem)
+        if not window or (record and record.get("nominal_end_seconds") != window["nominal_end_seconds"]):
+            old.unlink()
+    
+    return cut_planned_clips(video_path, clips_dir, planned, video_duration, video_duration,
+                             keyframe_aligned=bool(index), on_clip=on_clip,
+                             clip_duration_seconds=None, windowing=summary)
+
+def cut_planned_clips(video_path, clips_dir, planned, video_duration, processing_duration,
+                      keyframe_aligned=False, on_clip=None, **extra):
+    """Cut `planned` clips in parallel (stream copy) and write segments.json
+
+    Each planned clip has index, start_seconds and end_seconds; VEO windows
+    also carry nominal_start_seconds (used for the name), nominal_end_seconds
+    and window. `extra` is merged into segments.json.
+    """
+    num_clips = len(planned)
+    clip_duration = SEGMENT_SECONDS
+    
+    def nominal_start(clip):
+        return clip.get("nominal_start_seconds", clip["index"] * clip_duration)
+    
     clips_info = {
         "total_clips": num_clips,
         "clip_duration_seconds": clip_duration,
@@ -179,44 +321,50 @@ def generate_clips(match_id):
     
     successful_clips = 0
     processing_start_time = time.time()
+    journal = StageJournal(clips_dir.parent, JOURNAL_STAGE)
     
-    def process_single_clip(i):
+    def process_single_clip(clip):
         """Process a single clip with time-based naming"""
-        start_time = i * clip_duration
-        minutes = int(start_time // 60)
-        seconds = int(start_time % 60)
+        start_time = clip["start_seconds"]
+        actual_duration = clip["end_seconds"] - start_time
         
-        # TIME-BASED NAMING: clip_00m00s.mp4, clip_00m15s.mp4, etc.
-        clip_filename = f"clip_{minutes:02d}m{seconds:02d}s.mp4"
-        
-        end_time = min(start_time + clip_duration, processing_duration)
-        actual_duration = end_time - start_time
+        # TIME-BASED NAMING on the 15s grid: clip_00m00s.mp4, clip_00m15s.mp4, etc.
+        clip_filename = f"{clip_stem(nominal_start(clip))}.mp4"
         
         clip_path = clips_dir / clip_filename
+        item = clip_path.stem
         
-        # Skip if clip already exists
-        if clip_path.exists():
+        # Skip clips the journal has as cut (or that predate the journal)
+        if journal.is_done(item) or (clip_path.exists() and journal.status(item) is None):
             size_mb = clip_path.stat().st_size / (1024*1024)
             return f"♻️  Already exists: {clip_filename} ({size_mb:.1f}MB)", True
         
-        # Extract the clip
-        if extract_clip_fast(video_path, start_time, actual_duration, clip_path):
+        # Cut next to the clip and rename, so an interrupted cut never looks like a clip
+        journal.pending(item)
+        tmp_path = clips_dir / f"tmp_{clip_filename}"
+        if extract_clip_fast(video_path, start_time, actual_duration, tmp_path):
+            os.replace(tmp_path, clip_path)
+            journal.ok(item, clip_path, start_seconds=start_time)
             size_mb = clip_path.stat().st_size / (1024*1024)
             return f"✅ Created: {clip_filename} ({size_mb:.1f}MB)", True
         else:
+            tmp_path.unlink(missing_ok=True)
+            journal.failed(item, "ffmpeg stream copy failed")
             return f"❌ Failed: {clip_filename}", False
     
-    # Process clips in parallel (8 workers + GPU acceleration for maximum performance)
-    print("🚀 Using GPU acceleration + parallel processing (8 threads)")
+    # Process clips in parallel, bounded by the shared ffmpeg slot budget
+    num_workers = budgets.ffmpeg_worker_count()
+    print(f"🚀 Using GPU acceleration + parallel processing ({num_workers} threads)")
     print("⚡ Tesla T4 GPU + 4-core Xeon optimization enabled!")
     
-    with ThreadPoolExecutor(max_workers=8) as executor:
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
         # Submit all clip creation tasks
-        future_to_clip = {executor.submit(process_single_clip, i): i for i in range(num_clips)}
+        future_to_clip = {executor.submit(process_single_clip, clip): clip for clip in planned}
         
         # Process results as they complete
         for i, future in enumerate(as_completed(future_to_clip), 1):
-            clip_index = future_to_clip[future]
+            clip = future_to_clip[future]
+            clip_index = clip["index"]
             try:
                 result_message, success = future.result()
                 print(f"🔄 {i}/{num_clips}: {result_message}")
@@ -224,19 +372,32 @@ def generate_clips(match_id):
                 if success:
                     successful_clips += 1
                     
-                    # Add to clips info with time-based naming
-                    start_seconds = clip_index * clip_duration
-                    end_seconds = min(start_seconds + clip_duration, processing_duration)
-                    minutes = int(start_seconds // 60)
-                    seconds = int(start_seconds % 60)
+                    # Record the real (keyframe) start/end, named on the 15s grid
+                    filename = f"{clip_stem(nominal_start(clip))}.mp4"
+                    start_seconds = clip["start_seconds"]
+                    end_seconds = clip["end_seconds"]
                     
-                    clips_info["clips"].append({
-                        "filename": f"clip_{minutes:02d}m{seconds:02d}s.mp4",
+                    record = {
+                        "filename": filename,
+                        "nominal_start_seconds": nominal_start(clip),
                         "start_seconds": start_seconds,
                         "end_seconds": end_seconds,
-                        "duration": end_seconds - start_seconds,
-                        "timestamp": f"{minutes:02d}:{seconds:02d}"
-                    })
+                        "duration": round(end_seconds - start_seconds, 3),
+                        "timestamp": f"{int(start_seconds) // 60:02d}:{int(start_seconds) % 60:02d}"
+                    }
+                    if "window" in clip:
+                        record["nominal_end_seconds"] = clip["nominal_end_seconds"]
+                        record["window"] = clip["window"]
+                    clips_info["clips"].append(record)
+                    
+                    if on_clip:
+                        on_clip({
+                            "filename": filename,
+                            "path": clips_dir / filename,
+                            "index": clip_index,
+                            "start_seconds": start_seconds,
+                            "end_seconds": end_seconds,
+                        })
                 
                 # Show speed metrics every 20 clips
                 if i % 20 == 0:
@@ -251,10 +412,11 @@ def generate_clips(match_id):
     
     # Sort clips info by start time
     clips_info["clips"].sort(key=lambda x: x["start_seconds"])
+    clips_info["keyframe_aligned"] = keyframe_aligned
+    clips_info.update(extra)
     
     # Save clips metadata
-    with open(clips_dir / "segments.json", 'w') as f:
-        json.dump(clips_info, f, indent=2)
+    atomic_write_json(clips_dir / "segments.json", clips_info)
     
     print("\n⚡ FULL GAME CLIPPING COMPLETE!")
     print("=" * 50)
@@ -268,12 +430,17 @@ def generate_clips(match_id):
     return successful_clips > 0
 
 if __name__ == "__main__":
-    if len(sys.argv) != 2:
-        print("Usage: python 3_generate_clips.py <match-id>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    windowing = None
+    if '--windows' in sys.argv:
+        windowing = sys.argv[sys.argv.index('--windows') + 1]
+        args.remove(windowing)
+    if len(args) != 1 or (windowing and windowing not in WINDOWING_MODES):
+        print("Usage: python 3_generate_clips.py <match-id> [--windows fixed|veo]")
         sys.exit(1)
     
-    match_id = sys.argv[1]
-    success = generate_clips(match_id)
+    match_id = args[0]
+    success = generate_clips(match_id, windowing=windowing)
     
     if success:
         print(f"🎯 Ready for Step 3.5: Video compression")
@@ -9,11 +9,25 @@ import sys
 import os
 import json
 import time
+import queue
+import asyncio
+import threading
 from pathlib import Path
 from concurrent.futures import ThreadPoolExecutor, as_completed
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+import budgets
+from gemini_client import GeminiError, get_client
+from clip_stream import SEGMENT_SECONDS, load_segments
+from clip_triage import DEFAULT_THRESHOLD as TRIAGE_THRESHOLD
+from clip_records import BATCH_SCHEMA, RECORD_INSTRUCTIONS, RECORD_SCHEMA, normalize_record, parse_record, record_to_text
+from stage_journal import StageJournal, atomic_write_json, atomic_write_text
+
+# What to do with clips whose 1.4 triage score is below the threshold
+TRIAGE_MODES = ('skip', 'cheap', 'last')
+# Per-clip pending / ok / failed log in outputs/<match-id>/.journal/
+JOURNAL_STAGE = "1.5_analyze_clips"
+
 def load_env_multisource() -> None:
     """Load environment variables from multiple likely locations without overriding.
 
@@ -42,35 +56,73 @@ def load_env_multisource() -> None:
 load_env_multisource()
 
 class SimpleClipAnalyzer:
-    def __init__(self):
-        """Initialize with Gemini 2.5 Pro for simple analysis"""
+    def __init__(self, structured: bool = None):
+        """Initialize with Gemini 2.5 Pro for simple analysis
+
+        `structured` (default unless CLANN_CLIP_FORMAT=text) asks for a JSON
+        record per clip (clip_records.py) and saves it next to the .txt.
+        """
         api_key = os.getenv('GEMINI_API_KEY')
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+        # Shared client: adaptive concurrency, retries and rate limits across stages
+        self.client = get_client(api_key)
+        self.model_name = 'gemini-2.5-pro'
+        # For dead-ball clips when running with --triage cheap
+        self.cheap_model_name = 'gemini-2.5-flash'
+        self.structured = structured if structured is not None else os.getenv('CLANN_CLIP_FORMAT', 'json') != 'text'
+        # Built once per match and shared by every clip request (see prompt_prefix)
+        self.team_configs = {}
+        self.prefixes = {}
     
     def load_team_config(self, match_id: str) -> dict:
-        """Load team configuration for consistent naming"""
-        config_path = Path(f"../outputs/{match_id}/match_config.json")
+        """Load team configuration for consistent naming (read once per match)"""
+        if match_id in self.team_configs:
+            return self.team_configs[match_id]
+        config_path = Path(f"../outputs/{match_id}/1_team_config.json")
         if config_path.exists():
             with open(config_path, 'r') as f:
-                return json.load(f)
+                team_config = json.load(f)
         else:
             # Fallback to generic names if config missing
-            return {
-                'team_a': {'name': 'Team A', 'jersey': 'first team colors'},
-                'team_b': {'name': 'Team B', 'jersey': 'second team colors'}
+            print(f"⚠️  No team config at {config_path} - run 1.3_setup_teams.py; using generic team names")
+            team_config = {
+                'team_a': {'name': 'Team A', 'colors': 'first team colors'},
+                'team_b': {'name': 'Team B', 'colors': 'second team colors'}
             }
+        self.team_configs[match_id] = team_config
+        return team_config
+
+    def prompt_prefix(self, match_id: str) -> str:
+        """Static instructions + team config for a match, assembled once
+
+        Sent as the request's system prefix (gemini_client registers it as
+        cached content where the API allows), so each clip request carries only
+        the video and a one-line suffix.
+        """
+        if match_id not in self.prefixes:
+            prefix = self.get_simple_analysis_prompt(self.load_team_config(match_id))
+            if self.structured:
+                prefix += "\n\n" + RECORD_INSTRUCTIONS
+            self.prefixes[match_id] = prefix
+        return self.prefixes[match_id]
+
+    def get_clip_suffix(self, clip_seconds: int = SEGMENT_SECONDS) -> str:
+        """The only per-clip prompt text"""
+        return f"Analyze this {clip_seconds}-second clip. Event timings run from 00:00 to 00:{clip_seconds:02d}."
 
     def get_simple_analysis_prompt(self, team_config: dict) -> str:
         """Generate analysis prompt with team config for Gemini to interpret"""
-        return f"""Analyze this 15-second football clip. This is one segment from a 90-minute match.
+        return f"""You analyze football clips (usually about {SEGMENT_SECONDS} seconds long). Each clip is one segment from a 90-minute match.
 
 Describe what is happening as accurately as possible. Your analysis will be combined with other clips to create a complete match timeline.
 
-TEAM CONFIGURATION:
+""" + self.get_clip_rules(team_config)
+
+    def get_clip_rules(self, team_config: dict) -> str:
+        """Team identification, focus and format rules shared by the single and batched prompts"""
+        return f"""TEAM CONFIGURATION:
 {json.dumps(team_config, indent=2)}
 
 CRITICAL TEAM IDENTIFICATION RULES:
@@ -85,7 +137,7 @@ Focus on:
 - Which team has possession
 - Main actions: passing, defending, attacking, set pieces, throw-ins
 - Only mention significant events if they CLEARLY and OBVIOUSLY occur (don't speculate or force events)
-- For events, use timing relative to this clip (00:00 to 00:15) - the pipeline will convert to global match time
+- For events, use timing relative to the clip (00:00 to the clip's length) - the pipeline will convert to global match time
 
 Be precise and avoid speculation. Most clips will show routine play - that's normal.
 
@@ -93,59 +145,161 @@ Format: "[Color] team [main action]. [Any clear events with timing if they occur
 
 Example: "Blue team maintains possession in midfield" or "White team takes throw-in. Key events: 00:08 shot taken, 00:10 saved by keeper" """
 
-    def analyze_single_clip(self, clip_path: Path) -> tuple:
-        """Analyze a single clip and return timestamp + description"""
+    async def analyze_clip_async(self, clip_path: Path, clip_seconds: float = None,
+                                 upload_path: Path = None, generation_config: dict = None,
+                                 model_name: str = None) -> tuple:
+        """Analyze a single clip and return (timestamp, description, record)
+
+        `clip_seconds` is the clip's real length from segments.json (stream-copy
+        clips end on a keyframe, not exactly 15s in). `upload_path` is the 1.45
+        proxy to send instead of the original, `model_name` overrides the
+        default model (--triage cheap). Raises GeminiError when the clip
+        cannot be analyzed, so no error text is saved as a description.
+        `record` is None unless the analyzer is structured.
+        """
+        timestamp = self.clip_timestamp(clip_path)
+
+        print(f"📹 Analyzing {timestamp}: {clip_path.name}")
+        
+        # Per-match prefix (instructions + team config) is built once; the clip only adds a suffix
+        match_id = clip_path.parent.parent.name  # Extract match_id from path
+        prefix = self.prompt_prefix(match_id)
+        
+        # Upload, poll until ACTIVE, generate and delete - retried and rate limited by the client
+        clip_seconds = clip_seconds or SEGMENT_SECONDS
+        if self.structured:
+            generation_config = {**(generation_config or {}), "responseMimeType": "application/json",
+                                 "responseSchema": RECORD_SCHEMA}
+        text = await self.client.aanalyze_video(
+            model_name or self.model_name, upload_path or clip_path, self.get_clip_suffix(round(clip_seconds)),
+            media_seconds=clip_seconds,
+            generation_config=generation_config or None,
+            system=prefix,
+        )
+        
+        record = None
+        description = text
+        if self.structured:
+            try:
+                record = parse_record(text, clip_seconds)
+                description = record_to_text(record)
+            except ValueError as e:
+                # Keep the answer as plain text rather than losing the clip
+                print(f"⚠️  {timestamp}: no structured record ({e}) - saving text only")
+        print(f"✅ {timestamp}: {description}")
+        
+        return timestamp, description, record
+
+    def clip_timestamp(self, clip_path: Path) -> str:
+        """Extract timestamp from filename (e.g., clip_05m30s.mp4 -> 05:30)"""
+        filename = clip_path.stem
+        if 'clip_' in filename:
+            time_part = filename.replace('clip_', '').replace('m', ':').replace('s', '')
+            # Convert to mm:ss format
+            if ':' in time_part:
+                parts = time_part.split(':')
+                return f"{parts[0].zfill(2)}:{parts[1].zfill(2)}"
+        return "00:00"
+
+    def get_batch_analysis_prompt(self, clips: list) -> str:
+        """Per-batch suffix after the shared prefix, for clips each sent after a "CLIP MM:SS" marker"""
+        markers = ", ".join(timestamp for timestamp, _ in clips)
+        return f"""You are given {len(clips)} consecutive clips. Each video is preceded by a marker "CLIP MM:SS (N seconds)" giving the clip's start time in the match and its length.
+
+Analyze EACH clip on its own, exactly as if it were the only clip you had. Do not carry events from one clip into another.
+
+""" + (
+            f"""Instead of a single object, return ONLY a JSON array with one object per clip, in marker order ({markers}).
+Each object is "clip_start" (copied exactly from the clip's marker) plus the record fields above, with
+"offset_seconds" relative to that clip.""" if self.structured else
+            f"""Return ONLY a JSON array with one object per clip, in marker order ({markers}):
+[{{"clip_start": "MM:SS", "description": "..."}}]
+- "clip_start" is copied exactly from the clip's marker
+- "description" follows the format above, with event timings relative to that clip (00:00 to its length)""")
+
+    async def analyze_batch_async(self, clips: list, generation_config: dict = None,
+                                  model_name: str = None) -> dict:
+        """Analyze consecutive clips in one Gemini call; returns {timestamp: (description, record)}
+
+        `clips` is a list of (clip_path, clip_seconds, upload_path). Clips the
+        model leaves out of its JSON answer are missing from the result.
+        """
+        labelled = [(self.clip_timestamp(clip_path), clip_seconds or SEGMENT_SECONDS, upload_path or clip_path)
+                    for clip_path, clip_seconds, upload_path in clips]
+        print(f"📦 Analyzing batch {labelled[0][0]}-{labelled[-1][0]} ({len(clips)} clips)")
+        
+        match_id = clips[0][0].parent.parent.name
+        prompt = self.get_batch_analysis_prompt([(timestamp, seconds) for timestamp, seconds, _ in labelled])
+        
+        batch_config = {**(generation_config or {}), "responseMimeType": "application/json"}
+        if self.structured:
+            batch_config["responseSchema"] = BATCH_SCHEMA
+        text = await self.client.aanalyze_videos(
+            model_name or self.model_name,
+            [(f"CLIP {timestamp} ({round(seconds)} seconds)", path, seconds) for timestamp, seconds, path in labelled],
+            prompt,
+            generation_config=batch_config,
+            system=self.prompt_prefix(match_id),
+        )
+        return parse_batch_response(text, {timestamp: seconds for timestamp, seconds, _ in labelled}, self.structured)
+
+    async def analyze_batch_or_singles(self, clips: list, generation_config: dict = None,
+                                       model_name: str = None) -> dict:
+        """Batched call, then single-clip calls for any clip the batch answer missed
+
+        Returns {clip_path: (timestamp, description, record) or the exception it failed with}.
+        """
         try:
-            # Extract timestamp from filename (e.g., clip_05m30s.mp4 -> 05:30)
-            filename = clip_path.stem
-            if 'clip_' in filename:
-                time_part = filename.replace('clip_', '').replace('m', ':').replace('s', '')
-                # Convert to mm:ss format
-                if ':' in time_part:
-                    parts = time_part.split(':')
-                    timestamp = f"{parts[0].zfill(2)}:{parts[1].zfill(2)}"
-                else:
-                    timestamp = "00:00"
-            else:
-                timestamp = "00:00"
+            answers = await self.analyze_batch_async(clips, generation_config, model_name)
+            batch_failed = False
+        except GeminiError as e:
+            print(f"⚠️  Batch failed ({e}) - analyzing its clips one by one")
+            answers, batch_failed = {}, True
+        
+        results = {}
+        for clip_path, _, _ in clips:
+            timestamp = self.clip_timestamp(clip_path)
+            if timestamp in answers:
+                description, record = answers[timestamp]
+                print(f"✅ {timestamp}: {description}")
+                results[clip_path] = (timestamp, description, record)
+        
+        missing = [clip for clip in clips if clip[0] not in results]
+        if missing and not batch_failed:
+            print(f"⚠️  {len(missing)} clips missing from the batch answer - analyzing them one by one")
+        singles = await asyncio.gather(*(
+            self.analyze_clip_async(clip_path, clip_seconds, upload_path, generation_config, model_name)
+            for clip_path, clip_seconds, upload_path in missing
+        ), return_exceptions=True)
+        for (clip_path, _, _), result in zip(missing, singles):
+            results[clip_path] = result
+        return results
 
-            print(f"📹 Analyzing {timestamp}: {clip_path.name}")
-            
-            # Upload and analyze clip
-            uploaded_file = genai.upload_file(str(clip_path))
-            
-            # Wait for processing
-            while uploaded_file.state.name == "PROCESSING":
-                time.sleep(1)
-                uploaded_file = genai.get_file(uploaded_file.name)
+    def analyze_single_clip(self, clip_path: Path, clip_seconds: float = None) -> tuple:
+        """Blocking wrapper around analyze_clip_async"""
+        return self.client.run(self.analyze_clip_async(clip_path, clip_seconds))
 
-            if uploaded_file.state.name == "FAILED":
-                return timestamp, "Analysis failed"
+    def load_proxies(self, data_dir: Path) -> tuple:
+        """(proxies dir, Gemini generation config) if 1.45 made proxies, else (None, None)"""
+        proxies_dir = data_dir / "1.45_proxies"
+        report_path = proxies_dir / "proxies.json"
+        if not report_path.exists():
+            return None, None
+        with open(report_path, 'r') as f:
+            report = json.load(f)
+        print(f"🗜️  Uploading '{report['profile']}' proxies ({report['bytes_saved_percent']}% fewer bytes, "
+              f"~{report['tokens_saved_percent']}% fewer tokens)")
+        return proxies_dir, report.get("gemini_generation_config") or None
 
-            # Load team config for this match
-            match_id = clip_path.parent.parent.name  # Extract match_id from path
-            team_config = self.load_team_config(match_id)
-            
-            # Generate analysis with team config
-            response = self.model.generate_content([
-                uploaded_file,
-                self.get_simple_analysis_prompt(team_config)
-            ])
-            
-            # Clean up uploaded file
-            genai.delete_file(uploaded_file.name)
-            
-            description = response.text.strip()
-            print(f"✅ {timestamp}: {description}")
-            
-            return timestamp, description
-            
-        except Exception as e:
-            print(f"❌ Error analyzing {clip_path.name}: {str(e)}")
-            return timestamp, f"Error: {str(e)}"
+    def analyze_all_clips(self, match_id: str, triage: str = None, triage_threshold: float = TRIAGE_THRESHOLD,
+                          batch_size: int = 1) -> bool:
+        """Analyze all clips in parallel and save to individual text files
 
-    def analyze_all_clips(self, match_id: str) -> bool:
-        """Analyze all clips in parallel and save to individual text files"""
+        `triage` decides what happens to clips 1.4 scored below `triage_threshold`:
+        'skip' leaves them without a description, 'cheap' sends them to the cheap
+        model and 'last' queues them behind every other clip. `batch_size` > 1
+        packs that many consecutive clips into each Gemini request.
+        """
         print(f"🎬 Simple Clip Analysis for {match_id}")
         
         data_dir = Path("../outputs") / match_id
@@ -181,19 +335,16 @@ Example: "Blue team maintains possession in midfield" or "White team takes throw
             print(f"❌ No clips found in {clips_dir}")
             return False
         
-        # Filter out clips that already have description files (to avoid API waste)
-        unprocessed_clips = []
-        for clip_path in clip_files:
-            # Generate expected output filename
-            clip_name = clip_path.stem  # e.g., "clip_05m30s"
-            timestamp = clip_name.replace('clip_', '').replace('m', ':').replace('s', '')
-            output_filename = f"clip_{timestamp.replace(':', 'm')}s.txt"
-            output_path = output_dir / output_filename
-            
-            if not output_path.exists():
-                unprocessed_clips.append(clip_path)
-            else:
-                print(f"⏭️  Skipping {clip_path.name} (already analyzed)")
+        # Only clips the journal doesn't have as done (with their files intact) cost an API call
+        journal = StageJournal(data_dir, JOURNAL_STAGE)
+        unprocessed_clips = [clip_path for clip_path in clip_files
+                             if not self.is_analyzed(journal, output_dir, clip_path)]
+        done = len(clip_files) - len(unprocessed_clips)
+        if done:
+            print(f"⏭️  Skipping {done} clips already analyzed")
+        retrying = sum(1 for clip_path in unprocessed_clips if journal.status(clip_path.stem) is not None)
+        if retrying:
+            print(f"🔁 Retrying {retrying} clips that failed or were interrupted last time")
         
         clip_files = unprocessed_clips
         
@@ -205,54 +356,400 @@ Example: "Blue team maintains possession in midfield" or "White team takes throw
         print(f"⚽ RESUMING ANALYSIS: Processing {len(clip_files)} remaining clips")
         
         print(f"📊 Found {len(clip_files)} clips to analyze")
-        print(f"🎯 Using parallel processing with Gemini 2.5 Pro (30 workers)")
+        print(f"🎯 Using Gemini 2.5 Pro with adaptive concurrency "
+              f"(up to {budgets.gemini_worker_count()} calls in flight)")
         
-        # Process clips in parallel
-        successful_analyses = 0
+        # Real clip lengths recorded by 1.4, proxies from 1.45 if they exist
+        segments = load_segments(clips_dir)
+        proxies_dir, generation_config = self.load_proxies(data_dir)
         
-        with ThreadPoolExecutor(max_workers=30) as executor:
-            # Submit all tasks
-            future_to_clip = {
-                executor.submit(self.analyze_single_clip, clip_path): clip_path 
-                for clip_path in clip_files
+        quiet_clips = set()
+        if triage:
+            quiet_clips = {
+                clip_path for clip_path in clip_files
+                if segments.get(clip_path.stem, {}).get("triage", {}).get("score", 1.0) < triage_threshold
             }
+            if not any("triage" in clip for clip in segments.values()):
+                print("⚠️  No triage scores in segments.json - re-run 1.4 (or clip_triage.py) to enable --triage")
+            elif triage == 'skip':
+                print(f"🔎 Triage: skipping {len(quiet_clips)} dead-ball clips (score < {triage_threshold})")
+                clip_files = [clip_path for clip_path in clip_files if clip_path not in quiet_clips]
+            elif triage == 'cheap':
+                print(f"🔎 Triage: {len(quiet_clips)} dead-ball clips go to {self.cheap_model_name}")
+            elif triage == 'last':
+                print(f"🔎 Triage: {len(quiet_clips)} dead-ball clips queued last")
+                # The client starts queued calls in submission order
+                clip_files = sorted(clip_files, key=lambda clip_path: clip_path in quiet_clips)
+        
+        def upload_path(clip_path):
+            if proxies_dir and (proxies_dir / clip_path.name).exists():
+                return proxies_dir / clip_path.name
+            return clip_path
+        
+        def clip_args(clip_path):
+            return clip_path, segments.get(clip_path.stem, {}).get("duration"), upload_path(clip_path)
+        
+        def model_for(clip_path):
+            return self.cheap_model_name if triage == 'cheap' and clip_path in quiet_clips else None
+        
+        for clip_path in clip_files:
+            journal.pending(clip_path.stem)
+        if batch_size > 1:
+            return self.analyze_in_batches(clip_files, batch_size, clip_args, model_for, generation_config,
+                                           output_dir, journal)
+        
+        # All clips are queued on the shared client; it decides how many run at once
+        successful_analyses = 0
+        future_to_clip = {
+            self.client.submit(self.analyze_clip_async(
+                *clip_args(clip_path), generation_config, model_for(clip_path))): clip_path
+            for clip_path in clip_files
+        }
+        
+        # Process results as they complete
+        for future in as_completed(future_to_clip):
+            clip_path = future_to_clip[future]
             
-            # Process results as they complete
-            for future in as_completed(future_to_clip):
-                clip_path = future_to_clip[future]
+            try:
+                timestamp, description, record = future.result()
+                self.save_description(output_dir, timestamp, description, record, journal)
+                successful_analyses += 1
                 
-                try:
-                    timestamp, description = future.result()
-                    
-                    # Save to individual text file
-                    output_filename = f"clip_{timestamp.replace(':', 'm')}s.txt"
-                    output_path = output_dir / output_filename
-                    
-                    with open(output_path, 'w') as f:
-                        f.write(description)
-                    
-                    successful_analyses += 1
-                    
-                except Exception as e:
-                    print(f"❌ Failed to process {clip_path.name}: {str(e)}")
+            except Exception as e:
+                print(f"❌ Failed to process {clip_path.name}: {str(e)}")
+                journal.failed(clip_path.stem, e)
         
+        return self.report_analysis(successful_analyses, len(clip_files), output_dir)
+
+    def analyze_in_batches(self, clip_files: list, batch_size: int, clip_args, model_for,
+                           generation_config: dict, output_dir: Path, journal: StageJournal) -> bool:
+        """Submit consecutive clips `batch_size` at a time and fan the answers out to clip_XXmYYs.txt"""
+        batches = []
+        for clip_path in clip_files:
+            # A batch only holds clips going to the same model
+            if batches and len(batches[-1]) < batch_size and model_for(batches[-1][-1]) == model_for(clip_path):
+                batches[-1].append(clip_path)
+            else:
+                batches.append([clip_path])
+        print(f"📦 Batching up to {batch_size} clips per request: {len(batches)} requests for {len(clip_files)} clips")
+        
+        future_to_batch = {
+            self.client.submit(self.analyze_batch_or_singles(
+                [clip_args(clip_path) for clip_path in batch], generation_config, model_for(batch[0]))): batch
+            for batch in batches
+        }
+        
+        successful_analyses = 0
+        for future in as_completed(future_to_batch):
+            batch = future_to_batch[future]
+            try:
+                results = future.result()
+            except Exception as e:
+                print(f"❌ Failed to process batch {batch[0].name}-{batch[-1].name}: {str(e)}")
+                for clip_path in batch:
+                    journal.failed(clip_path.stem, e)
+                continue
+            for clip_path, result in results.items():
+                if isinstance(result, BaseException):
+                    print(f"❌ Failed to process {clip_path.name}: {str(result)}")
+                    journal.failed(clip_path.stem, result)
+                    continue
+                timestamp, description, record = result
+                self.save_description(output_dir, timestamp, description, record, journal)
+                successful_analyses += 1
+        
+        return self.report_analysis(successful_analyses, len(clip_files), output_dir)
+
+    def report_analysis(self, successful_analyses: int, total: int, output_dir: Path) -> bool:
         print(f"✅ Analysis complete!")
-        print(f"📊 Successfully analyzed: {successful_analyses}/{len(clip_files)} clips")
+        print(f"📊 Successfully analyzed: {successful_analyses}/{total} clips")
+        if successful_analyses < total:
+            print(f"🔁 Re-run to retry the {total - successful_analyses} failed clips")
+        self.release_prefixes()
+        self.client.print_stats()
         print(f"📁 Output saved to: {output_dir}")
         
         return successful_analyses > 0
 
+    def release_prefixes(self):
+        """Drop any cached prompt prefixes once the match's clips are done (they would expire anyway)"""
+        for prefix in self.prefixes.values():
+            self.client.release_prefix(prefix)
+
+    def save_description(self, output_dir: Path, timestamp: str, description: str, record: dict = None,
+                         journal: StageJournal = None) -> Path:
+        """Write one clip description to 1.5_clip_descriptions/clip_XXmYYs.txt (+ .json record)
+
+        Both files are swapped in whole, then the journal marks the clip done.
+        """
+        output_path = output_dir / f"clip_{timestamp.replace(':', 'm')}s.txt"
+        written = []
+        if record is not None:
+            written.append(atomic_write_json(output_path.with_suffix('.json'), record))
+        written.append(atomic_write_text(output_path, description))
+        if journal:
+            journal.ok(output_path.stem, *written)
+        return output_path
+
+    def is_analyzed(self, journal: StageJournal, output_dir: Path, clip_path: Path) -> bool:
+        """Journaled as done with its files intact, or described before there was a journal"""
+        item = clip_path.stem
+        if journal.is_done(item):
+            return True
+        output_path = output_dir / f"{item}.txt"
+        if journal.status(item) is not None or not output_path.exists():
+            return False
+        # Older runs saved failures as "Error: ..." descriptions - those get analyzed again
+        text = output_path.read_text(errors='replace').strip()
+        if not text or text.startswith("Error"):
+            return False
+        record_path = output_path.with_suffix('.json')
+        journal.ok(item, output_path, *([record_path] if record_path.exists() else []), adopted=True)
+        return True
+
+    def analyze_streaming(self, match_id: str, triage: str = None, triage_threshold: float = TRIAGE_THRESHOLD,
+                          batch_size: int = 1, proxy_profile: str = None, windowing: str = None) -> bool:
+        """1.4 + 1.45 + 1.5 in one pass: analyze each clip as soon as 1.4 has cut it
+
+        1.4's generate_clips runs on a thread (same windowing, journal and triage
+        as on its own) and hands over every clip it finishes. With a
+        `proxy_profile` the clip's 1.45 proxy is encoded first and proxies.json
+        is written at the end. `batch_size` consecutive clips share a request.
+        Wall-clock becomes max(segmentation, analysis) instead of their sum, and
+        the first description arrives seconds after starting.
+
+        Triage scores are relative to the whole match, so they only exist once
+        1.4 has decoded all of it: with a `triage` mode the clips and proxies are
+        still made as they arrive, but the Gemini calls wait for the scores and
+        then go out through analyze_all_clips.
+        """
+        print(f"🎬 Streaming Clip Analysis for {match_id}")
+        
+        from pipeline_runner import load_stage_module
+        make_clips = load_stage_module("1.4_make_clips.py")
+        make_proxies = load_stage_module("1.45_make_proxies.py") if proxy_profile else None
+        if make_proxies and proxy_profile not in make_proxies.PROXY_PROFILES:
+            print(f"❌ Unknown proxy profile '{proxy_profile}' (choose from {', '.join(make_proxies.PROXY_PROFILES)})")
+            return False
+        
+        data_dir = Path("../outputs") / match_id
+        proxies_dir = data_dir / "1.45_proxies"
+        output_dir = data_dir / "1.5_clip_descriptions"
+        output_dir.mkdir(parents=True, exist_ok=True)
+        
+        profile = make_proxies.PROXY_PROFILES[proxy_profile] if make_proxies else None
+        generation_config = make_proxies.gemini_generation_config(profile) if profile else {}
+        if make_proxies:
+            make_proxies.clear_stale_proxies(proxies_dir, proxy_profile)
+            print(f"🗜️  Encoding '{proxy_profile}' proxies as clips are cut")
+        
+        clip_queue = queue.Queue()
+        proxy_results, proxy_failures = [], []
+        segment_errors = []
+        run_start = time.time()
+        proxy_pool = ThreadPoolExecutor(max_workers=budgets.ffmpeg_worker_count()) if make_proxies else None
+        
+        def encode_proxy(clip):
+            """Proxy first, then queue the clip for analysis (its original if the encode failed)"""
+            try:
+                with budgets.ffmpeg_slot():
+                    result = make_proxies.make_proxy(clip["path"], proxies_dir / clip["path"].name, profile)
+                if result["ok"]:
+                    result["duration_seconds"] = clip["end_seconds"] - clip["start_seconds"]
+                    proxy_results.append(result)
+                else:
+                    proxy_failures.append(result["filename"])
+                    print(f"⚠️  {result['filename']}: proxy failed, uploading the original ({result['error']})")
+            finally:
+                clip_queue.put(clip)
+        
+        def on_clip(clip):
+            if proxy_pool:
+                proxy_pool.submit(encode_proxy, clip)
+            else:
+                clip_queue.put(clip)
+        
+        def segment():
+            """Producer: cut clips with 1.4 (then triage) and queue each one the moment it exists"""
+            try:
+                if not make_clips.generate_clips(match_id, on_clip=on_clip, windowing=windowing):
+                    segment_errors.append("1.4 could not cut the clips")
+                print(f"✂️  Segmentation finished in {time.time() - run_start:.1f}s")
+            except Exception as e:
+                segment_errors.append(e)
+                print(f"❌ Segmentation failed: {e}")
+            finally:
+                if proxy_pool:
+                    proxy_pool.shutdown(wait=True)
+                    if proxy_results:
+                        make_proxies.write_report(proxies_dir, proxy_profile, proxy_results,
+                                                  len(proxy_failures), run_start)
+                clip_queue.put(None)
+        
+        producer = threading.Thread(target=segment, daemon=True)
+        producer.start()
+        
+        if triage:
+            print(f"🔎 Triage '{triage}': cutting clips now, analyzing once 1.4 has scored them")
+            producer.join()
+            if segment_errors:
+                return False
+            return self.analyze_all_clips(match_id, triage, triage_threshold, batch_size)
+        
+        print(f"🎯 Analyzing clips as they are cut (adaptive concurrency, "
+              f"up to {budgets.gemini_worker_count()} calls in flight"
+              f"{f', {batch_size} clips per request' if batch_size > 1 else ''})")
+        
+        first_saved = []
+        future_to_batch = {}
+        journal = StageJournal(data_dir, JOURNAL_STAGE)
+        
+        async def analyze_and_save(clips):
+            """Save each description the moment it arrives, not after segmentation ends"""
+            if len(clips) > 1:
+                results = await self.analyze_batch_or_singles(clips, generation_config)
+            else:
+                try:
+                    results = {clips[0][0]: await self.analyze_clip_async(*clips[0], generation_config)}
+                except GeminiError as e:
+                    results = {clips[0][0]: e}
+            saved = 0
+            for clip_path, result in results.items():
+                if isinstance(result, BaseException):
+                    print(f"❌ Failed to process {clip_path.name}: {str(result)}")
+                    journal.failed(clip_path.stem, result)
+                    continue
+                timestamp, description, record = result
+                self.save_description(output_dir, timestamp, description, record, journal)
+                saved += 1
+                if not first_saved:
+                    first_saved.append(time.time() - run_start)
+            return saved
+        
+        def submit(batch):
+            future_to_batch[self.client.submit(analyze_and_save(batch))] = batch
+        
+        batch = []
+        queued = 0
+        while True:
+            clip = clip_queue.get()
+            if clip is None:
+                break
+            clip_path = clip["path"]
+            if self.is_analyzed(journal, output_dir, clip_path):
+                print(f"⏭️  Skipping {clip_path.name} (already analyzed)")
+                continue
+            journal.pending(clip_path.stem)
+            queued += 1
+            upload_path = proxies_dir / clip_path.name if make_proxies else None
+            batch.append((clip_path, clip["end_seconds"] - clip["start_seconds"],
+                          upload_path if upload_path and upload_path.exists() else None))
+            if len(batch) >= batch_size:
+                submit(batch)
+                batch = []
+        if batch:
+            submit(batch)
+        
+        successful_analyses = 0
+        for future in as_completed(future_to_batch):
+            try:
+                successful_analyses += future.result()
+            except Exception as e:
+                batch = future_to_batch[future]
+                print(f"❌ Failed to process {batch[0][0].name}-{batch[-1][0].name}: {str(e)}")
+                for clip_path, _, _ in batch:
+                    journal.failed(clip_path.stem, e)
+        
+        producer.join()
+        first_description_at = first_saved[0] if first_saved else None
+        total_time = time.time() - run_start
+        
+        print(f"✅ Streaming analysis complete!")
+        print(f"📊 Successfully analyzed: {successful_analyses}/{queued} clips")
+        if successful_analyses < queued:
+            print(f"🔁 Re-run to retry the {queued - successful_analyses} failed clips")
+        if first_description_at is not None:
+            print(f"⚡ Time to first description: {first_description_at:.1f}s")
+        print(f"⏱️  Total time (segment + analyze): {total_time:.1f}s")
+        self.release_prefixes()
+        self.client.print_stats()
+        print(f"📁 Output saved to: {output_dir}")
+        
+        if segment_errors:
+            return False
+        return successful_analyses > 0 or not queued
+
+def parse_batch_response(text: str, clip_seconds: dict, structured: bool = False) -> dict:
+    """{timestamp: (description, record)} from a batched JSON answer, ignoring unknown or empty entries
+
+    `clip_seconds` maps each clip's marker timestamp to its length.
+    """
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json').strip()
+    try:
+        items = json.loads(text)
+    except json.JSONDecodeError:
+        return {}
+    if isinstance(items, dict):
+        items = items.get("clips", [])
+    
+    results = {}
+    for item in items if isinstance(items, list) else []:
+        if not isinstance(item, dict):
+            continue
+        start = str(item.get("clip_start", "")).strip()
+        if start not in clip_seconds or start in results:
+            continue
+        if structured:
+            try:
+                record = normalize_record(item, clip_seconds[start])
+            except ValueError:
+                continue
+            results[start] = (record_to_text(record), record)
+        else:
+            description = str(item.get("description") or "").strip()
+            if description:
+                results[start] = (description, None)
+    return results
+
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python 4_simple_clip_analyzer.py <match-id>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    triage = os.getenv('CLANN_TRIAGE_MODE') or None
+    triage_threshold = float(os.getenv('CLANN_TRIAGE_THRESHOLD', TRIAGE_THRESHOLD))
+    if '--triage' in sys.argv:
+        triage = sys.argv[sys.argv.index('--triage') + 1]
+        args.remove(triage)
+    if '--triage-threshold' in sys.argv:
+        value = sys.argv[sys.argv.index('--triage-threshold') + 1]
+        triage_threshold = float(value)
+        args.remove(value)
+    batch_size = int(os.getenv('CLANN_BATCH_CLIPS', 1))
+    if '--batch' in sys.argv:
+        value = sys.argv[sys.argv.index('--batch') + 1]
+        batch_size = int(value)
+        args.remove(value)
+    
+    if len(args) != 1 or (triage and triage not in TRIAGE_MODES):
+        print("Usage: python 4_simple_clip_analyzer.py <match-id> [--stream] [--triage skip|cheap|last] [--triage-threshold 0.2] [--batch N]")
         print("Example: python 4_simple_clip_analyzer.py ballyclare-20250111")
+        print("  --stream  run 1.4 and analyze each clip as soon as it is cut (CLANN_PROXY_PROFILE adds 1.45 proxies)")
+        print("  --triage  skip, send to a cheaper model, or analyze last the clips 1.4 scored as dead ball")
+        print("  --batch   analyze N consecutive clips per Gemini request (default 1)")
         sys.exit(1)
     
-    match_id = sys.argv[1]
+    match_id = args[0]
+    stream = '--stream' in sys.argv
     
     try:
         analyzer = SimpleClipAnalyzer()
-        success = analyzer.analyze_all_clips(match_id)
+        if stream:
+            # 1.45 proxies only when CLANN_PROXY_PROFILE asks for them
+            success = analyzer.analyze_streaming(match_id, triage, triage_threshold, batch_size,
+                                                 os.getenv('CLANN_PROXY_PROFILE') or None)
+        else:
+            success = analyzer.analyze_all_clips(match_id, triage, triage_threshold, batch_size)
         
         if success:
             print("🎉 Simple clip analysis completed successfully!")
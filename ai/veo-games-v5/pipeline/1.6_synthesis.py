@@ -3,13 +3,20 @@
 1.6 Synthesis
 Combine all clip descriptions into one chronological timeline
 Simple, fast, no AI needed - just file concatenation and sorting
+Also builds the indexed timeline store (timeline_store.py) from the 1.5 records
 """
 
 import sys
 import os
 import re
+import json
 from pathlib import Path
 
+from clip_stream import load_segments
+from clip_records import classify_event, record_from_text
+from timeline_store import build_rows, duplicate_events, write_store
+from stage_journal import atomic_write_text
+
 def extract_timestamp_from_filename(filename: str) -> tuple:
     """Extract timestamp from filename like clip_05m30s.txt -> (5, 30)"""
     try:
@@ -55,6 +62,39 @@ def parse_and_adjust_timings(description: str, clip_start_minutes: int, clip_sta
     
     return adjusted_description
 
+# "00:08 shot taken" inside a description, up to the next separator or timing
+EVENT_PATTERN = re.compile(r'00:(\d{2})\s*[-–]?\s*(.*?)(?=\s*(?:[,;.]|00:\d{2}|$))')
+
+def find_overlap_duplicates(entries: list) -> dict:
+    """Events reported by two overlapping windows (1.4 --windows veo)
+
+    `entries` have start/end seconds and a description. Uses the same rule as
+    the timeline store (timeline_store.duplicate_events). Returns
+    {entry index: [(start, end) character spans to remove]}.
+    """
+    events = []
+    for i, entry in enumerate(entries):
+        for match in EVENT_PATTERN.finditer(entry["description"]):
+            events.append({
+                "window": i, "seconds": entry["start"] + int(match.group(1)), "span": match.span(),
+                "type": classify_event(match.group(2)), "description": match.group(2),
+            })
+    
+    drops = {}
+    windows = [(entry["start"], entry["end"]) for entry in entries]
+    for index in duplicate_events(events, windows):
+        drops.setdefault(events[index]["window"], []).append(events[index]["span"])
+    return drops
+
+def remove_events(description: str, spans: list) -> str:
+    """Cut event fragments out of a description and tidy the separators left behind"""
+    for start, end in sorted(spans, reverse=True):
+        description = description[:start] + description[end:]
+    description = re.sub(r'\s*,\s*(?=,|\.|$)', '', description)
+    description = re.sub(r':\s*,\s*', ': ', description)
+    description = re.sub(r'Key events:\s*(\.|$)', '', description)
+    return re.sub(r'\s{2,}', ' ', description).strip()
+
 def synthesize_timeline(match_id: str) -> bool:
     """Combine all clip descriptions into one timeline file"""
     print(f"📝 Synthesizing timeline for {match_id}")
@@ -77,42 +117,87 @@ def synthesize_timeline(match_id: str) -> bool:
     
     print(f"📊 Found {len(description_files)} description files")
     
+    # Real clip start times from 1.4 (stream-copy clips start on the keyframe after the 15s mark)
+    segments = load_segments(data_dir / "1.4_clips")
+    if segments:
+        print(f"🔑 Using real clip offsets from segments.json ({len(segments)} clips)")
+    
     # Read and sort by timestamp
-    timeline_entries = []
+    raw_entries = []
     
     for file_path in description_files:
         try:
-            # Extract timestamp from filename
-            minutes, seconds = extract_timestamp_from_filename(file_path.name)
-            timestamp = format_timestamp(minutes, seconds)
+            # Real start if 1.4 recorded it, otherwise the filename timestamp
+            segment = segments.get(file_path.stem)
+            if segment:
+                minutes, seconds = divmod(int(round(segment["start_seconds"])), 60)
+            else:
+                minutes, seconds = extract_timestamp_from_filename(file_path.name)
+            start = minutes * 60 + seconds
+            end = segment["end_seconds"] if segment else start + 15
             
             # Read the simple description (no timestamp prefix expected)
             with open(file_path, 'r') as f:
                 description = f.read().strip()
             
-            # Adjust any internal clip timings (00:XX) to match timestamps
-            adjusted_description = parse_and_adjust_timings(description, minutes, seconds)
+            # Structured record from 1.5 if there is one (older matches only have the text)
+            record_path = file_path.with_suffix('.json')
+            if record_path.exists():
+                with open(record_path, 'r') as f:
+                    record = json.load(f)
+            else:
+                record = record_from_text(description)
             
-            # Add to timeline with filename timestamp + adjusted events
-            timeline_entries.append((minutes * 60 + seconds, timestamp, adjusted_description))
+            raw_entries.append({"clip": file_path.stem, "start": start, "end": end, "minutes": minutes,
+                                "seconds": seconds, "description": description, "record": record})
             
         except Exception as e:
             print(f"⚠️ Warning: Could not process {file_path.name}: {str(e)}")
     
+    # Overlapping VEO windows describe the same goal/shot twice - keep one copy
+    duplicates = find_overlap_duplicates(raw_entries)
+    duplicate_count = sum(len(spans) for spans in duplicates.values())
+    if duplicate_count:
+        print(f"🪟 Removed {duplicate_count} events already reported by an overlapping window")
+    
+    timeline_entries = []
+    for i, entry in enumerate(raw_entries):
+        description = entry["description"]
+        if i in duplicates:
+            description = remove_events(description, duplicates[i])
+        
+        # Adjust any internal clip timings (00:XX) to match timestamps
+        adjusted_description = parse_and_adjust_timings(description, entry["minutes"], entry["seconds"])
+        
+        # Add to timeline with filename timestamp + adjusted events
+        timestamp = format_timestamp(entry["minutes"], entry["seconds"])
+        timeline_entries.append((entry["start"], timestamp, adjusted_description))
+        entry["text"] = adjusted_description
+    
     # Sort by total seconds
     timeline_entries.sort(key=lambda x: x[0])
     
     # Write combined timeline
-    with open(output_path, 'w') as f:
-        f.write(f"# Complete Match Timeline - {match_id}\n")
-        f.write(f"# Generated from {len(timeline_entries)} clip descriptions\n\n")
-        
-        for _, timestamp, description in timeline_entries:
-            f.write(f"{timestamp} - {description}\n")
+    lines = [f"# Complete Match Timeline - {match_id}",
+             f"# Generated from {len(timeline_entries)} clip descriptions"]
+    if duplicate_count:
+        lines.append(f"# {duplicate_count} duplicate events from overlapping windows removed")
+    lines.append("")
+    lines += [f"{timestamp} - {description}" for _, timestamp, description in timeline_entries]
+    atomic_write_text(output_path, "\n".join(lines) + "\n")
+    
+    # Indexed store for range/type queries downstream
+    rows = build_rows([
+        {"clip": entry["clip"], "start_seconds": entry["start"], "end_seconds": entry["end"],
+         "record": entry["record"], "text": entry["text"]}
+        for entry in raw_entries
+    ])
+    store = write_store(data_dir, rows)
     
     print(f"✅ Timeline synthesis complete!")
     print(f"📊 Combined {len(timeline_entries)} descriptions")
     print(f"📁 Output saved to: {output_path}")
+    print(f"🗂️ Timeline store: {store['clips']} clips, {store['events']} events → 1.6_timeline.jsonl, 1.6_events.npz")
     
     # Show sample of timeline
     print("\n🎯 Timeline Sample:")
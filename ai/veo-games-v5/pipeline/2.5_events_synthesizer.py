@@ -18,11 +18,16 @@ Outputs:
 import sys
 import os
 import json
-import google.generativeai as genai
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+from gemini_client import get_client
+from event_mapreduce import (synthesis_mode, veo_goals_and_shots, synthesize_events, format_events,
+                             format_seconds, count_events, SYNTHESIS_MODES)
+from stage_journal import atomic_write_json, atomic_write_text
+from timeline_store import TimelineStore
+
 # Load environment variables
 env_paths = [
     Path('.env'),
@@ -39,14 +44,19 @@ for env_path in env_paths:
         break
 
 class MegaAnalyzer:
-    def __init__(self):
-        """Initialize the mega analyzer with Gemini"""
+    def __init__(self, synthesis: str = None):
+        """Initialize the mega analyzer with Gemini
+
+        `synthesis` is 'single', 'mapreduce' or 'auto' (default CLANN_SYNTHESIS,
+        else auto: map-reduce only when the timeline is too long for one call).
+        """
         api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
         if not api_key:
             raise Exception("GOOGLE_API_KEY not found in environment variables")
             
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.client = get_client(api_key)
+        self.model_name = 'gemini-2.5-flash'
+        self.synthesis = synthesis
         print("🧠 Mega Analyzer initialized with Gemini 2.5 Flash")
     
     def load_team_config(self, match_id: str) -> dict:
@@ -106,22 +116,9 @@ class MegaAnalyzer:
         """Create the comprehensive analysis prompt for plain text output"""
         
         # Extract VEO goals and shots
-        veo_goals = []
-        veo_shots = []
-        
-        for event in data['veo_data']['events']:
-            event_info = {
-                'time': event['timestamp'],
-                'seconds': event['timestamp_seconds'],
-                'type': event['event_type']
-            }
-            
-            if event['event_type'] == 'Goal':
-                veo_goals.append(event_info)
-            elif event['event_type'] == 'Shot on goal':
-                veo_shots.append(event_info)
+        veo_goals, veo_shots = veo_goals_and_shots(data['veo_data'])
         
-        # Truncate timeline if too long (Gemini limits)
+        # Truncate timeline if too long (Gemini limits) - only with --synthesis single, auto switches to map-reduce
         timeline = data['timeline']
         if len(timeline) > 100000:
             timeline = timeline[:100000] + "\n... (timeline truncated for analysis)"
@@ -149,7 +146,16 @@ AI TIMELINE:
 
 OUTPUT 3 SEPARATE SECTIONS:
 
-=== MEGA_EVENTS.TXT ===
+{self.events_section(team_a_name, team_b_name, veo_goals)}
+{self.tactical_summary_sections(team_a_name, team_b_name, veo_goals, veo_shots)}
+
+Generate these 3 sections now:"""
+
+        return prompt
+
+    def events_section(self, team_a_name: str, team_b_name: str, veo_goals: list) -> str:
+        """MEGA_EVENTS.TXT format and VEO goal rules (whole match or one map-reduce window)"""
+        return f"""=== MEGA_EVENTS.TXT ===
 List all significant events in chronological order, one per line:
 Format: MM:SS - TYPE: Team - Description
 
@@ -172,8 +178,11 @@ Example:
 30:50 - GOAL: {team_a_name} - Header from corner kick, player #10 scores with powerful header
 31:31 - SHOT: {team_b_name} - Long range effort from 25 yards, saved by goalkeeper
 70:15 - PENALTY: {team_a_name} - Penalty awarded after defender handball in box
+"""
 
-=== MEGA_TACTICAL.TXT ===
+    def tactical_summary_sections(self, team_a_name: str, team_b_name: str, veo_goals: list, veo_shots: list) -> str:
+        """MEGA_TACTICAL.TXT and MEGA_SUMMARY.TXT templates"""
+        return f"""=== MEGA_TACTICAL.TXT ===
 Team analysis in plain text sections:
 
 === {team_a_name.upper()} ===
@@ -209,11 +218,79 @@ Key Statistics:
 - [Other stats from AI timeline: fouls, corners, cards, throw-ins, free kicks]
 
 Match Narrative:
-[2-3 paragraph summary of match flow, using VEO goals as the definitive scoring record]
+[2-3 paragraph summary of match flow, using VEO goals as the definitive scoring record]"""
 
-Generate these 3 sections now:"""
+    def create_window_prompt(self, window: dict, veo_goals: list, veo_shots: list, team_config: dict) -> str:
+        """Map step: MEGA_EVENTS.TXT lines for one timeline window"""
+        team_a_name = team_config['team_a']['name']
+        team_b_name = team_config['team_b']['name']
+        span = f"{format_seconds(window['start'])} to {format_seconds(window['end'])}"
+        
+        return f"""You are analyzing {span} of a football match.
 
-        return prompt
+TEAMS: {team_a_name} vs {team_b_name} (use actual team names consistently)
+
+VEO VERIFIED GOALS IN THIS PART OF THE MATCH ({len(veo_goals)} total):
+{json.dumps(veo_goals, indent=2)}
+
+VEO VERIFIED SHOTS IN THIS PART OF THE MATCH ({len(veo_shots)} total):
+{json.dumps(veo_shots, indent=2)}
+
+AI TIMELINE ({span}):
+{window['text']}
+
+OUTPUT ONLY THIS SECTION:
+
+{self.events_section(team_a_name, team_b_name, veo_goals)}
+Only list events between {span}. Use match timestamps (MM:SS) as in the AI timeline.
+Generate the event lines now - one per line, nothing else:"""
+
+    def create_narrative_prompt(self, events: list, veo_goals: list, veo_shots: list, team_config: dict) -> str:
+        """Reduce step: tactical and summary sections from the merged, VEO-reconciled events"""
+        team_a_name = team_config['team_a']['name']
+        team_b_name = team_config['team_b']['name']
+        
+        statistics = ""
+        for team in (team_a_name, team_b_name):
+            counts = count_events(events, team)
+            statistics += f"\n{team}: " + (", ".join(f"{event_type} {n}" for event_type, n in sorted(counts.items()))
+                                            or "no events")
+        
+        return f"""You are analyzing a football match from its complete list of significant events.
+Goals have already been checked against VEO ground truth ({len(veo_goals)} goals) - the GOAL lines are the real goals.
+
+TEAMS: {team_a_name} vs {team_b_name} (use actual team names consistently)
+
+EVENT COUNTS (use these exact numbers for the statistics):{statistics}
+
+MATCH EVENTS:
+{format_events(events)}
+
+OUTPUT 2 SEPARATE SECTIONS:
+
+{self.tactical_summary_sections(team_a_name, team_b_name, veo_goals, veo_shots)}
+
+Generate these 2 sections now:"""
+
+    def analyze_match_mapreduce(self, data: dict) -> str:
+        """Events from concurrent timeline windows, then one small call for the tactical and summary sections
+
+        Returns the analysis text in the single-call layout, so it is saved the same way.
+        """
+        team_config = self.load_team_config(data['match_id'])
+        veo_goals, veo_shots = veo_goals_and_shots(data['veo_data'])
+        
+        store = TimelineStore.require(Path(f"../outputs/{data['match_id']}"))
+        events, _ = synthesize_events(
+            self.client, self.model_name, store, veo_goals, veo_shots,
+            lambda window, goals, shots: self.create_window_prompt(window, goals, shots, team_config),
+        )
+        
+        prompt = self.create_narrative_prompt(events, veo_goals, veo_shots, team_config)
+        print(f"🧠 Writing tactical and summary sections from {len(events)} events ({len(prompt)} char prompt)...")
+        narrative = self.client.generate_text(self.model_name, prompt)
+        
+        return f"=== MEGA_EVENTS.TXT ===\n{format_events(events)}\n\n{narrative}"
 
     def analyze_match(self, match_id: str):
         """Run complete match analysis"""
@@ -223,16 +300,17 @@ Generate these 3 sections now:"""
         # Load all data
         data = self.load_match_data(match_id)
         
-        # Create mega prompt  
-        prompt = self.create_mega_prompt(data)
-        
-        print(f"🧠 Calling Gemini with {len(prompt)} char prompt...")
-        
         # Get analysis from Gemini and save as text files
         try:
-            print("🧠 Generating comprehensive analysis...")
-            response = self.model.generate_content(prompt)
-            analysis_text = response.text
+            if synthesis_mode(data['timeline'], self.synthesis) == 'mapreduce':
+                print(f"🗺️  Map-reduce synthesis ({len(data['timeline'])} char timeline)")
+                analysis_text = self.analyze_match_mapreduce(data)
+            else:
+                # Create mega prompt
+                prompt = self.create_mega_prompt(data)
+                print(f"🧠 Calling Gemini with {len(prompt)} char prompt...")
+                print("🧠 Generating comprehensive analysis...")
+                analysis_text = self.client.generate_text(self.model_name, prompt)
             
             print("✅ Analysis generated")
             print(f"📊 Generated {len(analysis_text)} characters")
@@ -278,34 +356,29 @@ Generate these 3 sections now:"""
             
             # Save mega_events.txt
             events_path = base_path / "2.5_mega_events.txt"
-            with open(events_path, 'w') as f:
-                f.write(events_text)
+            atomic_write_text(events_path, events_text)
             print(f"✅ Saved: {events_path}")
             
             # Save mega_tactical.txt  
             tactical_path = base_path / "2.5_mega_tactical.txt"
-            with open(tactical_path, 'w') as f:
-                f.write(tactical_text)
+            atomic_write_text(tactical_path, tactical_text)
             print(f"✅ Saved: {tactical_path}")
             
             # Save mega_summary.txt
             summary_path = base_path / "2.5_mega_summary.txt"
-            with open(summary_path, 'w') as f:
-                f.write(summary_text)
+            atomic_write_text(summary_path, summary_text)
             print(f"✅ Saved: {summary_path}")
             
             # Also save the full analysis for debugging
             full_path = base_path / "2.5_mega_analysis_full.txt"
-            with open(full_path, 'w') as f:
-                f.write(analysis_text)
+            atomic_write_text(full_path, analysis_text)
             print(f"📄 Full analysis saved: {full_path}")
             
         except Exception as e:
             print(f"❌ Failed to parse text sections: {e}")
             # Save raw text for debugging
             raw_path = base_path / "mega_analysis_raw.txt" 
-            with open(raw_path, 'w') as f:
-                f.write(analysis_text)
+            atomic_write_text(raw_path, analysis_text)
             print(f"💾 Raw analysis saved: {raw_path}")
             raise
 
@@ -317,8 +390,7 @@ Generate these 3 sections now:"""
         
         # Save complete analysis
         mega_path = base_path / "mega_analysis.json" 
-        with open(mega_path, 'w') as f:
-            json.dump(analysis, f, indent=2)
+        atomic_write_json(mega_path, analysis)
         print(f"✅ Saved: {mega_path}")
         
         # Extract nested match analysis
@@ -327,48 +399,52 @@ Generate these 3 sections now:"""
         # Save web events array
         web_events = match_analysis.get('web_events_array', [])
         web_path = base_path / "web_events_array.json"
-        with open(web_path, 'w') as f:
-            json.dump(web_events, f, indent=2)
+        atomic_write_json(web_path, web_events)
         print(f"✅ Saved: {web_path}")
         
         # Save tactical analysis
         tactical = match_analysis.get('tactical_analysis', {})
         tactical_path = base_path / "11_tactical_analysis.json"
-        with open(tactical_path, 'w') as f:
-            json.dump(tactical, f, indent=2)
+        atomic_write_json(tactical_path, tactical)
         print(f"✅ Saved: {tactical_path}")
         
         # Save accuracy report
         accuracy = match_analysis.get('accuracy_metrics', {})
         accuracy_path = base_path / "accuracy_report.json"
-        with open(accuracy_path, 'w') as f:
-            json.dump(accuracy, f, indent=2)
+        atomic_write_json(accuracy_path, accuracy)
         print(f"✅ Saved: {accuracy_path}")
         
         # Also save legacy web events format 
         web_events_legacy = {"events": web_events}
         legacy_path = base_path / "web_events.json"
-        with open(legacy_path, 'w') as f:
-            json.dump(web_events_legacy, f, indent=2)
+        atomic_write_json(legacy_path, web_events_legacy)
         print(f"✅ Saved: {legacy_path}")
         
         # Save match metadata
         metadata = match_analysis.get('match_metadata', {})
         metadata_path = base_path / "match_metadata.json"
-        with open(metadata_path, 'w') as f:
-            json.dump(metadata, f, indent=2)
+        atomic_write_json(metadata_path, metadata)
         print(f"✅ Saved: {metadata_path}")
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python mega_analyzer.py <match-id>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    synthesis = None
+    if '--synthesis' in sys.argv:
+        synthesis = sys.argv[sys.argv.index('--synthesis') + 1]
+        args.remove(synthesis)
+    
+    if len(args) != 1 or (synthesis and synthesis not in SYNTHESIS_MODES):
+        print("Usage: python mega_analyzer.py <match-id> [--synthesis auto|single|mapreduce]")
         print("Example: python mega_analyzer.py 20250523-match-23-may-2025-3fc1de88")
+        print("  --synthesis  mapreduce extracts events from overlapping timeline windows concurrently")
+        print("               (auto: only when the timeline is too long for one call)")
         sys.exit(1)
     
-    match_id = sys.argv[1]
+    match_id = args[0]
     
     try:
-        analyzer = MegaAnalyzer()
+        analyzer = MegaAnalyzer(synthesis)
         # Run analysis (saves text files directly)
         analyzer.analyze_match(match_id)
         
@@ -5,6 +5,7 @@ Same as 2.5 mega analyzer but focuses ONLY on 7 high-value event types
 
 Inputs:
 - 1.6_complete_timeline.txt (complete match timeline)
+- 1.6_timeline.jsonl + 1.6_events.npz (timeline store: rule engine and map-reduce windows)
 - 1_veo_ground_truth.json (VEO verified events)
 - 1_team_config.json (team names and colors)
 
@@ -16,11 +17,20 @@ Outputs:
 import sys
 import os
 import json
-import google.generativeai as genai
+import time
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+from gemini_client import get_client
+from event_mapreduce import (synthesis_mode, veo_goals_and_shots, synthesize_events, format_events,
+                             format_seconds, count_events, SYNTHESIS_MODES)
+from focused_rules import extract_focused_events, format_focused_events
+from stage_journal import atomic_write_json, atomic_write_text
+from timeline_store import TimelineStore
+
+EXTRACTION_MODES = ('rules', 'llm')
+
 # Load environment variables
 env_paths = [
     Path('.env'),
@@ -37,20 +47,36 @@ for env_path in env_paths:
         break
 
 class FocusedEventsAnalyzer:
-    def __init__(self):
-        """Initialize the focused analyzer with Gemini"""
+    def __init__(self, synthesis: str = None, extraction: str = None):
+        """Initialize the focused analyzer with Gemini
+
+        `extraction` is 'rules' (default, CLANN_FOCUSED_EXTRACT) - events from
+        focused_rules.py, the model only for unclear lines - or 'llm'.
+        With 'llm', `synthesis` is 'single', 'mapreduce' or 'auto' (default
+        CLANN_SYNTHESIS, else auto: map-reduce only when the timeline is too long
+        for one call).
+        """
         api_key = os.getenv('GOOGLE_API_KEY') or os.getenv('GEMINI_API_KEY')
         if not api_key:
             raise Exception("GOOGLE_API_KEY not found in environment variables")
             
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-flash')
+        self.client = get_client(api_key)
+        self.model_name = 'gemini-2.5-flash'
         print("🎯 Focused Events Analyzer initialized with Gemini 2.5 Flash")
         
         # Our 7 target event types
         self.TARGET_EVENTS = [
             'Goals', 'Shots', 'Fouls', 'Corners', 'Free kicks', 'Goal kicks', 'Turnovers'
         ]
+        # Event line TYPE for each target (map-reduce counts and filters on these)
+        self.TARGET_TYPES = {
+            'Goals': 'GOAL', 'Shots': 'SHOT', 'Fouls': 'FOUL', 'Corners': 'CORNER',
+            'Free kicks': 'FREE KICK', 'Goal kicks': 'GOAL KICK', 'Turnovers': 'TURNOVER'
+        }
+        self.synthesis = synthesis
+        self.extraction = extraction or os.getenv('CLANN_FOCUSED_EXTRACT', 'rules')
+        if self.extraction not in EXTRACTION_MODES:
+            raise ValueError(f"Unknown extraction mode '{self.extraction}' (use {', '.join(EXTRACTION_MODES)})")
         print(f"📋 Target events: {', '.join(self.TARGET_EVENTS)}")
     
     def load_team_config(self, match_id: str) -> dict:
@@ -101,22 +127,9 @@ class FocusedEventsAnalyzer:
         """Create the focused analysis prompt - ONLY 7 event types"""
         
         # Extract VEO goals and shots (same system as 2.5)
-        veo_goals = []
-        veo_shots = []
+        veo_goals, veo_shots = veo_goals_and_shots(data['veo_data'])
         
-        for event in data['veo_data']['events']:
-            event_info = {
-                'time': event['timestamp'],
-                'seconds': event['timestamp_seconds'],
-                'type': event['event_type']
-            }
-            
-            if event['event_type'] == 'Goal':
-                veo_goals.append(event_info)
-            elif event['event_type'] == 'Shot on goal':
-                veo_shots.append(event_info)
-        
-        # Truncate timeline if too long (Gemini limits)
+        # Truncate timeline if too long (Gemini limits) - only with --synthesis single, auto switches to map-reduce
         timeline = data['timeline']
         if len(timeline) > 100000:
             timeline = timeline[:100000] + "\n... (timeline truncated for analysis)"
@@ -143,7 +156,16 @@ AI TIMELINE:
 {timeline}
 
 OUTPUT 3 SECTIONS - FOCUS ONLY ON THESE 7 EVENT TYPES:
-1. Goals (use VEO verification system)
+{self.events_section(team_a_name, team_b_name, veo_goals)}
+{self.summary_sections(team_a_name, team_b_name)}
+
+Generate these 3 sections now - IGNORE everything except the 7 event types:"""
+
+        return prompt
+
+    def events_section(self, team_a_name: str, team_b_name: str, veo_goals: list) -> str:
+        """The 7 event types and the FOCUSED_EVENTS.TXT rules (whole match or one map-reduce window)"""
+        return f"""1. Goals (use VEO verification system)
 2. Shots (including penalties, headers, volleys)
 3. Fouls (including cards, bookings)
 4. Corners (corner kicks)
@@ -197,8 +219,11 @@ IGNORE ALL OTHER EVENTS: No throw-ins, substitutions, warm-ups, pre-match activi
 - These could be: warm-up shots, practice goals, celebration descriptions, or AI mistakes
 - ONLY the {len(veo_goals)} VEO-verified goals at timestamps {[g['time'] for g in veo_goals]} are real
 - All other "goal" mentions in AI timeline must be classified as SHOTS instead
+"""
 
-=== FOCUSED_SUMMARY.TXT ===
+    def summary_sections(self, team_a_name: str, team_b_name: str) -> str:
+        """FOCUSED_SUMMARY.TXT and FOCUSED_TACTICAL.TXT templates"""
+        return f"""=== FOCUSED_SUMMARY.TXT ===
 Match summary focusing on the 7 event types:
 
 Match: {team_a_name} vs {team_b_name}
@@ -246,11 +271,114 @@ Weaknesses:
 - [List 2-3 weaknesses based on focused events evidence]
 
 Key Moments:
-- [Key plays involving {team_b_name} from the 7 event types]
+- [Key plays involving {team_b_name} from the 7 event types]"""
 
-Generate these 3 sections now - IGNORE everything except the 7 event types:"""
+    def create_window_prompt(self, window: dict, veo_goals: list, veo_shots: list, team_config: dict) -> str:
+        """Map step: FOCUSED_EVENTS.TXT lines for one timeline window"""
+        team_a_name = team_config['team_a']['name']
+        team_b_name = team_config['team_b']['name']
+        span = f"{format_seconds(window['start'])} to {format_seconds(window['end'])}"
+        
+        return f"""You are analyzing {span} of a football match. Focus ONLY on 7 high-value event types.
 
-        return prompt
+TEAMS: {team_a_name} vs {team_b_name} (use actual team names consistently)
+
+VEO VERIFIED GOALS IN THIS PART OF THE MATCH ({len(veo_goals)} total):
+{json.dumps(veo_goals, indent=2)}
+
+VEO VERIFIED SHOTS IN THIS PART OF THE MATCH ({len(veo_shots)} total):
+{json.dumps(veo_shots, indent=2)}
+
+AI TIMELINE ({span}):
+{window['text']}
+
+OUTPUT ONLY THE FIRST SECTION BELOW - FOCUS ONLY ON THESE 7 EVENT TYPES:
+{self.events_section(team_a_name, team_b_name, veo_goals)}
+Only list events between {span}. Use match timestamps (MM:SS) as in the AI timeline.
+Generate the event lines now - one per line, nothing else:"""
+
+    def create_narrative_prompt(self, events: list, veo_goals: list, team_config: dict, events_text: str = None) -> str:
+        """Reduce step: summary and tactical sections from the merged, VEO-reconciled events"""
+        team_a_name = team_config['team_a']['name']
+        team_b_name = team_config['team_b']['name']
+        
+        statistics = ""
+        for team in (team_a_name, team_b_name):
+            counts = count_events(events, team)
+            statistics += f"\n{team}: " + ", ".join(f"{label} {counts.get(event_type, 0)}"
+                                                     for label, event_type in self.TARGET_TYPES.items())
+        
+        return f"""You are summarizing a football match from its complete list of focused events.
+Goals have already been checked against VEO ground truth ({len(veo_goals)} goals) - the GOAL lines are the real goals.
+
+TEAMS: {team_a_name} vs {team_b_name} (use actual team names consistently)
+
+EVENT COUNTS (use these exact numbers in the statistics):{statistics}
+
+FOCUSED EVENTS:
+{events_text or format_events(events)}
+
+OUTPUT 2 SECTIONS:
+
+{self.summary_sections(team_a_name, team_b_name)}
+
+Generate these 2 sections now:"""
+
+    def analyze_match_mapreduce(self, data: dict) -> str:
+        """Events from concurrent timeline windows, then one small call for the summary and tactical sections
+
+        Returns the analysis text in the single-call layout, so it is saved the same way.
+        """
+        team_config = self.load_team_config(data['match_id'])
+        veo_goals, veo_shots = veo_goals_and_shots(data['veo_data'])
+        
+        store = TimelineStore.require(Path(f"../outputs/{data['match_id']}"))
+        events, _ = synthesize_events(
+            self.client, self.model_name, store, veo_goals, veo_shots,
+            lambda window, goals, shots: self.create_window_prompt(window, goals, shots, team_config),
+        )
+        events = [e for e in events if e["type"] in self.TARGET_TYPES.values()]
+        
+        prompt = self.create_narrative_prompt(events, veo_goals, team_config)
+        print(f"🧠 Writing summary and tactical sections from {len(events)} events ({len(prompt)} char prompt)...")
+        narrative = self.client.generate_text(self.model_name, prompt)
+        
+        return f"=== FOCUSED_EVENTS.TXT ===\n{format_events(events)}\n\n{narrative}"
+
+    def analyze_match_rules(self, data: dict) -> str:
+        """Events from the local rule engine (model only for unclear lines), then the summary and tactical call
+
+        2.6_focused_events.txt is written as soon as the events are known.
+        """
+        match_id = data['match_id']
+        team_config = self.load_team_config(match_id)
+        veo_goals, veo_shots = veo_goals_and_shots(data['veo_data'])
+        
+        store = TimelineStore.require(Path(f"../outputs/{match_id}"))
+        started = time.perf_counter()
+        events, stats = extract_focused_events(
+            store, team_config, veo_goals, veo_shots,
+            fallback=lambda prompt: self.client.generate_text(
+                self.model_name, prompt, generation_config={"responseMimeType": "application/json"}),
+        )
+        events_text = format_focused_events(events)
+        stats["total_ms"] = round((time.perf_counter() - started) * 1000, 1)
+        stats["events"] = len(events)
+        
+        base_path = Path(f"../outputs/{match_id}")
+        atomic_write_text(base_path / "2.6_focused_events.txt", events_text)
+        atomic_write_json(base_path / "2.6_focused_events_stats.json", stats)
+        veo = stats["veo"]
+        print(f"⚡ {len(events)} events in {stats['total_ms']:.0f} ms - fast path {stats['fast_path']}, "
+              f"LLM path {stats['llm_path']} ({stats['llm_candidates']} unclear clauses, {stats['llm_calls']} call)")
+        print(f"🎯 VEO goals: {veo['goals_matched']} matched, {veo['goals_promoted']} promoted, {veo['goals_added']} added, "
+              f"{veo['goals_demoted']} unverified goals → shots, {veo['shots_added']} VEO shots added")
+        
+        prompt = self.create_narrative_prompt(events, veo_goals, team_config, events_text)
+        print(f"🧠 Writing summary and tactical sections ({len(prompt)} char prompt)...")
+        narrative = self.client.generate_text(self.model_name, prompt)
+        
+        return f"=== FOCUSED_EVENTS.TXT ===\n{events_text}\n\n{narrative}"
 
     def analyze_match(self, match_id: str):
         """Run focused match analysis"""
@@ -259,17 +387,22 @@ Generate these 3 sections now - IGNORE everything except the 7 event types:"""
         # Load all data
         data = self.load_match_data(match_id)
         
-        # Create focused prompt  
-        prompt = self.create_focused_prompt(data)
-        
-        print(f"🧠 Calling Gemini with {len(prompt)} char prompt...")
         print("🎯 Focusing on 7 event types only...")
         
         # Get analysis from Gemini and save as text files
         try:
-            print("🧠 Generating focused analysis...")
-            response = self.model.generate_content(prompt)
-            analysis_text = response.text
+            if self.extraction == 'rules':
+                print("⚡ Rule-based event extraction")
+                analysis_text = self.analyze_match_rules(data)
+            elif synthesis_mode(data['timeline'], self.synthesis) == 'mapreduce':
+                print(f"🗺️  Map-reduce synthesis ({len(data['timeline'])} char timeline)")
+                analysis_text = self.analyze_match_mapreduce(data)
+            else:
+                # Create focused prompt
+                prompt = self.create_focused_prompt(data)
+                print(f"🧠 Calling Gemini with {len(prompt)} char prompt...")
+                print("🧠 Generating focused analysis...")
+                analysis_text = self.client.generate_text(self.model_name, prompt)
             
             print("✅ Analysis generated")
             print(f"📊 Generated {len(analysis_text)} characters")
@@ -308,41 +441,53 @@ Generate these 3 sections now - IGNORE everything except the 7 event types:"""
             
             # Save focused_events.txt
             events_path = base_path / "2.6_focused_events.txt"
-            with open(events_path, 'w') as f:
-                f.write(events_text)
+            atomic_write_text(events_path, events_text)
             print(f"✅ Saved events: {events_path}")
             
             # Save focused_summary.txt
             summary_path = base_path / "2.6_focused_summary.txt"
-            with open(summary_path, 'w') as f:
-                f.write(summary_text)
+            atomic_write_text(summary_path, summary_text)
             print(f"✅ Saved summary: {summary_path}")
             
             # Save focused_tactical.txt
             tactical_path = base_path / "2.6_focused_tactical.txt"
-            with open(tactical_path, 'w') as f:
-                f.write(tactical_text)
+            atomic_write_text(tactical_path, tactical_text)
             print(f"✅ Saved tactical: {tactical_path}")
             
         except Exception as e:
             print(f"❌ Failed to parse sections: {e}")
             # Save raw text for debugging
             raw_path = base_path / "2.6_focused_analysis_raw.txt" 
-            with open(raw_path, 'w') as f:
-                f.write(analysis_text)
+            atomic_write_text(raw_path, analysis_text)
             print(f"💾 Raw analysis saved for debugging: {raw_path}")
             raise
 
 def main():
-    if len(sys.argv) != 2:
-        print("Usage: python 2.6_focused_events.py <match-id>")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    
+    synthesis = None
+    if '--synthesis' in sys.argv:
+        synthesis = sys.argv[sys.argv.index('--synthesis') + 1]
+        args.remove(synthesis)
+    extraction = None
+    if '--extract' in sys.argv:
+        extraction = sys.argv[sys.argv.index('--extract') + 1]
+        args.remove(extraction)
+    
+    if len(args) != 1 or (synthesis and synthesis not in SYNTHESIS_MODES) or \
+            (extraction and extraction not in EXTRACTION_MODES):
+        print("Usage: python 2.6_focused_events.py <match-id> [--extract rules|llm] [--synthesis auto|single|mapreduce]")
         print("Example: python 2.6_focused_events.py 20250427-match-apr-27-2025-9bd1cf29")
+        print("  --extract    rules (default) finds events locally and asks Gemini only about unclear lines;")
+        print("               llm asks Gemini for the whole event list")
+        print("  --synthesis  with --extract llm: mapreduce extracts events from overlapping timeline windows")
+        print("               concurrently (auto: only when the timeline is too long for one call)")
         sys.exit(1)
     
-    match_id = sys.argv[1]
+    match_id = args[0]
     
     try:
-        analyzer = FocusedEventsAnalyzer()
+        analyzer = FocusedEventsAnalyzer(synthesis, extraction)
         # Run focused analysis (saves text files directly)
         analyzer.analyze_match(match_id)
         
@@ -0,0 +1,138 @@
+#!/usr/bin/env python3
+"""
+3.15 Make Thumbnails
+Scrubber thumbnails and event posters for the webapp player
+
+- sprite_NNN.jpg + thumbnails.vtt: a 160x90 frame every 2s, 100 per sheet
+  (video_thumbnails.py). Copied from 1.4_sprites when 1.4's triage decode
+  already made them from this video, otherwise one decode pass of its own.
+- posters/poster_MMmSSs.jpg: a 720p frame at every timestamp in
+  3.1_web_events_array.json. Each is an input-seeked single-frame read that
+  only decodes from the nearest keyframe, not another pass over the match.
+- thumbnails.json: settings, counts and {timestamp: poster file}
+
+All in 3.15_thumbnails/, which 3.5 publishes with the analysis JSON.
+
+Usage:
+    python3 3.15_make_thumbnails.py <match-id>
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import subprocess
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import budgets
+import video_thumbnails
+from stage_journal import atomic_write_json
+
+THUMBNAILS_DIRNAME = "3.15_thumbnails"
+POSTER_HEIGHT = 720
+
+
+def probe_duration(video_path: Path) -> float:
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', str(video_path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(json.loads(result.stdout)["format"]["duration"])
+    except (OSError, subprocess.CalledProcessError, KeyError, ValueError):
+        return 0.0
+
+
+def poster_name(timestamp: int) -> str:
+    return f"poster_{timestamp // 60:02d}m{timestamp % 60:02d}s.jpg"
+
+
+def extract_poster(video_path, timestamp, output_path) -> bool:
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+           '-ss', str(timestamp), '-i', str(video_path),
+           '-frames:v', '1', '-vf', f'scale=-2:{POSTER_HEIGHT}', '-q:v', '3', '-y', str(output_path)]
+    with budgets.ffmpeg_slot():
+        result = subprocess.run(cmd, capture_output=True, text=True)
+    return result.returncode == 0 and output_path.exists()
+
+
+def load_event_timestamps(data_dir: Path, duration: float) -> list:
+    with open(data_dir / "3.1_web_events_array.json", 'r') as f:
+        events = json.load(f)
+    timestamps = {int(event["timestamp"]) for event in events if isinstance(event.get("timestamp"), (int, float))}
+    return sorted(t for t in timestamps if not duration or t < duration)
+
+
+def make_thumbnails(match_id: str) -> bool:
+    """Sprites, VTT track and event posters for one match"""
+    print(f"🖼️  Step 3.15: Making scrubber thumbnails and event posters for {match_id}")
+
+    data_dir = Path("../outputs") / match_id
+    video_path = data_dir / "video.mp4"
+    out_dir = data_dir / THUMBNAILS_DIRNAME
+    if not video_path.exists():
+        print(f"❌ Video not found: {video_path}")
+        return False
+    if not (data_dir / "3.1_web_events_array.json").exists():
+        print("❌ No 3.1_web_events_array.json - run Step 3.1 first: python 3.1_format_webapp.py")
+        return False
+
+    tmp_dir = data_dir / f"tmp_{THUMBNAILS_DIRNAME}"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    (tmp_dir / "posters").mkdir(parents=True)
+    start_time = time.time()
+
+    shared = video_thumbnails.reusable_sprites(data_dir / "1.4_sprites", video_path)
+    if shared:
+        print(f"♻️  Reusing {shared['sheets']} sprite sheets from 1.4's triage decode")
+        video_thumbnails.copy_sprites(data_dir / "1.4_sprites", tmp_dir)
+        duration = shared["duration_seconds"]
+    else:
+        print(f"🎞️  One decode pass: a frame every {video_thumbnails.THUMB_STRIDE_SECONDS}s → sprite sheets")
+        with budgets.ffmpeg_slot():
+            if not video_thumbnails.make_sprites(video_path, tmp_dir):
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                return False
+        duration = probe_duration(video_path)
+    sheets = len(list(tmp_dir.glob("sprite_*.jpg")))
+    if not duration:
+        duration = sheets * video_thumbnails.SPRITE_COLUMNS * video_thumbnails.SPRITE_ROWS \
+            * video_thumbnails.THUMB_STRIDE_SECONDS
+    cues = video_thumbnails.write_vtt(tmp_dir, duration, sheets)
+
+    timestamps = load_event_timestamps(data_dir, duration)
+    with ThreadPoolExecutor(max_workers=budgets.ffmpeg_worker_count()) as pool:
+        made = list(pool.map(lambda t: extract_poster(video_path, t, tmp_dir / "posters" / poster_name(t)),
+                             timestamps))
+    posters = {str(t): f"posters/{poster_name(t)}" for t, ok in zip(timestamps, made) if ok}
+
+    report = {
+        **video_thumbnails.sprite_settings(),
+        "vtt": video_thumbnails.VTT_FILENAME,
+        "sheets": sheets,
+        "cues": cues,
+        "duration_seconds": round(duration, 1),
+        "sprites_from": "1.4_triage" if shared else "own_pass",
+        "posters": posters,
+        "poster_failures": len(timestamps) - len(posters),
+        "seconds": round(time.time() - start_time, 1),
+    }
+    atomic_write_json(tmp_dir / "thumbnails.json", report)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+    print(f"✅ Thumbnails complete in {report['seconds']}s: {sheets} sprite sheets, {cues} VTT cues, "
+          f"{len(posters)}/{len(timestamps)} event posters")
+    return True
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python3 3.15_make_thumbnails.py <match-id>")
+        sys.exit(1)
+    if not make_thumbnails(sys.argv[1]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
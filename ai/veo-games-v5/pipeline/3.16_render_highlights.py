@@ -0,0 +1,331 @@
+#!/usr/bin/env python3
+"""
+3.16 Render Highlights
+Padded MP4 clips for every event in 3.1_web_events_array.json plus one highlights reel
+
+Each clip window (event time - pad before .. + pad after, HIGHLIGHT_PADDING)
+is cut without re-encoding the whole thing. From the cached keyframe index
+(keyframe_index.py):
+- head: window start → first keyframe inside it, re-encoded
+- body: that keyframe → last keyframe inside it, stream copied
+- tail: last keyframe → window end, re-encoded
+so only the partial GOPs at each end go through x264. The pieces are MPEG-TS
+(in-band codec headers) and the concat demuxer joins them with -c copy.
+Windows with no whole GOP inside, or a source that isn't H.264, are
+re-encoded in one piece.
+
+Every piece of every clip goes into one process pool, encodes first; a clip's
+concat is queued as soon as its pieces are done. Each ffmpeg run holds one of
+budgets.py's ffmpeg slots, shared with every other stage and match. The reel joins the pieces of
+the REEL_TYPES windows (overlaps merged) in match order.
+
+Writes 3.16_highlights/event_MMmSSs_<type>.mp4, highlights_reel.mp4 and
+highlights.json (per-clip copy/encode seconds and timings). 3.5 uploads the
+folder. CLANN_HIGHLIGHTS=0 leaves the stage out of pipeline runs.
+
+Usage:
+    python3 3.16_render_highlights.py <match-id>
+"""
+
+import sys
+import os
+import json
+import time
+import shutil
+import subprocess
+from pathlib import Path
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+
+import budgets
+from stage_journal import atomic_write_json
+from keyframe_index import load_keyframe_index, keyframe_at_or_after, keyframe_at_or_before
+
+HIGHLIGHTS_DIRNAME = "3.16_highlights"
+REEL_FILENAME = "highlights_reel.mp4"
+
+# Seconds of build-up before and follow-through after each event
+HIGHLIGHT_PADDING = {
+    "goal": (15, 10),
+    "penalty_awarded": (10, 10),
+    "shot": (8, 6),
+    "card": (8, 6),
+}
+DEFAULT_PADDING = (6, 6)
+REEL_TYPES = ("goal", "shot", "penalty_awarded", "card")
+
+ENCODE_PRESET = os.getenv('CLANN_HIGHLIGHTS_PRESET', 'veryfast')
+ENCODE_CRF = 18
+MIN_PIECE_SECONDS = 0.02
+
+
+def probe_source(video_path: Path) -> dict:
+    """Codec settings the re-encoded heads/tails must match to concat with copied packets"""
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', '-show_streams', str(video_path)]
+    try:
+        info = json.loads(subprocess.run(cmd, capture_output=True, text=True, timeout=60).stdout or '{}')
+    except (OSError, subprocess.TimeoutExpired, json.JSONDecodeError):
+        info = {}
+    streams = info.get("streams", [])
+    video = next((s for s in streams if s.get("codec_type") == "video"), {})
+    audio = next((s for s in streams if s.get("codec_type") == "audio"), None)
+    return {
+        "video_codec": video.get("codec_name"),
+        "audio": audio is not None if streams else True,
+        "sample_rate": (audio or {}).get("sample_rate") or "48000",
+        "channels": (audio or {}).get("channels") or 2,
+        "duration": float(info.get("format", {}).get("duration") or 0),
+    }
+
+
+def clip_name(event: dict) -> str:
+    timestamp = int(event["timestamp"])
+    kind = "".join(c if c.isalnum() else "_" for c in str(event.get("type") or "event"))
+    return f"event_{timestamp // 60:02d}m{timestamp % 60:02d}s_{kind}.mp4"
+
+
+def event_window(event: dict, duration: float) -> tuple:
+    before, after = HIGHLIGHT_PADDING.get(event.get("type"), DEFAULT_PADDING)
+    start = max(0.0, float(event["timestamp"]) - before)
+    end = float(event["timestamp"]) + after
+    return round(start, 3), round(min(end, duration) if duration else end, 3)
+
+
+def merge_windows(windows) -> list:
+    merged = []
+    for start, end in sorted(windows):
+        if merged and start <= merged[-1][1]:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return merged
+
+
+def plan_pieces(window, keyframes, smart=True) -> list:
+    """[(kind, start, end)] where kind is "encode" or "copy"; one encode piece when no GOP fits"""
+    start, end = window
+    first = keyframe_at_or_after(keyframes, start) if smart else None
+    last = keyframe_at_or_before(keyframes, end) if smart else None
+    if first is None or last is None or last <= first:
+        return [("encode", start, end)]
+    pieces = []
+    if first - start >= MIN_PIECE_SECONDS:
+        pieces.append(("encode", start, first))
+    pieces.append(("copy", first, last))
+    if end - last >= MIN_PIECE_SECONDS:
+        pieces.append(("encode", last, end))
+    return pieces
+
+
+def piece_command(video_path, kind, start, end, output_path, source) -> list:
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+           '-ss', f"{start:.3f}", '-i', str(video_path), '-t', f"{end - start:.3f}",
+           '-map', '0:v:0', '-map', '0:a:0?']
+    if kind == "copy":
+        # Input seek onto a keyframe: the copy starts exactly there
+        cmd += ['-c', 'copy']
+    else:
+        cmd += ['-c:v', 'libx264', '-preset', ENCODE_PRESET, '-crf', str(ENCODE_CRF), '-pix_fmt', 'yuv420p']
+        if source["audio"]:
+            cmd += ['-c:a', 'aac', '-ar', str(source["sample_rate"]), '-ac', str(source["channels"])]
+    return cmd + ['-avoid_negative_ts', 'make_zero', '-f', 'mpegts', '-y', str(output_path)]
+
+
+def concat_command(list_path, output_path) -> list:
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin',
+            '-f', 'concat', '-safe', '0', '-i', str(list_path),
+            '-c', 'copy', '-bsf:a', 'aac_adtstoasc', '-movflags', '+faststart', '-y', str(output_path)]
+
+
+def run_task(task: dict) -> dict:
+    """One ffmpeg run in a pool worker: a piece, a clip concat or the reel"""
+    started = time.time()
+    if task["kind"] == "concat":
+        Path(task["list_path"]).write_text("".join(f"file '{Path(p).resolve()}'\n" for p in task["inputs"]))
+        cmd = concat_command(task["list_path"], task["output"])
+    else:
+        cmd = piece_command(task["video"], task["kind"], task["start"], task["end"], task["output"],
+                            task["source"])
+    result = subprocess.run(cmd, capture_output=True, text=True)
+    ok = result.returncode == 0 and Path(task["output"]).exists() and Path(task["output"]).stat().st_size > 0
+    return {"id": task["id"], "ok": ok, "seconds": time.time() - started,
+            "bytes": Path(task["output"]).stat().st_size if ok else 0,
+            "error": None if ok else result.stderr.strip()[-300:]}
+
+
+def load_events(data_dir: Path, duration: float) -> list:
+    with open(data_dir / "3.1_web_events_array.json", 'r') as f:
+        events = json.load(f)
+    events = [e for e in events if isinstance(e.get("timestamp"), (int, float))
+              and (not duration or e["timestamp"] < duration)]
+    return sorted(events, key=lambda e: e["timestamp"])
+
+
+def render_highlights(match_id: str) -> bool:
+    """Event clips and the highlights reel for one match"""
+    print(f"🎬 Step 3.16: Rendering event highlights for {match_id}")
+
+    data_dir = Path("../outputs") / match_id
+    video_path = data_dir / "video.mp4"
+    out_dir = data_dir / HIGHLIGHTS_DIRNAME
+    if not video_path.exists():
+        print(f"❌ Video not found: {video_path}")
+        return False
+    if not (data_dir / "3.1_web_events_array.json").exists():
+        print("❌ No 3.1_web_events_array.json - run Step 3.1 first: python 3.1_format_webapp.py")
+        return False
+
+    source = probe_source(video_path)
+    index = load_keyframe_index(video_path)
+    keyframes = index["keyframes"] if index else []
+    duration = (index or {}).get("duration") or source["duration"]
+    smart = bool(keyframes) and source["video_codec"] in ("h264", None)
+    if not smart:
+        print(f"⚠️  No keyframe index or {source['video_codec']} source - re-encoding whole clips")
+
+    events = load_events(data_dir, duration)
+    if not events:
+        print("❌ No timed events to render")
+        return False
+
+    # Identical windows (same time and padding) share one clip
+    clips = {}
+    for event in events:
+        window = event_window(event, duration)
+        if window[1] - window[0] < MIN_PIECE_SECONDS:
+            continue
+        clip = clips.setdefault(window, {"file": clip_name(event), "window": window, "events": []})
+        clip["events"].append({"timestamp": event["timestamp"], "type": event.get("type")})
+    reel_windows = merge_windows(event_window(e, duration) for e in events if e.get("type") in REEL_TYPES)
+
+    tmp_dir = data_dir / f"tmp_{HIGHLIGHTS_DIRNAME}"
+    pieces_dir = tmp_dir / "pieces"
+    shutil.rmtree(tmp_dir, ignore_errors=True)
+    pieces_dir.mkdir(parents=True)
+
+    # Every window's pieces, shared between a clip and the reel when the window is the same
+    pieces, window_pieces = {}, {}
+    for window in sorted(set(clips) | set(reel_windows)):
+        window_pieces[window] = []
+        for kind, start, end in plan_pieces(window, keyframes, smart):
+            piece_id = f"{kind}_{start:010.3f}_{end:010.3f}"
+            pieces.setdefault(piece_id, {"id": piece_id, "kind": kind, "start": start, "end": end,
+                                         "video": str(video_path), "source": source,
+                                         "output": str(pieces_dir / f"{piece_id}.ts")})
+            window_pieces[window].append(piece_id)
+
+    encode_seconds = sum(p["end"] - p["start"] for p in pieces.values() if p["kind"] == "encode")
+    copy_seconds = sum(p["end"] - p["start"] for p in pieces.values() if p["kind"] == "copy")
+    bitrate = video_path.stat().st_size / duration if duration else 0
+    num_workers = budgets.ffmpeg_worker_count()
+    print(f"✂️  {len(clips)} clips + reel of {len(reel_windows)} moments: {len(pieces)} pieces, "
+          f"{copy_seconds:.0f}s stream-copied, {encode_seconds:.0f}s re-encoded ({num_workers} processes)")
+
+    # Longest encodes first so the pool doesn't end on one big straggler; copies are nearly free
+    queue = sorted(pieces.values(), key=lambda p: (p["kind"] != "encode", p["start"] - p["end"]))
+    waiting = {window: set(ids) for window, ids in window_pieces.items() if window in clips}
+    timings, failed = {}, set()
+    started = time.time()
+
+    with budgets.disk_reservation(data_dir, int(bitrate * (copy_seconds + encode_seconds) * 2.5)), \
+            ProcessPoolExecutor(max_workers=num_workers) as executor:
+        # Each task holds a shared ffmpeg slot, so other stages and matches keep their share
+        running = {budgets.submit_ffmpeg(executor, run_task, task) for task in queue}
+        while running:
+            done, running = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                result = future.result()
+                timings[result["id"]] = result
+                if not result["ok"]:
+                    failed.add(result["id"])
+                    print(f"❌ {result['id']}: {result['error']}")
+                    continue
+                for window in [w for w, ids in waiting.items() if result["id"] in ids]:
+                    waiting[window].discard(result["id"])
+                    if waiting[window]:
+                        continue
+                    del waiting[window]
+                    clip = clips[window]
+                    running.add(budgets.submit_ffmpeg(executor, run_task, {
+                        "id": clip["file"], "kind": "concat",
+                        "inputs": [pieces[piece_id]["output"] for piece_id in window_pieces[window]],
+                        "list_path": str(pieces_dir / f"{clip['file']}.txt"),
+                        "output": str(tmp_dir / clip["file"])}))
+
+        reel_pieces = [piece_id for window in reel_windows for piece_id in window_pieces[window]]
+        reel = None
+        if reel_pieces and not failed.intersection(reel_pieces):
+            with budgets.ffmpeg_slot():
+                reel = run_task({"id": REEL_FILENAME, "kind": "concat",
+                                 "inputs": [pieces[piece_id]["output"] for piece_id in reel_pieces],
+                                 "list_path": str(pieces_dir / "reel.txt"),
+                                 "output": str(tmp_dir / REEL_FILENAME)})
+            if not reel["ok"]:
+                print(f"❌ Highlights reel: {reel['error']}")
+    wall_seconds = time.time() - started
+
+    rendered = []
+    for window, clip in sorted(clips.items()):
+        concat = timings.get(clip["file"])
+        if not concat or not concat["ok"]:
+            continue
+        piece_list = [pieces[piece_id] for piece_id in window_pieces[window]]
+        rendered.append({
+            "file": clip["file"],
+            "start_seconds": window[0],
+            "end_seconds": window[1],
+            "events": clip["events"],
+            "mode": "smart" if any(p["kind"] == "copy" for p in piece_list) else "reencode",
+            "copy_seconds": round(sum(p["end"] - p["start"] for p in piece_list if p["kind"] == "copy"), 3),
+            "encode_seconds": round(sum(p["end"] - p["start"] for p in piece_list if p["kind"] == "encode"), 3),
+            "render_seconds": round(sum(timings[p["id"]]["seconds"] for p in piece_list) + concat["seconds"], 2),
+            "bytes": concat["bytes"],
+        })
+    shutil.rmtree(pieces_dir, ignore_errors=True)
+
+    if not rendered:
+        print("❌ No highlight clips were rendered")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+    report = {
+        "padding": {**{k: list(v) for k, v in HIGHLIGHT_PADDING.items()}, "default": list(DEFAULT_PADDING)},
+        "smart_cut": smart,
+        "preset": ENCODE_PRESET,
+        "clips": len(rendered),
+        "failed": len(clips) - len(rendered),
+        "pieces": len(pieces),
+        "copy_seconds": round(copy_seconds, 1),
+        "encode_seconds": round(encode_seconds, 1),
+        "copied_percent": round(copy_seconds / (copy_seconds + encode_seconds) * 100, 1)
+        if copy_seconds + encode_seconds else 0,
+        "wall_seconds": round(wall_seconds, 1),
+        "workers": num_workers,
+        "reel": {"file": REEL_FILENAME, "moments": len(reel_windows),
+                 "seconds": round(sum(end - start for start, end in reel_windows), 1),
+                 "bytes": reel["bytes"]} if reel and reel["ok"] else None,
+        "per_clip": rendered,
+    }
+    atomic_write_json(tmp_dir / "highlights.json", report)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
+
+    slowest = max(rendered, key=lambda r: r["render_seconds"])
+    print(f"✅ Highlights complete in {report['wall_seconds']}s: {len(rendered)}/{len(clips)} clips, "
+          f"{report['copied_percent']}% stream-copied")
+    print(f"   ⏱️  Per clip: {sum(r['render_seconds'] for r in rendered) / len(rendered):.2f}s average, "
+          f"slowest {slowest['file']} {slowest['render_seconds']}s")
+    if report["reel"]:
+        print(f"   🎞️  Reel: {report['reel']['moments']} moments, {report['reel']['seconds']}s → {out_dir / REEL_FILENAME}")
+    return True
+
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python3 3.16_render_highlights.py <match-id>")
+        sys.exit(1)
+    if not render_highlights(sys.argv[1]):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
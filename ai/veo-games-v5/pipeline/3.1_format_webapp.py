@@ -9,9 +9,11 @@ import os
 import json
 import time
 from pathlib import Path
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from gemini_client import get_client
+from stage_journal import atomic_write_json
+
 def load_env_multisource() -> None:
     """Load environment variables from multiple likely locations"""
     load_dotenv()  # Keep shell environment
@@ -37,8 +39,8 @@ class WebappFormatter:
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+        self.client = get_client(api_key)
+        self.model_name = 'gemini-2.5-pro'
 
     def convert_text_to_json(self, highlights_text: str, summary_text: str, team_config: dict, match_id: str) -> dict:
         """Use Gemini to convert plain text highlights to webapp JSON format"""
@@ -104,8 +106,7 @@ class WebappFormatter:
 Convert ALL events from the text to JSON format:"""
 
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = self.client.generate_text(self.model_name, prompt)
             
             # Extract JSON from response
             if "```json" in response_text:
@@ -176,20 +177,14 @@ def create_match_metadata(webapp_data: dict, match_id: str, team_config: dict) -
     
     return metadata
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python 5_format_webapp.py <match-id>")
-        print("Example: python 5_format_webapp.py sunday-league-game-1")
-        sys.exit(1)
-    
-    match_id = sys.argv[1]
-    
+def format_match_for_webapp(match_id: str) -> bool:
+    """Convert the 2.6 focused outputs for a match into the 3.1 webapp JSON files"""
     # Check directories exist
     outputs_dir = Path(__file__).parent.parent / 'outputs' / match_id
     
     if not outputs_dir.exists():
         print(f"❌ Error: Match directory not found: {outputs_dir}")
-        sys.exit(1)
+        return False
     
     # Load required files
     team_config_file = outputs_dir / '1_team_config.json'
@@ -200,17 +195,17 @@ def main():
     
     if not team_config_file.exists():
         print(f"❌ Error: Team configuration not found: {team_config_file}")
-        sys.exit(1)
+        return False
     
     if not highlights_file.exists():
         print(f"❌ Error: Focused events data not found: {highlights_file}")
         print("Run step 2.6 first: python 2.6_focused_events.py <match-id>")
-        sys.exit(1)
+        return False
     
     if not summary_file.exists():
         print(f"❌ Error: Focused summary data not found: {summary_file}")
         print("Run step 2.6 first: python 2.6_focused_events.py <match-id>")
-        sys.exit(1)
+        return False
     
     # Load data
     with open(team_config_file, 'r') as f:
@@ -236,16 +231,13 @@ def main():
     webapp_file = outputs_dir / '3.1_web_events_array.json'
     metadata_file = outputs_dir / '3.1_match_metadata.json'
     
-    with open(webapp_file, 'w') as f:
-        json.dump(webapp_data.get('timeline_events', []), f, indent=2)
+    atomic_write_json(webapp_file, webapp_data.get('timeline_events', []))
     
-    with open(metadata_file, 'w') as f:
-        json.dump(match_metadata, f, indent=2)
+    atomic_write_json(metadata_file, match_metadata)
     
     # Also save complete webapp data
     complete_file = outputs_dir / '3.1_webapp_complete.json'
-    with open(complete_file, 'w') as f:
-        json.dump(webapp_data, f, indent=2)
+    atomic_write_json(complete_file, webapp_data)
     
     print(f"✅ Webapp formatting complete!")
     print(f"📄 Timeline events: {webapp_file}")
@@ -268,6 +260,19 @@ def main():
     
     print(f"\n🎉 Analysis complete! Ready for webapp integration.")
     print(f"📁 All files saved in: {outputs_dir}")
+    
+    return True
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python 5_format_webapp.py <match-id>")
+        print("Example: python 5_format_webapp.py sunday-league-game-1")
+        sys.exit(1)
+    
+    match_id = sys.argv[1]
+    
+    if not format_match_for_webapp(match_id):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
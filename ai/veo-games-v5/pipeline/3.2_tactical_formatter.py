@@ -9,9 +9,11 @@ import os
 import json
 import time
 from pathlib import Path
-import google.generativeai as genai
 from dotenv import load_dotenv
 
+from gemini_client import get_client
+from stage_journal import atomic_write_json
+
 def load_env_multisource() -> None:
     """Load environment variables from multiple likely locations"""
     load_dotenv()  # Keep shell environment
@@ -37,8 +39,8 @@ class TacticalFormatter:
         if not api_key:
             raise ValueError("GEMINI_API_KEY not found in environment variables")
         
-        genai.configure(api_key=api_key)
-        self.model = genai.GenerativeModel('gemini-2.5-pro')
+        self.client = get_client(api_key)
+        self.model_name = 'gemini-2.5-pro'
 
     def convert_tactical_to_json(self, tactical_text: str, summary_text: str, team_config: dict, match_id: str) -> dict:
         """Use Gemini to convert plain text tactical analysis to rich JSON format"""
@@ -133,8 +135,7 @@ class TacticalFormatter:
 Convert the tactical analysis to rich JSON format:"""
 
         try:
-            response = self.model.generate_content(prompt)
-            response_text = response.text.strip()
+            response_text = self.client.generate_text(self.model_name, prompt)
             
             # Extract JSON from response
             if "```json" in response_text:
@@ -163,20 +164,14 @@ Convert the tactical analysis to rich JSON format:"""
                 }
             }
 
-def main():
-    if len(sys.argv) != 2:
-        print("Usage: python 3.2_tactical_formatter.py <match-id>")
-        print("Example: python 3.2_tactical_formatter.py 20250427-match-apr-27-2025-9bd1cf29")
-        sys.exit(1)
-    
-    match_id = sys.argv[1]
-    
+def format_tactical_analysis(match_id: str) -> bool:
+    """Convert the 2.6 focused tactical text for a match into 3.2_tactical_analysis.json"""
     # Check directories exist
     outputs_dir = Path(__file__).parent.parent / 'outputs' / match_id
     
     if not outputs_dir.exists():
         print(f"❌ Error: Match directory not found: {outputs_dir}")
-        sys.exit(1)
+        return False
     
     # Load required files
     team_config_file = outputs_dir / '1_team_config.json'
@@ -185,17 +180,17 @@ def main():
     
     if not team_config_file.exists():
         print(f"❌ Error: Team configuration not found: {team_config_file}")
-        sys.exit(1)
+        return False
     
     if not tactical_file.exists():
         print(f"❌ Error: Focused tactical analysis not found: {tactical_file}")
         print("Run step 2.6 first: python 2.6_focused_events.py <match-id>")
-        sys.exit(1)
+        return False
     
     if not summary_file.exists():
         print(f"❌ Error: Focused summary data not found: {summary_file}")
         print("Run step 2.6 first: python 2.6_focused_events.py <match-id>")
-        sys.exit(1)
+        return False
     
     # Load data
     with open(team_config_file, 'r') as f:
@@ -219,8 +214,7 @@ def main():
     # Save tactical JSON file
     tactical_json_file = outputs_dir / '3.2_tactical_analysis.json'
     
-    with open(tactical_json_file, 'w') as f:
-        json.dump(tactical_json, f, indent=2)
+    atomic_write_json(tactical_json_file, tactical_json)
     
     print(f"✅ Tactical JSON formatting complete!")
     print(f"📄 Tactical analysis: {tactical_json_file}")
@@ -237,6 +231,19 @@ def main():
     
     print(f"\n🎉 Rich tactical analysis complete!")
     print(f"📁 File saved in: {outputs_dir}")
+    
+    return True
+
+def main():
+    if len(sys.argv) != 2:
+        print("Usage: python 3.2_tactical_formatter.py <match-id>")
+        print("Example: python 3.2_tactical_formatter.py 20250427-match-apr-27-2025-9bd1cf29")
+        sys.exit(1)
+    
+    match_id = sys.argv[1]
+    
+    if not format_tactical_analysis(match_id):
+        sys.exit(1)
 
 if __name__ == "__main__":
     main()
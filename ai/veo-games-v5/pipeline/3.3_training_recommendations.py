@@ -12,6 +12,9 @@ import google.generativeai as genai
 from datetime import datetime
 from dotenv import load_dotenv
 
+import budgets
+from stage_journal import atomic_write_json
+
 # Load environment variables
 env_paths = [
     Path('.env'),
@@ -159,7 +162,8 @@ Focus on areas where the team showed clear weaknesses with specific match eviden
 """
 
     try:
-        response = model.generate_content(prompt)
+        with budgets.gemini_slot():
+            response = model.generate_content(prompt)
         response_text = response.text.strip()
         
         # Extract JSON from response
@@ -223,8 +227,7 @@ def generate_training_recommendations(match_id):
     base_path = Path(__file__).parent.parent / "outputs" / match_id
     output_file = base_path / "3.3_training_recommendations.json"
     
-    with open(output_file, 'w') as f:
-        json.dump(recommendations, f, indent=2)
+    atomic_write_json(output_file, recommendations)
     
     print(f"✅ Training recommendations saved: {output_file}")
     print(f"📊 Generated {len(recommendations['training_recommendations'])} drill recommendations")
@@ -2,16 +2,62 @@
 """
 6. S3 Uploader - Analysis Files Only
 Uploads key analysis files to S3 and tracks cloud locations
+
+Files go up in parallel through s3_sync.py; anything already in the bucket
+with the same size and MD5 is skipped, and 3.5_upload_manifest.json makes an
+unchanged re-run close to a no-op. What ended up in the bucket (SHA-256, key,
+ETag) goes into the publish manifest's "artifacts" for 3.7 and 3.8 to diff on.
+
+The JSON the game page fetches (COMPRESSED_FILES) is minified and stored
+gzip-encoded under its usual key, with a brotli copy at <key>.br when the
+brotli package is installed (CLANN_S3_COMPRESS=0 uploads them as-is).
+
+Output folders (DIRECTORY_UPLOADS) - 1.25's HLS ladder, 3.15's scrubber
+thumbnails and event posters, 3.16's event clips and highlights reel - go up
+file by file under a per-match prefix.
 """
 
 import sys
 import os
 import json
-import boto3
 from pathlib import Path
 from datetime import datetime
 from dotenv import load_dotenv
 
+import publish_manifest
+from stage_journal import atomic_write_json
+from s3_sync import (MANIFEST_FILENAME, ENCODING_SUFFIXES, get_s3_client, check_bucket, sync_files,
+                     precompress_json)
+
+# Fetched by every game page - served pre-compressed with Content-Encoding
+COMPRESSED_FILES = ("3.1_web_events_array.json", "3.1_webapp_complete.json", "3.2_tactical_analysis.json")
+
+# Folders uploaded file by file, each listed as one file (its entry point) in the S3 locations
+DIRECTORY_UPLOADS = {
+    "1.25_hls": {
+        "entry": "master.m3u8",
+        "s3_folder": "analysis-videos/hls",
+        "description": "Adaptive HLS ladder (master playlist) from 1.25",
+    },
+    "3.15_thumbnails": {
+        "entry": "thumbnails.vtt",
+        "s3_folder": "analysis-data/thumbnails",
+        "description": "Scrubber sprite sheets (WebVTT track) and event posters from 3.15",
+    },
+    "3.16_highlights": {
+        "entry": "highlights.json",
+        "s3_folder": "analysis-videos/highlights",
+        "description": "Padded event clips and highlights reel from 3.16 (clip index)",
+    },
+}
+DIRECTORY_CONTENT_TYPES = {
+    ".m3u8": "application/vnd.apple.mpegurl", ".ts": "video/mp2t",
+    ".vtt": "text/vtt", ".jpg": "image/jpeg", ".json": "application/json", ".mp4": "video/mp4",
+}
+HLS_MASTER = "1.25_hls/master.m3u8"
+THUMBNAILS_VTT = "3.15_thumbnails/thumbnails.vtt"
+HIGHLIGHTS_INDEX = "3.16_highlights/highlights.json"
+
 def load_env_multisource() -> None:
     """Load env vars from multiple locations without overriding existing ones."""
     load_dotenv()  # keep shell values
@@ -33,58 +79,25 @@ load_env_multisource()
 class S3MatchUploader:
     def __init__(self):
         """Initialize S3 client with environment credentials"""
-        # Try environment variables first, then AWS CLI/profile
-        if os.getenv('AWS_ACCESS_KEY_ID'):
-            self.s3_client = boto3.client(
-                's3',
-                region_name=os.getenv('AWS_REGION', 'eu-west-1'),
-                aws_access_key_id=os.getenv('AWS_ACCESS_KEY_ID'),
-                aws_secret_access_key=os.getenv('AWS_SECRET_ACCESS_KEY')
-            )
-        else:
-            # Use default AWS profile/credentials
-            self.s3_client = boto3.client('s3', region_name='eu-west-1')
+        # Environment variables first, then AWS CLI/profile; the client is shared per process
+        self.region = os.getenv('AWS_REGION', 'eu-west-1')
+        self.s3_client = get_s3_client(self.region)
         self.bucket_name = os.getenv('AWS_BUCKET_NAME', 'end-nov-webapp-clann')
         
-        # Validate credentials are available (try a test call)
+        # Validate credentials once per process (batch runs construct one uploader per match)
         try:
-            self.s3_client.head_bucket(Bucket=self.bucket_name)
-            print(f"✅ AWS credentials valid")
+            check_bucket(self.s3_client, self.bucket_name)
         except Exception as e:
-            if "NoSuchBucket" in str(e):
-                print(f"✅ AWS credentials valid (bucket may not exist yet)")
-            else:
-                raise Exception(f"AWS credentials not found. Either set AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY or run 'aws configure'")
+            raise Exception(f"AWS credentials not found. Either set AWS_ACCESS_KEY_ID/AWS_SECRET_ACCESS_KEY or run 'aws configure' ({e})")
         
-        print(f"🌩️  Connected to S3 bucket: {self.bucket_name} ({os.getenv('AWS_REGION', 'eu-west-1')})")
+        print(f"🌩️  Connected to S3 bucket: {self.bucket_name} ({self.region})")
 
-    def upload_file_to_s3(self, local_path, s3_key, content_type=None):
-        """Upload a single file to S3 and return the URL"""
-        try:
-            extra_args = {}
-            if content_type:
-                extra_args['ContentType'] = content_type
-                
-            # Add cache control for better performance
-            extra_args['CacheControl'] = 'max-age=31536000'
-            
-            file_size_mb = local_path.stat().st_size / 1024 / 1024
-            print(f"   📤 Uploading {local_path.name} ({file_size_mb:.1f}MB)")
-            
-            self.s3_client.upload_file(
-                str(local_path), 
-                self.bucket_name, 
-                s3_key,
-                ExtraArgs=extra_args
-            )
-            
-            s3_url = f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
-            print(f"   ✅ Uploaded to: {s3_url}")
-            return s3_url
-            
-        except Exception as e:
-            print(f"   ❌ Failed to upload {local_path.name}: {e}")
-            return None
+    def s3_url(self, s3_key):
+        return f"https://{self.bucket_name}.s3.amazonaws.com/{s3_key}"
+
+    def sync_files(self, jobs, manifest_path):
+        """Upload what changed; returns {name: manifest entry or {"error": ...}}"""
+        return sync_files(self.s3_client, self.bucket_name, jobs, manifest_path)
 
 def upload_match_to_s3(match_id):
     """Upload key match analysis files to S3"""
@@ -209,7 +222,8 @@ def upload_match_to_s3(match_id):
     
     print(f"📋 Found {len(upload_files)} files to upload")
     
-    # Upload each file
+    compress = os.getenv('CLANN_S3_COMPRESS', '1') != '0'
+    jobs = []
     for filename, config in upload_files.items():
         local_path = data_dir / filename
         
@@ -222,31 +236,118 @@ def upload_match_to_s3(match_id):
         file_extension = local_path.suffix
         clean_filename = f"{match_id}-{filename.replace('.', '-')}{file_extension}"
         s3_key = f"{config['s3_folder']}/{clean_filename}"
-        
-        # Upload file
-        s3_url = uploader.upload_file_to_s3(
-            local_path, 
-            s3_key, 
-            config["content_type"]
-        )
-        
-        if s3_url:
-            s3_locations["s3_urls"][filename] = {
-                "url": s3_url,
-                "s3_key": s3_key,
-                "description": config["description"],
-                "file_size_mb": round(local_path.stat().st_size / 1024 / 1024, 2)
-            }
-            s3_locations["upload_summary"]["successful_uploads"] += 1
-            s3_locations["upload_summary"]["total_size_mb"] += s3_locations["s3_urls"][filename]["file_size_mb"]
-        else:
+        if not (compress and filename in COMPRESSED_FILES):
+            jobs.append({"file": filename, "name": filename, "path": local_path, "key": s3_key,
+                         "content_type": config["content_type"]})
+            continue
+        try:
+            variants = precompress_json(local_path, data_dir / "3.5_compressed")
+        except (OSError, ValueError) as e:
+            print(f"⚠️  Could not compress {filename} ({e}) - uploading it as-is")
+            variants = {None: local_path}
+        # gzip keeps the usual key (every client decodes it); other encodings get a suffixed key
+        for encoding, path in variants.items():
+            suffix = ENCODING_SUFFIXES[encoding] if encoding not in ("gzip", None) else ""
+            jobs.append({"file": filename, "name": filename + suffix, "path": path, "key": s3_key + suffix,
+                         "content_type": config["content_type"], "content_encoding": encoding,
+                         "source_size": local_path.stat().st_size if encoding else None})
+    
+    for dirname, config in DIRECTORY_UPLOADS.items():
+        entry = f"{dirname}/{config['entry']}"
+        if not (data_dir / entry).exists():
+            continue
+        s3_locations["upload_summary"]["total_files"] += 1
+        for path in sorted((data_dir / dirname).rglob("*")):
+            if path.suffix in DIRECTORY_CONTENT_TYPES:
+                relative = path.relative_to(data_dir / dirname).as_posix()
+                jobs.append({"file": entry, "name": f"{dirname}/{relative}", "path": path,
+                             "key": f"{config['s3_folder']}/{match_id}/{relative}",
+                             "content_type": DIRECTORY_CONTENT_TYPES[path.suffix], "directory": dirname})
+    
+    # Upload in parallel, skipping objects the bucket already has
+    results = uploader.sync_files(jobs, data_dir / MANIFEST_FILENAME)
+    outcomes = {"uploaded": 0, "skipped": 0, "unchanged": 0}
+    
+    for job in jobs:
+        filename, result = job["file"], results[job["name"]]
+        if job.get("directory"):
+            continue
+        if job["name"] != filename:
+            # Extra encoding of a file listed above
+            if "error" not in result and filename in s3_locations["s3_urls"]:
+                s3_locations["s3_urls"][filename].setdefault("variants", {})[job["content_encoding"]] = {
+                    "url": uploader.s3_url(job["key"]), "s3_key": job["key"],
+                    "upload_size_kb": round(result["size"] / 1024, 1)}
+            continue
+        if "error" in result:
+            s3_locations["upload_summary"]["failed_uploads"] += 1
+            continue
+        outcomes[result["result"]] += 1
+        s3_locations["s3_urls"][filename] = {
+            "url": uploader.s3_url(job["key"]),
+            "s3_key": job["key"],
+            "description": upload_files[filename]["description"],
+            "file_size_mb": round((result.get("source_size") or result["size"]) / 1024 / 1024, 2)
+        }
+        if result.get("content_encoding"):
+            s3_locations["s3_urls"][filename].update({
+                "content_encoding": result["content_encoding"],
+                "upload_size_kb": round(result["size"] / 1024, 1),
+                "compression_ratio": result["compression_ratio"],
+            })
+        s3_locations["upload_summary"]["successful_uploads"] += 1
+        s3_locations["upload_summary"]["total_size_mb"] += s3_locations["s3_urls"][filename]["file_size_mb"]
+    for dirname, config in DIRECTORY_UPLOADS.items():
+        entry = f"{dirname}/{config['entry']}"
+        dir_jobs = [job for job in jobs if job.get("directory") == dirname]
+        if not dir_jobs:
+            continue
+        dir_results = [results[job["name"]] for job in dir_jobs]
+        failed = [job["name"] for job, result in zip(dir_jobs, dir_results) if "error" in result]
+        if failed:
+            print(f"⚠️  {dirname} incomplete: {len(failed)}/{len(dir_jobs)} objects failed")
             s3_locations["upload_summary"]["failed_uploads"] += 1
+            continue
+        entry_key = next(job["key"] for job in dir_jobs if job["name"] == entry)
+        results_seen = {result["result"] for result in dir_results}
+        outcomes[next(o for o in ("uploaded", "skipped", "unchanged") if o in results_seen)] += 1
+        s3_locations["s3_urls"][entry] = {
+            "url": uploader.s3_url(entry_key),
+            "s3_key": entry_key,
+            "description": config["description"],
+            "file_size_mb": round(sum(result["size"] for result in dir_results) / 1024 / 1024, 2),
+            "objects": len(dir_jobs),
+        }
+        s3_locations["upload_summary"]["successful_uploads"] += 1
+        s3_locations["upload_summary"]["total_size_mb"] += s3_locations["s3_urls"][entry]["file_size_mb"]
+    s3_locations["upload_summary"].update({f"{outcome}_files": n for outcome, n in outcomes.items()})
+    
+    # Record what the bucket now holds; failed files keep their last published entry
+    previous = publish_manifest.load(data_dir)["artifacts"]
+    published = {name: previous[name] for name, result in results.items() if "error" in result and name in previous}
+    for job in jobs:
+        result = results[job["name"]]
+        if "error" in result:
+            continue
+        published[job["name"]] = {
+            "path": str(job["path"].relative_to(data_dir)),
+            "source": job["file"],
+            "size": result["size"],
+            "sha256": result["sha256"],
+            "content_type": job["content_type"],
+            "content_encoding": job.get("content_encoding"),
+            "s3_key": job["key"],
+            "etag": result["etag"],
+            "url": uploader.s3_url(job["key"]),
+            "published_at": result.get("synced_at"),
+        }
+    changes = publish_manifest.diff(previous, published, ("sha256", "s3_key", "etag"))
+    publish_manifest.update(data_dir, "artifacts", published, replace=True)
     
     # Save S3 locations tracker
     s3_locations_file = data_dir / "3.5_s3_locations.json"
     try:
-        with open(s3_locations_file, 'w') as f:
-            json.dump(s3_locations, f, indent=2)
+        atomic_write_json(s3_locations_file, s3_locations)
         print(f"📋 S3 locations saved to: {s3_locations_file}")
     except Exception as e:
         print(f"⚠️  Failed to save S3 locations: {e}")
@@ -276,7 +377,10 @@ def upload_match_to_s3(match_id):
             # Legacy 2.5 files (for backward compatibility)
             "mega_tactical_txt": "2.5_mega_tactical.txt",  # Tactical analysis
             "mega_summary_txt": "2.5_mega_summary.txt",    # Match summary
-            "mega_events_txt": "2.5_mega_events.txt"       # Events timeline
+            "mega_events_txt": "2.5_mega_events.txt",      # Events timeline
+            "hls_master_m3u8": HLS_MASTER,                 # Adaptive streaming ladder
+            "thumbnails_vtt": THUMBNAILS_VTT,              # Scrubber sprites (posters alongside)
+            "highlights_json": HIGHLIGHTS_INDEX            # Event clips + reel, files next to it
         }
         
         for key, filename in core_file_mapping.items():
@@ -284,8 +388,7 @@ def upload_match_to_s3(match_id):
                 core_locations["core_files"][key] = s3_locations["s3_urls"][filename]["url"]
         
         core_locations_file = data_dir / "3.5_s3_core_locations.json"
-        with open(core_locations_file, 'w') as f:
-            json.dump(core_locations, f, indent=2)
+        atomic_write_json(core_locations_file, core_locations)
         print(f"📋 Core locations saved to: {core_locations_file}")
         
     except Exception as e:
@@ -294,8 +397,24 @@ def upload_match_to_s3(match_id):
     # Print summary
     summary = s3_locations["upload_summary"]
     print(f"\n📊 Upload Summary:")
-    print(f"   ✅ Successful: {summary['successful_uploads']}/{summary['total_files']} files")
-    print(f"   📦 Total uploaded: {summary['total_size_mb']:.1f}MB")
+    print(f"   ✅ Successful: {summary['successful_uploads']}/{summary['total_files']} files "
+          f"({summary['uploaded_files']} uploaded, {summary['skipped_files']} already in the bucket, "
+          f"{summary['unchanged_files']} unchanged since the last run)")
+    print(f"   📦 Total synced: {summary['total_size_mb']:.1f}MB")
+    print(f"   🔍 Since the last publish: {len(changes['added'])} new, {len(changes['changed'])} changed, "
+          f"{len(changes['unchanged'])} unchanged")
+    compressed = [r for r in results.values() if r.get("compression_ratio")]
+    if compressed:
+        source_kb = sum(r["source_size"] for r in compressed) / 1024
+        upload_kb = sum(r["size"] for r in compressed) / 1024
+        print(f"   🗜️  Pre-compressed JSON: {len(compressed)} objects, {source_kb:.0f}KB → {upload_kb:.0f}KB "
+              f"(ratio {source_kb / max(upload_kb, 0.001):.1f}x)")
+    if HLS_MASTER in s3_locations["s3_urls"]:
+        print(f"   📺 HLS ladder: {s3_locations['s3_urls'][HLS_MASTER]['objects']} playlists and segments")
+    if THUMBNAILS_VTT in s3_locations["s3_urls"]:
+        print(f"   🖼️  Thumbnails: {s3_locations['s3_urls'][THUMBNAILS_VTT]['objects']} sprites, posters and track")
+    if HIGHLIGHTS_INDEX in s3_locations["s3_urls"]:
+        print(f"   🎬 Highlights: {s3_locations['s3_urls'][HIGHLIGHTS_INDEX]['objects']} clips, reel and index")
     print(f"   🌐 S3 bucket: {uploader.bucket_name}")
     
     if summary["failed_uploads"] > 0:
@@ -304,7 +423,7 @@ def upload_match_to_s3(match_id):
     # Show key URLs for easy access
     if s3_locations["s3_urls"]:
         print(f"\n🔗 Key S3 URLs:")
-        priority_files = ["web_events_array.json", "web_events.json", "8_tactical_match_summary.txt", "video.mp4"]
+        priority_files = ["web_events_array.json", "web_events.json", "8_tactical_match_summary.txt", "video.mp4", HLS_MASTER]
         for key_file in priority_files:
             if key_file in s3_locations["s3_urls"]:
                 url = s3_locations["s3_urls"][key_file]["url"]
@@ -327,7 +446,7 @@ def upload_match_to_s3(match_id):
         if "web_events_array.json" in s3_locations["s3_urls"]:
             events_url = s3_locations["s3_urls"]["web_events_array.json"]["url"]
             print(f"   🎮 2. CLICK 'Add Analysis' → Download and paste JSON content:")
-            print(f"      curl -s {events_url}")
+            print(f"      curl -s --compressed {events_url}")
             print(f"      (Or download: {events_url})")
             print(f"")
         
@@ -362,8 +481,7 @@ def upload_match_to_s3(match_id):
             source_data["s3_files_count"] = summary["successful_uploads"]
             source_data["s3_bucket"] = uploader.bucket_name
             
-            with open(source_file, 'w') as f:
-                json.dump(source_data, f, indent=2)
+            atomic_write_json(source_file, source_data)
             print(f"📝 Updated source.json with cloud status")
     except Exception as e:
         print(f"⚠️  Failed to update source.json: {e}")
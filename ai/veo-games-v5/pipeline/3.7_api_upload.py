@@ -3,12 +3,19 @@
 Step 3.7: Upload to website via API
 Uses the same API endpoints as the manual website form.
 Reads S3 URLs from 3.5_s3_core_locations.json and posts to website.
+Several match ids are pushed together (--jobs games at a time) with a summary
+table; calls go through website_api.py (pooled session, timeouts, retries).
+Artifacts the publish manifest says this game already has (same route, URL
+and content) are not re-posted.
 """
 
 import json
 import sys
-import requests
 from pathlib import Path
+from datetime import datetime
+
+import website_api
+import publish_manifest
 
 def load_website_game_id(match_id):
     """Load website game ID from file"""
@@ -54,268 +61,179 @@ def get_auth_token(no_auth=False):
     
     return token
 
+def _report(artifact, filename, s3_url, result):
+    """Print one artifact's outcome the way the single-match run always has"""
+    if result.get("unchanged"):
+        print(f"⏭️  {artifact.capitalize()} unchanged since the last publish: {filename}")
+        return True
+    print(f"📤 Uploading {artifact}: {filename}")
+    print(f"🔗 URL: {s3_url}")
+    if result["ok"]:
+        retried = f" after {result['attempts']} attempts" if result["attempts"] > 1 else ""
+        print(f"✅ {artifact.capitalize()} uploaded successfully{retried}")
+        if artifact == "events":
+            print(f"📊 Events count: {result['response'].get('game', {}).get('events_count', 'Unknown')}")
+    else:
+        print(f"❌ {artifact.capitalize()} upload failed: {result['error']}")
+    return result["ok"]
+
+def upload_artifact(game_id, artifact, s3_url, auth_token, base_url="http://localhost:3001"):
+    """Upload one artifact URL through the shared pooled, retrying client"""
+    client = website_api.get_api_client(base_url, auth_token)
+    return _report(artifact, s3_url.split('/')[-1], s3_url, client.upload_artifact(game_id, artifact, s3_url))
+
 def upload_events(game_id, events_url, auth_token, base_url="http://localhost:3001"):
     """Upload events JSON via API"""
-    if auth_token is None:
-        # Use test endpoint (no auth required)
-        url = f"{base_url}/api/games/{game_id}/upload-analysis-file-test"
-        headers = {'Content-Type': 'application/json'}
-    else:
-        # Use regular endpoint (auth required)
-        url = f"{base_url}/api/games/{game_id}/upload-events"
-        headers = {
-            'Authorization': f'Bearer {auth_token}',
-            'Content-Type': 'application/json'
-        }
-    
-    # Extract filename from URL
-    filename = events_url.split('/')[-1]
-    
-    if auth_token is None:
-        # Test endpoint payload format
-        payload = {
-            's3Key': events_url,
-            'originalFilename': filename,
-            'fileType': 'events'
-        }
-    else:
-        # Regular endpoint payload format
-        payload = {
-            's3Key': events_url,
-            'originalFilename': filename
-        }
-    
-    print(f"📤 Uploading events: {filename}")
-    print(f"🔗 URL: {events_url}")
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            result = response.json()
-            print(f"✅ Events uploaded successfully")
-            print(f"📊 Events count: {result.get('game', {}).get('events_count', 'Unknown')}")
-            return True
-        else:
-            print(f"❌ Events upload failed: {response.status_code}")
-            print(f"Error: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Events upload error: {e}")
-        return False
+    return upload_artifact(game_id, "events", events_url, auth_token, base_url)
 
 def upload_tactical(game_id, tactical_url, auth_token, base_url="http://localhost:3001"):
     """Upload tactical analysis via API"""
-    if auth_token is None:
-        # Use improved test endpoint (no auth required, now updates tactical_files properly)
-        url = f"{base_url}/api/games/{game_id}/upload-tactical-test"
-        headers = {'Content-Type': 'application/json'}
-    else:
-        # Use regular endpoint (auth required)
-        url = f"{base_url}/api/games/{game_id}/upload-tactical"
-        headers = {
-            'Authorization': f'Bearer {auth_token}',
-            'Content-Type': 'application/json'
-        }
-    
-    # Extract filename from URL
-    filename = tactical_url.split('/')[-1]
-    
-    payload = {
-        's3Key': tactical_url,
-        'originalFilename': filename
-    }
-    
-    print(f"📤 Uploading tactical: {filename}")
-    print(f"🔗 URL: {tactical_url}")
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            print(f"✅ Tactical analysis uploaded successfully")
-            return True
-        else:
-            print(f"❌ Tactical upload failed: {response.status_code}")
-            print(f"Error: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Tactical upload error: {e}")
-        return False
+    return upload_artifact(game_id, "tactical", tactical_url, auth_token, base_url)
 
 def upload_metadata(game_id, metadata_url, auth_token, base_url="http://localhost:3001"):
     """Upload metadata JSON via API"""
-    if auth_token is None:
-        # Use test endpoint (no auth required)
-        url = f"{base_url}/api/games/{game_id}/upload-metadata-test"
-        headers = {'Content-Type': 'application/json'}
-    else:
-        # Use regular endpoint (auth required)
-        url = f"{base_url}/api/games/{game_id}/upload-metadata"
-        headers = {
-            'Authorization': f'Bearer {auth_token}',
-            'Content-Type': 'application/json'
-        }
-    
-    filename = metadata_url.split('/')[-1]
-    
-    payload = {
-        'metadataUrl': metadata_url
-    }
-    
-    print(f"📤 Uploading metadata: {filename}")
-    print(f"🔗 URL: {metadata_url}")
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            print(f"✅ Metadata uploaded successfully")
-            return True
-        else:
-            print(f"❌ Metadata upload failed: {response.status_code}")
-            print(f"Error: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Metadata upload error: {e}")
-        return False
+    return upload_artifact(game_id, "metadata", metadata_url, auth_token, base_url)
 
 def upload_video(game_id, video_url, auth_token, base_url="http://localhost:3001"):
     """Upload video URL via API"""
-    url = f"{base_url}/api/games/{game_id}/upload-video"
-    
-    headers = {
-        'Authorization': f'Bearer {auth_token}',
-        'Content-Type': 'application/json'
-    }
-    
-    payload = {
-        's3Key': video_url
-    }
-    
-    print(f"📤 Uploading video URL")
-    print(f"🔗 URL: {video_url}")
-    
-    try:
-        response = requests.post(url, json=payload, headers=headers)
-        
-        if response.status_code == 200:
-            print(f"✅ Video URL uploaded successfully")
-            return True
-        else:
-            print(f"❌ Video upload failed: {response.status_code}")
-            print(f"Error: {response.text}")
-            return False
-            
-    except Exception as e:
-        print(f"❌ Video upload error: {e}")
-        return False
+    return upload_artifact(game_id, "video", video_url, auth_token, base_url)
 
 def main():
-    if len(sys.argv) < 2:
-        print("Usage: python 3.7_api_upload.py <match-id> [base-url] [--no-auth]")
+    args = [arg for arg in sys.argv[1:] if not arg.startswith('--')]
+    if not args:
+        print("Usage: python 3.7_api_upload.py <match-id> [<match-id> ...] [base-url] [--no-auth] [--jobs N]")
         print("Example: python 3.7_api_upload.py 20250427-match-apr-27-2025-9bd1cf29")
         print("Example: python 3.7_api_upload.py 20250427-match-apr-27-2025-9bd1cf29 --no-auth")
         print("Example: python 3.7_api_upload.py 20250427-match-apr-27-2025-9bd1cf29 https://your-website.com")
+        print("Example: python 3.7_api_upload.py match-a match-b match-c --no-auth --jobs 8")
         sys.exit(1)
     
-    match_id = sys.argv[1]
     no_auth = '--no-auth' in sys.argv
+    max_workers = None
+    if '--jobs' in sys.argv:
+        jobs_value = sys.argv[sys.argv.index('--jobs') + 1]
+        args.remove(jobs_value)
+        max_workers = int(jobs_value)
+    
+    # A URL is the base URL, everything else is a match id
+    base_url = next((arg for arg in args if arg.startswith(('http://', 'https://'))), "http://localhost:3001")
+    match_ids = [arg for arg in args if arg != base_url]
+    
+    if len(match_ids) == 1:
+        return upload_match_via_api(match_ids[0], base_url, no_auth)
+    return upload_matches_via_api(match_ids, base_url, no_auth, max_workers)
+
+def _load_game(match_id):
+    """{match_id, game_id, core_files} for push_games, or None when 1.0/3.5 haven't run"""
+    game_id = load_website_game_id(match_id)
+    if not game_id:
+        return None
+    s3_locations = load_s3_locations(match_id)
+    if not s3_locations:
+        return None
+    core_files = dict(s3_locations.get('core_files', {}))
+    # Note: Video URL might be in different format, check what's available
+    if s3_locations.get('video_url'):
+        core_files['video_mp4'] = s3_locations['video_url']
+    return {"match_id": match_id, "game_id": game_id, "core_files": core_files,
+            "bucket": s3_locations.get('bucket', 'Unknown'),
+            "data_dir": Path(__file__).parent.parent / "outputs" / match_id}
+
+def _plan(game, client):
+    """Split a game's artifacts into what to post and what the publish manifest says is live already"""
+    manifest = publish_manifest.load(game["data_dir"])
+    game["records"], game["pending"], game["unchanged"] = {}, {}, []
+    for key, artifact in website_api.ARTIFACTS:
+        s3_url = game["core_files"].get(key)
+        if not s3_url:
+            continue
+        record = {
+            "game_id": game["game_id"],
+            "base_url": client.base_url,
+            "route": client.artifact_request(game["game_id"], artifact, s3_url)[0],
+            "s3_url": s3_url,
+            "sha256": publish_manifest.sha256_for_url(manifest, s3_url),
+        }
+        game["records"][artifact] = record
+        previous = manifest["api"].get(artifact, {})
+        # Without a SHA-256 we can't tell whether the content behind the URL changed
+        if record["sha256"] and all(previous.get(k) == v for k, v in record.items()) \
+                and not publish_manifest.force():
+            game["unchanged"].append(artifact)
+        else:
+            game["pending"][key] = s3_url
+    return {**game, "core_files": game["pending"]}
+
+def _record(game, results):
+    """Add the unchanged artifacts to results and swap in the manifest's new "api" entries"""
+    for artifact in game["unchanged"]:
+        results[artifact] = {"ok": True, "unchanged": True, "attempts": 0, "seconds": 0}
+    accepted = {artifact: {**game["records"][artifact], "published_at": datetime.now().isoformat()}
+                for artifact, result in results.items() if result["ok"] and not result.get("unchanged")}
+    if accepted:
+        publish_manifest.update(game["data_dir"], "api", accepted)
+    return results
+
+def upload_matches_via_api(match_ids, base_url="http://localhost:3001", no_auth=False, max_workers=None):
+    """Push many matches' S3 analysis URLs at once; True when every artifact was accepted"""
+    print(f"🌐 Uploading {len(match_ids)} matches via website API...")
+    print(f"🔗 Base URL: {base_url}")
+    print("=" * 60)
+    
+    games = [game for game in map(_load_game, match_ids) if game]
+    if not games:
+        return False
+    
+    auth_token = get_auth_token(no_auth)
+    if not no_auth and not auth_token:
+        return False
     
-    # Parse base URL (skip --no-auth flag)
-    base_url = "http://localhost:3001"
-    for arg in sys.argv[2:]:
-        if not arg.startswith('--'):
-            base_url = arg
-            break
+    client = website_api.get_api_client(base_url, auth_token)
+    pushed = website_api.push_games(client, [_plan(game, client) for game in games], max_workers)
+    for game, result in zip(games, pushed):
+        result["results"] = _record(game, result["results"])
+    website_api.print_push_summary(pushed)
     
+    all_ok = len(games) == len(match_ids) and all(
+        game["results"] and all(result["ok"] for result in game["results"].values()) for game in pushed)
+    if not all_ok:
+        print(f"\n⚠️  Some uploads failed. Check the errors above.")
+    return all_ok
+
+def upload_match_via_api(match_id, base_url="http://localhost:3001", no_auth=False):
+    """Push a match's S3 analysis URLs to the website API"""
     print(f"🌐 Uploading {match_id} analysis via website API...")
     print(f"🔗 Base URL: {base_url}")
     print("=" * 60)
     
     # Load required data
-    game_id = load_website_game_id(match_id)
-    if not game_id:
-        sys.exit(1)
-    
-    s3_locations = load_s3_locations(match_id)
-    if not s3_locations:
-        sys.exit(1)
+    game = _load_game(match_id)
+    if not game:
+        return False
     
     # Get auth token (or skip if no-auth mode)
     auth_token = get_auth_token(no_auth)
     if not no_auth and not auth_token:
-        sys.exit(1)
+        return False
     
+    game_id, core_files = game["game_id"], game["core_files"]
     print(f"\n🎯 Uploading to game: {game_id}")
-    print(f"📦 S3 bucket: {s3_locations.get('bucket', 'Unknown')}")
-    
-    core_files = s3_locations.get('core_files', {})
-    success_count = 0
-    total_uploads = 0
+    print(f"📦 S3 bucket: {game['bucket']}")
     
-    # Upload events JSON (main requirement)
-    if 'web_events_array_json' in core_files:
-        total_uploads += 1
-        if upload_events(game_id, core_files['web_events_array_json'], auth_token, base_url):
-            success_count += 1
-    else:
-        print("⚠️  No web_events_array_json found in S3 locations")
-    
-    # Upload metadata JSON (if available)
-    if 'match_metadata_json' in core_files:
-        total_uploads += 1
-        if upload_metadata(game_id, core_files['match_metadata_json'], auth_token, base_url):
-            success_count += 1
-            
-            # Also upload S3 core locations as additional metadata
-            try:
-                s3_core_url = s3_locations.get('core_files', {}).get('training_recommendations_json')
-                if s3_core_url:
-                    print("📤 Updating metadata with S3 core locations...")
-                    # Create a metadata update with s3_files
-                    metadata_update = {
-                        "s3_files": s3_locations.get('core_files', {})
-                    }
-                    
-                    # Send metadata update (this will merge with existing metadata)
-                    import json
-                    temp_metadata = json.dumps(metadata_update)
-                    # We'll use the same metadata endpoint but with core locations
-                    print("🔗 S3 files metadata updated")
-                else:
-                    print("ℹ️  No training recommendations in S3 core files")
-            except Exception as e:
-                print(f"⚠️  Failed to update S3 metadata: {e}")
-    else:
-        print("⚠️  No match_metadata_json found in S3 locations")
-    
-    # Upload tactical analysis (if available)
-    if 'tactical_analysis_json' in core_files:
-        total_uploads += 1
-        if upload_tactical(game_id, core_files['tactical_analysis_json'], auth_token, base_url):
-            success_count += 1
-    else:
-        print("⚠️  No tactical_analysis_json found in S3 locations")
-    
-    # Upload video URL (if we have it)
-    # Note: Video URL might be in different format, check what's available
-    video_url = None
-    if 'video_url' in s3_locations:
-        video_url = s3_locations['video_url']
-    elif 'video_mp4' in core_files:
-        video_url = core_files['video_mp4']
-    
-    if video_url:
-        total_uploads += 1
-        if upload_video(game_id, video_url, auth_token, base_url):
-            success_count += 1
-    else:
+    for key, artifact in website_api.ARTIFACTS:
+        if key not in core_files and artifact != "video":
+            print(f"⚠️  No {key} found in S3 locations")
+    if 'video_mp4' not in core_files:
         print("ℹ️  No video URL found (this is optional)")
     
+    client = website_api.get_api_client(base_url, auth_token)
+    results = _record(game, client.push_game(game_id, _plan(game, client)["core_files"]))
+    for key, artifact in website_api.ARTIFACTS:
+        if artifact in results:
+            _report(artifact, core_files[key].split('/')[-1], core_files[key], results[artifact])
+    success_count = sum(result["ok"] for result in results.values())
+    total_uploads = len(results)
+    
     # Summary
     print(f"\n🎉 UPLOAD SUMMARY:")
     print(f"✅ Successful: {success_count}/{total_uploads}")
@@ -2,6 +2,8 @@
 """
 Step 3.8: Update S3 Metadata
 Updates the database metadata with S3 core locations to make training recommendations accessible.
+Also registers 1.25's HLS ladder as the game's completed HLS conversion.
+Skipped when the publish manifest shows this game already has the same s3_files.
 """
 
 import json
@@ -10,6 +12,9 @@ import os
 import psycopg2
 from pathlib import Path
 from datetime import datetime
+from urllib.parse import urlparse
+
+import publish_manifest
 
 def load_s3_core_locations(match_id):
     """Load S3 core locations"""
@@ -49,6 +54,15 @@ def update_s3_metadata(match_id):
     if not game_id:
         return False
     
+    # Nothing to do if this game already has these URLs
+    data_dir = Path(__file__).parent.parent / "outputs" / match_id
+    s3_files = s3_locations.get('core_files', {})
+    record = {"game_id": game_id, "s3_files_sha256": publish_manifest.digest(s3_files)}
+    previous = publish_manifest.load(data_dir)["metadata"]
+    if all(previous.get(k) == v for k, v in record.items()) and not publish_manifest.force():
+        print(f"⏭️  S3 metadata unchanged since the last publish ({previous.get('published_at')})")
+        return True
+    
     # Connect to database
     database_url = os.getenv('DATABASE_URL')
     if not database_url:
@@ -72,7 +86,7 @@ def update_s3_metadata(match_id):
         # Update metadata with S3 files
         updated_metadata = {
             **current_metadata,
-            "s3_files": s3_locations.get('core_files', {}),
+            "s3_files": s3_files,
             "s3_updated_at": datetime.now().isoformat()
         }
         
@@ -82,7 +96,22 @@ def update_s3_metadata(match_id):
             (json.dumps(updated_metadata), game_id)
         )
         
+        # 1.25's ladder as a finished conversion. 'COMPLETE' is migration 006's status: its trigger
+        # then sets games.hls_url / hls_status = 'AVAILABLE', and /api/hls/url serves it
+        hls_url = s3_files.get('hls_master_m3u8')
+        if hls_url:
+            job_id = f"pipeline-{match_id}"
+            output_path = urlparse(hls_url).path.lstrip('/').rsplit('/', 1)[0] + '/'  # analysis-videos/hls/<match-id>/
+            cur.execute("DELETE FROM hls_conversions WHERE game_id = %s AND job_id = %s", (game_id, job_id))
+            cur.execute(
+                "INSERT INTO hls_conversions (game_id, job_id, status, hls_url, output_path, progress) "
+                "VALUES (%s, %s, 'COMPLETE', %s, %s, 100)",
+                (game_id, job_id, hls_url, output_path)
+            )
+        
         conn.commit()
+        publish_manifest.update(data_dir, "metadata", {**record, "published_at": datetime.now().isoformat()},
+                                replace=True)
         
         print(f"✅ S3 metadata updated for game: {game_id}")
         print(f"📦 Added {len(s3_locations.get('core_files', {}))} S3 file URLs")
@@ -91,6 +120,8 @@ def update_s3_metadata(match_id):
         training_url = s3_locations.get('core_files', {}).get('training_recommendations_json')
         if training_url:
             print(f"🏋️ Training recommendations URL: {training_url}")
+        if hls_url:
+            print(f"📺 HLS stream: {hls_url}")
         
         cur.close()
         conn.close()
@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""
+Event-centric analysis windows driven by VEO ground truth
+
+Fixed 15s clips split goals and set pieces across clip boundaries. VEO already
+tells us where the goals and shots are (1_veo_ground_truth.json, from 1.1), so
+1.4 --windows veo cuts:
+- focus windows: 15s, starting every 8s, from 5s before each VEO goal/shot to
+  35s after it (VEO marks the start of the attack; the finish lands 15-30s later)
+- coarse windows: up to 30s, no overlap, everywhere else
+
+A 95 minute match with ~30 VEO events needs about 310 windows instead of 380
+fixed clips. 1.6 de-duplicates events reported by two overlapping windows.
+"""
+
+import json
+import math
+from pathlib import Path
+
+FOCUS_EVENT_TYPES = ('Goal', 'Shot on goal')
+FOCUS_BEFORE_SECONDS = 5
+FOCUS_AFTER_SECONDS = 35
+FOCUS_WINDOW_SECONDS = 15
+FOCUS_STRIDE_SECONDS = 8
+COARSE_WINDOW_SECONDS = 30
+
+WINDOWING_MODES = ('fixed', 'veo')
+
+
+def load_veo_events(data_dir: Path) -> list:
+    """VEO goal/shot events from 1_veo_ground_truth.json (None if the file is missing)"""
+    veo_path = Path(data_dir) / "1_veo_ground_truth.json"
+    if not veo_path.exists():
+        return None
+    with open(veo_path, 'r') as f:
+        veo_data = json.load(f)
+    return [event for event in veo_data.get("events", []) if event.get("event_type") in FOCUS_EVENT_TYPES]
+
+
+def focus_regions(veo_events, duration) -> list:
+    """Merged [start, end] second ranges around each VEO event"""
+    regions = []
+    for seconds in sorted(event["timestamp_seconds"] for event in veo_events):
+        start = max(0, math.floor(seconds - FOCUS_BEFORE_SECONDS))
+        end = min(math.ceil(duration), math.ceil(seconds + FOCUS_AFTER_SECONDS))
+        if start >= end:
+            continue
+        # Gaps too short for a coarse window are folded into the focus region
+        if regions and start - regions[-1][1] < FOCUS_WINDOW_SECONDS:
+            regions[-1][1] = max(regions[-1][1], end)
+        else:
+            regions.append([start, end])
+    return regions
+
+
+def _focus_windows(start, end):
+    # Evenly spaced, at most FOCUS_STRIDE_SECONDS apart, last one ending on the region end
+    span = max(0, end - start - FOCUS_WINDOW_SECONDS)
+    count = math.ceil(span / FOCUS_STRIDE_SECONDS) + 1
+    starts = [start + round(i * span / max(count - 1, 1)) for i in range(count)]
+    return [(s, min(s + FOCUS_WINDOW_SECONDS, end), "focus") for s in starts]
+
+
+def _coarse_windows(start, end):
+    if end - start <= 0:
+        return []
+    count = math.ceil((end - start) / COARSE_WINDOW_SECONDS)
+    bounds = [start + round(i * (end - start) / count) for i in range(count)] + [end]
+    return [(bounds[i], bounds[i + 1], "coarse") for i in range(count)]
+
+
+def plan_windows(veo_events, duration) -> list:
+    """Nominal analysis windows covering the whole match
+
+    Returns dicts with nominal_start_seconds, nominal_end_seconds (whole
+    seconds, so every window gets a unique clip_MMmSSs name) and window
+    ('focus' or 'coarse'), sorted by start.
+    """
+    windows = []
+    cursor = 0
+    for start, end in focus_regions(veo_events, duration):
+        windows += _coarse_windows(cursor, start)
+        windows += _focus_windows(start, end)
+        cursor = end
+    windows += _coarse_windows(cursor, math.ceil(duration))
+
+    return [
+        {"nominal_start_seconds": start, "nominal_end_seconds": min(end, duration), "window": kind}
+        for start, end, kind in windows
+        if start < duration
+    ]
+
+
+def summarize_windows(windows, veo_events, duration, fixed_seconds=15) -> dict:
+    """Window counts for segments.json and the 1.4 printout"""
+    focus = sum(1 for w in windows if w["window"] == "focus")
+    return {
+        "mode": "veo",
+        "veo_events": len(veo_events),
+        "focus_windows": focus,
+        "coarse_windows": len(windows) - focus,
+        "fixed_clip_count": math.ceil(duration / fixed_seconds),
+        "focus_window_seconds": FOCUS_WINDOW_SECONDS,
+        "focus_stride_seconds": FOCUS_STRIDE_SECONDS,
+        "coarse_window_seconds": COARSE_WINDOW_SECONDS,
+    }
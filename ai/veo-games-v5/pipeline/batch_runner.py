@@ -0,0 +1,261 @@
+#!/usr/bin/env python3
+"""
+Batch Runner - v5 Pipeline
+Runs many matches (e.g. a club's whole season) through one shared scheduler.
+
+All matches share one pool of stage workers and the process-wide budgets in
+budgets.py (ffmpeg slots, concurrent Gemini calls, S3 bandwidth, disk headroom),
+so launching a season no longer starts one 30-thread Gemini pool per match.
+Whenever a worker frees up, the ready stage belonging to the match with the
+least estimated progress goes next, so no match is starved while another
+races ahead. A progress/ETA table is printed as stages finish.
+
+Usage:
+    python3 batch_runner.py <match-id|veo-url> [...] [--file season.txt] [--publish]
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+import subprocess
+from pathlib import Path
+from statistics import median
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import budgets
+from pipeline_runner import (
+    MatchRun, build_stages, select_stages, resolve_match, PIPELINE_DIR
+)
+
+# Typical stage durations (seconds) for a 90 minute 1080p match, used until real timings are known
+DEFAULT_STAGE_SECONDS = {
+    "1.1_fetch_veo": 10,
+    "1.2_download_video": 240,
+    # One decode feeding 360p/720p/1080p x264 encodes, slower than real time on 4 cores
+    "1.25_make_hls": 2400,
+    "1.4_make_clips": 450,
+    "1.45_make_proxies": 120,
+    "1.5_analyze_clips": 1350,
+    "1.6_synthesis": 5,
+    "2.5_events_synthesizer": 120,
+    "2.6_focused_events": 120,
+    "3.1_format_webapp": 60,
+    # Keyframe-seek posters plus 1.4's sprites; a full decode when 1.4 didn't make them
+    "3.15_make_thumbnails": 120,
+    # ~40 event clips: partial GOPs re-encoded, the rest stream-copied
+    "3.16_render_highlights": 150,
+    "3.2_tactical_formatter": 60,
+    "3.3_training_recommendations": 30,
+    "3.5_s3_uploader": 30,
+    "3.7_api_upload": 10,
+}
+DEFAULT_MATCH_SECONDS = 90 * 60
+# Defaults that grow with the length of the video, scaled once video.mp4 is there to probe
+DURATION_SCALED_STAGES = ("1.25_make_hls", "1.4_make_clips", "1.45_make_proxies", "1.5_analyze_clips")
+
+
+def probe_video_seconds(video_path: Path):
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', str(video_path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (subprocess.CalledProcessError, FileNotFoundError, KeyError, ValueError):
+        return None
+
+
+class BatchScheduler:
+    """Fair scheduler for the stage graphs of many matches"""
+
+    def __init__(self, runs, max_workers=4, per_match=2):
+        self.runs = runs
+        self.max_workers = max_workers
+        self.per_match = per_match
+        self.running = {}  # future -> (run, stage name)
+        self.started_at = {}  # (match_id, stage) -> start time
+        self.video_seconds = {}  # match_id -> probed video length (None if ffprobe failed)
+        self.batch_start = time.time()
+
+    def estimate(self, run, name):
+        """Expected seconds for a stage: last run of this match, then this batch, then defaults"""
+        record = run.state["stages"].get(name, {})
+        if record.get("duration_seconds"):
+            return record["duration_seconds"]
+        observed = [r.results[name]["seconds"] for r in self.runs
+                    if r.results.get(name, {}).get("status") == "ok"]
+        if observed:
+            return median(observed)
+        default = DEFAULT_STAGE_SECONDS.get(name, 60)
+        seconds = self.match_seconds(run) if name in DURATION_SCALED_STAGES else None
+        return default * seconds / DEFAULT_MATCH_SECONDS if seconds else default
+
+    def match_seconds(self, run):
+        """Length of the match video, probed once per match as soon as video.mp4 exists"""
+        match_id = run.ctx.match_id
+        if match_id not in self.video_seconds:
+            video_path = run.ctx.match_dir / "video.mp4"
+            if not video_path.exists():
+                return None
+            self.video_seconds[match_id] = probe_video_seconds(video_path)
+        return self.video_seconds[match_id]
+
+    def progress(self, run):
+        """Fraction of the match's estimated work that is finished"""
+        total = sum(self.estimate(run, name) for name in run.order)
+        done = sum(self.estimate(run, name) for name in run.order
+                   if run.status[name] in ("ok", "skipped", "failed", "blocked"))
+        return done / total if total else 1.0
+
+    def eta_seconds(self, run):
+        """Remaining estimated work, scaled by how this match has tracked its estimates so far"""
+        remaining = 0.0
+        now = time.time()
+        for name in run.order:
+            state = run.status[name]
+            if state == "pending":
+                remaining += self.estimate(run, name)
+            elif state == "running":
+                elapsed = now - self.started_at.get((run.ctx.match_id, name), now)
+                remaining += max(self.estimate(run, name) - elapsed, 0)
+
+        actual = sum(r["seconds"] for n, r in run.results.items() if r["status"] == "ok")
+        expected = sum(self.estimate(run, n) for n, r in run.results.items() if r["status"] == "ok")
+        speed = actual / expected if expected else 1.0
+        return remaining * speed
+
+    def pick_next(self):
+        """Ready stage from the least-progressed match that is under its per-match limit"""
+        busy = {}
+        for run, _ in self.running.values():
+            busy[run.ctx.match_id] = busy.get(run.ctx.match_id, 0) + 1
+
+        candidates = []
+        for index, run in enumerate(self.runs):
+            if busy.get(run.ctx.match_id, 0) >= self.per_match:
+                continue
+            ready = run.ready_stages()
+            if ready:
+                candidates.append((self.progress(run), index, run, ready[0]))
+
+        if not candidates:
+            return None
+        _, _, run, name = min(candidates, key=lambda c: (c[0], c[1]))
+        return run, name
+
+    def print_progress(self):
+        print(f"\n📈 Batch progress ({time.time() - self.batch_start:.0f}s elapsed):")
+        for run in self.runs:
+            done = sum(1 for s in run.status.values() if s in ("ok", "skipped"))
+            failed = sum(1 for s in run.status.values() if s in ("failed", "blocked"))
+            active = [n for n in run.order if run.status[n] == "running"]
+            if run.finished():
+                eta = "done" if not failed else "stopped"
+            else:
+                eta = f"~{self.eta_seconds(run) / 60:.0f} min"
+            status = f"running {', '.join(active)}" if active else ""
+            print(f"   {run.ctx.match_id[:40]:<40} {done:>2}/{len(run.order)} stages "
+                  f"{self.progress(run) * 100:5.1f}%  ETA {eta:<8} {status}")
+            if failed:
+                print(f"      ❌ {failed} stage(s) failed or blocked")
+
+    def run(self):
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            while True:
+                while len(self.running) < self.max_workers:
+                    picked = self.pick_next()
+                    if not picked:
+                        break
+                    run, name = picked
+                    run.status[name] = "running"
+                    self.started_at[(run.ctx.match_id, name)] = time.time()
+                    self.running[executor.submit(run.execute, name)] = (run, name)
+
+                if not self.running:
+                    break
+
+                done, _ = wait(self.running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    self.running.pop(future)
+                    future.result()
+                self.print_progress()
+
+        for run in self.runs:
+            run.save_state()
+            run.summary()
+            run.write_metrics()
+
+        return all(run.finished() and all(s in ("ok", "skipped") for s in run.status.values())
+                   for run in self.runs)
+
+
+def read_match_list(args_matches, list_file):
+    """Match IDs / Veo URLs from the command line plus an optional one-per-line file"""
+    matches = list(args_matches)
+    if list_file:
+        for line in Path(list_file).read_text().splitlines():
+            line = line.strip()
+            if line and not line.startswith('#'):
+                matches.append(line)
+    # Keep order, drop duplicates
+    return list(dict.fromkeys(matches))
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run many matches through the v5 pipeline with shared budgets")
+    parser.add_argument("matches", nargs="*", help="Match IDs or Veo match URLs")
+    parser.add_argument("--file", default=None, help="Text file with one match ID or Veo URL per line")
+    parser.add_argument("--until", default=None, help="Stop each match after this stage (e.g. 1.6, 3.2)")
+    parser.add_argument("--publish", action="store_true", help="Also run 3.5 S3 upload and 3.7 API upload")
+    parser.add_argument("--jobs", type=int, default=6, help="Stages running at once across all matches")
+    parser.add_argument("--per-match", type=int, default=2, help="Stages running at once for one match")
+    parser.add_argument("--ffmpeg-slots", type=int, default=None, help="Concurrent ffmpeg processes")
+    parser.add_argument("--gemini-concurrency", type=int, default=None, help="Concurrent Gemini calls")
+    parser.add_argument("--s3-mbps", type=float, default=None, help="S3 upload bandwidth cap in Mbit/s")
+    parser.add_argument("--disk-headroom-gb", type=float, default=None, help="Free disk to keep in reserve")
+    parser.add_argument("--base-url", default="http://localhost:3001", help="Website API base URL for 3.7")
+    args = parser.parse_args()
+
+    matches = read_match_list(args.matches, args.file)
+    if not matches:
+        parser.print_usage()
+        print("❌ No matches given")
+        sys.exit(1)
+
+    budgets.configure(
+        ffmpeg=args.ffmpeg_slots,
+        gemini=args.gemini_concurrency,
+        s3_mbps=args.s3_mbps,
+        disk_headroom_gb=args.disk_headroom_gb,
+    )
+
+    try:
+        stages = select_stages(build_stages(publish=args.publish), args.until)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    os.chdir(PIPELINE_DIR)  # stages resolve ../outputs relative to the pipeline dir
+
+    runs = []
+    for match in matches:
+        ctx = resolve_match(match)
+        ctx.base_url = args.base_url
+        runs.append(MatchRun(ctx, stages))
+
+    print(f"🗓️  Batch of {len(runs)} matches, {len(stages)} stages each")
+    print(f"⚙️  Workers: {args.jobs} total, {args.per_match} per match | "
+          f"ffmpeg slots: {budgets.ffmpeg_worker_count()} | Gemini calls: {budgets.gemini_worker_count()}")
+
+    scheduler = BatchScheduler(runs, max_workers=args.jobs, per_match=args.per_match)
+    success = scheduler.run()
+
+    if success:
+        print(f"\n🎉 Batch complete: {len(runs)} matches")
+    else:
+        print("\n⚠️  Batch finished with failures - re-run to resume from the cached stages")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
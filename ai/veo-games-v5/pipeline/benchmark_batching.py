@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""
+Benchmark batched 1.5 clip analysis against the single-clip path
+
+Analyzes the same consecutive clips once per batch size (1 = the normal
+one-clip-per-request path) and compares:
+- wall time, p50/p95 time-to-description per clip, Gemini calls and tokens
+- agreement with the single-clip descriptions: same team named first, and F1
+  of the event types mentioned (goal, shot, corner, free kick, ...)
+
+Descriptions are kept in memory only - 1.5_clip_descriptions is never touched -
+and the response cache is bypassed so every size pays for its own calls.
+Results are written to outputs/<match-id>/1.5_batch_benchmark.json.
+
+Usage:
+    python3 benchmark_batching.py <match-id> [--sizes 1,4,8] [--clips 24] [--start 30:00]
+    GEMINI_API_BASE=http://127.0.0.1:8089 GEMINI_API_KEY=fake python3 benchmark_batching.py <match-id>
+"""
+
+import os
+import sys
+import json
+import time
+import argparse
+from pathlib import Path
+from concurrent.futures import as_completed
+
+os.environ['CLANN_GEMINI_CACHE'] = '0'
+
+from clip_stream import load_segments
+from clip_records import lead_team, record_from_text
+from pipeline_runner import load_stage_module
+
+
+def event_kinds(description: str) -> set:
+    return {event["type"] for event in record_from_text(description)["events"]}
+
+
+def agreement(reference: dict, candidate: dict) -> dict:
+    """Team and event-kind agreement of `candidate` with the single-clip `reference`"""
+    shared = [t for t in reference if t in candidate]
+    if not shared:
+        return {"clips_compared": 0, "team_agreement": None, "event_f1": None}
+    team_hits = sum(1 for t in shared if lead_team(reference[t]) == lead_team(candidate[t]))
+    true_pos = false_pos = false_neg = 0
+    for t in shared:
+        ref, cand = event_kinds(reference[t]), event_kinds(candidate[t])
+        true_pos += len(ref & cand)
+        false_pos += len(cand - ref)
+        false_neg += len(ref - cand)
+    f1 = 2 * true_pos / (2 * true_pos + false_pos + false_neg) if (true_pos + false_pos + false_neg) else 1.0
+    return {"clips_compared": len(shared), "team_agreement": round(team_hits / len(shared), 3),
+            "event_f1": round(f1, 3)}
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))] if ordered else None
+
+
+def run_size(analyzer, clips, batch_size, generation_config):
+    """Analyze `clips` with one batch size; returns (descriptions by timestamp, timing stats)"""
+    client = analyzer.client
+    calls_before, tokens_before = client.stats["calls"], client.stats["tokens"]
+    started = time.monotonic()
+    ready_at = []
+    descriptions = {}
+
+    if batch_size == 1:
+        futures = [client.submit(analyzer.analyze_clip_async(*clip, generation_config)) for clip in clips]
+        for future in as_completed(futures):
+            try:
+                timestamp, description, _ = future.result()
+            except Exception as e:
+                print(f"❌ {e}")
+                continue
+            descriptions[timestamp] = description
+            ready_at.append(time.monotonic() - started)
+    else:
+        batches = [clips[i:i + batch_size] for i in range(0, len(clips), batch_size)]
+        futures = [client.submit(analyzer.analyze_batch_or_singles(batch, generation_config)) for batch in batches]
+        for future in as_completed(futures):
+            elapsed = time.monotonic() - started
+            for result in future.result().values():
+                if isinstance(result, BaseException):
+                    print(f"❌ {result}")
+                    continue
+                timestamp, description, _ = result
+                descriptions[timestamp] = description
+                ready_at.append(elapsed)
+
+    return descriptions, {
+        "batch_size": batch_size,
+        "clips_described": len(descriptions),
+        "wall_seconds": round(time.monotonic() - started, 2),
+        "p50_seconds_to_description": round(percentile(ready_at, 0.5) or 0, 2),
+        "p95_seconds_to_description": round(percentile(ready_at, 0.95) or 0, 2),
+        "gemini_calls": client.stats["calls"] - calls_before,
+        "tokens": client.stats["tokens"] - tokens_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare batched and single-clip 1.5 analysis")
+    parser.add_argument("match_id")
+    parser.add_argument("--sizes", default="1,4,8", help="Comma-separated batch sizes (1 is always included)")
+    parser.add_argument("--clips", type=int, default=24, help="Number of consecutive clips to analyze")
+    parser.add_argument("--start", default="00:00", help="First clip time MM:SS")
+    args = parser.parse_args()
+
+    sizes = sorted({1} | {int(size) for size in args.sizes.split(',')})
+    data_dir = Path("../outputs") / args.match_id
+    clips_dir = data_dir / "1.4_clips"
+    start_minutes, start_seconds = (int(part) for part in args.start.split(':'))
+
+    segments = load_segments(clips_dir)
+    clip_files = sorted(clips_dir.glob("clip_*.mp4"),
+                        key=lambda p: segments.get(p.stem, {}).get("start_seconds", 0))
+    clip_files = [p for p in clip_files
+                  if segments.get(p.stem, {}).get("start_seconds", 0) >= start_minutes * 60 + start_seconds]
+    clip_files = clip_files[:args.clips]
+    if not clip_files:
+        print(f"❌ No clips found in {clips_dir}")
+        sys.exit(1)
+
+    analyzer = load_stage_module("1.5_analyze_clips.py").SimpleClipAnalyzer()
+    proxies_dir, generation_config = analyzer.load_proxies(data_dir)
+    clips = [
+        (p, segments.get(p.stem, {}).get("duration"),
+         proxies_dir / p.name if proxies_dir and (proxies_dir / p.name).exists() else p)
+        for p in clip_files
+    ]
+    print(f"🧪 Benchmarking batch sizes {sizes} on {len(clips)} clips from {analyzer.clip_timestamp(clip_files[0])}")
+
+    results = []
+    reference = None
+    for size in sizes:
+        print(f"\n📦 Batch size {size}")
+        descriptions, stats = run_size(analyzer, clips, size, generation_config)
+        if reference is None:
+            reference = descriptions
+        stats.update(agreement(reference, descriptions))
+        results.append(stats)
+
+    report = {"match_id": args.match_id, "clips": len(clips), "first_clip": clip_files[0].name,
+              "api_base": analyzer.client.api_base, "results": results}
+    report_path = data_dir / "1.5_batch_benchmark.json"
+    with open(report_path, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n📊 BATCH BENCHMARK")
+    print("=" * 78)
+    print(f"{'batch':>5} {'wall s':>8} {'p50 s':>7} {'p95 s':>7} {'calls':>6} {'tokens':>9} {'team':>6} {'events F1':>10}")
+    for r in results:
+        team = f"{r['team_agreement']:.0%}" if r['team_agreement'] is not None else "-"
+        f1 = f"{r['event_f1']:.2f}" if r['event_f1'] is not None else "-"
+        print(f"{r['batch_size']:>5} {r['wall_seconds']:>8} {r['p50_seconds_to_description']:>7} "
+              f"{r['p95_seconds_to_description']:>7} {r['gemini_calls']:>6} {r['tokens']:>9,} {team:>6} {f1:>10}")
+    print(f"📁 Report saved: {report_path}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,285 @@
+#!/usr/bin/env python3
+"""
+Offline throughput benchmark of the analysis stages
+
+Builds a synthetic match from generated test video (ffmpeg lavfi, no download),
+starts fake_gemini_server.py in-process and runs the real pipeline stages
+1.4 -> 1.45 -> 1.5 -> 1.6 -> 2.5 -> 2.6 -> 3.1 against it through
+pipeline_runner's MatchRun, one stage at a time. Per stage it reports:
+- wall time and clips/sec
+- Gemini calls and exact p50/p99 call latency (telemetry.py samples)
+- peak RSS of this process during the stage (Linux; elsewhere the process peak)
+
+No network is used. The fake server answers from recorded responses: either a
+CLANN_GEMINI_RECORD file from a real run (--replay), or a replay set built from
+an analyzed match already in outputs/ (--source, default: the first one with 1.5
+descriptions, 2.6 and 3.1 outputs) - so 2.5/2.6/3.1 parse realistic answers.
+Latency, its distribution and 429 injection are configurable, and --seed makes
+the draws repeatable.
+
+The synthetic match is outputs/benchmark-offline-<N>m; it is deleted afterwards
+unless --keep. The report goes to outputs/benchmark_offline.json.
+
+Usage:
+    python3 benchmark_offline.py [--minutes 10] [--latency-ms 800] [--latency-dist lognormal] [--rate-429 0.02]
+    python3 benchmark_offline.py --replay recorded.jsonl --latency-dist replay --seed 7
+"""
+
+import os
+import sys
+import json
+import time
+import shutil
+import random
+import argparse
+import resource
+import subprocess
+from pathlib import Path
+
+os.environ['CLANN_GEMINI_CACHE'] = '0'
+
+from fake_gemini_server import start_fake_server, load_replay, LATENCY_DISTRIBUTIONS
+from pipeline_runner import OUTPUTS_DIR, PIPELINE_DIR, MatchContext, MatchRun, build_stages
+
+BENCH_STAGES = ("1.4_make_clips", "1.45_make_proxies", "1.5_analyze_clips", "1.6_synthesis",
+                "2.5_events_synthesizer", "2.6_focused_events", "3.1_format_webapp")
+
+DEFAULT_TEAM_CONFIG = {
+    "team_a": {"name": "Blue Rovers", "colors": "blue jersey"},
+    "team_b": {"name": "Yellow United", "colors": "yellow jersey"},
+    "game_type": "11-a-side",
+    "focus": "detailed play-by-play description",
+    "additional_context": "",
+}
+
+# Opening lines of the text prompts the replay set answers (2.5/2.6 single and
+# map-reduce calls, the 2.6 rules fallback and 3.1), keyed to the answer shape
+TEXT_PROMPTS = {
+    "You are analyzing a 90-minute football match. You will create 3": "mega",
+    "You are analyzing a 90-minute football match. Focus ONLY": "focused",
+    "You are analyzing ": "window_events",
+    "You are analyzing a football match from its complete list": "mega_narrative",
+    "You are summarizing a football match from its complete list": "focused_narrative",
+    "Classify football match timeline fragments.": "fallback",
+    "Convert this plain text match analysis": "webapp",
+}
+
+
+def find_source_match():
+    """First analyzed match in outputs/ that has everything a replay set is built from"""
+    for match_dir in sorted(OUTPUTS_DIR.iterdir()):
+        if (match_dir / "1.5_clip_descriptions").is_dir() and (match_dir / "2.6_focused_summary.txt").exists() \
+                and (match_dir / "3.1_webapp_complete.json").exists():
+            return match_dir
+    return None
+
+
+def build_replay(source_dir: Path) -> list:
+    """Replay entries (fake_gemini_server.py format) from an analyzed match's outputs"""
+    entries = []
+    for path in sorted((source_dir / "1.5_clip_descriptions").glob("clip_*.txt")):
+        record_path = path.with_suffix(".json")
+        if record_path.exists():
+            entries.append({"prompt": "", "videos": 1, "structured": True, "text": record_path.read_text()})
+        entries.append({"prompt": "", "videos": 1, "structured": False, "text": path.read_text().strip()})
+
+    events = (source_dir / "2.6_focused_events.txt").read_text().strip()
+    summary = (source_dir / "2.6_focused_summary.txt").read_text().strip()
+    tactical = (source_dir / "2.6_focused_tactical.txt").read_text().strip()
+    webapp = json.loads((source_dir / "3.1_webapp_complete.json").read_text())
+    answers = {
+        "mega": f"=== MEGA_EVENTS.TXT ===\n{events}\n\n=== MEGA_TACTICAL.TXT ===\n{tactical}\n\n"
+                f"=== MEGA_SUMMARY.TXT ===\n{summary}",
+        "focused": f"=== FOCUSED_EVENTS.TXT ===\n{events}\n\n=== FOCUSED_SUMMARY.TXT ===\n{summary}\n\n"
+                   f"=== FOCUSED_TACTICAL.TXT ===\n{tactical}",
+        "window_events": events,
+        "mega_narrative": f"=== MEGA_TACTICAL.TXT ===\n{tactical}\n\n=== MEGA_SUMMARY.TXT ===\n{summary}",
+        "focused_narrative": f"=== FOCUSED_SUMMARY.TXT ===\n{summary}\n\n=== FOCUSED_TACTICAL.TXT ===\n{tactical}",
+        "fallback": "[]",
+        "webapp": f"```json\n{json.dumps(webapp, indent=2)}\n```",
+    }
+    for prompt, shape in TEXT_PROMPTS.items():
+        entries.append({"prompt": prompt, "videos": 0, "structured": False, "text": answers[shape]})
+    return entries
+
+
+def make_synthetic_match(match_dir: Path, minutes: float, team_config: dict, seed: int):
+    """video.mp4 from ffmpeg test sources, team config and a VEO ground truth with a few goals/shots"""
+    match_dir.mkdir(parents=True)
+    seconds = int(minutes * 60)
+    cmd = [
+        'ffmpeg', '-hide_banner', '-loglevel', 'error', '-y',
+        '-f', 'lavfi', '-i', 'testsrc2=size=1280x720:rate=25',
+        '-f', 'lavfi', '-i', 'sine=frequency=440:sample_rate=44100',
+        '-t', str(seconds), '-c:v', 'libx264', '-preset', 'ultrafast', '-g', '50', '-pix_fmt', 'yuv420p',
+        '-c:a', 'aac', '-shortest', '-movflags', '+faststart', str(match_dir / "video.mp4"),
+    ]
+    subprocess.run(cmd, check=True)
+
+    with open(match_dir / "1_team_config.json", 'w') as f:
+        json.dump({"match_id": match_dir.name, **team_config}, f, indent=2)
+
+    rng = random.Random(seed)
+    events = []
+    # Roughly what VEO tags per 10 minutes: a goal and a few shots
+    for i in range(max(1, seconds // 600)):
+        for event_type, slug, count in (("Goal", "goal", 1), ("Shot on goal", "shot-on-goal", 3)):
+            for _ in range(count):
+                at = i * 600 + rng.randint(20, min(600, seconds) - 20)
+                events.append({"timestamp": f"{at // 60}:{at % 60:02d}", "timestamp_seconds": at,
+                               "event_type": event_type, "duration": 25, "is_ai_generated": True,
+                               "tags": [{"name": event_type, "slug": slug}]})
+    events.sort(key=lambda e: e["timestamp_seconds"])
+    with open(match_dir / "1_veo_ground_truth.json", 'w') as f:
+        json.dump({"match_url": None, "total_events": len(events), "events": events}, f, indent=2)
+
+
+def reset_peak_rss() -> bool:
+    """Start a new peak-RSS window for this process (Linux only)"""
+    try:
+        Path("/proc/self/clear_refs").write_text("5")
+        return True
+    except OSError:
+        return False
+
+
+def peak_rss_mb() -> float:
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmHWM:"):
+                    return int(line.split()[1]) / 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KB on Linux
+
+
+def run_stages(ctx: MatchContext, clips_dir: Path) -> tuple:
+    """Run the benchmark stages one at a time; returns (MatchRun, per-stage results)"""
+    stages = [stage for stage in build_stages() if stage.name in BENCH_STAGES]
+    run = MatchRun(ctx, stages, force=BENCH_STAGES)
+    results = []
+    for name in run.order:
+        windowed = reset_peak_rss()
+        status = run.execute(name)
+        stage = run.metrics.stages[name]
+        clips = len(list(clips_dir.glob("clip_*.mp4")))
+        generate = run.metrics.histograms.get(("gemini.generate", name))
+        results.append({
+            "stage": name,
+            "status": status,
+            "wall_seconds": stage["wall_seconds"],
+            "process_cpu_seconds": stage.get("process_cpu_seconds"),
+            "clips_per_second": round(clips / stage["wall_seconds"], 2) if stage["wall_seconds"] else None,
+            "gemini_calls": generate.count if generate else 0,
+            "p50_seconds": round(generate.sample_quantile(0.5), 3) if generate else None,
+            "p99_seconds": round(generate.sample_quantile(0.99), 3) if generate else None,
+            "peak_rss_mb": round(peak_rss_mb(), 1),
+            "peak_rss_scope": "stage" if windowed else "process",
+        })
+        if status != "ok":
+            break
+    return run, results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark against a fake Gemini server")
+    parser.add_argument("--minutes", type=float, default=10, help="Length of the synthetic match")
+    parser.add_argument("--latency-ms", type=float, default=800, help="Median/mean generateContent latency")
+    parser.add_argument("--jitter-ms", type=float, default=300, help="Latency spread (see fake_gemini_server.py)")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="lognormal")
+    parser.add_argument("--rate-429", type=float, default=0.02, help="Fraction of calls answered 429")
+    parser.add_argument("--rpm", type=int, default=0, help="Fake quota: requests per minute before 429")
+    parser.add_argument("--per-video-ms", type=float, default=0, help="Extra latency per video in a request")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the fake server and the synthetic match")
+    parser.add_argument("--replay", default=None, help="Recorded answers (CLANN_GEMINI_RECORD file) to replay")
+    parser.add_argument("--source", default=None, help="Analyzed match to build the replay set from")
+    parser.add_argument("--report", default=str(OUTPUTS_DIR / "benchmark_offline.json"))
+    parser.add_argument("--keep", action="store_true", help="Keep the synthetic match outputs")
+    args = parser.parse_args()
+
+    source_dir = OUTPUTS_DIR / args.source if args.source else (None if args.replay else find_source_match())
+    if args.replay:
+        replay = load_replay(args.replay)
+    elif source_dir and source_dir.exists():
+        replay = build_replay(source_dir)
+    else:
+        print("❌ No recorded answers: pass --replay <file.jsonl> or --source <analyzed match-id>")
+        sys.exit(1)
+    team_config = DEFAULT_TEAM_CONFIG
+    if source_dir and (source_dir / "1_team_config.json").exists():
+        with open(source_dir / "1_team_config.json", 'r') as f:
+            team_config = {k: v for k, v in json.load(f).items() if k != "match_id"}
+
+    server, base_url = start_fake_server(
+        latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, latency_dist=args.latency_dist,
+        rate_429=args.rate_429, rpm=args.rpm, per_video_ms=args.per_video_ms, seed=args.seed, replay=replay,
+    )
+    os.environ['GEMINI_API_BASE'] = base_url
+    os.environ['GEMINI_API_KEY'] = 'fake'
+
+    ctx = MatchContext(match_id=f"benchmark-offline-{args.minutes:g}m")
+    if ctx.match_dir.exists():
+        shutil.rmtree(ctx.match_dir)
+    print(f"🧪 Offline benchmark: {args.minutes:g}-minute synthetic match, {len(replay)} recorded answers, "
+          f"{args.latency_dist} latency ~{args.latency_ms:g}ms, {args.rate_429:.0%} 429s, seed {args.seed}")
+
+    started = time.monotonic()
+    try:
+        make_synthetic_match(ctx.match_dir, args.minutes, team_config, args.seed)
+        print(f"🎞️  Synthetic video ready in {time.monotonic() - started:.1f}s")
+        os.chdir(PIPELINE_DIR)  # stages resolve ../outputs relative to the pipeline dir
+        started = time.monotonic()
+        run, results = run_stages(ctx, ctx.match_dir / "1.4_clips")
+        wall = time.monotonic() - started
+        clips = len(list((ctx.match_dir / "1.4_clips").glob("clip_*.mp4")))
+    finally:
+        server.shutdown()
+        if not args.keep:
+            shutil.rmtree(ctx.match_dir, ignore_errors=True)
+
+    totals = run.metrics.to_dict()["totals"]
+    counts = server.state.counts
+    report = {
+        "match_id": ctx.match_id,
+        "minutes": args.minutes,
+        "clips": clips,
+        "source": source_dir.name if source_dir and not args.replay else args.replay,
+        "server": {"latency_ms": args.latency_ms, "jitter_ms": args.jitter_ms, "latency_dist": args.latency_dist,
+                   "rate_429": args.rate_429, "rpm": args.rpm, "per_video_ms": args.per_video_ms, "seed": args.seed},
+        "stages": results,
+        "totals": {
+            "wall_seconds": round(wall, 2),
+            "clips_per_second": round(clips / wall, 2) if wall else None,
+            "gemini_calls": counts["generate"],
+            "answered_429": counts["429"],
+            "replayed": counts["replayed"],
+            "peak_in_flight": counts["peak_in_flight"],
+            "client_retries": totals["retries"],
+            "tokens_input": totals["tokens_input"],
+            "children_peak_rss_mb": round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1),
+        },
+    }
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print("\n📊 OFFLINE BENCHMARK")
+    print("=" * 86)
+    print(f"{'stage':<24} {'status':<7} {'wall s':>8} {'clips/s':>8} {'calls':>6} {'p50 s':>7} {'p99 s':>7} {'peak MB':>8}")
+    for r in results:
+        p50 = f"{r['p50_seconds']:.2f}" if r['p50_seconds'] is not None else "-"
+        p99 = f"{r['p99_seconds']:.2f}" if r['p99_seconds'] is not None else "-"
+        print(f"{r['stage']:<24} {r['status']:<7} {r['wall_seconds']:>8.2f} {r['clips_per_second'] or 0:>8.1f} "
+              f"{r['gemini_calls']:>6} {p50:>7} {p99:>7} {r['peak_rss_mb']:>8.1f}")
+    t = report["totals"]
+    print(f"{'total':<24} {'':<7} {t['wall_seconds']:>8.2f} {t['clips_per_second'] or 0:>8.1f} {t['gemini_calls']:>6}")
+    print(f"🚦 {t['answered_429']} calls answered 429, {t['client_retries']} client retries, "
+          f"{t['peak_in_flight']} calls in flight at peak")
+    print(f"📁 Report saved: {args.report}")
+
+    if any(r["status"] != "ok" for r in results) or len(results) < len(run.order):
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
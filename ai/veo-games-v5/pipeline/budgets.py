@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+"""
+Process-wide resource budgets shared by every v5 stage
+
+When several matches run in one process (batch_runner.py) they share these
+limits instead of each stage creating its own pool:
+- ffmpeg process slots       CLANN_FFMPEG_SLOTS       (default: CPU count)
+- concurrent Gemini calls    CLANN_GEMINI_CONCURRENCY (default: 30)
+- S3 upload bandwidth        CLANN_S3_MBPS            (default: 0 = unlimited)
+- free disk space headroom   CLANN_DISK_HEADROOM_GB   (default: 10)
+
+Stand-alone scripts get the same defaults they always had.
+"""
+
+import os
+import time
+import shutil
+import threading
+from contextlib import contextmanager
+from pathlib import Path
+
+
+class ResizableSemaphore:
+    """Counting semaphore whose limit can be changed while in use"""
+
+    def __init__(self, limit: int):
+        self.limit = max(1, int(limit))
+        self.in_use = 0
+        self.cond = threading.Condition()
+
+    def acquire(self):
+        with self.cond:
+            while self.in_use >= self.limit:
+                self.cond.wait()
+            self.in_use += 1
+
+    def release(self):
+        with self.cond:
+            self.in_use -= 1
+            self.cond.notify()
+
+    def set_limit(self, limit: int):
+        with self.cond:
+            self.limit = max(1, int(limit))
+            self.cond.notify_all()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc):
+        self.release()
+
+
+class TokenBucket:
+    """Blocking token bucket; rate <= 0 means unlimited"""
+
+    def __init__(self, rate_per_second: float, burst: float = None):
+        self.lock = threading.Lock()
+        self.set_rate(rate_per_second, burst)
+
+    def set_rate(self, rate_per_second: float, burst: float = None):
+        with self.lock:
+            self.rate = float(rate_per_second)
+            self.capacity = float(burst) if burst else max(self.rate, 1.0)
+            self.tokens = self.capacity
+            self.updated = time.monotonic()
+
+    def consume(self, amount: float):
+        """Take `amount` tokens, sleeping until they are available"""
+        if self.rate <= 0 or amount <= 0:
+            return
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+                self.updated = now
+                # Requests larger than the bucket are allowed to drive it negative
+                if self.tokens >= min(amount, self.capacity):
+                    self.tokens -= amount
+                    return
+                wait_seconds = (min(amount, self.capacity) - self.tokens) / self.rate
+            time.sleep(min(wait_seconds, 1.0))
+
+
+def _env_number(name: str, default: float) -> float:
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+ffmpeg_slots = ResizableSemaphore(_env_number('CLANN_FFMPEG_SLOTS', os.cpu_count() or 4))
+gemini_slots = ResizableSemaphore(_env_number('CLANN_GEMINI_CONCURRENCY', 30))
+s3_bandwidth = TokenBucket(_env_number('CLANN_S3_MBPS', 0) * 1024 * 1024 / 8)
+disk_headroom_bytes = _env_number('CLANN_DISK_HEADROOM_GB', 10) * 1024 ** 3
+
+_disk_lock = threading.Lock()
+_disk_reserved = 0
+
+
+def configure(ffmpeg=None, gemini=None, s3_mbps=None, disk_headroom_gb=None):
+    """Override the budgets for this process (used by batch_runner.py)"""
+    global disk_headroom_bytes
+    if ffmpeg:
+        ffmpeg_slots.set_limit(ffmpeg)
+    if gemini:
+        gemini_slots.set_limit(gemini)
+    if s3_mbps is not None:
+        s3_bandwidth.set_rate(s3_mbps * 1024 * 1024 / 8)
+    if disk_headroom_gb is not None:
+        disk_headroom_bytes = disk_headroom_gb * 1024 ** 3
+
+
+def ffmpeg_worker_count() -> int:
+    """Pool size for stages that fan ffmpeg out over threads"""
+    return ffmpeg_slots.limit
+
+
+def gemini_worker_count() -> int:
+    """Pool size for stages that fan Gemini calls out over threads"""
+    return gemini_slots.limit
+
+
+@contextmanager
+def ffmpeg_slot():
+    with ffmpeg_slots:
+        yield
+
+
+def submit_ffmpeg(executor, fn, *args):
+    """Submit an ffmpeg job to a process pool, holding an ffmpeg slot until it finishes
+
+    Worker processes have their own copy of this module, so they can't take a
+    slot themselves: the slot is taken here (blocking while none is free) and
+    given back by the future's done callback.
+    """
+    ffmpeg_slots.acquire()
+    try:
+        future = executor.submit(fn, *args)
+    except BaseException:
+        ffmpeg_slots.release()
+        raise
+    future.add_done_callback(lambda _: ffmpeg_slots.release())
+    return future
+
+
+@contextmanager
+def gemini_slot():
+    with gemini_slots:
+        yield
+
+
+def s3_throttle_callback():
+    """boto3 transfer Callback that paces uploads to the shared S3 bandwidth budget"""
+    return s3_bandwidth.consume
+
+
+@contextmanager
+def disk_reservation(path, needed_bytes: int, poll_seconds: float = 15):
+    """Block until `needed_bytes` plus the headroom are free on `path`'s disk, then hold the space
+
+    Reservations from other matches in this process are counted as already used,
+    so two downloads cannot both claim the same free gigabytes. Only those
+    reservations are waited on; if nothing else is reserved the call proceeds
+    with a warning.
+    """
+    global _disk_reserved
+    path = Path(path)
+    probe = path if path.exists() else next((p for p in path.parents if p.exists()), Path('.'))
+    announced = False
+
+    while True:
+        with _disk_lock:
+            free = shutil.disk_usage(probe).free - _disk_reserved
+            if free - needed_bytes >= disk_headroom_bytes or _disk_reserved == 0:
+                # With nothing else reserved, waiting cannot free space - go ahead and warn
+                if free - needed_bytes < disk_headroom_bytes:
+                    print(f"⚠️  Low disk space: {free / 1024**3:.1f}GB free, "
+                          f"need {needed_bytes / 1024**3:.1f}GB + {disk_headroom_bytes / 1024**3:.0f}GB headroom")
+                _disk_reserved += needed_bytes
+                break
+        if not announced:
+            print(f"💽 Waiting for disk space: need {needed_bytes / 1024**3:.1f}GB "
+                  f"+ {disk_headroom_bytes / 1024**3:.0f}GB headroom, {free / 1024**3:.1f}GB free")
+            announced = True
+        time.sleep(poll_seconds)
+
+    try:
+        yield
+    finally:
+        with _disk_lock:
+            _disk_reserved -= needed_bytes
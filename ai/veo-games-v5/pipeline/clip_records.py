@@ -0,0 +1,177 @@
+#!/usr/bin/env python3
+"""
+Structured clip records written by 1.5
+
+Alongside each clip_XXmYYs.txt, 1.5 saves clip_XXmYYs.json:
+    {
+      "possession": "Blue",
+      "summary": "Blue team builds from the back",
+      "actions": ["passing", "build-up"],
+      "events": [{"offset_seconds": 8, "type": "shot", "team": "Blue",
+                  "description": "shot from the edge of the box"}],
+      "confidence": 0.8
+    }
+Offsets are relative to the clip; 1.6 turns them into match time when it
+builds the timeline store (timeline_store.py). The .txt is rendered from the
+record in the old "[Color] team [action]. Key events: 00:08 ..." format so
+text consumers keep working.
+"""
+
+import json
+import re
+from difflib import SequenceMatcher
+
+# The 2.6 event types plus the other set pieces 1.5 is asked to report
+EVENT_TYPES = ('goal', 'shot', 'save', 'foul', 'card', 'penalty', 'corner', 'free_kick', 'goal_kick',
+               'throw_in', 'offside', 'kick_off', 'turnover', 'substitution', 'other')
+
+# Free-text keyword -> event type, longest phrases first ("goal kick" before "goal")
+EVENT_KEYWORDS = (
+    ('goal kick', 'goal_kick'), ('free kick', 'free_kick'), ('free-kick', 'free_kick'),
+    ('kick-off', 'kick_off'), ('kick off', 'kick_off'), ('throw-in', 'throw_in'), ('throw in', 'throw_in'),
+    ('penalty', 'penalty'), ('corner', 'corner'), ('offside', 'offside'), ('yellow card', 'card'),
+    ('red card', 'card'), ('booked', 'card'), ('substitut', 'substitution'), ('foul', 'foul'),
+    ('save', 'save'), ('interception', 'turnover'), ('intercept', 'turnover'), ('tackle', 'turnover'),
+    ('shot', 'shot'), ('header', 'shot'), ('scores', 'goal'), ('goal', 'goal'),
+)
+
+# Gemini responseSchema for one record (OpenAPI subset)
+RECORD_SCHEMA = {
+    "type": "OBJECT",
+    "properties": {
+        "possession": {"type": "STRING"},
+        "summary": {"type": "STRING"},
+        "actions": {"type": "ARRAY", "items": {"type": "STRING"}},
+        "events": {
+            "type": "ARRAY",
+            "items": {
+                "type": "OBJECT",
+                "properties": {
+                    "offset_seconds": {"type": "NUMBER"},
+                    "type": {"type": "STRING", "enum": list(EVENT_TYPES)},
+                    "team": {"type": "STRING"},
+                    "description": {"type": "STRING"},
+                },
+                "required": ["offset_seconds", "type", "description"],
+            },
+        },
+        "confidence": {"type": "NUMBER"},
+    },
+    "required": ["possession", "summary", "events", "confidence"],
+}
+
+BATCH_SCHEMA = {
+    "type": "ARRAY",
+    "items": {
+        **RECORD_SCHEMA,
+        "properties": {"clip_start": {"type": "STRING"}, **RECORD_SCHEMA["properties"]},
+        "required": ["clip_start"] + RECORD_SCHEMA["required"],
+    },
+}
+
+RECORD_INSTRUCTIONS = """Return ONLY a JSON object:
+{"possession": "<primary color of the team in possession, or none>",
+ "summary": "<[Color] team [main action] - one sentence, no event timings>",
+ "actions": ["<main actions: passing, defending, attacking, set piece, throw-in ...>"],
+ "events": [{"offset_seconds": <seconds from the start of this clip>, "type": "<""" + "|".join(EVENT_TYPES) + """>",
+             "team": "<color>", "description": "<what happened>"}],
+ "confidence": <0.0-1.0, how clearly the clip shows what you describe>}
+Only list events that CLEARLY occur; "events" is usually empty."""
+
+
+def classify_event(text: str) -> str:
+    """Event type for a free-text event description"""
+    text = text.lower()
+    return next((event_type for keyword, event_type in EVENT_KEYWORDS if keyword in text), 'other')
+
+
+def same_event(a: dict, b: dict) -> bool:
+    """Two reports of one event: same type (or, for 'other', similar wording)"""
+    if a["type"] != b["type"]:
+        return False
+    if a["type"] != 'other':
+        return True
+    return SequenceMatcher(None, a["description"].lower(), b["description"].lower()).ratio() >= 0.6
+
+
+def lead_team(text: str):
+    """'Blue' from 'Blue team maintains possession...'"""
+    match = re.search(r'(\w+) team', text)
+    return match.group(1).capitalize() if match else None
+
+
+def normalize_record(data: dict, clip_seconds: float = None) -> dict:
+    """Clean up a model answer into the record layout above; raises ValueError if it isn't one"""
+    if not isinstance(data, dict) or not str(data.get("summary") or "").strip():
+        raise ValueError("record has no summary")
+
+    events = []
+    for event in data.get("events") or []:
+        if not isinstance(event, dict) or not str(event.get("description") or "").strip():
+            continue
+        try:
+            offset = max(0.0, float(event.get("offset_seconds", 0)))
+        except (TypeError, ValueError):
+            continue
+        if clip_seconds:
+            offset = min(offset, float(clip_seconds))
+        event_type = str(event.get("type") or "").lower().replace(' ', '_').replace('-', '_')
+        description = str(event["description"]).strip()
+        events.append({
+            "offset_seconds": round(offset, 1),
+            "type": event_type if event_type in EVENT_TYPES else classify_event(description),
+            "team": str(event.get("team") or "").strip() or None,
+            "description": description,
+        })
+
+    try:
+        confidence = min(1.0, max(0.0, float(data.get("confidence", 0.5))))
+    except (TypeError, ValueError):
+        confidence = 0.5
+    possession = str(data.get("possession") or "").strip()
+    return {
+        "possession": None if possession.lower() in ("", "none", "unknown") else possession,
+        "summary": str(data["summary"]).strip(),
+        "actions": [str(action).strip() for action in data.get("actions") or [] if str(action).strip()],
+        "events": sorted(events, key=lambda e: e["offset_seconds"]),
+        "confidence": round(confidence, 2),
+    }
+
+
+def parse_record(text: str, clip_seconds: float = None) -> dict:
+    """Record from a JSON model answer (tolerates ```json fences)"""
+    text = text.strip()
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json').strip()
+    try:
+        data = json.loads(text)
+    except json.JSONDecodeError as e:
+        raise ValueError(f"not JSON: {e}")
+    return normalize_record(data, clip_seconds)
+
+
+def record_from_text(description: str) -> dict:
+    """Best-effort record for a free-text description (matches analyzed before records existed)"""
+    events = []
+    for match in re.finditer(r'00:(\d{2})\s*[-–]?\s*(.*?)(?=\s*(?:[,;.]|00:\d{2}|$))', description):
+        text = match.group(2).strip()
+        if text:
+            events.append({"offset_seconds": float(match.group(1)), "type": classify_event(text),
+                           "team": lead_team(text), "description": text})
+    summary = re.split(r'\.\s*Key events:|Key events:', description)[0].strip().rstrip('.')
+    return {
+        "possession": lead_team(description),
+        "summary": summary or description,
+        "actions": [],
+        "events": events,
+        "confidence": None,
+    }
+
+
+def record_to_text(record: dict) -> str:
+    """Render a record in the free-text format 1.6 and the text prompts expect"""
+    text = record["summary"].rstrip('.')
+    if record["events"]:
+        events = ", ".join(f"00:{int(e['offset_seconds']):02d} {e['description']}" for e in record["events"])
+        text += f". Key events: {events}"
+    return text
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+Streaming clip segmenter shared by 1.4_make_clips and 1.5_analyze_clips
+
+Runs one stream-copy `ffmpeg -f segment` pass and reports every segment the
+moment ffmpeg closes it, using the CSV segment list written to stdout
+(`-segment_list pipe:1`). Each line carries the segment's real start/end time,
+so callers can start uploading/analyzing clip 0 while ffmpeg is still cutting
+clip 300.
+"""
+
+import json
+import os
+import subprocess
+import tempfile
+import threading
+from pathlib import Path
+
+from stage_journal import atomic_write_json
+
+SEGMENT_SECONDS = 15
+
+
+def clip_stem(start_seconds: float) -> str:
+    """Time-based clip name used across the pipeline: 330 -> clip_05m30s"""
+    start_seconds = int(start_seconds)
+    return f"clip_{start_seconds // 60:02d}m{start_seconds % 60:02d}s"
+
+
+def grid_slot(start_seconds: float, segment_seconds=SEGMENT_SECONDS) -> int:
+    """Index of the segment_seconds slot a clip starting at start_seconds is named after"""
+    return int((start_seconds + 0.0005) // segment_seconds)
+
+
+def _segment_command(source, clips_dir, segment_seconds, use_gpu):
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error']
+    if use_gpu:
+        cmd += ['-hwaccel', 'cuda']
+    cmd += [
+        '-i', str(source),
+        '-f', 'segment',
+        '-segment_time', str(segment_seconds),
+        '-segment_format', 'mp4',
+        '-segment_list', 'pipe:1',       # one CSV line per finished segment
+        '-segment_list_type', 'csv',
+        '-c', 'copy',
+        '-reset_timestamps', '1',
+        '-segment_start_number', '0',
+        '-y',
+        str(Path(clips_dir) / 'temp_clip_%04d.mp4'),
+    ]
+    return cmd
+
+
+def _pump(feed, stdin):
+    """Run `feed(stdin)` and close ffmpeg's stdin; ffmpeg exiting early just ends the feed"""
+    try:
+        feed(stdin)
+    except (BrokenPipeError, ValueError):
+        pass
+    finally:
+        try:
+            stdin.close()
+        except BrokenPipeError:
+            pass
+
+
+def stream_segments(video_path, clips_dir, segment_seconds=SEGMENT_SECONDS, feed=None):
+    """Yield one dict per finished clip: filename, path, index, start_seconds, end_seconds
+
+    Clips are renamed to the clip_XXmYYs.mp4 layout as soon as ffmpeg reports
+    them. Tries GPU decode first and falls back to CPU if ffmpeg fails before
+    producing anything.
+
+    With `feed`, ffmpeg reads the video from stdin instead of `video_path` and
+    `feed(stdin)` is called on a thread to write the bytes (e.g. while they are
+    still downloading). A feed cannot be replayed, so there is no GPU retry.
+    """
+    clips_dir = Path(clips_dir)
+    clips_dir.mkdir(parents=True, exist_ok=True)
+
+    for use_gpu in ((False,) if feed else (True, False)):
+        produced = 0
+        with tempfile.TemporaryFile(mode='w+b') as stderr_file:
+            proc = subprocess.Popen(
+                _segment_command('pipe:0' if feed else video_path, clips_dir, segment_seconds, use_gpu),
+                stdin=subprocess.PIPE if feed else subprocess.DEVNULL,
+                stdout=subprocess.PIPE, stderr=stderr_file,
+            )
+            if feed:
+                threading.Thread(target=_pump, args=(feed, proc.stdin), daemon=True).start()
+            try:
+                for line in proc.stdout:
+                    line = line.decode().strip()
+                    if not line:
+                        continue
+                    name, start, end = line.rsplit(',', 2)
+                    start, end = float(start), float(end)
+
+                    # Name by the 15s slot the real (keyframe) start falls in, not the
+                    # segment counter - a long GOP must not shift every later name
+                    index = grid_slot(start, segment_seconds)
+                    final_path = clips_dir / f"{clip_stem(index * segment_seconds)}.mp4"
+                    os.replace(clips_dir / name, final_path)
+                    produced += 1
+
+                    yield {
+                        "filename": final_path.name,
+                        "path": final_path,
+                        "index": index,
+                        "start_seconds": start,
+                        "end_seconds": end,
+                    }
+            finally:
+                if proc.poll() is None:
+                    proc.stdout.close()
+                    proc.wait()
+
+            returncode = proc.wait()
+            if returncode == 0:
+                return
+            stderr_file.seek(0)
+            error = stderr_file.read().decode(errors='replace').strip()
+
+        if produced or not use_gpu:
+            raise subprocess.CalledProcessError(returncode, 'ffmpeg segment', stderr=error)
+        print("⚠️  GPU segmentation failed, retrying on CPU...")
+
+
+def write_segments_json(clips_dir, clips, video_duration, segment_seconds=SEGMENT_SECONDS, **extra):
+    """Record real clip boundaries in 1.4_clips/segments.json (same layout as the parallel path)"""
+    clips = sorted(clips, key=lambda c: c["start_seconds"])
+    info = {
+        "total_clips": len(clips),
+        "clip_duration_seconds": segment_seconds,
+        "processing_duration_seconds": video_duration,
+        "video_duration_seconds": video_duration,
+        "keyframe_aligned": True,  # ffmpeg reported where each stream-copy segment really starts
+        "clips": [
+            {
+                "filename": clip["filename"],
+                "nominal_start_seconds": clip["index"] * segment_seconds,
+                "start_seconds": round(clip["start_seconds"], 3),
+                "end_seconds": round(clip["end_seconds"], 3),
+                "duration": round(clip["end_seconds"] - clip["start_seconds"], 3),
+                "timestamp": clip_stem(clip["start_seconds"]).replace('clip_', '').replace('m', ':').rstrip('s'),
+            }
+            for clip in clips
+        ],
+        **extra,
+    }
+    atomic_write_json(Path(clips_dir) / "segments.json", info)
+    return info
+
+
+def load_segments(clips_dir) -> dict:
+    """segments.json clip records keyed by clip stem (clip_05m00s); empty if there is no file"""
+    segments_path = Path(clips_dir) / "segments.json"
+    if not segments_path.exists():
+        return {}
+    try:
+        with open(segments_path) as f:
+            info = json.load(f)
+    except (json.JSONDecodeError, OSError):
+        return {}
+    return {Path(clip["filename"]).stem: clip for clip in info.get("clips", [])}
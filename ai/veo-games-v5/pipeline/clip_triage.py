@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+"""
+Clip Triage - cheap CPU activity scores for 1.4_clips
+
+Decodes the match video once as a tiny grayscale stream (2 fps, 64x36) plus
+8kHz mono audio, and gives every clip in segments.json:
+- motion: mean absolute frame difference (camera pans and players moving)
+- audio_rms: loudness (whistles, shouting, crowd)
+- score: 0-1 activity relative to this match's median clip (median clip = 0.5)
+
+When given a sprites_dir the same decode also makes the player's scrubber
+sprite sheets (video_thumbnails.py), which 3.15 then reuses.
+
+Warm-up, half-time and long stoppages score low, so 1.5 can skip them, send
+them to a cheaper model or analyze them last (--triage skip|cheap|last).
+
+1.4 runs this after cutting clips; it can also be run on its own:
+    python3 clip_triage.py <match-id>
+"""
+
+import os
+import sys
+import json
+import time
+import threading
+import subprocess
+from pathlib import Path
+from statistics import median
+
+import numpy as np
+
+from stage_journal import atomic_write_json
+from video_thumbnails import sprite_filter, sprite_output_args, record_sprites
+
+TRIAGE_FPS = 2
+FRAME_WIDTH, FRAME_HEIGHT = 64, 36
+AUDIO_RATE = 8000
+MOTION_WEIGHT, AUDIO_WEIGHT = 0.7, 0.3
+DEFAULT_THRESHOLD = 0.2
+
+
+def _decode_command(video_path, audio_fd=None, sprites_dir=None):
+    activity = f'fps={TRIAGE_FPS},scale={FRAME_WIDTH}:{FRAME_HEIGHT},format=gray'
+    cmd = ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-i', str(video_path)]
+    if sprites_dir is None:
+        cmd += ['-map', '0:v:0', '-vf', activity, '-f', 'rawvideo', 'pipe:1']
+    else:
+        # Same decoded frames also feed the player's scrubber sprite sheets
+        cmd += ['-filter_complex', f'[0:v:0]split=2[activity_in][sprites_in];[activity_in]{activity}[activity];'
+                + sprite_filter('sprites_in', 'sprites'),
+                '-map', '[activity]', '-f', 'rawvideo', 'pipe:1'] + sprite_output_args('sprites', sprites_dir)
+    if audio_fd is not None:
+        cmd += ['-map', '0:a:0', '-ac', '1', '-ar', str(AUDIO_RATE), '-f', 's16le', f'pipe:{audio_fd}']
+    return cmd
+
+
+def decode_activity(video_path, with_audio=True, sprites_dir=None):
+    """One decode pass -> (per-frame motion array at TRIAGE_FPS, int16 audio samples or None)
+
+    With sprites_dir the same pass also writes video_thumbnails sprite sheets there.
+    """
+    frame_bytes = FRAME_WIDTH * FRAME_HEIGHT
+    motion = []
+    audio_chunks = []
+    audio_read, audio_write = os.pipe() if with_audio else (None, None)
+
+    proc = subprocess.Popen(
+        _decode_command(video_path, audio_write, sprites_dir),
+        stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+        pass_fds=(audio_write,) if with_audio else (),
+    )
+
+    reader = None
+    if with_audio:
+        os.close(audio_write)  # ffmpeg holds the write end now
+
+        def read_audio():
+            with os.fdopen(audio_read, 'rb') as f:
+                for chunk in iter(lambda: f.read(1 << 16), b''):
+                    audio_chunks.append(chunk)
+
+        reader = threading.Thread(target=read_audio, daemon=True)
+        reader.start()
+
+    previous = None
+    while True:
+        raw = proc.stdout.read(frame_bytes)
+        if len(raw) < frame_bytes:
+            break
+        frame = np.frombuffer(raw, dtype=np.uint8).astype(np.int16)
+        motion.append(0.0 if previous is None else float(np.abs(frame - previous).mean()) / 255.0)
+        previous = frame
+
+    stderr = proc.stderr.read().decode(errors='replace')
+    returncode = proc.wait()
+    if reader:
+        reader.join()
+
+    if returncode != 0:
+        if with_audio and not motion:
+            # Most likely no audio stream - try again with video only
+            return decode_activity(video_path, with_audio=False, sprites_dir=sprites_dir)
+        raise subprocess.CalledProcessError(returncode, 'ffmpeg triage decode', stderr=stderr)
+
+    audio = np.frombuffer(b''.join(audio_chunks), dtype=np.int16) if audio_chunks else None
+    return np.array(motion), audio
+
+
+def score_clips(clips, motion, audio):
+    """Add a "triage" dict to each segments.json clip record"""
+    for clip in clips:
+        start, end = clip["start_seconds"], clip["end_seconds"]
+        frames = motion[int(start * TRIAGE_FPS) + 1:max(int(end * TRIAGE_FPS), int(start * TRIAGE_FPS) + 2)]
+        clip_motion = float(frames.mean()) if len(frames) else 0.0
+
+        clip_audio = 0.0
+        if audio is not None:
+            samples = audio[int(start * AUDIO_RATE):int(end * AUDIO_RATE)].astype(np.float64)
+            if len(samples):
+                clip_audio = float(np.sqrt(np.mean(samples ** 2))) / 32768.0
+
+        clip["triage"] = {"motion": round(clip_motion, 5), "audio_rms": round(clip_audio, 5)}
+
+    # Relative to the match's own median so lighting, camera and pitch don't matter
+    median_motion = median(c["triage"]["motion"] for c in clips) or 1e-9
+    median_audio = median(c["triage"]["audio_rms"] for c in clips) or 1e-9
+    for clip in clips:
+        t = clip["triage"]
+        motion_part = min(t["motion"] / median_motion / 2, 1.0)
+        audio_part = min(t["audio_rms"] / median_audio / 2, 1.0) if audio is not None else motion_part
+        t["score"] = round(MOTION_WEIGHT * motion_part + AUDIO_WEIGHT * audio_part, 3)
+    return clips
+
+
+def triage_clips(match_id: str, clips_dir: Path = None, video_path: Path = None, sprites_dir: Path = None) -> bool:
+    """Score every clip in segments.json and write the scores back into it (plus scrubber sprites into sprites_dir)"""
+    data_dir = Path("../outputs") / match_id
+    clips_dir = clips_dir or data_dir / "1.4_clips"
+    video_path = video_path or data_dir / "video.mp4"
+    segments_path = clips_dir / "segments.json"
+
+    if not segments_path.exists() or not video_path.exists():
+        print(f"❌ Triage needs {segments_path} and {video_path}")
+        return False
+
+    print(f"🔎 Triage: scoring clip activity ({TRIAGE_FPS}fps {FRAME_WIDTH}x{FRAME_HEIGHT} grayscale + {AUDIO_RATE}Hz audio)")
+    start_time = time.time()
+
+    with open(segments_path, 'r') as f:
+        info = json.load(f)
+
+    if sprites_dir:
+        sprites_dir.mkdir(parents=True, exist_ok=True)
+    try:
+        motion, audio = decode_activity(video_path, sprites_dir=sprites_dir)
+    except subprocess.CalledProcessError as e:
+        print(f"❌ Triage decode failed: {(e.stderr or '').strip()[-300:]}")
+        return False
+    if sprites_dir:
+        sprites = record_sprites(sprites_dir, video_path, len(motion) / TRIAGE_FPS)
+        print(f"🖼️  Scrubber sprites from the same decode: {sprites['sheets']} sheets in {sprites_dir}")
+
+    score_clips(info["clips"], motion, audio)
+    info["triage"] = {
+        "fps": TRIAGE_FPS,
+        "frame_size": f"{FRAME_WIDTH}x{FRAME_HEIGHT}",
+        "audio": audio is not None,
+        "default_threshold": DEFAULT_THRESHOLD,
+        "seconds": round(time.time() - start_time, 1),
+    }
+
+    atomic_write_json(segments_path, info)
+
+    quiet = sum(1 for c in info["clips"] if c["triage"]["score"] < DEFAULT_THRESHOLD)
+    print(f"✅ Triage complete in {info['triage']['seconds']}s: "
+          f"{quiet}/{len(info['clips'])} clips below {DEFAULT_THRESHOLD} (likely dead ball)")
+    return True
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print("Usage: python3 clip_triage.py <match-id>")
+        sys.exit(1)
+    if not triage_clips(sys.argv[1]):
+        sys.exit(1)
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Map-reduce event synthesis for 2.5 and 2.6
+
+The single-call prompts cut the 1.6 timeline at 100,000 characters, so long
+matches and extra time silently lost their final minutes, and the whole match
+waited on one huge call. In map-reduce mode:
+- map:    the timeline is split into 10 minute windows overlapping by 1 minute
+          (range queries on the 1.6 timeline store, timeline_store.py), and
+          events are extracted from every window concurrently, each window
+          seeing only the VEO goals/shots that fall inside it
+- reduce: no model call - window answers are parsed, events reported by two
+          overlapping windows are de-duplicated, and the result is reconciled
+          with VEO: exactly one GOAL per VEO goal, other "goals" become SHOTs,
+          and VEO goals/shots no window reported are added
+The summary and tactical sections are then written from the merged event list,
+which stays small however long the match is.
+
+`auto` (the default) keeps the single call while the timeline fits, and
+switches to map-reduce where the old prompt would have truncated it.
+"""
+
+import os
+import re
+import asyncio
+
+from timeline_store import duplicate_events
+
+SYNTHESIS_MODES = ('auto', 'single', 'mapreduce')
+SINGLE_CALL_CHARS = 100000
+
+WINDOW_SECONDS = 600
+OVERLAP_SECONDS = 60
+
+# VEO marks the start of the attack; the finish lands up to ~45s later
+GOAL_BEFORE_SECONDS = 5
+GOAL_AFTER_SECONDS = 45
+SHOT_AFTER_SECONDS = 35
+
+# "36:45 - GOAL: Team - Description [→ OUTCOME: ...]"
+EVENT_LINE = re.compile(r'^\s*[-*]?\s*(\d+):(\d{2})\s*-\s*([A-Z][A-Z \-]*?)\s*:\s*(.+?)\s+-\s+(.+)$')
+
+
+def synthesis_mode(timeline: str, requested: str = None) -> str:
+    """'single' or 'mapreduce' for this timeline (requested mode, else CLANN_SYNTHESIS, else auto)"""
+    mode = requested or os.getenv('CLANN_SYNTHESIS', 'auto')
+    if mode not in SYNTHESIS_MODES:
+        raise ValueError(f"Unknown synthesis mode '{mode}' (use {', '.join(SYNTHESIS_MODES)})")
+    if mode == 'auto':
+        return 'mapreduce' if len(timeline) > SINGLE_CALL_CHARS else 'single'
+    return mode
+
+
+def format_seconds(seconds) -> str:
+    seconds = int(seconds)
+    return f"{seconds // 60:02d}:{seconds % 60:02d}"
+
+
+def veo_goals_and_shots(veo_data: dict) -> tuple:
+    """VEO goals and shots as [{time, seconds, type}] (tag slugs also match localized event names)"""
+    goals, shots = [], []
+    for event in veo_data.get('events', []):
+        slugs = {tag.get('slug') for tag in event.get('tags', [])}
+        event_info = {'time': event['timestamp'], 'seconds': event['timestamp_seconds'], 'type': event['event_type']}
+        if event['event_type'] == 'Goal' or 'goal' in slugs:
+            goals.append(event_info)
+        elif event['event_type'] == 'Shot on goal' or 'shot-on-goal' in slugs:
+            shots.append(event_info)
+    return goals, shots
+
+
+def split_timeline(store, window_seconds=WINDOW_SECONDS, overlap_seconds=OVERLAP_SECONDS) -> list:
+    """Overlapping windows of the timeline store: [{start, end, text}], text from a range query"""
+    if not store.rows:
+        return []
+
+    last = store.rows[-1]["start_seconds"]
+    stride = window_seconds - overlap_seconds
+    windows = []
+    start = 0
+    while True:
+        end = start + window_seconds
+        text = store.timeline_text(start, end)
+        if text:
+            windows.append({"start": start, "end": end, "text": text})
+        if end > last:
+            return windows
+        start += stride
+
+
+def window_veo(events: list, window: dict, after_seconds=GOAL_AFTER_SECONDS) -> list:
+    """VEO events whose play falls inside the window"""
+    return [e for e in events if window["start"] - after_seconds <= e['seconds'] < window["end"]]
+
+
+async def _map(client, model, prompts):
+    return await asyncio.gather(*(client.agenerate_text(model, prompt) for prompt in prompts))
+
+
+def run_map(client, model, prompts: list) -> list:
+    """All window prompts concurrently through the shared client; raises if any window fails"""
+    return client.run(_map(client, model, prompts))
+
+
+def parse_events(text: str) -> list:
+    """Event lines from a window answer; anything that isn't one is ignored"""
+    events = []
+    for line in text.splitlines():
+        match = EVENT_LINE.match(line.strip().strip('`'))
+        if match:
+            events.append({
+                "seconds": int(match.group(1)) * 60 + int(match.group(2)),
+                "type": match.group(3).strip().upper(),
+                "team": match.group(4).strip(),
+                "description": match.group(5).strip(),
+            })
+    return events
+
+
+def merge_windows(windows: list, answers: list) -> tuple:
+    """Events from every window answer, minus copies reported by an overlapping window"""
+    events = []
+    for index, answer in enumerate(answers):
+        events += [{**event, "window": index} for event in parse_events(answer)]
+    drops = duplicate_events(events, [(w["start"], w["end"]) for w in windows])
+    merged = [event for i, event in enumerate(events) if i not in drops]
+    return sorted(merged, key=lambda e: e["seconds"]), len(drops)
+
+
+def _nearest_team(events, seconds):
+    teamed = [e for e in events if e["team"] and abs(e["seconds"] - seconds) <= GOAL_AFTER_SECONDS]
+    return min(teamed, key=lambda e: abs(e["seconds"] - seconds))["team"] if teamed else "Unknown"
+
+
+def reconcile_veo(events: list, veo_goals: list, veo_shots: list) -> tuple:
+    """Make the goals match VEO exactly; returns (events, report)"""
+    events = [dict(event) for event in events]
+    report = {"goals_matched": 0, "goals_promoted": 0, "goals_added": 0, "goals_demoted": 0, "shots_added": 0}
+
+    claimed = set()
+    for goal in sorted(veo_goals, key=lambda g: g['seconds']):
+        lo, hi = goal['seconds'] - GOAL_BEFORE_SECONDS, goal['seconds'] + GOAL_AFTER_SECONDS
+        in_play = [i for i, e in enumerate(events) if lo <= e["seconds"] <= hi and i not in claimed]
+        goals = [i for i in in_play if events[i]["type"] == "GOAL"]
+        shots = [i for i in in_play if events[i]["type"] == "SHOT"]
+        if goals:
+            claimed.add(goals[0])
+            report["goals_matched"] += 1
+        elif shots:
+            # The finish was reported as a shot - the last one in the attack is the goal
+            events[shots[-1]]["type"] = "GOAL"
+            claimed.add(shots[-1])
+            report["goals_promoted"] += 1
+        else:
+            events.append({"seconds": goal['seconds'], "type": "GOAL",
+                           "team": _nearest_team(events, goal['seconds']),
+                           "description": f"Goal (VEO verified at {goal['time']})"})
+            claimed.add(len(events) - 1)
+            report["goals_added"] += 1
+
+    for i, event in enumerate(events):
+        if event["type"] == "GOAL" and i not in claimed:
+            event["type"] = "SHOT"
+            report["goals_demoted"] += 1
+
+    for shot in veo_shots:
+        lo, hi = shot['seconds'] - GOAL_BEFORE_SECONDS, shot['seconds'] + SHOT_AFTER_SECONDS
+        if not any(lo <= e["seconds"] <= hi and e["type"] in ("SHOT", "GOAL") for e in events):
+            events.append({"seconds": shot['seconds'], "type": "SHOT",
+                           "team": _nearest_team(events, shot['seconds']),
+                           "description": f"Shot on goal (VEO at {shot['time']})"})
+            report["shots_added"] += 1
+
+    return sorted(events, key=lambda e: e["seconds"]), report
+
+
+def format_events(events: list) -> str:
+    return "\n".join(f"{format_seconds(e['seconds'])} - {e['type']}: {e['team']} - {e['description']}"
+                     for e in events)
+
+
+def count_events(events: list, team: str) -> dict:
+    """{TYPE: count} for one team"""
+    counts = {}
+    for event in events:
+        if event["team"].lower() == team.lower():
+            counts[event["type"]] = counts.get(event["type"], 0) + 1
+    return counts
+
+
+def synthesize_events(client, model, store, veo_goals: list, veo_shots: list, window_prompt) -> tuple:
+    """Map the timeline store's windows through `window_prompt(window, goals, shots)` and reduce
+
+    Returns (events, stats) where stats has the window count, duplicates
+    dropped, VEO reconciliation and the raw window answers.
+    """
+    windows = split_timeline(store)
+    if not windows:
+        raise ValueError("No clips in the timeline store")
+    prompts = [window_prompt(window, window_veo(veo_goals, window), window_veo(veo_shots, window, SHOT_AFTER_SECONDS))
+               for window in windows]
+    print(f"🗺️  Map: {len(windows)} windows of {WINDOW_SECONDS // 60} min "
+          f"(overlap {OVERLAP_SECONDS}s), largest prompt {max(len(p) for p in prompts):,} chars")
+    answers = run_map(client, model, prompts)
+
+    merged, duplicates = merge_windows(windows, answers)
+    events, report = reconcile_veo(merged, veo_goals, veo_shots)
+    print(f"🧮 Reduce: {len(events)} events, {duplicates} overlap duplicates dropped, VEO goals "
+          f"{report['goals_matched']} matched / {report['goals_promoted']} promoted / {report['goals_added']} added, "
+          f"{report['goals_demoted']} unverified goals → shots, {report['shots_added']} VEO shots added")
+    return events, {"windows": windows, "answers": answers, "duplicates": duplicates, "veo": report}
@@ -0,0 +1,367 @@
+#!/usr/bin/env python3
+"""
+Fake Gemini HTTP server for exercising gemini_client.py offline
+
+Implements the handful of REST endpoints the pipeline uses:
+- POST   /upload/v1beta/files                      resumable upload start
+- POST   /upload/v1beta/files/session/<id>         upload + finalize
+- GET    /v1beta/files/<id>                         PROCESSING -> ACTIVE
+- DELETE /v1beta/files/<id>
+- POST   /v1beta/cachedContents                     context cache (DELETE to drop)
+- POST   /v1beta/models/<model>:generateContent
+
+and can misbehave on purpose: per-call latency (normal, lognormal or exponential
+around --latency-ms, or the latency recorded with a replayed answer), random
+429/503 responses, and a requests-per-minute ceiling that answers 429 like the
+real quota does. --seed makes the latency and failure draws repeatable.
+
+--replay answers from recorded responses (JSON lines, as written by
+gemini_client.py with CLANN_GEMINI_RECORD=<path>, or built by
+benchmark_offline.py from a match's outputs):
+    {"prompt": "<start of the request text>", "videos": 1, "structured": false,
+     "text": "<answer>", "seconds": 1.8}
+Video requests get a recorded clip answer (text entries are turned into clip
+records when a responseSchema is asked for); text requests get the entry whose
+prompt is the longest prefix of theirs. Anything without a match gets the
+default reply.
+
+Batched 1.5 requests ("CLIP MM:SS (N seconds)" markers before each video, JSON
+response type) get a JSON array with one entry per marker; --batch-miss-rate
+leaves clips out of it so the single-clip fallback gets exercised. Requests with
+a responseSchema get structured clip records (clip_records.py) instead of text.
+
+usageMetadata reports prompt tokens (text/4 + 263 per video second, assuming
+15s clips) and cachedContentTokenCount for a cachedContent reference or for a
+systemInstruction seen before (implicit prefix caching). --prefill-ms-per-1k
+adds latency per uncached prompt token, so prefix caching shows up in time to
+answer as well as in tokens.
+
+Usage:
+    python3 fake_gemini_server.py --port 8089 --latency-ms 800 --rate-429 0.05 --rpm 300
+    python3 fake_gemini_server.py --replay recorded.jsonl --latency-dist replay --seed 7
+    GEMINI_API_BASE=http://127.0.0.1:8089 GEMINI_API_KEY=fake python3 1.5_analyze_clips.py <match-id>
+"""
+
+import os
+import re
+import json
+import math
+import time
+import uuid
+import random
+import argparse
+import threading
+from collections import deque
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+from clip_records import record_from_text
+
+DEFAULT_REPLY = "Blue team maintains possession in midfield."
+CLIP_MARKER = re.compile(r'^CLIP (\d+:\d{2}) \(')
+VIDEO_TOKENS = 15 * 263
+LATENCY_DISTRIBUTIONS = ("normal", "lognormal", "exponential", "replay")
+# Shortest shared prompt start that counts as a replay match for text requests
+MIN_REPLAY_PREFIX = 24
+
+
+class FakeGeminiState:
+    """Shared server state and failure settings"""
+
+    def __init__(self, latency_ms=200, jitter_ms=100, rate_429=0.0, rate_503=0.0,
+                 rpm=0, processing_seconds=0.5, reply=DEFAULT_REPLY, per_video_ms=0, batch_miss_rate=0.0,
+                 prefill_ms_per_1k=0, cache_min_tokens=1024, latency_dist="normal", seed=None, replay=None):
+        if latency_dist not in LATENCY_DISTRIBUTIONS:
+            raise ValueError(f"Unknown latency distribution '{latency_dist}' (use {', '.join(LATENCY_DISTRIBUTIONS)})")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.rate_429 = rate_429
+        self.rate_503 = rate_503
+        self.rpm = rpm
+        self.processing_seconds = processing_seconds
+        self.reply = reply
+        self.per_video_ms = per_video_ms
+        self.batch_miss_rate = batch_miss_rate
+        self.prefill_ms_per_1k = prefill_ms_per_1k
+        self.cache_min_tokens = cache_min_tokens
+        self.latency_dist = latency_dist
+        self.random = random.Random(seed)
+        self.replay = load_replay(replay) if isinstance(replay, str) else list(replay or [])
+        self.lock = threading.Lock()
+        self.files = {}       # file id -> ready_at
+        self.sessions = {}    # upload session id -> display name
+        self.cached = {}      # cachedContents id -> token count
+        self.prefixes = set()  # systemInstruction texts already seen
+        self.recent = deque()  # generateContent timestamps for the rpm window
+        self.counts = {"generate": 0, "uploads": 0, "429": 0, "503": 0, "in_flight": 0, "peak_in_flight": 0,
+                       "prompt_tokens": 0, "cached_tokens": 0, "generate_seconds": 0.0, "replayed": 0}
+
+    def base_latency_ms(self, entry=None):
+        """One draw from the configured latency distribution"""
+        if self.latency_dist == "replay" and entry and entry.get("seconds") is not None:
+            return entry["seconds"] * 1000
+        with self.lock:
+            if self.latency_dist == "lognormal" and self.latency_ms > 0:
+                # latency_ms is the median; jitter_ms / latency_ms sets how long the tail is
+                return self.random.lognormvariate(math.log(self.latency_ms), self.jitter_ms / self.latency_ms)
+            if self.latency_dist == "exponential" and self.latency_ms > 0:
+                return self.random.expovariate(1 / self.latency_ms)
+            return max(0.0, self.random.gauss(self.latency_ms, self.jitter_ms))
+
+    def pick_replay(self, text, videos, structured):
+        """Recorded answer for a request, or None"""
+        if videos:
+            # One-clip answers only; batch replies are rebuilt per CLIP marker
+            clips = [e for e in self.replay if e.get("videos") == 1]
+            candidates = [e for e in clips if bool(e.get("structured")) == structured] or clips
+        else:
+            best = MIN_REPLAY_PREFIX
+            candidates = []
+            for entry in self.replay:
+                if entry.get("videos"):
+                    continue
+                prompt = entry.get("prompt", "")
+                shared = len(os.path.commonprefix([prompt, text]))
+                # A prompt that is a full prefix of the request beats a longer partial overlap
+                score = shared + (len(text) if shared == len(prompt) else 0)
+                if score > best:
+                    best, candidates = score, [entry]
+                elif score == best:
+                    candidates.append(entry)
+        if not candidates:
+            return None
+        with self.lock:
+            self.counts["replayed"] += 1
+            return self.random.choice(candidates)
+
+    def over_rpm(self):
+        if not self.rpm:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            while self.recent and now - self.recent[0] > 60:
+                self.recent.popleft()
+            if len(self.recent) >= self.rpm:
+                return True
+            self.recent.append(now)
+            return False
+
+
+class FakeGeminiHandler(BaseHTTPRequestHandler):
+    server_version = "FakeGemini/1.0"
+
+    def log_message(self, format, *args):
+        pass  # keep benchmark output readable
+
+    @property
+    def state(self) -> FakeGeminiState:
+        return self.server.state
+
+    def _send_json(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        return self.rfile.read(length) if length else b''
+
+    def _file_resource(self, file_id):
+        ready = time.monotonic() >= self.state.files[file_id]
+        return {
+            "name": f"files/{file_id}",
+            "uri": f"http://{self.headers.get('Host')}/v1beta/files/{file_id}",
+            "mimeType": "video/mp4",
+            "state": "ACTIVE" if ready else "PROCESSING",
+        }
+
+    def do_POST(self):
+        body = self._read_body()
+        path = self.path.split('?')[0]
+
+        if path == '/upload/v1beta/files':
+            session_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.sessions[session_id] = json.loads(body or b'{}').get("file", {}).get("display_name")
+            upload_url = f"http://{self.headers.get('Host')}/upload/v1beta/files/session/{session_id}"
+            return self._send_json(200, {}, {'X-Goog-Upload-URL': upload_url})
+
+        if path.startswith('/upload/v1beta/files/session/'):
+            file_id = uuid.uuid4().hex[:12]
+            with self.state.lock:
+                self.state.files[file_id] = time.monotonic() + self.state.processing_seconds
+                self.state.counts["uploads"] += 1
+            return self._send_json(200, {"file": self._file_resource(file_id)})
+
+        if path == '/v1beta/cachedContents':
+            request = json.loads(body or b'{}')
+            tokens = _text_tokens(request.get("systemInstruction"))
+            if tokens < self.state.cache_min_tokens:
+                return self._send_json(400, {"error": {"code": 400, "status": "INVALID_ARGUMENT", "message":
+                                                       f"Cached content is too small. total_token_count={tokens}, "
+                                                       f"min_total_token_count={self.state.cache_min_tokens}"}})
+            cache_id = uuid.uuid4().hex[:12]
+            with self.state.lock:
+                self.state.cached[cache_id] = tokens
+            return self._send_json(200, {"name": f"cachedContents/{cache_id}", "model": request.get("model")})
+
+        if path.endswith(':generateContent'):
+            return self._generate(json.loads(body or b'{}'))
+
+        self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+    def _generate(self, request):
+        state = self.state
+        if state.over_rpm() or state.random.random() < state.rate_429:
+            with state.lock:
+                state.counts["429"] += 1
+            return self._send_json(429, {"error": {"code": 429, "status": "RESOURCE_EXHAUSTED"}},
+                                   {'Retry-After': '1'})
+        if state.random.random() < state.rate_503:
+            with state.lock:
+                state.counts["503"] += 1
+            return self._send_json(503, {"error": {"code": 503, "status": "UNAVAILABLE"}})
+
+        parts = [part for content in request.get("contents", []) for part in content.get("parts", [])]
+        videos = sum(1 for part in parts if "file_data" in part)
+
+        cached_tokens = 0
+        prefix_tokens = _text_tokens(request.get("systemInstruction"))
+        if "cachedContent" in request:
+            cache_id = request["cachedContent"].rsplit('/', 1)[-1]
+            if cache_id not in state.cached:
+                return self._send_json(404, {"error": {"code": 404, "status": "NOT_FOUND"}})
+            cached_tokens = prefix_tokens = state.cached[cache_id]
+        elif prefix_tokens:
+            prefix = request["systemInstruction"]["parts"][0].get("text", "")
+            with state.lock:
+                if prefix in state.prefixes:
+                    cached_tokens = prefix_tokens
+                state.prefixes.add(prefix)
+        prompt_tokens = prefix_tokens + _text_tokens({"parts": parts}) + videos * VIDEO_TOKENS
+
+        config = request.get("generationConfig", {})
+        # With a responseSchema, answer in the 1.5 clip record shape instead of free text
+        structured = "responseSchema" in config
+        text = "\n".join(part["text"] for part in parts if "text" in part)
+        entry = state.pick_replay(text, videos, structured)
+
+        with state.lock:
+            state.counts["in_flight"] += 1
+            state.counts["peak_in_flight"] = max(state.counts["peak_in_flight"], state.counts["in_flight"])
+        try:
+            latency = (state.base_latency_ms(entry) + videos * state.per_video_ms
+                       + (prompt_tokens - cached_tokens) / 1000 * state.prefill_ms_per_1k) / 1000
+            time.sleep(latency)
+        finally:
+            with state.lock:
+                state.counts["in_flight"] -= 1
+                state.counts["generate"] += 1
+                state.counts["prompt_tokens"] += prompt_tokens
+                state.counts["cached_tokens"] += cached_tokens
+                state.counts["generate_seconds"] += latency
+
+        reply = entry["text"] if entry else state.reply
+        markers = [m.group(1) for part in parts if (m := CLIP_MARKER.match(part.get("text", "")))]
+        if markers and config.get("responseMimeType") == "application/json":
+            answers = [self._clip_answer(state.pick_replay(text, 1, structured), structured) for _ in markers]
+            reply = json.dumps([{"clip_start": marker, **answer} for marker, answer in zip(markers, answers)
+                                if state.random.random() >= state.batch_miss_rate])
+        elif structured and (videos or not entry):
+            reply = json.dumps(self._clip_answer(entry, structured))
+        self._send_json(200, {
+            "candidates": [{"content": {"role": "model", "parts": [{"text": reply}]}}],
+            "usageMetadata": {"promptTokenCount": prompt_tokens, "cachedContentTokenCount": cached_tokens,
+                              "candidatesTokenCount": len(reply) // 4,
+                              "totalTokenCount": prompt_tokens + len(reply) // 4},
+        })
+
+    def _clip_answer(self, entry, structured):
+        """One clip's answer: a clip record (clip_records.py) or {"description": text}"""
+        if entry and entry.get("structured"):
+            return json.loads(entry["text"])
+        reply = entry["text"] if entry else self.state.reply
+        if not structured:
+            return {"description": reply}
+        if entry:
+            return {**record_from_text(reply), "confidence": 0.8}
+        return {"possession": reply.split()[0], "summary": reply, "actions": ["passing"], "events": [],
+                "confidence": 0.8}
+
+    def do_GET(self):
+        path = self.path.split('?')[0]
+        if path.startswith('/v1beta/files/'):
+            file_id = path.rsplit('/', 1)[-1]
+            if file_id in self.state.files:
+                return self._send_json(200, self._file_resource(file_id))
+        self._send_json(404, {"error": {"message": f"unknown path {path}"}})
+
+    def do_DELETE(self):
+        file_id = self.path.split('?')[0].rsplit('/', 1)[-1]
+        with self.state.lock:
+            self.state.files.pop(file_id, None)
+            self.state.cached.pop(file_id, None)
+        self._send_json(200, {})
+
+
+def _text_tokens(content):
+    return sum(len(part.get("text", "")) for part in (content or {}).get("parts", [])) // 4
+
+
+def load_replay(path):
+    """Recorded answers, one JSON object per line"""
+    with open(path, 'r') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def start_fake_server(port=0, **settings):
+    """Start the server on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeGeminiHandler)
+    server.daemon_threads = True
+    server.state = FakeGeminiState(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake Gemini REST server for offline pipeline runs")
+    parser.add_argument("--port", type=int, default=8089)
+    parser.add_argument("--latency-ms", type=float, default=200, help="Mean generateContent latency")
+    parser.add_argument("--jitter-ms", type=float, default=100,
+                        help="Latency spread (normal: standard deviation; lognormal: sigma = jitter / latency)")
+    parser.add_argument("--latency-dist", choices=LATENCY_DISTRIBUTIONS, default="normal",
+                        help="How per-call latency is drawn (replay = the latency recorded with the answer)")
+    parser.add_argument("--seed", type=int, default=None, help="Seed for latency, failure and replay draws")
+    parser.add_argument("--replay", default=None, help="Recorded answers to replay (JSON lines)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of calls answered 429")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Fraction of calls answered 503")
+    parser.add_argument("--rpm", type=int, default=0, help="Requests per minute before answering 429")
+    parser.add_argument("--processing-seconds", type=float, default=0.5, help="Time an upload stays PROCESSING")
+    parser.add_argument("--per-video-ms", type=float, default=0, help="Extra latency per video in a request")
+    parser.add_argument("--batch-miss-rate", type=float, default=0.0, help="Fraction of clips left out of batch answers")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0, help="Extra latency per 1k uncached prompt tokens")
+    parser.add_argument("--cache-min-tokens", type=int, default=1024, help="Smallest prefix cachedContents accepts")
+    args = parser.parse_args()
+
+    server, base_url = start_fake_server(
+        args.port, latency_ms=args.latency_ms, jitter_ms=args.jitter_ms, rate_429=args.rate_429,
+        rate_503=args.rate_503, rpm=args.rpm, processing_seconds=args.processing_seconds,
+        per_video_ms=args.per_video_ms, batch_miss_rate=args.batch_miss_rate,
+        prefill_ms_per_1k=args.prefill_ms_per_1k, cache_min_tokens=args.cache_min_tokens,
+        latency_dist=args.latency_dist, seed=args.seed, replay=args.replay,
+    )
+    print(f"🧪 Fake Gemini listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {server.state.counts}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
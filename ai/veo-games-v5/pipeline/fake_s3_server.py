@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Fake S3 server for exercising 3.5_s3_uploader.py / s3_sync.py offline
+
+Path-style subset of the S3 REST API, objects kept in memory:
+- HEAD   /<bucket>                                   bucket exists
+- PUT    /<bucket>/<key>                             put object (plain or aws-chunked body)
+- POST   /<bucket>/<key>?uploads                     start a multipart upload
+- PUT    /<bucket>/<key>?partNumber=N&uploadId=ID    upload a part
+- POST   /<bucket>/<key>?uploadId=ID                 complete (ETag = MD5 of part MD5s + "-N")
+- DELETE /<bucket>/<key>?uploadId=ID                 abort
+- HEAD / GET / DELETE /<bucket>/<key>
+- GET    /<bucket>?list-type=2&prefix=P              list objects
+
+ETags, Content-Type, Cache-Control, Content-Encoding and x-amz-meta-* headers
+come back the way S3 returns them. --latency-ms and --rate-503 add per-request
+delay and SlowDown errors. Signatures are not checked.
+
+Usage:
+    python3 fake_s3_server.py --port 9000 --bucket end-nov-webapp-clann
+    CLANN_S3_ENDPOINT=http://127.0.0.1:9000 AWS_ACCESS_KEY_ID=fake AWS_SECRET_ACCESS_KEY=fake \\
+        python3 3.5_s3_uploader.py <match-id>
+"""
+
+import re
+import time
+import uuid
+import random
+import hashlib
+import argparse
+import threading
+from urllib.parse import urlsplit, parse_qs, unquote
+from xml.sax.saxutils import escape
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+STORED_HEADERS = ("Content-Type", "Cache-Control", "Content-Encoding", "Content-Disposition")
+
+
+class FakeS3State:
+    """Buckets, objects, multipart uploads and failure settings"""
+
+    def __init__(self, buckets=(), latency_ms=0, rate_503=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.rate_503 = rate_503
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.buckets = {name: {} for name in buckets}  # bucket -> key -> object
+        self.uploads = {}                              # upload id -> {bucket, key, headers, parts}
+        self.counts = {"put": 0, "parts": 0, "head": 0, "get": 0, "list": 0, "delete": 0, "503": 0,
+                       "bytes_received": 0}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+
+class FakeS3Handler(BaseHTTPRequestHandler):
+    server_version = "FakeS3/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeS3State:
+        return self.server.state
+
+    def _parse(self):
+        url = urlsplit(self.path)
+        bucket, _, key = url.path.lstrip('/').partition('/')
+        return unquote(bucket), unquote(key), {k: v[0] for k, v in parse_qs(url.query, keep_blank_values=True).items()}
+
+    def _send(self, status, body=b'', headers=None, content_type='application/xml'):
+        self.send_response(status)
+        if (body or status not in (204, 304)) and 'Content-Type' not in (headers or {}):
+            self.send_header('Content-Type', content_type)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        if body and self.command != 'HEAD':
+            self.wfile.write(body)
+
+    def _error(self, status, code, message=""):
+        body = f"<Error><Code>{code}</Code><Message>{escape(message)}</Message></Error>".encode()
+        self._send(status, body)
+
+    def _read_body(self):
+        length = int(self.headers.get('Content-Length') or 0)
+        body = self.rfile.read(length) if length else b''
+        if self.headers.get('x-amz-content-sha256', '').startswith('STREAMING-') \
+                or 'aws-chunked' in self.headers.get('Content-Encoding', ''):
+            body = _decode_aws_chunked(body)
+        self.state.count("bytes_received", len(body))
+        return body
+
+    def _misbehave(self):
+        """Per-request latency and injected 503s; True when the request was answered with an error"""
+        state = self.state
+        if state.latency_ms:
+            time.sleep(state.latency_ms / 1000)
+        with state.lock:
+            fail = state.random.random() < state.rate_503
+        if fail:
+            state.count("503")
+            # Drain the body so the connection stays usable for the retry
+            self.rfile.read(int(self.headers.get('Content-Length') or 0))
+            self._error(503, "SlowDown", "Please reduce your request rate.")
+        return fail
+
+    def _object(self, bucket, key):
+        return self.state.buckets.get(bucket, {}).get(key)
+
+    def _object_headers(self, obj):
+        headers = {"ETag": f'"{obj["etag"]}"', "Last-Modified": obj["last_modified"]}
+        headers.update(obj["headers"])
+        return headers
+
+    def do_HEAD(self):
+        bucket, key, _ = self._parse()
+        self.state.count("head")
+        if bucket not in self.state.buckets:
+            return self._send(404)
+        if not key:
+            return self._send(200)
+        obj = self._object(bucket, key)
+        if obj is None:
+            return self._send(404)
+        self.send_response(200)
+        for name, value in self._object_headers(obj).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(obj["data"])))
+        self.end_headers()
+
+    def do_GET(self):
+        bucket, key, query = self._parse()
+        if bucket not in self.state.buckets:
+            return self._error(404, "NoSuchBucket")
+        if not key:
+            self.state.count("list")
+            prefix = query.get("prefix", "")
+            with self.state.lock:
+                items = sorted((k, o) for k, o in self.state.buckets[bucket].items() if k.startswith(prefix))
+            contents = "".join(f"<Contents><Key>{escape(k)}</Key><ETag>&quot;{o['etag']}&quot;</ETag>"
+                               f"<Size>{len(o['data'])}</Size><LastModified>{o['iso_modified']}</LastModified>"
+                               f"</Contents>" for k, o in items)
+            body = (f'<?xml version="1.0" encoding="UTF-8"?><ListBucketResult><Name>{escape(bucket)}</Name>'
+                    f"<Prefix>{escape(prefix)}</Prefix><KeyCount>{len(items)}</KeyCount>"
+                    f"<IsTruncated>false</IsTruncated>{contents}</ListBucketResult>")
+            return self._send(200, body.encode())
+        self.state.count("get")
+        obj = self._object(bucket, key)
+        if obj is None:
+            return self._error(404, "NoSuchKey")
+        self._send(200, obj["data"], self._object_headers(obj),
+                   content_type=obj["headers"].get("Content-Type", "binary/octet-stream"))
+
+    def do_PUT(self):
+        bucket, key, query = self._parse()
+        if self._misbehave():
+            return
+        if not key:
+            self._read_body()
+            with self.state.lock:
+                self.state.buckets.setdefault(bucket, {})
+            return self._send(200)
+        if bucket not in self.state.buckets:
+            self._read_body()
+            return self._error(404, "NoSuchBucket")
+        data = self._read_body()
+        etag = hashlib.md5(data).hexdigest()
+
+        if "uploadId" in query:
+            upload = self.state.uploads.get(query["uploadId"])
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            with self.state.lock:
+                upload["parts"][int(query["partNumber"])] = data
+            self.state.count("parts")
+            return self._send(200, headers={"ETag": f'"{etag}"'})
+
+        self._store(bucket, key, data, etag, self._request_headers())
+        self.state.count("put")
+        self._send(200, headers={"ETag": f'"{etag}"'})
+
+    def do_POST(self):
+        bucket, key, query = self._parse()
+        body = self._read_body()
+        if bucket not in self.state.buckets:
+            return self._error(404, "NoSuchBucket")
+
+        if "uploads" in query:
+            upload_id = uuid.uuid4().hex
+            with self.state.lock:
+                self.state.uploads[upload_id] = {"bucket": bucket, "key": key, "parts": {},
+                                                 "headers": self._request_headers()}
+            result = (f"<InitiateMultipartUploadResult><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                      f"<UploadId>{upload_id}</UploadId></InitiateMultipartUploadResult>")
+            return self._send(200, result.encode())
+
+        if "uploadId" in query:
+            with self.state.lock:
+                upload = self.state.uploads.pop(query["uploadId"], None)
+            if upload is None:
+                return self._error(404, "NoSuchUpload")
+            numbers = [int(n) for n in re.findall(rb'<PartNumber>(\d+)</PartNumber>', body)]
+            if any(n not in upload["parts"] for n in numbers):
+                return self._error(400, "InvalidPart")
+            parts = [upload["parts"][n] for n in numbers]
+            etag = f"{hashlib.md5(b''.join(hashlib.md5(p).digest() for p in parts)).hexdigest()}-{len(parts)}"
+            self._store(bucket, key, b''.join(parts), etag, upload["headers"])
+            self.state.count("put")
+            result = (f"<CompleteMultipartUploadResult><Bucket>{escape(bucket)}</Bucket><Key>{escape(key)}</Key>"
+                      f"<ETag>&quot;{etag}&quot;</ETag></CompleteMultipartUploadResult>")
+            return self._send(200, result.encode())
+
+        self._error(400, "InvalidRequest", "unsupported POST")
+
+    def do_DELETE(self):
+        bucket, key, query = self._parse()
+        self.state.count("delete")
+        with self.state.lock:
+            if "uploadId" in query:
+                self.state.uploads.pop(query["uploadId"], None)
+            else:
+                self.state.buckets.get(bucket, {}).pop(key, None)
+        self._send(204)
+
+    def _request_headers(self):
+        headers = {name: self.headers[name] for name in STORED_HEADERS if self.headers.get(name)}
+        if headers.get("Content-Encoding"):
+            # aws-chunked is transport framing, not part of the stored object
+            encodings = [e.strip() for e in headers["Content-Encoding"].split(',') if e.strip() != 'aws-chunked']
+            if encodings:
+                headers["Content-Encoding"] = ", ".join(encodings)
+            else:
+                headers.pop("Content-Encoding")
+        headers.update({name: value for name, value in self.headers.items() if name.lower().startswith('x-amz-meta-')})
+        return headers
+
+    def _store(self, bucket, key, data, etag, headers):
+        now = time.gmtime()
+        with self.state.lock:
+            self.state.buckets[bucket][key] = {
+                "data": data, "etag": etag, "headers": headers,
+                "last_modified": time.strftime("%a, %d %b %Y %H:%M:%S GMT", now),
+                "iso_modified": time.strftime("%Y-%m-%dT%H:%M:%S.000Z", now),
+            }
+
+
+def _decode_aws_chunked(body: bytes) -> bytes:
+    """Payload of an aws-chunked body ("<hex size>[;chunk-signature=...]\\r\\n<data>\\r\\n" ... "0\\r\\n<trailers>")"""
+    data = []
+    pos = 0
+    while pos < len(body):
+        line_end = body.index(b'\r\n', pos)
+        size = int(body[pos:line_end].split(b';')[0], 16)
+        if size == 0:
+            break
+        data.append(body[line_end + 2:line_end + 2 + size])
+        pos = line_end + 2 + size + 2
+    return b''.join(data)
+
+
+def start_fake_s3(port=0, **settings):
+    """Start the server on a background thread; returns (server, endpoint_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeS3Handler)
+    server.daemon_threads = True
+    server.state = FakeS3State(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake S3 server for offline upload runs")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--bucket", action="append", default=[], help="Bucket to create (repeatable)")
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every write")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Fraction of writes answered 503 SlowDown")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, endpoint = start_fake_s3(args.port, buckets=args.bucket or ["end-nov-webapp-clann"],
+                                     latency_ms=args.latency_ms, rate_503=args.rate_503, seed=args.seed)
+    print(f"🧪 Fake S3 listening on {endpoint} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {server.state.counts}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,167 @@
+#!/usr/bin/env python3
+"""
+Fake website API for exercising 3.7_api_upload.py / website_api.py offline
+
+Answers the routes 3.7 calls, like web-apps/1-clann-webapp/backend/routes/games.js:
+- POST /api/games/<id>/upload-events              (auth)
+- POST /api/games/<id>/upload-analysis-file-test
+- POST /api/games/<id>/upload-metadata            (auth)
+- POST /api/games/<id>/upload-metadata-test
+- POST /api/games/<id>/upload-tactical            (auth)
+- POST /api/games/<id>/upload-tactical-test
+- POST /api/games/<id>/upload-video               (auth)
+
+Auth routes want any "Authorization: Bearer <token>" (401 otherwise). Every
+accepted payload is kept per game and route, and repeats of an Idempotency-Key
+are counted. --latency-ms, --rate-503 and --rate-429 make it slow and flaky;
+the "connections" count shows whether clients reuse keep-alive connections.
+
+Usage:
+    python3 fake_website_api.py --port 3001 --rate-503 0.1
+    python3 3.7_api_upload.py <match-id> [<match-id> ...] http://127.0.0.1:3001 --no-auth
+"""
+
+import re
+import json
+import time
+import random
+import argparse
+import threading
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+ROUTES = {
+    "upload-events": True,
+    "upload-analysis-file-test": False,
+    "upload-metadata": True,
+    "upload-metadata-test": False,
+    "upload-tactical": True,
+    "upload-tactical-test": False,
+    "upload-video": True,
+}
+ROUTE_PATTERN = re.compile(r'^/api/games/([^/]+)/([a-z-]+)$')
+
+
+class FakeWebsiteState:
+    """Accepted uploads, request counts and failure settings"""
+
+    def __init__(self, latency_ms=0, rate_503=0.0, rate_429=0.0, seed=None):
+        self.latency_ms = latency_ms
+        self.rate_503 = rate_503
+        self.rate_429 = rate_429
+        self.random = random.Random(seed)
+        self.lock = threading.Lock()
+        self.games = {}          # game id -> route -> last payload
+        self.idempotency_keys = set()
+        self.counts = {"requests": 0, "accepted": 0, "connections": 0, "repeated_keys": 0,
+                       "401": 0, "404": 0, "429": 0, "503": 0}
+
+    def count(self, name, value=1):
+        with self.lock:
+            self.counts[name] += value
+
+
+class FakeWebsiteHandler(BaseHTTPRequestHandler):
+    server_version = "FakeWebsite/1.0"
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        pass
+
+    @property
+    def state(self) -> FakeWebsiteState:
+        return self.server.state
+
+    def setup(self):
+        # One handler per TCP connection; keep-alive requests reuse it
+        super().setup()
+        self.state.count("connections")
+
+    def _send(self, status, payload, headers=None):
+        body = json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_POST(self):
+        state = self.state
+        state.count("requests")
+        body = self.rfile.read(int(self.headers.get('Content-Length') or 0))
+        if state.latency_ms:
+            time.sleep(state.latency_ms / 1000)
+        with state.lock:
+            roll = state.random.random()
+        if roll < state.rate_429:
+            state.count("429")
+            return self._send(429, {"error": "Too many requests"}, {"Retry-After": "0"})
+        if roll < state.rate_429 + state.rate_503:
+            state.count("503")
+            return self._send(503, {"error": "Service unavailable"})
+
+        match = ROUTE_PATTERN.match(self.path)
+        if not match or match.group(2) not in ROUTES:
+            state.count("404")
+            return self._send(404, {"error": "Not found"})
+        game_id, route = match.groups()
+        authorization = self.headers.get('Authorization', '')
+        if ROUTES[route] and (not authorization.startswith('Bearer ') or authorization[7:] in ('', 'None')):
+            state.count("401")
+            return self._send(401, {"error": "Access token required"})
+        try:
+            payload = json.loads(body or b'{}')
+        except json.JSONDecodeError:
+            return self._send(400, {"error": "Invalid JSON"})
+
+        key = self.headers.get('Idempotency-Key')
+        with state.lock:
+            if key and key in state.idempotency_keys:
+                state.counts["repeated_keys"] += 1
+            elif key:
+                state.idempotency_keys.add(key)
+            state.games.setdefault(game_id, {})[route] = payload
+            state.counts["accepted"] += 1
+        self._send(200, self._response(game_id, route, payload))
+
+    def _response(self, game_id, route, payload):
+        if route in ("upload-events", "upload-analysis-file-test"):
+            return {"message": "Events uploaded successfully", "game": {"id": game_id, "events_count": 0}}
+        if route == "upload-video":
+            return {"message": "Video uploaded successfully",
+                    "game": {"id": game_id, "title": f"Game {game_id}", "s3_key": payload.get("s3Key")}}
+        return {"message": "Uploaded successfully", "game": {"id": game_id}}
+
+
+def start_fake_website(port=0, **settings):
+    """Start the server on a background thread; returns (server, base_url)"""
+    server = ThreadingHTTPServer(('127.0.0.1', port), FakeWebsiteHandler)
+    server.daemon_threads = True
+    server.state = FakeWebsiteState(**settings)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Fake website API for offline 3.7 runs")
+    parser.add_argument("--port", type=int, default=3001)
+    parser.add_argument("--latency-ms", type=float, default=0, help="Delay added to every request")
+    parser.add_argument("--rate-503", type=float, default=0.0, help="Fraction of requests answered 503")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Fraction of requests answered 429")
+    parser.add_argument("--seed", type=int, default=None)
+    args = parser.parse_args()
+
+    server, base_url = start_fake_website(args.port, latency_ms=args.latency_ms, rate_503=args.rate_503,
+                                          rate_429=args.rate_429, seed=args.seed)
+    print(f"🧪 Fake website API listening on {base_url} (Ctrl+C to stop)")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"   {server.state.counts}")
+    except KeyboardInterrupt:
+        server.shutdown()
+
+
+if __name__ == "__main__":
+    main()
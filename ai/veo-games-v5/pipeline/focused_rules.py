@@ -0,0 +1,340 @@
+#!/usr/bin/env python3
+"""
+Rule-based extraction of the 2.6 focused events from the 1.6 timeline store
+
+The 1.5 records already say "shot", "corner", "foul by the Red team", so 2.6
+doesn't need a model to find most events. For every clip in the timeline store
+(timeline_store.py):
+- its events come from a range query, already in match time. Events the model
+  typed keep their type and team (STORE_TYPES maps them onto the 7 focused
+  types: GOAL, SHOT, FOUL, CORNER, FREE KICK, GOAL KICK, TURNOVER); "other"
+  events are typed with the compiled patterns below
+- summary sentences ("Blue team wins a corner") are classified with the same
+  patterns, timed at the clip start
+- clips described before 1.5 wrote records (no confidence) only have free
+  text: their timeline text is split into clauses, each timed by its first
+  MM:SS (or the clip start), and classified with the patterns
+- a "save" or "goes wide" right after a shot becomes its OUTCOME
+- teams come from the jersey colours in 1_team_config.json ("blocked by the
+  Red team" credits the other team with the shot)
+- goals are reconciled with VEO using the map-reduce tolerance windows
+  (event_mapreduce.reconcile_veo): one GOAL per VEO goal, the rest are SHOTs
+
+Clauses the rules can't call confidently - hedged ("appears to"), negated ("no
+foul"), or with no team - go to the model in one small JSON batch. Everything
+else takes milliseconds.
+"""
+
+import re
+import json
+import time
+from collections import Counter
+
+from event_mapreduce import reconcile_veo, format_seconds
+
+FOCUSED_TYPES = ('GOAL', 'SHOT', 'FOUL', 'CORNER', 'FREE KICK', 'GOAL KICK', 'TURNOVER')
+
+# Timeline store (clip_records.EVENT_TYPES) type -> focused type; penalties are typed by their wording
+STORE_TYPES = {'goal': 'GOAL', 'shot': 'SHOT', 'foul': 'FOUL', 'card': 'FOUL', 'corner': 'CORNER',
+               'free_kick': 'FREE KICK', 'goal_kick': 'GOAL KICK', 'turnover': 'TURNOVER'}
+
+COLOURS = ('white', 'black', 'red', 'blue', 'yellow', 'green', 'orange', 'purple', 'pink', 'grey', 'gray',
+           'navy', 'maroon', 'claret', 'gold', 'amber', 'brown', 'teal', 'violet', 'sky')
+
+# Checked in this order; the first match is the clause type ("shot from a corner" is a CORNER,
+# "foul, free kick to the Red team" a FOUL)
+TYPE_PATTERNS = (
+    ('GOAL KICK', re.compile(r'\bgoal[- ]?kick', re.I)),
+    ('GOAL', re.compile(r'\bgoal (?:is )?scored|\bscores?\b|\bscoring\b|\binto the (?:back of the )?net\b|'
+                        r'\bfinds the net\b|\bnets\b|\bequali[sz]er\b', re.I)),
+    ('CORNER', re.compile(r'(?<!top )(?<!bottom )(?<!far )(?<!near )(?<!left )(?<!right )\bcorner(?:[- ]kick)?s?\b(?! of)',
+                          re.I)),
+    ('FOUL', re.compile(r'\bfoul|\byellow card|\bred card|\bbooked\b|\bcaution|\bpenalty (?:is )?(?:awarded|given)',
+                        re.I)),
+    ('FREE KICK', re.compile(r'\bfree[- ]?kick', re.I)),
+    ('SHOT', re.compile(r'\bshot\b|\bshoots?\b|\bshooting\b|\bstrike[sd]?\b|\bheader\b|\bvolley|\beffort\b|'
+                        r'\bpenalty kick\b|\bon target\b', re.I)),
+    ('TURNOVER', re.compile(r'\bintercept|\btackle|\bdispossess|\bwins? (?:the ball|possession)|'
+                            r'\b(?:regains?|recovers?|gains?) (?:the ball|possession)|\bturnover|\bloses? possession|'
+                            r'\bsteals?\b', re.I)),
+)
+
+OUTCOME_WORDS = re.compile(r'\bwide\b|\bover the (?:bar|goal|crossbar)|\bsaved?\b|\bblocked\b|\bcleared\b|'
+                           r'\bcrossbar\b|\bpost\b|\bmiss(?:es|ed)?\b|\bcaught\b', re.I)
+IGNORE = re.compile(r'warm[- ]?up|pre-match|practice|\bdrill|before the (?:match|game)|half[- ]time|training|'
+                    r'handshake|line up', re.I)
+HEDGE = re.compile(r'\b(?:appears?|seems?|possibl[ey]|likely|maybe|perhaps|unclear|potential|might|could be)\b', re.I)
+NEGATION = re.compile(r'\bno (?:foul|goal|shot|corner|free kick)|\bwithout (?:a )?(?:shot|foul)|\bnot (?:a|given)\b',
+                      re.I)
+NEW_EVENT = re.compile(r'\bsecond\b|\banother\b|\brebound\b|\bagain\b|\bfollow[- ]up\b', re.I)
+TIMESTAMP = re.compile(r'\b(\d+):(\d{2})\b')
+
+# Who does the clause credit? (pattern, credit the named colour or the other team)
+TEAM_RULES = {
+    'SHOT': ((re.compile(r'\b(?:saved|blocked|cleared|caught|stopped|deflected)\s+by\s+(?:the\s+|a\s+)?(\w+)', re.I), 'other'),),
+    'CORNER': ((re.compile(r'\bcleared\s+by\s+(?:the\s+|a\s+)?(\w+)', re.I), 'other'),),
+    'FREE KICK': ((re.compile(r'\bfree[- ]?kick (?:is )?(?:awarded )?(?:to|for) (?:the\s+)?(\w+)', re.I), 'same'),
+                  (re.compile(r'\b(?:blocked|cleared|defended)\s+by\s+(?:the\s+|a\s+)?(\w+)', re.I), 'other')),
+    'FOUL': ((re.compile(r'\bfoul\s+(?:committed\s+)?by\s+(?:the\s+|a\s+)?(\w+)', re.I), 'same'),
+             (re.compile(r'\b(\w+)\s+(?:team\s+|player\s+|defender\s+)?commits?\s+a\s+foul', re.I), 'same'),
+             (re.compile(r'\bfoul\s+on\s+(?:the\s+|a\s+)?(\w+)', re.I), 'other'),
+             (re.compile(r'\b(?:free[- ]?kick|penalty|foul)\s+(?:is\s+)?(?:awarded\s+)?(?:to|for)\s+(?:the\s+)?(\w+)', re.I),
+              'other')),
+    'TURNOVER': ((re.compile(r'\b(?:intercepted|tackled|won|recovered)\s+by\s+(?:the\s+|a\s+)?(\w+)', re.I), 'same'),
+                 (re.compile(r'\b(\w+)\s+(?:team\s+)?loses?\s+possession', re.I), 'other'),
+                 (re.compile(r'\bdispossess\w*\s+(?:the\s+|a\s+)?(\w+)', re.I), 'other')),
+}
+
+
+def team_colours(team_config: dict, store=None) -> dict:
+    """{colour word: team name} for colours only one team wears
+
+    A team whose config names no usable colour ("bibs", a typo) gets the colour
+    the timeline store names as possession or event team most often that isn't
+    the other team's.
+    """
+    seen = {}
+    for key in ('team_a', 'team_b'):
+        team = team_config.get(key, {})
+        # 1.3 stores raw terminal input - drop escape sequences like "\x1b[D"
+        text = re.sub(r'\x1b\[[0-9;]*[A-Za-z]', ' ', f"{team.get('colors', '')} {team.get('jersey', '')}").lower()
+        for colour in COLOURS:
+            if re.search(rf'\b{colour}\b', text):
+                seen.setdefault(colour, set()).add(team['name'])
+    colours = {colour: names.pop() for colour, names in seen.items() if len(names) == 1}
+
+    unmapped = [team_config[key]['name'] for key in ('team_a', 'team_b') if team_config[key]['name'] not in colours.values()]
+    if len(unmapped) == 1 and store is not None:
+        named = [row["possession"] for row in store.rows] + [e["team"] for row in store.rows for e in row["events"]]
+        mentions = Counter(name.lower() for name in named if name and name.lower() in COLOURS)
+        free = [colour for colour, _ in mentions.most_common() if colour not in seen]
+        if free:
+            colours[free[0]] = unmapped[0]
+    return colours
+
+
+def _colour_team(word, colours):
+    return colours.get(word.lower()) if word else None
+
+
+def _first_colour_team(text, colours):
+    for match in re.finditer(r'[A-Za-z]+', text):
+        team = colours.get(match.group(0).lower())
+        if team:
+            return team
+    return None
+
+
+def _other(team, team_names):
+    return next((name for name in team_names if name != team), None) if team else None
+
+
+def resolve_team(event_type, text, lead_team, colours, team_names, named_team=None):
+    """Team credited with the event (`named_team`: the one its record names), or None"""
+    for pattern, credit in TEAM_RULES.get(event_type, ()):
+        match = pattern.search(text)
+        team = _colour_team(match.group(1), colours) if match else None
+        if team:
+            return team if credit == 'same' else _other(team, team_names)
+    return named_team or _first_colour_team(text, colours) or lead_team
+
+
+def outcome_for(event_type, text):
+    t = text.lower()
+    if event_type == 'GOAL':
+        return "Goal scored"
+    if event_type == 'SHOT':
+        if re.search(r'\bsaved?\b|\bcaught\b|keeper', t):
+            return "Saved by goalkeeper"
+        if 'blocked' in t or 'deflected' in t:
+            return "Shot blocked"
+        if re.search(r'\bwide\b|\bover\b|\bmiss|crossbar|\bpost\b', t):
+            return "Shot missed"
+        return "Shot taken"
+    if event_type == 'FOUL':
+        if 'penalty' in t:
+            return "Penalty awarded"
+        if re.search(r'card|booked|caution', t):
+            return "Card shown"
+        return "Free kick awarded"
+    if event_type == 'CORNER':
+        if re.search(r'\bshot\b|header|\bgoal\b', t):
+            return "Shot from corner"
+        if 'cleared' in t:
+            return "Corner cleared"
+        return "Cross delivered"
+    if event_type == 'FREE KICK':
+        if 'wall' in t or 'blocked' in t:
+            return "Shot blocked"
+        if re.search(r'\bshot\b|\bstrike|\bsaved?\b|on goal', t):
+            return "Shot on goal"
+        return "Cross delivered"
+    if event_type == 'GOAL KICK':
+        return "Goal kick taken"
+    return "Counter-attack started" if 'counter' in t else "Possession regained"
+
+
+def classify(text):
+    """Clause type (or None) from the ordered patterns"""
+    return next((event_type for event_type, pattern in TYPE_PATTERNS if pattern.search(text)), None)
+
+
+def split_clauses(seconds, text):
+    """[(seconds, clause)]: sentences, and comma lists of timed events ("04:37 shot, 04:39 wide")"""
+    text = re.sub(r'\bKey events:\s*', '. ', text)
+    clauses = []
+    for sentence in re.split(r'(?<!\d)[.;!](?!\d)\s*|\n', text):
+        for clause in re.split(r',\s*(?=(?:at\s+)?\d+:\d{2}\b)', sentence):
+            clause = clause.strip(' ,:-')
+            if not clause:
+                continue
+            stamp = TIMESTAMP.search(clause)
+            clause_seconds = int(stamp.group(1)) * 60 + int(stamp.group(2)) if stamp else seconds
+            clauses.append((clause_seconds, clause))
+    return clauses
+
+
+def _describe(clause):
+    text = re.sub(r'\b(?:at|by)\s+\d+:\d{2}\b', '', clause)
+    text = TIMESTAMP.sub('', text)
+    text = re.sub(r'\s{2,}', ' ', text).strip(' ,:-')
+    text = text[:1].upper() + text[1:]
+    return text if len(text) <= 120 else text[:117].rstrip() + "..."
+
+
+def clip_clauses(store, row) -> list:
+    """[(seconds, clause, focused type or None, team colour or None)] for one clip, in time order"""
+    if row["confidence"] is None:
+        return [(seconds, clause, classify(clause), None)
+                for seconds, clause in split_clauses(row["start_seconds"], store.row_text(row))]
+    clauses = [(row["start_seconds"], clause, classify(clause), None)
+               for _, clause in split_clauses(row["start_seconds"], row["summary"])]
+    events = [e for e in store.events(row["start_seconds"], row["end_seconds"] + 0.1) if e["clip"] == row["clip"]]
+    clauses += [(int(e["seconds"]), e["description"], STORE_TYPES.get(e["type"]) or classify(e["description"]),
+                 e["team"]) for e in events]
+    return clauses
+
+
+def extract_candidates(store, team_config: dict) -> tuple:
+    """Rule pass over the timeline store; returns (confident events, uncertain clauses, ignored count)"""
+    colours = team_colours(team_config, store)
+    team_names = [team_config['team_a']['name'], team_config['team_b']['name']]
+    events, uncertain, ignored = [], [], 0
+
+    for row in store.clips():
+        text = store.row_text(row)
+        if row["confidence"] is None:
+            lead_team = _first_colour_team(re.split(r'[.;]', text)[0], colours)
+        else:
+            lead_team = _colour_team(row["possession"], colours)
+        entry_events = []
+        for seconds, clause, event_type, event_team in clip_clauses(store, row):
+            if IGNORE.search(clause):
+                ignored += 1
+                continue
+            previous = entry_events[-1] if entry_events else None
+
+            # "04:39 goes wide" / "saved by keeper" / "free kick to the Red team" finish the previous event
+            if previous and seconds - previous["seconds"] <= 3 and not NEW_EVENT.search(clause) and (
+                    event_type in (None, previous["type"]) and OUTCOME_WORDS.search(clause)
+                    or previous["type"] == 'FOUL' and event_type == 'FREE KICK'):
+                previous["outcome"] = outcome_for(previous["type"], f"{previous['clause']} {clause}")
+                if event_type == 'FREE KICK':
+                    previous["outcome"] = "Free kick awarded"
+                continue
+            if event_type is None:
+                continue
+
+            team = resolve_team(event_type, clause, lead_team, colours, team_names, _colour_team(event_team, colours))
+            event = {"seconds": seconds, "type": event_type, "team": team, "description": _describe(clause),
+                     "outcome": outcome_for(event_type, clause), "clause": clause, "context": text}
+            if HEDGE.search(clause) or NEGATION.search(clause) or team is None:
+                uncertain.append(event)
+                continue
+            entry_events.append(event)
+        events += entry_events
+
+    # The same entry sometimes states an event twice (summary + key events)
+    unique = {}
+    for event in events:
+        unique.setdefault((event["seconds"], event["type"], event["team"]), event)
+    return list(unique.values()), uncertain, ignored
+
+
+def create_fallback_prompt(items: list, team_config: dict) -> str:
+    """One JSON classification request for the clauses the rules couldn't call"""
+    team_a, team_b = team_config['team_a'], team_config['team_b']
+    lines = [{"id": i, "time": format_seconds(item["seconds"]), "text": item["clause"],
+              "context": item["context"][:300]} for i, item in enumerate(items)]
+    return f"""Classify football match timeline fragments.
+
+TEAMS: {team_a['name']} ({team_a.get('colors', '')}) vs {team_b['name']} ({team_b.get('colors', '')})
+
+For each fragment decide if it is one of these events: {', '.join(FOCUSED_TYPES)} - or NONE
+(warm-ups, hedged guesses that didn't happen, general possession play).
+
+FRAGMENTS:
+{json.dumps(lines, indent=1)}
+
+Return ONLY a JSON array, one object per fragment:
+[{{"id": <id>, "type": "<{'|'.join(FOCUSED_TYPES)}|NONE>", "team": "<{team_a['name']}|{team_b['name']}>",
+  "outcome": "<what happened next, a few words>"}}]"""
+
+
+def apply_fallback(items: list, answer: str, team_names: list) -> list:
+    """Events for the fallback items the model classified"""
+    text = answer.strip()
+    if text.startswith('```'):
+        text = text.strip('`').removeprefix('json').strip()
+    events = []
+    for entry in json.loads(text):
+        try:
+            item = items[int(entry["id"])]
+        except (KeyError, IndexError, TypeError, ValueError):
+            continue
+        event_type = str(entry.get("type", "")).upper().replace('_', ' ')
+        team = next((name for name in team_names if name.lower() == str(entry.get("team", "")).lower()), None)
+        if event_type not in FOCUSED_TYPES or not team:
+            continue
+        events.append({**item, "type": event_type, "team": team,
+                       "outcome": str(entry.get("outcome") or "").strip() or outcome_for(event_type, item["clause"])})
+    return events
+
+
+def format_focused_events(events: list) -> str:
+    """2.6_focused_events.txt lines"""
+    lines = []
+    for e in events:
+        outcome = "Goal scored" if e["type"] == 'GOAL' else e.get("outcome") or outcome_for(e["type"], e["description"])
+        if e["type"] != 'GOAL' and outcome == "Goal scored":
+            outcome = "Shot taken"
+        lines.append(f"{format_seconds(e['seconds'])} - {e['type']}: {e['team']} - {e['description']} → OUTCOME: {outcome}")
+    return "\n".join(lines)
+
+
+def extract_focused_events(store, team_config: dict, veo_goals: list, veo_shots: list, fallback=None) -> tuple:
+    """Focused events for the whole timeline store; returns (events, stats)
+
+    `fallback(prompt) -> text` classifies the uncertain clauses (one call);
+    without it, or if it fails, those clauses are left out.
+    """
+    started = time.perf_counter()
+    events, uncertain, ignored = extract_candidates(store, team_config)
+    rules_ms = (time.perf_counter() - started) * 1000
+
+    stats = {"fast_path": len(events), "llm_path": 0, "llm_candidates": len(uncertain), "llm_calls": 0,
+             "ignored_clauses": ignored, "rules_ms": round(rules_ms, 1)}
+    if uncertain and fallback:
+        stats["llm_calls"] = 1
+        try:
+            classified = apply_fallback(uncertain, fallback(create_fallback_prompt(uncertain, team_config)),
+                                        [team_config['team_a']['name'], team_config['team_b']['name']])
+            stats["llm_path"] = len(classified)
+            events += classified
+        except Exception as e:
+            print(f"⚠️  Fallback classification failed ({e}) - {len(uncertain)} uncertain clauses left out")
+
+    events, stats["veo"] = reconcile_veo(events, veo_goals, veo_shots)
+    for event in events:
+        event.setdefault("outcome", outcome_for(event["type"], event["description"]))
+    return events, stats
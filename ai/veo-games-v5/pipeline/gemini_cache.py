@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Content-addressed cache for Gemini responses
+
+A response is stored under sha256(model, generation config, every input part),
+where a video part is represented by the sha256 of the clip bytes, never its
+path or upload URI. Re-running a match after a prompt fix, a team-config
+correction or a crash therefore only pays for calls whose inputs changed.
+
+The key does not depend on the match or the pipeline version, so footy2, v4 and
+v5 runs can share one directory (this module has no v5 dependencies):
+- CLANN_GEMINI_CACHE_DIR   default ~/.cache/clann/gemini
+- CLANN_GEMINI_CACHE_MB    size cap, least recently used entries go first (default 1024)
+- CLANN_GEMINI_CACHE_DAYS  entries older than this are misses (default 30)
+- CLANN_GEMINI_CACHE=0     disable
+"""
+
+import os
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+
+import telemetry
+from stage_journal import atomic_write_json
+
+DEFAULT_CACHE_DIR = Path.home() / ".cache" / "clann" / "gemini"
+
+
+def file_sha256(path, chunk_bytes=1024 * 1024) -> str:
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_bytes), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def cache_key(model, parts, generation_config=None) -> str:
+    """parts: prompt strings and/or {"sha256": ..., "mime_type": ...} for media"""
+    payload = json.dumps(
+        {"model": model, "config": generation_config or {}, "parts": parts},
+        sort_keys=True, ensure_ascii=False,
+    )
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class GeminiResponseCache:
+    """On-disk response cache with size/age eviction and hit/miss counters"""
+
+    def __init__(self, cache_dir=DEFAULT_CACHE_DIR, max_bytes=1024 * 1024 ** 2, max_age_days=30, enabled=True):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_days * 86400
+        self.enabled = enabled
+        self.lock = threading.Lock()
+        self.stats = {"hits": 0, "misses": 0, "writes": 0, "evictions": 0}
+        self._size = None  # bytes on disk, scanned lazily
+
+    @classmethod
+    def from_env(cls):
+        return cls(
+            cache_dir=os.getenv('CLANN_GEMINI_CACHE_DIR') or DEFAULT_CACHE_DIR,
+            max_bytes=float(os.getenv('CLANN_GEMINI_CACHE_MB', 1024)) * 1024 ** 2,
+            max_age_days=float(os.getenv('CLANN_GEMINI_CACHE_DAYS', 30)),
+            enabled=os.getenv('CLANN_GEMINI_CACHE', '1') != '0',
+        )
+
+    def _path(self, key) -> Path:
+        return self.cache_dir / key[:2] / f"{key}.json"
+
+    def get(self, key):
+        """Cached response text, or None"""
+        if not self.enabled:
+            return None
+        path = self._path(key)
+        try:
+            stat = path.stat()
+            if time.time() - stat.st_mtime > self.max_age_seconds:
+                self._remove(path, stat.st_size)
+                raise FileNotFoundError
+            with open(path) as f:
+                entry = json.load(f)
+            # Touch on read so size eviction drops the least recently used entries
+            os.utime(path, (time.time(), stat.st_mtime))
+        except (FileNotFoundError, json.JSONDecodeError, OSError):
+            with self.lock:
+                self.stats["misses"] += 1
+            telemetry.count("cache_lookups", cache="gemini", result="miss")
+            return None
+        with self.lock:
+            self.stats["hits"] += 1
+        telemetry.count("cache_lookups", cache="gemini", result="hit")
+        return entry["text"]
+
+    def put(self, key, text, model=None, tokens=None):
+        if not self.enabled:
+            return
+        path = self._path(key)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        entry = {"key": key, "model": model, "tokens": tokens, "created_at": time.time(), "text": text}
+        atomic_write_json(path, entry, indent=None)
+
+        with self.lock:
+            self.stats["writes"] += 1
+            if self._size is not None:
+                self._size += path.stat().st_size
+        self._evict_if_needed()
+
+    def _remove(self, path, size):
+        try:
+            path.unlink()
+        except OSError:
+            return
+        with self.lock:
+            self.stats["evictions"] += 1
+            if self._size is not None:
+                self._size -= size
+
+    def _entries(self):
+        """(last used, size, path) for every entry on disk"""
+        entries = []
+        for path in self.cache_dir.glob("*/*.json"):
+            try:
+                stat = path.stat()
+                entries.append((max(stat.st_atime, stat.st_mtime), stat.st_size, path, stat.st_mtime))
+            except OSError:
+                continue
+        return entries
+
+    def _evict_if_needed(self):
+        with self.lock:
+            if self._size is not None and self._size <= self.max_bytes:
+                return
+        entries = self._entries()
+        with self.lock:
+            self._size = sum(size for _, size, _, _ in entries)
+            if self._size <= self.max_bytes:
+                return
+
+        now = time.time()
+        # Expired entries first, then least recently used, down to 90% of the cap
+        for last_used, size, path, mtime in sorted(entries, key=lambda e: (now - e[3] <= self.max_age_seconds, e[0])):
+            if self._size <= self.max_bytes * 0.9:
+                break
+            self._remove(path, size)
+
+    def summary(self) -> str:
+        s = self.stats
+        lookups = s["hits"] + s["misses"]
+        rate = f"{s['hits'] / lookups * 100:.0f}%" if lookups else "n/a"
+        return (f"cache {s['hits']} hits / {s['misses']} misses ({rate}), "
+                f"{s['writes']} writes, {s['evictions']} evictions")
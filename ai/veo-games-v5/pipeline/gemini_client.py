@@ -0,0 +1,567 @@
+#!/usr/bin/env python3
+"""
+Shared Gemini client for the v5 analysis stages (1.5, 2.5, 2.6, 3.1, 3.2)
+
+Talks to the Gemini REST API directly so every stage in the process shares:
+- AIMD concurrency: the number of calls in flight grows by ~1 per window of
+  successful calls and halves on 429/503, capped by budgets.gemini_worker_count()
+- jittered exponential retries on 408/429/5xx and connection errors, bounded
+  by a per-call deadline (Retry-After is honoured)
+- a per-process token bucket for requests/minute and tokens/minute
+  (CLANN_GEMINI_RPM / CLANN_GEMINI_TPM, 0 = unlimited)
+- async upload polling instead of a thread sleeping per clip
+- a content-addressed response cache (gemini_cache.py) checked before any
+  upload or request, so unchanged clips and prompts are never re-billed
+- per-attempt latency, retries, bytes uploaded and token usage reported to
+  telemetry.py for the match/stage that made the call
+- prompt prefixes: a `system` text shared by many calls (1.5's per-match
+  instructions and team config) is registered once as cached content when it is
+  long enough for the API to accept, and otherwise sent as the leading
+  systemInstruction so Gemini's implicit prefix cache can reuse it
+
+All calls run on one background asyncio loop. Sync stages call
+client.generate_text(...) / client.analyze_video(...); 1.5 submits many
+coroutines with client.submit(...) and collects concurrent futures.
+
+Set GEMINI_API_BASE (e.g. http://127.0.0.1:8089) to run against
+fake_gemini_server.py instead of Google. CLANN_GEMINI_RECORD=<path.jsonl>
+appends every answer (with the start of its prompt and its latency) to a file
+the fake server can --replay.
+"""
+
+import os
+import json
+import time
+import random
+import asyncio
+import mimetypes
+import threading
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import budgets
+import telemetry
+from gemini_cache import GeminiResponseCache, cache_key, file_sha256
+
+DEFAULT_API_BASE = "https://generativelanguage.googleapis.com"
+RETRYABLE_STATUS = {408, 429, 500, 502, 503, 504}
+THROTTLE_STATUS = {429, 503}
+
+GENERATE_DEADLINE_SECONDS = 300
+VIDEO_DEADLINE_SECONDS = 600
+REQUEST_TIMEOUT_SECONDS = 180
+
+# Gemini bills video at roughly 263 tokens per second (frames + audio)
+VIDEO_TOKENS_PER_SECOND = 263
+
+# cachedContents rejects anything shorter than this (per model family)
+PREFIX_CACHE_MIN_TOKENS = {"gemini-2.5-pro": 4096, "gemini-2.5-flash": 1024}
+PREFIX_CACHE_TTL_SECONDS = 7200
+
+# How much of the prompt a recorded answer keeps to be matched on when replayed
+RECORD_PROMPT_CHARS = 200
+
+
+class GeminiError(Exception):
+    """A Gemini call that failed for good (non-retryable, or out of retries/deadline)"""
+
+    def __init__(self, message, status=None):
+        super().__init__(message)
+        self.status = status
+
+
+class _RetryableError(Exception):
+    def __init__(self, message, status=None, retry_after=None):
+        super().__init__(message)
+        self.status = status
+        self.retry_after = retry_after
+
+
+class AdaptiveConcurrency:
+    """AIMD limit on calls in flight: +1/limit per success, halve on throttling"""
+
+    def __init__(self, initial=8, minimum=1, maximum=None, cooldown_seconds=2.0):
+        self.limit = float(initial)
+        self.minimum = minimum
+        self.maximum = maximum or budgets.gemini_worker_count
+        self.cooldown_seconds = cooldown_seconds
+        self.in_flight = 0
+        self.last_decrease = 0.0
+        self.successes = 0
+        self.throttles = 0
+        self.cond = None
+
+    def _ceiling(self):
+        return self.maximum() if callable(self.maximum) else self.maximum
+
+    async def acquire(self):
+        if self.cond is None:
+            self.cond = asyncio.Condition()
+        async with self.cond:
+            while self.in_flight >= max(self.minimum, min(int(self.limit), self._ceiling())):
+                await self.cond.wait()
+            self.in_flight += 1
+
+    async def release(self, outcome="ok"):
+        async with self.cond:
+            self.in_flight -= 1
+            if outcome == "ok":
+                self.successes += 1
+                self.limit = min(self._ceiling(), self.limit + 1.0 / max(self.limit, 1.0))
+            elif outcome == "throttled":
+                self.throttles += 1
+                now = time.monotonic()
+                # One burst of 429s is one congestion signal, not thirty
+                if now - self.last_decrease >= self.cooldown_seconds:
+                    self.limit = max(self.minimum, self.limit / 2)
+                    self.last_decrease = now
+            self.cond.notify_all()
+
+
+class AsyncTokenBucket:
+    """Token bucket refilled per minute; rate <= 0 means unlimited"""
+
+    def __init__(self, per_minute):
+        self.rate = float(per_minute) / 60.0
+        self.capacity = float(per_minute)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def consume(self, amount):
+        if self.rate <= 0 or amount <= 0:
+            return
+        while True:
+            self._refill()
+            # Requests larger than the bucket may drive it negative rather than wait forever
+            needed = min(amount, self.capacity)
+            if self.tokens >= needed:
+                self.tokens -= amount
+                return
+            await asyncio.sleep(min((needed - self.tokens) / self.rate, 5.0))
+
+    def adjust(self, delta):
+        """Correct an estimate once the real usage is known (positive = used more)"""
+        if self.rate > 0:
+            self._refill()
+            self.tokens = min(self.capacity, self.tokens - delta)
+
+
+def estimate_tokens(text="", media_seconds=0):
+    return len(text) // 4 + int(media_seconds * VIDEO_TOKENS_PER_SECOND)
+
+
+class GeminiClient:
+    """Process-wide Gemini REST client; see get_client()"""
+
+    def __init__(self, api_key, api_base=None, initial_concurrency=8,
+                 requests_per_minute=None, tokens_per_minute=None, cache=None):
+        self.api_key = api_key
+        self.api_base = (api_base or os.getenv('GEMINI_API_BASE') or DEFAULT_API_BASE).rstrip('/')
+
+        rpm = requests_per_minute if requests_per_minute is not None else _env_number('CLANN_GEMINI_RPM', 0)
+        tpm = tokens_per_minute if tokens_per_minute is not None else _env_number('CLANN_GEMINI_TPM', 0)
+        self.concurrency = AdaptiveConcurrency(initial=initial_concurrency)
+        self.request_bucket = AsyncTokenBucket(rpm)
+        self.token_bucket = AsyncTokenBucket(tpm)
+        self.cache = cache or GeminiResponseCache.from_env()
+
+        self.stats = {"calls": 0, "retries": 0, "throttled": 0, "failed": 0, "tokens": 0,
+                      "prompt_tokens": 0, "cached_tokens": 0, "generate_seconds": 0.0}
+        # (model, system text) -> future of the request fields that carry that prefix
+        self.prefixes = {}
+        self.prefix_caching = os.getenv('CLANN_GEMINI_PREFIX_CACHE', '1') != '0'
+        self.prefix_ttl = int(_env_number('CLANN_GEMINI_PREFIX_TTL', PREFIX_CACHE_TTL_SECONDS))
+        self.record_path = os.getenv('CLANN_GEMINI_RECORD')
+        self.record_lock = threading.Lock()
+
+        # Blocking HTTP runs on a private pool sized for the concurrency ceiling
+        self.http_pool = ThreadPoolExecutor(max_workers=64, thread_name_prefix="gemini-http")
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=64)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+
+        self.loop = asyncio.new_event_loop()
+        self.loop_thread = threading.Thread(target=self.loop.run_forever, name="gemini-loop", daemon=True)
+        self.loop_thread.start()
+
+    # ---- running coroutines from sync code -------------------------------
+
+    def submit(self, coro):
+        """Schedule a coroutine on the client loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.loop)
+
+    def run(self, coro):
+        """Run a coroutine on the client loop and wait for its result"""
+        return self.submit(coro).result()
+
+    def generate_text(self, model, prompt, deadline_seconds=GENERATE_DEADLINE_SECONDS, generation_config=None):
+        return self.run(self.agenerate_text(model, prompt, deadline_seconds, generation_config))
+
+    def analyze_video(self, model, video_path, prompt, media_seconds=15,
+                      deadline_seconds=VIDEO_DEADLINE_SECONDS, generation_config=None, system=None):
+        return self.run(self.aanalyze_video(model, video_path, prompt, media_seconds,
+                                            deadline_seconds, generation_config, system))
+
+    def release_prefix(self, system):
+        """Delete the cached content registered for `system` (any model) instead of waiting for its TTL"""
+        self.run(self.arelease_prefix(system))
+
+    # ---- HTTP with retries ------------------------------------------------
+
+    def _blocking_request(self, method, url, timeout, **kwargs):
+        headers = kwargs.pop('headers', {})
+        headers['x-goog-api-key'] = self.api_key
+        return self.session.request(method, url, headers=headers, timeout=timeout, **kwargs)
+
+    async def _request(self, method, url, deadline, limited=True, kind="gemini", **kwargs):
+        """One HTTP call with jittered retries until `deadline` (time.monotonic())
+
+        `kind` labels the call in telemetry (gemini.generate, gemini.upload, ...).
+        """
+        attempt = 0
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                self.stats["failed"] += 1
+                raise GeminiError(f"deadline exceeded after {attempt} attempt(s): {method} {url}")
+
+            if limited:
+                await self.concurrency.acquire()
+            outcome = "error"
+            started = time.monotonic()
+            try:
+                response = await self.loop.run_in_executor(
+                    self.http_pool,
+                    lambda: self._blocking_request(method, url, min(remaining, REQUEST_TIMEOUT_SECONDS), **kwargs),
+                )
+                telemetry.observe(kind, time.monotonic() - started)
+                if response.status_code < 400:
+                    outcome = "ok"
+                    return response
+                if response.status_code in THROTTLE_STATUS:
+                    outcome = "throttled"
+                    self.stats["throttled"] += 1
+                if response.status_code not in RETRYABLE_STATUS:
+                    self.stats["failed"] += 1
+                    raise GeminiError(f"{response.status_code} from Gemini: {response.text[:300]}",
+                                      status=response.status_code)
+                error = _RetryableError(f"{response.status_code} from Gemini", response.status_code,
+                                        _retry_after(response))
+            except (requests.ConnectionError, requests.Timeout) as e:
+                telemetry.observe(kind, time.monotonic() - started)
+                error = _RetryableError(f"{type(e).__name__}: {e}")
+            finally:
+                if limited:
+                    await self.concurrency.release(outcome)
+
+            attempt += 1
+            self.stats["retries"] += 1
+            telemetry.count("retries", kind=kind)
+            # Full jitter, but never sooner than the server asked for
+            backoff = random.uniform(0, min(60.0, 1.0 * 2 ** attempt))
+            if error.retry_after:
+                backoff = max(backoff, error.retry_after)
+            if time.monotonic() + backoff >= deadline:
+                self.stats["failed"] += 1
+                raise GeminiError(f"gave up after {attempt} attempt(s): {error}", status=error.status)
+            await asyncio.sleep(backoff)
+
+    # ---- Gemini endpoints -------------------------------------------------
+
+    async def agenerate(self, model, parts, deadline, generation_config=None, estimated_tokens=0, system=None):
+        """generateContent; returns (text, total_tokens)
+
+        `system` is a prefix shared across calls - see aprompt_prefix().
+        """
+        await self.request_bucket.consume(1)
+        await self.token_bucket.consume(estimated_tokens)
+
+        body = {"contents": [{"role": "user", "parts": parts}]}
+        if generation_config:
+            body["generationConfig"] = generation_config
+        if system:
+            body.update(await self.aprompt_prefix(model, system))
+
+        self.stats["calls"] += 1
+        url = f"{self.api_base}/v1beta/models/{model}:generateContent"
+        try:
+            response = await self._request('POST', url, deadline, kind="gemini.generate", json=body)
+        except GeminiError as e:
+            if "cachedContent" not in body or e.status not in (400, 403, 404):
+                raise
+            # Cached content expired or was evicted mid-run - send the prefix inline from now on
+            print(f"⚠️  Cached prompt prefix {body['cachedContent']} gone ({e.status}) - sending it inline")
+            self.prefixes[(model, system)] = self.loop.create_future()
+            self.prefixes[(model, system)].set_result(_inline_prefix(system))
+            body.pop("cachedContent")
+            body.update(_inline_prefix(system))
+            response = await self._request('POST', url, deadline, kind="gemini.generate", json=body)
+        # Time to the first response byte, without the wait for a concurrency slot
+        self.stats["generate_seconds"] += response.elapsed.total_seconds()
+        data = response.json()
+
+        usage = data.get("usageMetadata", {})
+        used = usage.get("totalTokenCount", estimated_tokens)
+        self.token_bucket.adjust(used - estimated_tokens)
+        self.stats["tokens"] += used
+        self.stats["prompt_tokens"] += usage.get("promptTokenCount", 0)
+        self.stats["cached_tokens"] += usage.get("cachedContentTokenCount", 0)
+        # Thinking tokens bill as output
+        telemetry.tokens(model, usage.get("promptTokenCount", 0),
+                         usage.get("candidatesTokenCount", 0) + usage.get("thoughtsTokenCount", 0),
+                         usage.get("cachedContentTokenCount", 0))
+
+        try:
+            candidate_parts = data["candidates"][0]["content"]["parts"]
+        except (KeyError, IndexError):
+            reason = data.get("promptFeedback", {}).get("blockReason") or "no candidates"
+            raise GeminiError(f"empty Gemini response ({reason})")
+        text = "".join(part.get("text", "") for part in candidate_parts).strip()
+        if not text:
+            raise GeminiError("empty Gemini response text")
+        if self.record_path:
+            self._record(parts, generation_config, text, response.elapsed.total_seconds())
+        return text, used
+
+    def _record(self, parts, generation_config, text, seconds):
+        """Append one answer to CLANN_GEMINI_RECORD (fake_gemini_server.py --replay format)"""
+        prompt = "\n".join(part["text"] for part in parts if "text" in part)
+        entry = {"prompt": prompt[:RECORD_PROMPT_CHARS], "videos": sum(1 for part in parts if "file_data" in part),
+                 "structured": "responseSchema" in (generation_config or {}), "text": text,
+                 "seconds": round(seconds, 3)}
+        with self.record_lock:
+            with open(self.record_path, 'a') as f:
+                f.write(json.dumps(entry) + "\n")
+
+    async def agenerate_text(self, model, prompt, deadline_seconds=GENERATE_DEADLINE_SECONDS,
+                             generation_config=None):
+        key = cache_key(model, [prompt], generation_config)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        deadline = time.monotonic() + deadline_seconds
+        text, used = await self.agenerate(model, [{"text": prompt}], deadline, generation_config,
+                                          estimate_tokens(prompt))
+        self.cache.put(key, text, model, used)
+        return text
+
+    async def aprompt_prefix(self, model, system):
+        """Request fields that carry the `system` prefix, registered once per (model, text)
+
+        Concurrent first calls share one registration. A prefix long enough for
+        cachedContents is uploaded once and referenced by name; a shorter one
+        (or one the API refuses) is sent as systemInstruction, which keeps it
+        byte-identical at the front of every request for implicit caching.
+        """
+        key = (model, system)
+        if key not in self.prefixes:
+            self.prefixes[key] = asyncio.ensure_future(self._register_prefix(model, system))
+        return await asyncio.shield(self.prefixes[key])
+
+    async def _register_prefix(self, model, system):
+        minimum = PREFIX_CACHE_MIN_TOKENS.get(model, max(PREFIX_CACHE_MIN_TOKENS.values()))
+        if not self.prefix_caching or estimate_tokens(system) < minimum:
+            return _inline_prefix(system)
+        try:
+            response = await self._request(
+                'POST', f"{self.api_base}/v1beta/cachedContents", time.monotonic() + 60, limited=False,
+                kind="gemini.cache", json={"model": f"models/{model}", "ttl": f"{self.prefix_ttl}s",
+                      **_inline_prefix(system)},
+            )
+            name = response.json()["name"]
+        except (GeminiError, KeyError, ValueError) as e:
+            print(f"⚠️  Could not cache prompt prefix for {model} ({e}) - sending it inline")
+            return _inline_prefix(system)
+        print(f"🧷 Prompt prefix cached for {model} as {name} (~{estimate_tokens(system):,} tokens)")
+        return {"cachedContent": name}
+
+    async def arelease_prefix(self, system):
+        for key in [key for key in self.prefixes if key[1] == system]:
+            future = self.prefixes.pop(key)
+            fields = await future
+            if "cachedContent" in fields:
+                await self.adelete_file(fields["cachedContent"])
+
+    async def aupload_file(self, path, deadline):
+        """Resumable upload to the Files API; returns the file resource dict"""
+        path = Path(path)
+        mime_type = mimetypes.guess_type(path.name)[0] or 'application/octet-stream'
+        size = path.stat().st_size
+
+        start = await self._request(
+            'POST', f"{self.api_base}/upload/v1beta/files", deadline, kind="gemini.upload",
+            headers={
+                'X-Goog-Upload-Protocol': 'resumable',
+                'X-Goog-Upload-Command': 'start',
+                'X-Goog-Upload-Header-Content-Length': str(size),
+                'X-Goog-Upload-Header-Content-Type': mime_type,
+            },
+            json={"file": {"display_name": path.name}},
+        )
+        upload_url = start.headers.get('X-Goog-Upload-URL')
+        if not upload_url:
+            raise GeminiError("upload start returned no X-Goog-Upload-URL")
+
+        data = await self.loop.run_in_executor(self.http_pool, path.read_bytes)
+        response = await self._request(
+            'POST', upload_url, deadline, kind="gemini.upload",
+            headers={'X-Goog-Upload-Offset': '0', 'X-Goog-Upload-Command': 'upload, finalize'},
+            data=data,
+        )
+        telemetry.count("bytes_uploaded", size, target="gemini")
+        return response.json()["file"]
+
+    async def await_file_active(self, file, deadline):
+        """Poll the uploaded file until ACTIVE, sleeping on the loop rather than in a thread"""
+        delay = 0.5
+        while file.get("state") == "PROCESSING":
+            if time.monotonic() + delay >= deadline:
+                raise GeminiError(f"{file.get('name')} still PROCESSING at deadline")
+            await asyncio.sleep(delay)
+            delay = min(delay * 1.5, 5.0)
+            response = await self._request('GET', f"{self.api_base}/v1beta/{file['name']}", deadline,
+                                           limited=False, kind="gemini.poll")
+            file = response.json()
+        if file.get("state") == "FAILED":
+            raise GeminiError(f"Gemini failed to process {file.get('name')}")
+        return file
+
+    async def adelete_file(self, name):
+        try:
+            await self._request('DELETE', f"{self.api_base}/v1beta/{name}",
+                                time.monotonic() + 30, limited=False, kind="gemini.delete")
+        except GeminiError as e:
+            print(f"⚠️  Could not delete {name}: {e}")
+
+    async def aanalyze_video(self, model, video_path, prompt, media_seconds=15,
+                             deadline_seconds=VIDEO_DEADLINE_SECONDS, generation_config=None, system=None):
+        """Upload a clip, wait until it is ACTIVE, generate, delete; returns the text
+
+        `system` is the shared instruction prefix; `prompt` is then only the
+        per-clip suffix sent after the video.
+        """
+        # Keyed on the clip bytes, so a re-cut clip with identical content still hits
+        mime_type = mimetypes.guess_type(str(video_path))[0] or 'video/mp4'
+        clip_hash = await self.loop.run_in_executor(self.http_pool, file_sha256, video_path)
+        key = cache_key(model, _system_part(system) + [{"sha256": clip_hash, "mime_type": mime_type}, prompt],
+                        generation_config)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        deadline = time.monotonic() + deadline_seconds
+        file = await self.aupload_file(video_path, deadline)
+        try:
+            file = await self.await_file_active(file, deadline)
+            parts = [
+                {"file_data": {"mime_type": file.get("mimeType", "video/mp4"), "file_uri": file["uri"]}},
+                {"text": prompt},
+            ]
+            text, used = await self.agenerate(model, parts, deadline, generation_config,
+                                              estimate_tokens((system or "") + prompt, media_seconds), system)
+            self.cache.put(key, text, model, used)
+            return text
+        finally:
+            await self.adelete_file(file["name"])
+
+    async def aanalyze_videos(self, model, videos, prompt, deadline_seconds=VIDEO_DEADLINE_SECONDS,
+                              generation_config=None, system=None):
+        """Several clips in one generateContent call; returns the text
+
+        `videos` is a list of (label, path, media_seconds). Each clip is sent
+        as its label text followed by the video, then `prompt`. Uploads and
+        polls run concurrently, so a batch costs one upload/poll wait and one
+        round trip instead of one per clip.
+        """
+        hashes = await asyncio.gather(*(
+            self.loop.run_in_executor(self.http_pool, file_sha256, path) for _, path, _ in videos))
+        key_parts = _system_part(system)
+        for (label, path, _), clip_hash in zip(videos, hashes):
+            mime_type = mimetypes.guess_type(str(path))[0] or 'video/mp4'
+            key_parts += [label, {"sha256": clip_hash, "mime_type": mime_type}]
+        key = cache_key(model, key_parts + [prompt], generation_config)
+        cached = self.cache.get(key)
+        if cached is not None:
+            return cached
+
+        deadline = time.monotonic() + deadline_seconds
+        uploads = await asyncio.gather(*(self.aupload_file(path, deadline) for _, path, _ in videos),
+                                       return_exceptions=True)
+        try:
+            failed = next((u for u in uploads if isinstance(u, BaseException)), None)
+            if failed:
+                raise failed
+            files = await asyncio.gather(*(self.await_file_active(f, deadline) for f in uploads))
+            parts = []
+            for (label, _, _), file in zip(videos, files):
+                parts += [
+                    {"text": label},
+                    {"file_data": {"mime_type": file.get("mimeType", "video/mp4"), "file_uri": file["uri"]}},
+                ]
+            parts.append({"text": prompt})
+            media_seconds = sum(seconds for _, _, seconds in videos)
+            text, used = await self.agenerate(model, parts, deadline, generation_config,
+                                              estimate_tokens((system or "") + prompt, media_seconds), system)
+            self.cache.put(key, text, model, used)
+            return text
+        finally:
+            await asyncio.gather(*(self.adelete_file(u["name"]) for u in uploads if isinstance(u, dict)))
+
+    def print_stats(self):
+        s = self.stats
+        print(f"📡 Gemini: {s['calls']} calls, {s['retries']} retries, {s['throttled']} throttled, "
+              f"{s['failed']} failed, {s['tokens']:,} tokens | concurrency limit now "
+              f"{int(self.concurrency.limit)}")
+        if s['calls']:
+            cached_share = s['cached_tokens'] / s['prompt_tokens'] if s['prompt_tokens'] else 0
+            print(f"⏱️  Per call: {s['prompt_tokens'] // s['calls']:,} input tokens ({cached_share:.0%} from cached "
+                  f"prefixes), {s['generate_seconds'] / s['calls']:.2f}s to answer")
+        print(f"🗄️  Gemini {self.cache.summary()}")
+
+
+def _inline_prefix(system):
+    return {"systemInstruction": {"parts": [{"text": system}]}}
+
+
+def _system_part(system):
+    # Calls without a prefix keep the key shape they always had
+    return [{"system": system}] if system else []
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After'))
+    except (TypeError, ValueError):
+        return None
+
+
+def _env_number(name, default):
+    try:
+        return float(os.getenv(name, default))
+    except ValueError:
+        return default
+
+
+_client = None
+_client_lock = threading.Lock()
+
+
+def get_client(api_key=None):
+    """The process-wide client, so concurrent stages and matches share one limiter"""
+    global _client
+    with _client_lock:
+        if _client is None:
+            api_key = api_key or os.getenv('GEMINI_API_KEY') or os.getenv('GOOGLE_API_KEY')
+            if not api_key:
+                raise ValueError("GEMINI_API_KEY not found in environment variables")
+            _client = GeminiClient(api_key)
+        return _client
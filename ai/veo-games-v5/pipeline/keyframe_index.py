@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""
+Keyframe index for a match video
+
+Stream-copy clips can only start on a keyframe, so a clip named clip_05m00s
+really starts at the first keyframe at or after 05:00. One ffprobe packet scan
+(no decoding) lists every video keyframe; the result is cached next to the
+video as video.keyframes.json and rebuilt only when the video changes.
+
+1.4 uses it to cut on real boundaries and to record true start/end times in
+segments.json; 1.5/1.6 read those times instead of assuming i * 15 seconds.
+"""
+
+import json
+import subprocess
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from clip_stream import grid_slot
+from stage_journal import atomic_write_json
+
+
+def index_path(video_path) -> Path:
+    video_path = Path(video_path)
+    return video_path.with_name(f"{video_path.stem}.keyframes.json")
+
+
+def _probe_format(video_path):
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', str(video_path)]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+    fmt = json.loads(result.stdout)['format']
+    return float(fmt.get('start_time', 0) or 0), float(fmt['duration'])
+
+
+def _probe_keyframes(video_path):
+    """PTS (seconds) of every keyframe packet on the first video stream"""
+    cmd = [
+        'ffprobe', '-v', 'error',
+        '-select_streams', 'v:0',
+        '-show_entries', 'packet=pts_time,flags',
+        '-of', 'csv=print_section=0',
+        str(video_path),
+    ]
+    result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        fields = line.strip().split(',')
+        if len(fields) < 2 or 'K' not in fields[1]:
+            continue
+        try:
+            keyframes.append(float(fields[0]))
+        except ValueError:
+            continue  # pts_time N/A
+    return sorted(set(keyframes))
+
+
+def build_keyframe_index(video_path) -> dict:
+    """Scan the video and write video.keyframes.json; times are relative to the first frame"""
+    video_path = Path(video_path)
+    stat = video_path.stat()
+    start_time, duration = _probe_format(video_path)
+    keyframes = [round(t - start_time, 3) for t in _probe_keyframes(video_path)]
+
+    index = {
+        "video": video_path.name,
+        "video_size": stat.st_size,
+        "video_mtime_ns": stat.st_mtime_ns,
+        "start_time": start_time,
+        "duration": duration,
+        "keyframe_count": len(keyframes),
+        "keyframes": keyframes,
+    }
+
+    atomic_write_json(index_path(video_path), index, indent=None)
+    return index
+
+
+def load_keyframe_index(video_path):
+    """Cached index if it still matches the video, otherwise rebuild it. None if ffprobe fails."""
+    video_path = Path(video_path)
+    cached = index_path(video_path)
+    if cached.exists():
+        try:
+            with open(cached) as f:
+                index = json.load(f)
+            stat = video_path.stat()
+            if index.get("video_size") == stat.st_size and index.get("video_mtime_ns") == stat.st_mtime_ns:
+                return index
+        except (json.JSONDecodeError, OSError):
+            pass
+
+    try:
+        return build_keyframe_index(video_path)
+    except (subprocess.CalledProcessError, FileNotFoundError, KeyError, ValueError) as e:
+        print(f"⚠️  Could not build keyframe index for {video_path.name}: {e}")
+        return None
+
+
+def keyframe_at_or_after(keyframes, seconds):
+    """First keyframe time >= seconds (None past the last keyframe)"""
+    i = bisect_left(keyframes, seconds - 0.0005)
+    return keyframes[i] if i < len(keyframes) else None
+
+
+def keyframe_at_or_before(keyframes, seconds):
+    """Last keyframe time <= seconds (0.0 before the first keyframe)"""
+    i = bisect_right(keyframes, seconds + 0.0005)
+    return keyframes[i - 1] if i else 0.0
+
+
+def plan_clips(index, segment_seconds, duration=None):
+    """Real clip boundaries for nominal cuts every `segment_seconds`
+
+    Returns dicts with index (the slot the real start falls in, used for the
+    clip name), start_seconds and end_seconds. This matches what
+    `ffmpeg -f segment` produces with -c copy: each cut lands on the first
+    keyframe at or after the nominal time. Slots that fall inside one long GOP
+    collapse into a single clip.
+    """
+    keyframes = index["keyframes"]
+    duration = duration if duration is not None else index["duration"]
+
+    starts = []
+    slot = 0
+    while slot * segment_seconds < duration:
+        start = 0.0 if slot == 0 else keyframe_at_or_after(keyframes, slot * segment_seconds)
+        if start is None or start >= duration:
+            break
+        if not starts or start > starts[-1]:
+            starts.append(start)
+        slot += 1
+
+    clips = []
+    for i, start in enumerate(starts):
+        end = starts[i + 1] if i + 1 < len(starts) else duration
+        clips.append({
+            "index": grid_slot(start, segment_seconds),
+            "start_seconds": start,
+            "end_seconds": round(end, 3),
+        })
+    return clips
@@ -0,0 +1,704 @@
+#!/usr/bin/env python3
+"""
+Pipeline Runner - v5 Pipeline
+Runs the numbered v5 stages for one match as a dependency graph, in-process.
+
+Each stage declares the files it reads and writes. A stage is skipped only when
+the content hashes of its inputs and its config/prompt hash (the stage script
+source plus any parameters) match the last successful run and its outputs are
+still intact. Stages whose inputs are ready run concurrently, so 2.5 || 2.6 and
+3.1 || 3.2 overlap. Editing a prompt in 1.5 re-runs 1.5 and then only the
+stages whose inputs actually changed as a result.
+
+State is kept in outputs/<match-id>/.pipeline_state.json, and each run's
+stage timings, call latencies, tokens and cost go to metrics.json/metrics.prom
+(telemetry.py). .journal/pipeline.jsonl (stage_journal.py) logs every stage
+start and finish; a stage that was interrupted or failed is re-run with its
+outputs and item journal kept when its code and inputs are unchanged, so it
+resumes from the items it had already finished. A stage that finished with
+failed items in its journal is recorded as partial: later stages run on what
+it produced, and the next pass retries just those items. A stage switched off
+by its environment flag (Stage.enabled) is skipped, never failed, so it does
+not block the stages that only optionally read its outputs.
+
+Usage:
+    python3 pipeline_runner.py <match-id | veo-url> [--until 3.3] [--publish]
+"""
+
+import sys
+import os
+import json
+import re
+import time
+import shutil
+import hashlib
+import argparse
+import threading
+import importlib.util
+from dataclasses import dataclass
+from datetime import datetime
+from pathlib import Path
+from typing import Callable, Dict, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+import telemetry
+from stage_journal import StageJournal, atomic_write_json
+
+PIPELINE_DIR = Path(__file__).resolve().parent
+OUTPUTS_DIR = PIPELINE_DIR.parent / "outputs"
+STATE_FILENAME = ".pipeline_state.json"
+
+_module_cache = {}
+_module_lock = threading.Lock()
+
+
+def load_stage_module(script_name: str):
+    """Import a numbered pipeline script (e.g. 1.4_make_clips.py) as a module"""
+    with _module_lock:
+        if script_name not in _module_cache:
+            path = PIPELINE_DIR / script_name
+            module_name = "stage_" + re.sub(r"\W", "_", path.stem)
+            spec = importlib.util.spec_from_file_location(module_name, path)
+            module = importlib.util.module_from_spec(spec)
+            # Registered so process-pool workers can pickle the module's functions
+            sys.modules[module_name] = module
+            spec.loader.exec_module(module)
+            _module_cache[script_name] = module
+        return _module_cache[script_name]
+
+
+@dataclass
+class MatchContext:
+    """Everything a stage needs to know about the match it is running for"""
+    match_id: str
+    veo_url: Optional[str] = None
+    base_url: str = "http://localhost:3001"
+    no_auth: bool = True
+
+    @property
+    def match_dir(self) -> Path:
+        return OUTPUTS_DIR / self.match_id
+
+
+@dataclass
+class Stage:
+    """One node of the pipeline graph"""
+    name: str
+    run: Callable[[MatchContext], bool]
+    inputs: Tuple[str, ...] = ()
+    optional_inputs: Tuple[str, ...] = ()
+    outputs: Tuple[str, ...] = ()
+    code: Tuple[str, ...] = ()
+    params: Callable[[MatchContext], dict] = lambda ctx: {}
+    # False: needed but can't run here (no Veo URL) - fine only if its outputs already exist
+    available: Callable[[MatchContext], bool] = lambda ctx: True
+    # False: switched off (CLANN_HLS=0 ...) - skipped, and stages that only optionally read it still run
+    enabled: Callable[[MatchContext], bool] = lambda ctx: True
+
+
+class ContentHasher:
+    """SHA-256 of files and directories, memoised on (size, mtime) so a 3GB video is hashed once"""
+
+    def __init__(self, memo: Optional[dict] = None):
+        self.memo = memo if memo is not None else {}
+        self.lock = threading.Lock()
+
+    def hash_file(self, path: Path) -> str:
+        stat = path.stat()
+        key = str(path)
+        with self.lock:
+            cached = self.memo.get(key)
+        if cached and cached[0] == stat.st_size and cached[1] == stat.st_mtime_ns:
+            return cached[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(chunk)
+        result = digest.hexdigest()
+
+        with self.lock:
+            self.memo[key] = [stat.st_size, stat.st_mtime_ns, result]
+        return result
+
+    def hash_path(self, path: Path) -> Optional[str]:
+        """Hash a file, or a directory as the sorted list of (relative name, file hash)"""
+        if not path.exists():
+            return None
+        if path.is_file():
+            return self.hash_file(path)
+
+        digest = hashlib.sha256()
+        for child in sorted(p for p in path.rglob('*') if p.is_file()):
+            digest.update(str(child.relative_to(path)).encode())
+            digest.update(self.hash_file(child).encode())
+        return digest.hexdigest()
+
+
+class MatchRun:
+    """Tracks which stages of one match are fresh, runnable, running or done"""
+
+    def __init__(self, ctx: MatchContext, stages: List[Stage], force: Tuple[str, ...] = ()):
+        self.ctx = ctx
+        self.stages = {stage.name: stage for stage in stages}
+        self.order = [stage.name for stage in stages]
+        self.force = set(force)
+        self.state_path = ctx.match_dir / STATE_FILENAME
+        self.state = self._load_state()
+        self.hasher = ContentHasher(self.state.setdefault("hash_memo", {}))
+        self.journal = StageJournal(ctx.match_dir, "pipeline")
+        self.lock = threading.Lock()
+
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                self.producers[output] = stage.name
+
+        self.deps = {}
+        for stage in stages:
+            reads = stage.inputs + stage.optional_inputs
+            self.deps[stage.name] = {self.producers[p] for p in reads if p in self.producers} - {stage.name}
+
+        self.status = {name: "pending" for name in self.order}  # pending/running/ok/skipped/failed/blocked
+        self.results = {}
+        self.metrics = telemetry.MatchMetrics(ctx.match_id)
+
+    def _load_state(self) -> dict:
+        if self.state_path.exists():
+            try:
+                with open(self.state_path, 'r') as f:
+                    return json.load(f)
+            except (json.JSONDecodeError, OSError):
+                print(f"⚠️  Ignoring unreadable state file: {self.state_path}")
+        return {"stages": {}}
+
+    def save_state(self) -> None:
+        with self.lock, self.hasher.lock:
+            self.ctx.match_dir.mkdir(parents=True, exist_ok=True)
+            atomic_write_json(self.state_path, self.state)
+
+    def _hash_paths(self, rel_paths) -> Dict[str, Optional[str]]:
+        return {rel: self.hasher.hash_path(self.ctx.match_dir / rel) for rel in rel_paths}
+
+    def config_hash(self, stage: Stage) -> str:
+        """Hash of the stage code (prompts, models, settings) and its parameters"""
+        digest = hashlib.sha256()
+        for script in stage.code:
+            digest.update(script.encode())
+            digest.update(self.hasher.hash_file(PIPELINE_DIR / script).encode())
+        digest.update(json.dumps(stage.params(self.ctx), sort_keys=True).encode())
+        return digest.hexdigest()
+
+    def input_hashes(self, stage: Stage) -> Dict[str, Optional[str]]:
+        return self._hash_paths(stage.inputs + stage.optional_inputs)
+
+    def run_key(self, config_hash: str, inputs: Dict[str, Optional[str]]) -> str:
+        return hashlib.sha256(json.dumps([config_hash, inputs], sort_keys=True).encode()).hexdigest()
+
+    def is_fresh(self, stage: Stage) -> Tuple[bool, str]:
+        """Return (fresh, reason) by comparing hashes against the last successful run"""
+        if stage.name in self.force:
+            return False, "forced"
+
+        record = self.state["stages"].get(stage.name)
+        if record and record.get("status") == "partial":
+            return False, f"{record.get('unfinished_items')} items left to retry"
+        if not record or record.get("status") != "ok":
+            return False, "never completed"
+        if record.get("config_hash") != self.config_hash(stage):
+            return False, "stage code/config changed"
+        if record.get("inputs") != self.input_hashes(stage):
+            return False, "inputs changed"
+        if record.get("outputs") != self._hash_paths(stage.outputs):
+            return False, "outputs missing or modified"
+        return True, "up to date"
+
+    def ready_stages(self) -> List[str]:
+        """Pending stages whose dependencies have all finished successfully"""
+        ready = []
+        for name in self.order:
+            if self.status[name] != "pending":
+                continue
+            dep_states = [self.status[dep] for dep in self.deps[name]]
+            if any(state in ("failed", "blocked") for state in dep_states):
+                self.status[name] = "blocked"
+                continue
+            if all(state in ("ok", "skipped") for state in dep_states):
+                ready.append(name)
+        return ready
+
+    def finished(self) -> bool:
+        return all(state not in ("pending", "running") for state in self.status.values())
+
+    def check_missing_inputs(self, stage: Stage) -> List[str]:
+        return [rel for rel in stage.inputs
+                if rel not in self.producers and not (self.ctx.match_dir / rel).exists()]
+
+    def execute(self, name: str) -> str:
+        """Run (or skip) one stage and record the result. Returns the final status."""
+        stage = self.stages[name]
+        started = time.time()
+
+        if not stage.enabled(self.ctx):
+            print(f"⏭️  [{self.ctx.match_id}] {name}: disabled")
+            return self._finish(name, "skipped", started, "disabled")
+
+        if not stage.available(self.ctx):
+            missing = [rel for rel in stage.outputs if not (self.ctx.match_dir / rel).exists()]
+            if missing:
+                print(f"❌ [{self.ctx.match_id}] {name}: cannot run here and outputs are missing: {missing}")
+                return self._finish(name, "failed", started, "stage unavailable")
+            print(f"⏭️  [{self.ctx.match_id}] {name}: using existing outputs")
+            return self._finish(name, "skipped", started, "provided externally")
+
+        missing_inputs = self.check_missing_inputs(stage)
+        if missing_inputs:
+            print(f"❌ [{self.ctx.match_id}] {name}: missing inputs {missing_inputs}")
+            return self._finish(name, "failed", started, f"missing inputs: {missing_inputs}")
+
+        fresh, reason = self.is_fresh(stage)
+        if fresh:
+            print(f"⏭️  [{self.ctx.match_id}] {name}: cached ({reason})")
+            return self._finish(name, "skipped", started, reason)
+
+        config_hash = self.config_hash(stage)
+        inputs = self.input_hashes(stage)
+        run_key = self.run_key(config_hash, inputs)
+
+        # An interrupted or failed attempt with the same code and inputs picks up where it stopped
+        previous = self.journal.entries.get(name)
+        resuming = bool(previous and previous["status"] in ("running", "failed", "partial")
+                        and previous.get("run_key") == run_key and name not in self.force)
+        if resuming:
+            reason = {"running": "resuming after interruption", "failed": "resuming after failure",
+                      "partial": f"retrying {previous.get('unfinished_items')} unfinished items"}[previous["status"]]
+        print(f"▶️  [{self.ctx.match_id}] {name}: running ({reason})")
+
+        # Remove stale outputs and item journal so resume logic inside the stage
+        # cannot mask a prompt or input change
+        stale = reason != "never completed" or (previous and previous.get("run_key") != run_key)
+        if stale and not resuming:
+            for rel in stage.outputs:
+                target = self.ctx.match_dir / rel
+                if target.is_dir():
+                    shutil.rmtree(target)
+                elif target.exists():
+                    target.unlink()
+            StageJournal(self.ctx.match_dir, name).reset()
+        self.journal.record(name, "running", run_key=run_key)
+
+        with self.metrics.stage(name) as timing:
+            try:
+                ok = bool(stage.run(self.ctx))
+            except SystemExit as e:
+                ok = not e.code
+            except Exception as e:
+                print(f"❌ [{self.ctx.match_id}] {name} raised: {e}")
+                ok = False
+
+        if not ok:
+            self.journal.failed(name, "stage reported failure", run_key=run_key)
+            return self._finish(name, "failed", started, "stage reported failure", timing)
+
+        # Failed or unfinished items in the stage's own journal: downstream stages run on what
+        # there is, but the stage stays stale and the next pass resumes it for just those items
+        counts = StageJournal(self.ctx.match_dir, name).counts()
+        unfinished = counts["failed"] + counts["pending"]
+        with self.lock:
+            self.state["stages"][name] = {
+                "status": "partial" if unfinished else "ok",
+                "config_hash": config_hash,
+                "inputs": inputs,
+                "outputs": self._hash_paths(stage.outputs),
+                "duration_seconds": round(time.time() - started, 2),
+                "finished_at": datetime.now().isoformat(),
+            }
+            if unfinished:
+                self.state["stages"][name]["unfinished_items"] = unfinished
+        self.save_state()
+        if unfinished:
+            self.journal.record(name, "partial", run_key=run_key, unfinished_items=unfinished)
+            print(f"🔁 [{self.ctx.match_id}] {name}: {unfinished} items failed - retried on the next run")
+            return self._finish(name, "ok", started, f"completed, {unfinished} items left to retry", timing)
+        self.journal.ok(name, run_key=run_key)
+        return self._finish(name, "ok", started, "completed", timing)
+
+    def _finish(self, name: str, status: str, started: float, reason: str, timing: dict = None) -> str:
+        seconds = round(time.time() - started, 2)
+        with self.lock:
+            self.status[name] = status
+            self.results[name] = {
+                "status": status,
+                "reason": reason,
+                "seconds": seconds,
+            }
+        self.metrics.stage_result(name, status, reason, seconds, timing)
+        return status
+
+    def write_metrics(self) -> None:
+        """metrics.json / metrics.prom for this run (see telemetry.py)"""
+        try:
+            path = self.metrics.write(self.ctx.match_dir)
+        except OSError as e:
+            print(f"⚠️  [{self.ctx.match_id}] could not write metrics: {e}")
+            return
+        self.metrics.print_summary()
+        print(f"📈 Metrics written to {path}")
+
+    def summary(self) -> None:
+        print(f"\n📊 Pipeline summary for {self.ctx.match_id}:")
+        icons = {"ok": "✅", "skipped": "⏭️ ", "failed": "❌", "blocked": "⛔", "pending": "⏸️ "}
+        for name in self.order:
+            result = self.results.get(name, {"status": self.status[name], "reason": "", "seconds": 0})
+            icon = icons.get(result["status"], "•")
+            print(f"   {icon} {name:<32} {result['status']:<8} {result['seconds']:>8.1f}s  {result['reason']}")
+
+
+def _veo_url(ctx: MatchContext) -> Optional[str]:
+    """Veo URL from the command line, or from the metadata written by 1.1"""
+    if ctx.veo_url:
+        return ctx.veo_url
+    meta_path = ctx.match_dir / "meta" / "match_meta.json"
+    if meta_path.exists():
+        with open(meta_path, 'r') as f:
+            url = json.load(f).get("input", "")
+        if url.startswith("http"):
+            return url
+    return None
+
+
+def _run_fetch_veo(ctx):
+    return load_stage_module("1.1_fetch_veo.py").fetch_match(ctx.veo_url, str(ctx.match_dir)) == 0
+
+
+def _run_download_video(ctx):
+    return load_stage_module("1.2_download_video.py").download_video_with_sample(
+        _veo_url(ctx), ctx.match_id, ingest=_ingest())
+
+
+def _ingest():
+    """Cut 1.4_clips while 1.2 downloads (CLANN_INGEST=0 to turn off); VEO windows are cut by 1.4 anyway"""
+    return os.getenv('CLANN_INGEST', '1') != '0' and _windowing() == "fixed"
+
+
+def _run_make_clips(ctx):
+    return load_stage_module("1.4_make_clips.py").generate_clips(ctx.match_id, windowing=_windowing())
+
+
+def _windowing():
+    """CLANN_WINDOWS=veo cuts variable windows around VEO goals/shots (default fixed 15s clips)"""
+    return os.getenv('CLANN_WINDOWS', 'fixed')
+
+
+def _run_make_hls(ctx):
+    return load_stage_module("1.25_make_hls.py").make_hls(ctx.match_id, os.getenv('CLANN_HLS_PRESET', 'veryfast'))
+
+
+def _run_make_proxies(ctx):
+    return load_stage_module("1.45_make_proxies.py").make_proxies(ctx.match_id, _proxy_profile())
+
+
+def _proxy_profile():
+    return os.getenv('CLANN_PROXY_PROFILE', 'balanced')
+
+
+def _run_analyze_clips(ctx):
+    triage = _triage_settings()
+    return load_stage_module("1.5_analyze_clips.py").SimpleClipAnalyzer().analyze_all_clips(
+        ctx.match_id, triage["mode"], triage["threshold"], _batch_size())
+
+
+def _run_stream_clips(ctx):
+    triage = _triage_settings()
+    return load_stage_module("1.5_analyze_clips.py").SimpleClipAnalyzer().analyze_streaming(
+        ctx.match_id, triage["mode"], triage["threshold"], _batch_size(), _proxy_profile(), _windowing())
+
+
+def _streaming():
+    """CLANN_STREAM=1 fuses 1.4, 1.45 and 1.5: each clip is analyzed as soon as it is cut"""
+    return os.getenv('CLANN_STREAM', '0') == '1'
+
+
+def _batch_size():
+    """CLANN_BATCH_CLIPS=N packs N consecutive clips into each 1.5 Gemini request"""
+    return int(os.getenv('CLANN_BATCH_CLIPS', 1))
+
+
+def _triage_settings():
+    """CLANN_TRIAGE=0 turns off scoring in 1.4; CLANN_TRIAGE_MODE=skip|cheap|last acts on it in 1.5"""
+    return {
+        "enabled": os.getenv('CLANN_TRIAGE', '1') != '0',
+        "mode": os.getenv('CLANN_TRIAGE_MODE') or None,
+        "threshold": float(os.getenv('CLANN_TRIAGE_THRESHOLD', 0.2)),
+    }
+
+
+def _run_synthesis(ctx):
+    return load_stage_module("1.6_synthesis.py").synthesize_timeline(ctx.match_id)
+
+
+def _run_events_synthesizer(ctx):
+    return load_stage_module("2.5_events_synthesizer.py").MegaAnalyzer().analyze_match(ctx.match_id)
+
+
+def _run_focused_events(ctx):
+    return load_stage_module("2.6_focused_events.py").FocusedEventsAnalyzer().analyze_match(ctx.match_id)
+
+
+def _run_format_webapp(ctx):
+    return load_stage_module("3.1_format_webapp.py").format_match_for_webapp(ctx.match_id)
+
+
+def _run_make_thumbnails(ctx):
+    return load_stage_module("3.15_make_thumbnails.py").make_thumbnails(ctx.match_id)
+
+
+def _run_render_highlights(ctx):
+    return load_stage_module("3.16_render_highlights.py").render_highlights(ctx.match_id)
+
+
+def _run_tactical_formatter(ctx):
+    return load_stage_module("3.2_tactical_formatter.py").format_tactical_analysis(ctx.match_id)
+
+
+def _run_training_recommendations(ctx):
+    return load_stage_module("3.3_training_recommendations.py").generate_training_recommendations(ctx.match_id)
+
+
+def _run_s3_uploader(ctx):
+    return load_stage_module("3.5_s3_uploader.py").upload_match_to_s3(ctx.match_id)
+
+
+def _run_api_upload(ctx):
+    return load_stage_module("3.7_api_upload.py").upload_match_via_api(ctx.match_id, ctx.base_url, ctx.no_auth)
+
+
+S3_UPLOAD_FILES = (
+    "3.1_web_events_array.json", "3.1_match_metadata.json", "3.1_webapp_complete.json",
+    "3.2_tactical_analysis.json", "3.3_training_recommendations.json",
+    "2.6_focused_events.txt", "2.6_focused_tactical.txt", "2.6_focused_summary.txt",
+    "2.5_mega_events.txt", "2.5_mega_tactical.txt", "2.5_mega_summary.txt", "2.5_mega_analysis_full.txt",
+    "1.6_complete_timeline.txt", "1_team_config.json", "1_veo_ground_truth.json", "video.mp4", "1.25_hls",
+    "3.15_thumbnails", "3.16_highlights",
+)
+
+
+def _clip_stages() -> List[Stage]:
+    """1.4 → 1.45 → 1.5, each stage waiting for the whole of the one before"""
+    return [
+        Stage("1.4_make_clips", _run_make_clips,
+              inputs=("video.mp4",),
+              # VEO windows are planned from the ground truth, fixed clips don't need it
+              optional_inputs=("1_veo_ground_truth.json",) if _windowing() == "veo" else (),
+              outputs=("1.4_clips",),
+              code=("1.4_make_clips.py", "clip_triage.py", "analysis_windows.py"),
+              params=lambda ctx: {"triage": _triage_settings()["enabled"], "windows": _windowing()}),
+        Stage("1.45_make_proxies", _run_make_proxies,
+              inputs=("1.4_clips",),
+              outputs=("1.45_proxies",),
+              code=("1.45_make_proxies.py",),
+              params=lambda ctx: {"profile": _proxy_profile()}),
+        Stage("1.5_analyze_clips", _run_analyze_clips,
+              inputs=("1.4_clips", "1_team_config.json"),
+              optional_inputs=("1.45_proxies",),
+              outputs=("1.5_clip_descriptions",),
+              code=("1.5_analyze_clips.py", "clip_records.py"),
+              params=lambda ctx: {**{k: v for k, v in _triage_settings().items() if k != "enabled"},
+                                  "batch": _batch_size(), "format": os.getenv('CLANN_CLIP_FORMAT', 'json')}),
+    ]
+
+
+def _streamed_clip_stages() -> List[Stage]:
+    """CLANN_STREAM=1: one stage cuts, proxies and analyzes clip by clip
+
+    It keeps 1.5's name (and so its item journal, partial runs and --until
+    1.5) but owns the 1.4 and 1.45 outputs too. Triage, proxies and batching
+    are the same as in the separate stages; a CLANN_TRIAGE_MODE holds the
+    Gemini calls until 1.4 has scored the whole match.
+    """
+    return [
+        Stage("1.5_analyze_clips", _run_stream_clips,
+              inputs=("video.mp4", "1_team_config.json"),
+              optional_inputs=("1_veo_ground_truth.json",) if _windowing() == "veo" else (),
+              outputs=("1.4_clips", "1.45_proxies", "1.5_clip_descriptions"),
+              code=("1.4_make_clips.py", "clip_triage.py", "analysis_windows.py", "1.45_make_proxies.py",
+                    "1.5_analyze_clips.py", "clip_records.py"),
+              params=lambda ctx: {**_triage_settings(), "windows": _windowing(), "profile": _proxy_profile(),
+                                  "batch": _batch_size(), "format": os.getenv('CLANN_CLIP_FORMAT', 'json'),
+                                  "stream": True}),
+    ]
+
+
+def build_stages(publish: bool = False) -> List[Stage]:
+    """The v5 pipeline graph. 1.3 and 1.0 are interactive and must be run by hand first."""
+    stages = [
+        Stage("1.1_fetch_veo", _run_fetch_veo,
+              outputs=("1_veo_ground_truth.json", "meta/match_meta.json"),
+              params=lambda ctx: {"veo_url": ctx.veo_url},
+              available=lambda ctx: bool(ctx.veo_url)),
+        # Code is deliberately not hashed here: editing 1.2 must not re-download 3GB.
+        # Neither is _ingest(): it only decides whether 1.4's clips are cut during the download
+        Stage("1.2_download_video", _run_download_video,
+              inputs=("meta/match_meta.json",),
+              outputs=("video.mp4", "sample_clip.mp4"),
+              params=lambda ctx: {"veo_url": _veo_url(ctx), "format": "standard-1080p"},
+              available=lambda ctx: bool(_veo_url(ctx))),
+    ] + (_streamed_clip_stages() if _streaming() else _clip_stages()) + [
+        Stage("1.6_synthesis", _run_synthesis,
+              inputs=("1.5_clip_descriptions",),
+              outputs=("1.6_complete_timeline.txt", "1.6_timeline.jsonl", "1.6_events.npz"),
+              code=("1.6_synthesis.py", "timeline_store.py", "clip_records.py")),
+        Stage("2.5_events_synthesizer", _run_events_synthesizer,
+              inputs=("1.6_complete_timeline.txt", "1.6_timeline.jsonl", "1.6_events.npz",
+                      "1_veo_ground_truth.json", "1_team_config.json"),
+              optional_inputs=("meta/match_meta.json",),
+              outputs=("2.5_mega_events.txt", "2.5_mega_tactical.txt", "2.5_mega_summary.txt",
+                       "2.5_mega_analysis_full.txt"),
+              code=("2.5_events_synthesizer.py", "event_mapreduce.py", "timeline_store.py"),
+              params=lambda ctx: {"synthesis": os.getenv('CLANN_SYNTHESIS', 'auto')}),
+        Stage("2.6_focused_events", _run_focused_events,
+              inputs=("1.6_complete_timeline.txt", "1.6_timeline.jsonl", "1.6_events.npz",
+                      "1_veo_ground_truth.json", "1_team_config.json"),
+              outputs=("2.6_focused_events.txt", "2.6_focused_summary.txt", "2.6_focused_tactical.txt"),
+              code=("2.6_focused_events.py", "event_mapreduce.py", "focused_rules.py", "timeline_store.py"),
+              params=lambda ctx: {"synthesis": os.getenv('CLANN_SYNTHESIS', 'auto'),
+                                  "extract": os.getenv('CLANN_FOCUSED_EXTRACT', 'rules')}),
+        Stage("3.1_format_webapp", _run_format_webapp,
+              inputs=("2.6_focused_events.txt", "2.6_focused_summary.txt", "1_team_config.json"),
+              outputs=("3.1_web_events_array.json", "3.1_match_metadata.json", "3.1_webapp_complete.json"),
+              code=("3.1_format_webapp.py",)),
+        # 1.4_sprites is only a shortcut (1.4's triage decode); 3.15 decodes itself without it
+        Stage("3.15_make_thumbnails", _run_make_thumbnails,
+              inputs=("video.mp4", "3.1_web_events_array.json"),
+              optional_inputs=("1.4_sprites",),
+              outputs=("3.15_thumbnails",),
+              code=("3.15_make_thumbnails.py", "video_thumbnails.py"),
+              enabled=lambda ctx: os.getenv('CLANN_THUMBNAILS', '1') != '0'),
+        Stage("3.16_render_highlights", _run_render_highlights,
+              inputs=("video.mp4", "3.1_web_events_array.json"),
+              outputs=("3.16_highlights",),
+              code=("3.16_render_highlights.py", "keyframe_index.py"),
+              params=lambda ctx: {"preset": os.getenv('CLANN_HIGHLIGHTS_PRESET', 'veryfast')},
+              enabled=lambda ctx: os.getenv('CLANN_HIGHLIGHTS', '1') != '0'),
+        Stage("3.2_tactical_formatter", _run_tactical_formatter,
+              inputs=("2.6_focused_tactical.txt", "2.6_focused_summary.txt", "1_team_config.json"),
+              outputs=("3.2_tactical_analysis.json",),
+              code=("3.2_tactical_formatter.py",)),
+        Stage("3.3_training_recommendations", _run_training_recommendations,
+              inputs=("3.2_tactical_analysis.json",),
+              optional_inputs=("2.6_focused_summary.txt",),
+              outputs=("3.3_training_recommendations.json",),
+              code=("3.3_training_recommendations.py",)),
+        # Only 3.5 reads the ladder: listed last so --until an analysis stage doesn't encode it.
+        # It still starts as soon as video.mp4 exists, alongside 1.4
+        Stage("1.25_make_hls", _run_make_hls,
+              inputs=("video.mp4",),
+              outputs=("1.25_hls",),
+              code=("1.25_make_hls.py",),
+              params=lambda ctx: {"preset": os.getenv('CLANN_HLS_PRESET', 'veryfast')},
+              enabled=lambda ctx: os.getenv('CLANN_HLS', '1') != '0'),
+    ]
+
+    if publish:
+        stages += [
+            Stage("3.5_s3_uploader", _run_s3_uploader,
+                  inputs=("3.1_web_events_array.json",),
+                  optional_inputs=S3_UPLOAD_FILES,
+                  outputs=("3.5_s3_locations.json", "3.5_s3_core_locations.json"),
+                  code=("3.5_s3_uploader.py", "s3_sync.py", "publish_manifest.py")),
+            Stage("3.7_api_upload", _run_api_upload,
+                  inputs=("3.5_s3_core_locations.json", "website_game_id.txt"),
+                  code=("3.7_api_upload.py", "website_api.py", "publish_manifest.py"),
+                  params=lambda ctx: {"base_url": ctx.base_url, "no_auth": ctx.no_auth}),
+        ]
+
+    return stages
+
+
+def stage_matches(name: str, key: str) -> bool:
+    """`key` is a full stage name or just its number: "1.4" is 1.4_make_clips, not 1.45_make_proxies"""
+    return name == key or name.startswith(f"{key}_")
+
+
+def select_stages(stages: List[Stage], until: Optional[str] = None) -> List[Stage]:
+    """Keep stages up to and including the one `until` names (see stage_matches)"""
+    if not until:
+        return stages
+    for i, stage in enumerate(stages):
+        if stage_matches(stage.name, until):
+            return stages[:i + 1]
+    raise ValueError(f"Unknown stage: {until}")
+
+
+def run_match(ctx: MatchContext, stages: List[Stage], max_workers: int = 4,
+              force: Tuple[str, ...] = ()) -> bool:
+    """Run the graph for one match, executing independent stages concurrently"""
+    os.chdir(PIPELINE_DIR)  # stages resolve ../outputs relative to the pipeline dir
+    run = MatchRun(ctx, stages, force)
+
+    print(f"🧭 Running {len(stages)} stages for {ctx.match_id} ({max_workers} workers)")
+    pipeline_start = time.time()
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        running = {}
+        while True:
+            for name in run.ready_stages():
+                run.status[name] = "running"
+                running[executor.submit(run.execute, name)] = name
+
+            if not running:
+                break
+
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                running.pop(future)
+                future.result()
+
+    run.save_state()
+    run.summary()
+    run.write_metrics()
+    print(f"⏱️  Total time: {time.time() - pipeline_start:.1f} seconds")
+    return all(state in ("ok", "skipped") for state in run.status.values())
+
+
+def resolve_match(match_or_url: str) -> MatchContext:
+    """Accept either a Veo URL (match id derived like 1.1 does) or an existing match id"""
+    if match_or_url.startswith("http"):
+        match_id = load_stage_module("1.1_fetch_veo.py").derive_match_id(match_or_url)
+        return MatchContext(match_id=match_id, veo_url=match_or_url)
+    return MatchContext(match_id=match_or_url)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the v5 pipeline as a cached dependency graph")
+    parser.add_argument("match", help="Match ID (existing outputs dir) or Veo match URL")
+    parser.add_argument("--until", default=None, help="Stop after this stage (e.g. 1.6, 3.2)")
+    parser.add_argument("--publish", action="store_true", help="Also run 3.5 S3 upload and 3.7 API upload")
+    parser.add_argument("--force", nargs="*", default=[], help="Stage names to re-run even if cached")
+    parser.add_argument("--jobs", type=int, default=4, help="Maximum stages running at once")
+    parser.add_argument("--base-url", default="http://localhost:3001", help="Website API base URL for 3.7")
+    parser.add_argument("--auth", action="store_true", help="Use authenticated API endpoints in 3.7")
+    args = parser.parse_args()
+
+    ctx = resolve_match(args.match)
+    ctx.base_url = args.base_url
+    ctx.no_auth = not args.auth
+
+    try:
+        stages = select_stages(build_stages(publish=args.publish), args.until)
+    except ValueError as e:
+        print(f"❌ {e}")
+        sys.exit(1)
+
+    force = tuple(stage.name for stage in stages if any(stage_matches(stage.name, f) for f in args.force))
+    success = run_match(ctx, stages, max_workers=args.jobs, force=force)
+
+    if success:
+        print("🎉 Pipeline run complete!")
+    else:
+        print("❌ Pipeline run finished with failures")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
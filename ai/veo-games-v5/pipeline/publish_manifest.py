@@ -0,0 +1,86 @@
+#!/usr/bin/env python3
+"""
+Per-match publish manifest: outputs/<match-id>/publish_manifest.json
+
+What the publishing stages last put out for a match:
+- "artifacts" (3.5): every object in S3 - local path, size, SHA-256, content
+  type and encoding, S3 key, ETag, URL
+- "api" (3.7): every upload-* call the website accepted - game, base URL,
+  route, S3 URL, and the SHA-256 of the artifact behind it
+- "metadata" (3.8): the s3_files written into games.metadata
+
+Each stage diffs what it is about to publish against its section and only
+sends what changed, then swaps the new manifest in atomically
+(atomic_write_json) once its calls have gone through - a failed call leaves the old
+entry, so it is retried next time. CLANN_PUBLISH_FORCE=1 republishes
+everything.
+
+Not a stage output on purpose: the runner deletes outputs before a rerun.
+"""
+
+import os
+import json
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+
+from stage_journal import atomic_write_json
+
+MANIFEST_FILENAME = "publish_manifest.json"
+SECTIONS = ("artifacts", "api", "metadata")
+
+_lock = threading.Lock()
+
+
+def force() -> bool:
+    return os.getenv('CLANN_PUBLISH_FORCE', '0') == '1'
+
+
+def load(data_dir: Path) -> dict:
+    try:
+        with open(Path(data_dir) / MANIFEST_FILENAME, 'r') as f:
+            manifest = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        manifest = {}
+    for section in SECTIONS:
+        manifest.setdefault(section, {})
+    return manifest
+
+
+def update(data_dir: Path, section: str, entries: dict, replace: bool = False) -> dict:
+    """Merge (or replace) one section and atomically swap the manifest file in"""
+    path = Path(data_dir) / MANIFEST_FILENAME
+    with _lock:
+        manifest = load(data_dir)
+        manifest[section] = dict(entries) if replace else {**manifest[section], **entries}
+        manifest["match_id"] = Path(data_dir).name
+        manifest["updated_at"] = datetime.now().isoformat()
+        atomic_write_json(path, manifest)
+    return manifest
+
+
+def digest(value) -> str:
+    """SHA-256 of a JSON-able value (key order doesn't matter)"""
+    return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+
+
+def diff(previous: dict, current: dict, fields: tuple) -> dict:
+    """{"added", "changed", "unchanged", "removed"} names between two sections, comparing fields"""
+    result = {"added": [], "changed": [], "unchanged": [], "removed": sorted(set(previous) - set(current))}
+    for name, entry in current.items():
+        if name not in previous:
+            result["added"].append(name)
+        elif all(previous[name].get(field) == entry.get(field) for field in fields):
+            result["unchanged"].append(name)
+        else:
+            result["changed"].append(name)
+    return result
+
+
+def sha256_for_url(manifest: dict, url: str):
+    """SHA-256 of the artifact 3.5 published at url, or None if it isn't in the manifest"""
+    for entry in manifest["artifacts"].values():
+        if entry.get("url") == url:
+            return entry.get("sha256")
+    return None
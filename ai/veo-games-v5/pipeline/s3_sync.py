@@ -0,0 +1,255 @@
+#!/usr/bin/env python3
+"""
+Idempotent, parallel S3 sync used by 3.5_s3_uploader.py
+
+sync_files() uploads a set of local files to keys in one bucket:
+- several files at once (CLANN_S3_WORKERS, default 4), each as a multipart
+  upload in CLANN_S3_CHUNK_MB parts (default 16) sent CLANN_S3_PART_THREADS at
+  a time (default 8), paced by the shared budgets.s3_bandwidth
+- objects already in the bucket with the same size and MD5 are not re-sent.
+  The MD5 travels as x-amz-meta-md5 (so it survives multipart ETags), and
+  objects uploaded before that are compared by ETag: plain MD5, or the
+  multipart MD5-of-part-MD5s at our chunk size
+- a per-match manifest (3.5_upload_manifest.json) remembers each file's size,
+  mtime, MD5, SHA-256 and ETag, so an unchanged file costs no hashing and no request
+  on a re-run (CLANN_S3_VERIFY=1 still HEADs every object)
+
+precompress_json() makes the minified gzip / brotli copies 3.5 uploads with
+Content-Encoding; the manifest records their source size and compression ratio.
+
+CLANN_S3_ENDPOINT points the client at an S3-compatible server instead of AWS,
+e.g. fake_s3_server.py or MinIO.
+"""
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import threading
+from pathlib import Path
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+import budgets
+import telemetry
+from stage_journal import atomic_write_bytes, atomic_write_json
+
+try:
+    import brotli
+except ImportError:  # optional - without it only gzip copies are made
+    brotli = None
+
+MANIFEST_FILENAME = "3.5_upload_manifest.json"
+MB = 1024 * 1024
+ENCODING_SUFFIXES = {"gzip": ".gz", "br": ".br"}
+
+_clients = {}
+_checked_buckets = set()
+_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+def sync_settings() -> dict:
+    return {
+        "workers": _env_int('CLANN_S3_WORKERS', 4),
+        "part_threads": _env_int('CLANN_S3_PART_THREADS', 8),
+        "chunk_bytes": _env_int('CLANN_S3_CHUNK_MB', 16) * MB,
+        "verify": os.getenv('CLANN_S3_VERIFY', '0') == '1',
+    }
+
+
+def get_s3_client(region: str):
+    """One boto3 client per process and region (clients are thread-safe)"""
+    endpoint = os.getenv('CLANN_S3_ENDPOINT') or None
+    with _lock:
+        if (region, endpoint) not in _clients:
+            settings = sync_settings()
+            config = Config(max_pool_connections=settings["workers"] * settings["part_threads"] + 4,
+                            retries={"max_attempts": 5, "mode": "adaptive"})
+            if endpoint:
+                # Local stand-ins don't resolve <bucket>.<host>
+                config = config.merge(Config(s3={"addressing_style": "path"}))
+            kwargs = {}
+            if os.getenv('AWS_ACCESS_KEY_ID'):
+                kwargs = {"aws_access_key_id": os.getenv('AWS_ACCESS_KEY_ID'),
+                          "aws_secret_access_key": os.getenv('AWS_SECRET_ACCESS_KEY')}
+            _clients[(region, endpoint)] = boto3.client('s3', region_name=region, endpoint_url=endpoint,
+                                                        config=config, **kwargs)
+        return _clients[(region, endpoint)]
+
+
+def check_bucket(client, bucket: str):
+    """Fail early on bad credentials - once per process and bucket, not per uploader"""
+    with _lock:
+        if bucket in _checked_buckets:
+            return
+    try:
+        client.head_bucket(Bucket=bucket)
+    except ClientError as e:
+        # A missing bucket still proves the credentials work
+        if e.response.get("Error", {}).get("Code") not in ("404", "NoSuchBucket"):
+            raise
+    with _lock:
+        _checked_buckets.add(bucket)
+
+
+def file_digests(path: Path, chunk_bytes: int) -> tuple:
+    """(MD5 hex, the ETag S3 gives it when uploaded in chunk_bytes parts, SHA-256 hex) in one read"""
+    whole = hashlib.md5()
+    sha256 = hashlib.sha256()
+    parts = []
+    with open(path, 'rb') as f:
+        while True:
+            block = f.read(chunk_bytes)
+            if not block:
+                break
+            whole.update(block)
+            sha256.update(block)
+            parts.append(hashlib.md5(block).digest())
+    md5 = whole.hexdigest()
+    if len(parts) <= 1 and path.stat().st_size < chunk_bytes:
+        return md5, md5, sha256.hexdigest()
+    return md5, f"{hashlib.md5(b''.join(parts)).hexdigest()}-{len(parts)}", sha256.hexdigest()
+
+
+def precompress_json(path: Path, out_dir: Path) -> dict:
+    """Minified gzip (and brotli, when installed) copies of a JSON file; returns {encoding: path}
+
+    Same input, same bytes (gzip mtime is fixed), and a copy is only rewritten
+    when its bytes change - so the manifest keeps treating it as unchanged.
+    """
+    with open(path, 'r') as f:
+        minified = json.dumps(json.load(f), separators=(',', ':')).encode()
+    variants = {"gzip": gzip.compress(minified, compresslevel=9, mtime=0)}
+    if brotli:
+        variants["br"] = brotli.compress(minified, mode=brotli.MODE_TEXT, quality=11)
+
+    out_dir.mkdir(parents=True, exist_ok=True)
+    paths = {}
+    for encoding, data in variants.items():
+        target = out_dir / (path.name + ENCODING_SUFFIXES[encoding])
+        if not target.exists() or target.read_bytes() != data:
+            atomic_write_bytes(target, data)
+        paths[encoding] = target
+    return paths
+
+
+def load_manifest(path: Path) -> dict:
+    try:
+        with open(path, 'r') as f:
+            return json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return {}
+
+
+def _remote_matches(client, bucket: str, key: str, size: int, md5: str, etag: str) -> bool:
+    try:
+        head = client.head_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response.get("Error", {}).get("Code") in ("404", "NoSuchKey", "NotFound"):
+            return False
+        raise
+    if head.get("ContentLength") != size:
+        return False
+    remote_md5 = head.get("Metadata", {}).get("md5")
+    if remote_md5:
+        return remote_md5 == md5
+    return head.get("ETag", "").strip('"') in (md5, etag)
+
+
+def _sync_one(client, bucket, job, previous, settings, transfer_config):
+    """Upload one file unless the bucket already has it; returns its manifest entry"""
+    path, key = job["path"], job["key"]
+    stat = path.stat()
+    local = {"key": key, "size": stat.st_size, "mtime_ns": stat.st_mtime_ns,
+             "content_encoding": job.get("content_encoding")}
+
+    unchanged = previous and all(previous.get(k) == v for k, v in local.items()) \
+        and previous.get("chunk_bytes") == settings["chunk_bytes"] and previous.get("sha256")
+    if unchanged and not settings["verify"]:
+        telemetry.count("s3_objects", result="unchanged")
+        return {**previous, "result": "unchanged"}
+
+    if unchanged:
+        md5, etag, sha256 = previous["md5"], previous["etag"], previous["sha256"]
+    else:
+        md5, etag, sha256 = file_digests(path, settings["chunk_bytes"])
+    entry = {**local, "md5": md5, "etag": etag, "sha256": sha256, "chunk_bytes": settings["chunk_bytes"],
+             "content_type": job.get("content_type")}
+    if job.get("source_size"):
+        entry["source_size"] = job["source_size"]
+        entry["compression_ratio"] = round(job["source_size"] / max(stat.st_size, 1), 2)
+
+    if _remote_matches(client, bucket, key, stat.st_size, md5, etag):
+        telemetry.count("s3_objects", result="skipped")
+        return {**entry, "result": "skipped", "synced_at": (previous or {}).get("synced_at")
+                or datetime.now().isoformat()}
+
+    extra_args = {"CacheControl": "max-age=31536000", "Metadata": {"md5": md5}}
+    if job.get("content_type"):
+        extra_args["ContentType"] = job["content_type"]
+    if job.get("content_encoding"):
+        extra_args["ContentEncoding"] = job["content_encoding"]
+    print(f"   📤 Uploading {path.name} ({stat.st_size / MB:.1f}MB)")
+    started = time.monotonic()
+    client.upload_file(str(path), bucket, key, ExtraArgs=extra_args, Config=transfer_config,
+                       Callback=budgets.s3_throttle_callback())
+    telemetry.observe("s3.upload", time.monotonic() - started)
+    telemetry.count("bytes_uploaded", stat.st_size, target="s3")
+    telemetry.count("s3_objects", result="uploaded")
+    return {**entry, "result": "uploaded", "synced_at": datetime.now().isoformat()}
+
+
+def sync_files(client, bucket: str, jobs: list, manifest_path: Path) -> dict:
+    """Upload jobs [{name, path, key, content_type}]; returns {name: manifest entry or {"error": ...}}
+
+    Pre-compressed jobs also carry content_encoding and source_size (the
+    uncompressed file). The manifest is rewritten with every successful entry,
+    keyed by name, plus the overall compression of the encoded files.
+    """
+    settings = sync_settings()
+    transfer_config = TransferConfig(multipart_threshold=settings["chunk_bytes"],
+                                     multipart_chunksize=settings["chunk_bytes"],
+                                     max_concurrency=settings["part_threads"], use_threads=True)
+    manifest = load_manifest(manifest_path)
+    previous_files = manifest.get("files", {}) if manifest.get("bucket") == bucket else {}
+
+    def run(job):
+        try:
+            return job["name"], _sync_one(client, bucket, job, previous_files.get(job["name"]),
+                                          settings, transfer_config)
+        except Exception as e:
+            print(f"   ❌ Failed to upload {job['path'].name}: {e}")
+            telemetry.count("errors", kind="s3.upload")
+            return job["name"], {"error": str(e)}
+
+    # Largest first so the video starts while the small JSON files fill the other workers
+    ordered = sorted(jobs, key=lambda job: job["path"].stat().st_size, reverse=True)
+    with ThreadPoolExecutor(max_workers=settings["workers"], thread_name_prefix="s3-sync") as pool:
+        results = dict(pool.map(telemetry.bind(run), ordered))
+
+    files = {name: {k: v for k, v in entry.items() if k != "result"}
+             for name, entry in results.items() if "error" not in entry}
+    compressed = [entry for entry in files.values() if entry.get("source_size")]
+    source_bytes = sum(entry["source_size"] for entry in compressed)
+    upload_bytes = sum(entry["size"] for entry in compressed)
+    atomic_write_json(manifest_path, {
+        "bucket": bucket,
+        "updated_at": datetime.now().isoformat(),
+        "compression": {"files": len(compressed), "source_bytes": source_bytes, "upload_bytes": upload_bytes,
+                        "ratio": round(source_bytes / upload_bytes, 2) if upload_bytes else None},
+        "files": files,
+    })
+    return results
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Crash-safe writes and per-stage status journals
+
+atomic_write_bytes() / atomic_write_text() / atomic_write_json() write to a
+temp file in the same directory, fsync it and os.replace() it over the target,
+so a crash leaves either the old file or the new one - never half of one.
+Every v5 stage and helper module writes its artifacts through them.
+
+StageJournal is an append-only log, outputs/<match-id>/.journal/<stage>.jsonl,
+with one line per item status change: pending, ok (plus the size of every
+output it wrote) or failed (plus the reason). Appends are fsynced, and a torn
+last line from a crash is ignored on load. An item counts as done only when
+its last status is ok and those outputs are still on disk at the recorded
+size. A re-run therefore retries just the failed, pending and missing items.
+1.4 journals its clips and 1.5 its descriptions.
+
+pipeline_runner.py keeps the stage-level journal (.journal/pipeline.jsonl):
+running / ok / partial / failed for each stage, with the hash of the code and
+inputs it ran with (partial: it finished, but its item journal still has
+failed or pending items). An interrupted or partial stage that is re-run with
+the same hash keeps its outputs and item journal, and resumes. A different hash starts it afresh: the
+runner clears the stage's outputs and resets its item journal. .journal/
+itself is no stage's output, so clearing outputs never takes it with them.
+"""
+
+import os
+import json
+import threading
+from pathlib import Path
+from datetime import datetime
+
+JOURNAL_DIRNAME = ".journal"
+STATUSES = ("pending", "running", "ok", "partial", "failed")
+
+
+def atomic_write_bytes(path, data: bytes) -> Path:
+    """Replace `path` with `data` in one step (tmp file + fsync + os.replace)"""
+    path = Path(path)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{threading.get_ident()}.tmp")
+    try:
+        with open(tmp_path, 'wb') as f:
+            f.write(data)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+    return path
+
+
+def atomic_write_text(path, text: str, encoding: str = "utf-8") -> Path:
+    return atomic_write_bytes(path, text.encode(encoding))
+
+
+def atomic_write_json(path, data, indent=2, **dump_kwargs) -> Path:
+    return atomic_write_text(path, json.dumps(data, indent=indent, **dump_kwargs))
+
+
+class StageJournal:
+    """Per-item pending / ok / failed log for one stage of one match"""
+
+    def __init__(self, data_dir, stage: str):
+        self.data_dir = Path(data_dir)
+        self.stage = stage
+        self.path = self.data_dir / JOURNAL_DIRNAME / f"{stage}.jsonl"
+        self.lock = threading.Lock()
+        self.entries = self._load()
+
+    def _load(self) -> dict:
+        entries, lines = {}, 0
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    lines += 1
+                    try:
+                        entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # torn write from a crash
+                    if isinstance(entry, dict) and entry.get("status") in STATUSES and "item" in entry:
+                        entries[entry["item"]] = entry
+        except OSError:
+            return {}
+        # Keep the log short: one line per item once it has grown well past that
+        if lines > 2 * len(entries) + 100:
+            atomic_write_text(self.path, "".join(json.dumps(e) + "\n" for e in entries.values()))
+        return entries
+
+    def record(self, item: str, status: str, reason: str = None, outputs=(), **extra) -> dict:
+        """Append one status line for `item`; outputs are paths under the match folder"""
+        entry = {"item": item, "status": status, "at": datetime.now().isoformat(timespec="seconds")}
+        if reason:
+            entry["reason"] = str(reason)[:500]
+        if outputs:
+            base = self.data_dir.resolve()
+            entry["outputs"] = {Path(p).resolve().relative_to(base).as_posix(): Path(p).stat().st_size
+                                for p in outputs}
+        entry.update(extra)
+        line = json.dumps(entry) + "\n"
+        with self.lock:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line)
+                f.flush()
+                os.fsync(f.fileno())
+            self.entries[item] = entry
+        return entry
+
+    def pending(self, item: str, **extra) -> dict:
+        return self.record(item, "pending", **extra)
+
+    def ok(self, item: str, *outputs, **extra) -> dict:
+        return self.record(item, "ok", outputs=outputs, **extra)
+
+    def failed(self, item: str, reason, **extra) -> dict:
+        return self.record(item, "failed", reason=reason, **extra)
+
+    def status(self, item: str):
+        entry = self.entries.get(item)
+        return entry["status"] if entry else None
+
+    def is_done(self, item: str) -> bool:
+        """Last status ok and every output it recorded still there at the recorded size"""
+        entry = self.entries.get(item)
+        if not entry or entry["status"] != "ok":
+            return False
+        for rel, size in entry.get("outputs", {}).items():
+            try:
+                if (self.data_dir / rel).stat().st_size != size:
+                    return False
+            except OSError:
+                return False
+        return True
+
+    def counts(self) -> dict:
+        counts = {status: 0 for status in STATUSES}
+        for entry in self.entries.values():
+            counts[entry["status"]] += 1
+        return counts
+
+    def failures(self) -> dict:
+        return {item: entry.get("reason") for item, entry in self.entries.items() if entry["status"] == "failed"}
+
+    def reset(self):
+        """Forget every item (the stage is starting over with different inputs or code)"""
+        with self.lock:
+            if self.path.exists():
+                self.path.unlink()
+            self.entries = {}
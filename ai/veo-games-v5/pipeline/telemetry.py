@@ -0,0 +1,295 @@
+#!/usr/bin/env python3
+"""
+Pipeline telemetry - what each stage of a match took and cost
+
+pipeline_runner.py / batch_runner.py give every match a MatchMetrics and run
+each stage inside metrics.stage(name), which records wall and CPU time and
+sets a context variable for the stage thread. Work submitted from that thread
+(Gemini client coroutines, pools started through telemetry.bind) inherits it,
+so shared code reports without knowing which match it serves:
+    telemetry.observe("gemini.generate", seconds)      latency histogram
+    telemetry.count("bytes_uploaded", n, target="s3")   counter
+    telemetry.tokens(model, prompt, output, cached)     tokens + estimated cost
+Calls made outside a runner stage are not recorded.
+
+At the end of a run the runner writes, per match:
+- metrics.json           stages, call latency percentiles, counters, totals
+- metrics_history.jsonl  one line per run (stage wall/CPU, cost) to spot regressions
+- metrics.prom           Prometheus text format; also written to
+                         $CLANN_PROM_TEXTFILE_DIR/clann_<match-id>.prom for
+                         node_exporter's textfile collector when that is set
+"""
+
+import os
+import json
+import time
+import threading
+import contextvars
+from bisect import bisect_left
+from pathlib import Path
+from datetime import datetime
+from contextlib import contextmanager
+
+from stage_journal import atomic_write_text
+
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300)
+# Raw latencies kept per histogram for exact percentiles (benchmark_offline.py)
+MAX_SAMPLES = 10000
+
+# USD per 1M tokens, list prices for prompts up to 200k tokens (video bills as input)
+TOKEN_PRICES = {
+    "gemini-2.5-pro": {"input": 1.25, "cached": 0.31, "output": 10.00},
+    "gemini-2.5-flash": {"input": 0.30, "cached": 0.075, "output": 2.50},
+}
+
+_current = contextvars.ContextVar("clann_telemetry", default=None)
+
+
+class Histogram:
+    """Fixed-bucket latency histogram (Prometheus-style upper bounds, plus +Inf)"""
+
+    def __init__(self):
+        self.counts = [0] * (len(LATENCY_BUCKETS) + 1)
+        self.sum = 0.0
+        self.count = 0
+        self.samples = []
+
+    def observe(self, seconds):
+        self.counts[bisect_left(LATENCY_BUCKETS, seconds)] += 1
+        self.sum += seconds
+        self.count += 1
+        if len(self.samples) < MAX_SAMPLES:
+            self.samples.append(seconds)
+
+    def quantile(self, fraction):
+        """Upper bound of the bucket holding the quantile (None past the last bucket)"""
+        target = fraction * self.count
+        seen = 0
+        for bound, n in zip(LATENCY_BUCKETS + (None,), self.counts):
+            seen += n
+            if seen >= target:
+                return bound
+        return None
+
+    def sample_quantile(self, fraction):
+        """Exact quantile of the first MAX_SAMPLES observations (None when empty)"""
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+    def to_dict(self):
+        return {
+            "count": self.count,
+            "sum_seconds": round(self.sum, 3),
+            "mean_seconds": round(self.sum / self.count, 3) if self.count else None,
+            "p50_seconds": self.quantile(0.5),
+            "p90_seconds": self.quantile(0.9),
+            "p99_seconds": self.quantile(0.99),
+            "buckets": {str(bound): n for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), self.counts)},
+        }
+
+
+def _process_cpu_seconds():
+    times = os.times()
+    # Includes ffmpeg and other child processes once they have been waited for
+    return times.user + times.system + times.children_user + times.children_system
+
+
+class MatchMetrics:
+    """Everything recorded for one match during one runner invocation"""
+
+    def __init__(self, match_id: str):
+        self.match_id = match_id
+        self.started_at = datetime.now().isoformat()
+        self.lock = threading.Lock()
+        self.stages = {}      # stage -> {status, reason, wall/cpu seconds}
+        self.histograms = {}  # (kind, stage) -> Histogram
+        self.counters = {}    # (name, stage, sorted label items) -> value
+
+    @contextmanager
+    def stage(self, name: str):
+        """Attribute everything reported inside to `name`; yields a dict filled with its timings"""
+        timing = {}
+        token = _current.set((self, name))
+        wall, thread_cpu, process_cpu = time.monotonic(), time.thread_time(), _process_cpu_seconds()
+        try:
+            yield timing
+        finally:
+            _current.reset(token)
+            timing["wall_seconds"] = round(time.monotonic() - wall, 3)
+            timing["thread_cpu_seconds"] = round(time.thread_time() - thread_cpu, 3)
+            # Process-wide: overlapping stages (and the shared Gemini threads) are counted in each
+            timing["process_cpu_seconds"] = round(_process_cpu_seconds() - process_cpu, 3)
+
+    def stage_result(self, name: str, status: str, reason: str, seconds: float, timing: dict = None):
+        with self.lock:
+            self.stages[name] = {"status": status, "reason": reason, "wall_seconds": seconds, **(timing or {})}
+
+    def observe(self, kind: str, stage: str, seconds: float):
+        with self.lock:
+            self.histograms.setdefault((kind, stage), Histogram()).observe(seconds)
+
+    def count(self, name: str, stage: str, value, labels: dict):
+        key = (name, stage, tuple(sorted(labels.items())))
+        with self.lock:
+            self.counters[key] = self.counters.get(key, 0) + value
+
+    def total(self, name: str, **labels) -> float:
+        with self.lock:
+            return sum(value for (counter, _, items), value in self.counters.items()
+                       if counter == name and all(dict(items).get(k) == v for k, v in labels.items()))
+
+    def to_dict(self) -> dict:
+        with self.lock:
+            calls = {}
+            for (kind, stage), histogram in sorted(self.histograms.items()):
+                calls.setdefault(kind, {})[stage] = histogram.to_dict()
+            counters = [{"name": name, "stage": stage, "labels": dict(items), "value": round(value, 6)}
+                        for (name, stage, items), value in sorted(self.counters.items())]
+            stages = dict(self.stages)
+        return {
+            "match_id": self.match_id,
+            "started_at": self.started_at,
+            "finished_at": datetime.now().isoformat(),
+            "stages": stages,
+            "calls": calls,
+            "counters": counters,
+            "totals": {
+                "wall_seconds": round(sum(s["wall_seconds"] for s in stages.values() if s["status"] == "ok"), 3),
+                "cost_usd": round(self.total("cost_usd"), 4),
+                "tokens_input": int(self.total("tokens", kind="input")),
+                "tokens_output": int(self.total("tokens", kind="output")),
+                "tokens_cached": int(self.total("tokens", kind="cached")),
+                "bytes_uploaded": int(self.total("bytes_uploaded")),
+                "retries": int(self.total("retries")),
+            },
+        }
+
+    def to_prometheus(self) -> str:
+        """Prometheus text exposition format"""
+        match = _label_value(self.match_id)
+        lines = [
+            "# HELP clann_stage_wall_seconds Wall time of each stage in the last run",
+            "# TYPE clann_stage_wall_seconds gauge",
+        ]
+        with self.lock:
+            stages = sorted(self.stages.items())
+            histograms = sorted(self.histograms.items())
+            counters = sorted(self.counters.items())
+        for stage, result in stages:
+            lines.append(f'clann_stage_wall_seconds{{match="{match}",stage="{stage}",status="{result["status"]}"}} '
+                         f'{result["wall_seconds"]}')
+        lines += ["# HELP clann_stage_cpu_seconds CPU time of each stage (thread, or whole process incl. children)",
+                  "# TYPE clann_stage_cpu_seconds gauge"]
+        for stage, result in stages:
+            for scope in ("thread", "process"):
+                if f"{scope}_cpu_seconds" in result:
+                    lines.append(f'clann_stage_cpu_seconds{{match="{match}",stage="{stage}",scope="{scope}"}} '
+                                 f'{result[f"{scope}_cpu_seconds"]}')
+
+        lines += ["# HELP clann_call_duration_seconds Latency of Gemini, S3 and API calls (per attempt)",
+                  "# TYPE clann_call_duration_seconds histogram"]
+        for (kind, stage), histogram in histograms:
+            labels = f'match="{match}",stage="{stage}",kind="{kind}"'
+            cumulative = 0
+            for bound, n in zip(LATENCY_BUCKETS + ("+Inf",), histogram.counts):
+                cumulative += n
+                lines.append(f'clann_call_duration_seconds_bucket{{{labels},le="{bound}"}} {cumulative}')
+            lines.append(f"clann_call_duration_seconds_sum{{{labels}}} {histogram.sum:.6f}")
+            lines.append(f"clann_call_duration_seconds_count{{{labels}}} {histogram.count}")
+
+        typed = set()
+        for (name, stage, items), value in counters:
+            metric = f"clann_{name}_total"
+            if metric not in typed:
+                lines.append(f"# TYPE {metric} counter")
+                typed.add(metric)
+            labels = "".join(f',{key}="{_label_value(str(v))}"' for key, v in items)
+            value = int(value) if float(value).is_integer() else round(value, 6)
+            lines.append(f'{metric}{{match="{match}",stage="{stage}"{labels}}} {value}')
+        return "\n".join(lines) + "\n"
+
+    def write(self, match_dir: Path) -> Path:
+        """metrics.json, metrics.prom and a metrics_history.jsonl line; returns the json path"""
+        match_dir = Path(match_dir)
+        match_dir.mkdir(parents=True, exist_ok=True)
+        data = self.to_dict()
+        atomic_write_text(match_dir / "metrics.json", json.dumps(data, indent=2))
+        prometheus = self.to_prometheus()
+        atomic_write_text(match_dir / "metrics.prom", prometheus)
+
+        textfile_dir = os.getenv('CLANN_PROM_TEXTFILE_DIR')
+        if textfile_dir:
+            Path(textfile_dir).mkdir(parents=True, exist_ok=True)
+            atomic_write_text(Path(textfile_dir) / f"clann_{self.match_id}.prom", prometheus)
+
+        history = {"finished_at": data["finished_at"], "totals": data["totals"],
+                   "stages": {name: {k: v for k, v in result.items() if k != "reason"}
+                              for name, result in data["stages"].items()}}
+        with open(match_dir / "metrics_history.jsonl", 'a') as f:
+            f.write(json.dumps(history) + "\n")
+        return match_dir / "metrics.json"
+
+    def print_summary(self):
+        totals = self.to_dict()["totals"]
+        print(f"📈 [{self.match_id}] metrics: ${totals['cost_usd']:.2f} estimated Gemini cost, "
+              f"{totals['tokens_input']:,} in / {totals['tokens_output']:,} out tokens "
+              f"({totals['tokens_cached']:,} cached), {totals['bytes_uploaded'] / 1024 ** 2:,.1f}MB uploaded, "
+              f"{totals['retries']} retries")
+        with self.lock:
+            histograms = sorted(self.histograms.items())
+        for (kind, stage), histogram in histograms:
+            p50, p99 = (histogram.quantile(q) for q in (0.5, 0.99))
+            print(f"   {kind:<16} {stage:<28} {histogram.count:>5} calls  "
+                  f"p50 {_bound(p50)}  p99 {_bound(p99)}")
+
+
+def _bound(bound):
+    return f"≤{bound}s" if bound is not None else f">{LATENCY_BUCKETS[-1]}s"
+
+
+def _label_value(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+
+
+# ---- reporting from shared code ----------------------------------------------
+
+def observe(kind: str, seconds: float):
+    """One call's latency for the current match/stage (no-op outside a runner stage)"""
+    current = _current.get()
+    if current:
+        metrics, stage = current
+        metrics.observe(kind, stage, seconds)
+
+
+def count(name: str, value=1, **labels):
+    current = _current.get()
+    if current:
+        metrics, stage = current
+        metrics.count(name, stage, value, labels)
+
+
+def tokens(model: str, prompt: int, output: int, cached: int = 0):
+    """Token usage of one Gemini response, plus its estimated cost"""
+    current = _current.get()
+    if not current:
+        return
+    metrics, stage = current
+    metrics.count("tokens", stage, prompt, {"model": model, "kind": "input"})
+    metrics.count("tokens", stage, output, {"model": model, "kind": "output"})
+    if cached:
+        metrics.count("tokens", stage, cached, {"model": model, "kind": "cached"})
+    prices = next((p for name, p in TOKEN_PRICES.items() if model.startswith(name)), None)
+    if prices:
+        cost = ((prompt - cached) * prices["input"] + cached * prices["cached"] + output * prices["output"]) / 1e6
+        metrics.count("cost_usd", stage, cost, {"model": model})
+
+
+def bind(fn):
+    """`fn` running in the caller's telemetry context - for work handed to a thread pool"""
+    context = contextvars.copy_context()
+    # A Context can only be entered by one thread at a time - each call gets its own copy
+    return lambda *args, **kwargs: context.copy().run(fn, *args, **kwargs)
@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Indexed match timeline built by 1.6 from the 1.5 clip records
+
+- 1.6_timeline.jsonl  one clip per line in match time: start/end, possession,
+                      summary, actions, confidence, its events and its
+                      timeline text
+- 1.6_events.npz      columnar event table (NumPy): seconds, type, team, clip
+                      row, confidence and description, sorted by time, plus a
+                      per-type index, so time and type range scans are binary
+                      searches instead of re-parsing text or re-prompting
+
+Downstream stages query it directly:
+    store = TimelineStore.load(data_dir)
+    store.events(start=2160, end=2220, types=("goal", "shot"))
+    store.clips(start=2160, end=2220)
+    store.count_events(team="Blue")
+    store.timeline_text(start=2160, end=2760)   # the same range as timeline lines
+
+2.6's rule engine (focused_rules.py) and the 2.5/2.6 map-reduce windows
+(event_mapreduce.py) read the match through it.
+
+Usage:
+    python3 timeline_store.py <match-id> [--from 36:00] [--to 37:00] [--type goal,shot] [--team Blue]
+"""
+
+import io
+import sys
+import json
+import argparse
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+from collections import Counter
+
+import numpy as np
+
+from clip_records import EVENT_TYPES, same_event
+from stage_journal import atomic_write_bytes, atomic_write_text
+
+TIMELINE_FILE = "1.6_timeline.jsonl"
+EVENTS_FILE = "1.6_events.npz"
+
+# Two reports of the same event type this close together are one event
+DUPLICATE_SECONDS = 4
+
+
+def duplicate_events(events: list, windows: list) -> set:
+    """Indexes of events already reported by an overlapping window
+
+    `events` are dicts with window (index into `windows`), seconds, type and
+    description; `windows` are (start, end) seconds. Of two matching reports
+    from overlapping windows, the one closer to the middle of its window (more
+    context either side) is kept.
+    """
+    def off_centre(event):
+        start, end = windows[event["window"]]
+        return abs(event["seconds"] - (start + end) / 2)
+
+    order = sorted(range(len(events)), key=lambda i: events[i]["seconds"])
+    times = [events[i]["seconds"] for i in order]
+    drops = set()
+    for i in order:
+        event = events[i]
+        start, end = windows[event["window"]]
+        # Only events within DUPLICATE_SECONDS can match - binary search the sorted times
+        lo = bisect_left(times, event["seconds"] - DUPLICATE_SECONDS)
+        hi = bisect_right(times, event["seconds"] + DUPLICATE_SECONDS)
+        for j in order[lo:hi]:
+            other = events[j]
+            if other["window"] == event["window"]:
+                continue
+            other_start, other_end = windows[other["window"]]
+            if other_start >= end or start >= other_end or not same_event(event, other):
+                continue
+            if (off_centre(other), other["window"]) < (off_centre(event), event["window"]):
+                drops.add(i)
+                break
+    return drops
+
+
+def build_rows(clips: list) -> list:
+    """Timeline rows in match time from [{clip, start_seconds, end_seconds, record, text}]
+
+    `text` is the clip's 1.6_complete_timeline.txt entry, kept as it is: for
+    clips described before 1.5 wrote records it is the only full account.
+    """
+    clips = sorted(clips, key=lambda c: c["start_seconds"])
+    windows = [(c["start_seconds"], c["end_seconds"]) for c in clips]
+
+    events = []
+    for window, clip in enumerate(clips):
+        for event in clip["record"]["events"]:
+            events.append({**event, "window": window,
+                           "seconds": round(clip["start_seconds"] + event["offset_seconds"], 1)})
+    drops = duplicate_events(events, windows)
+
+    rows = []
+    for window, clip in enumerate(clips):
+        record = clip["record"]
+        rows.append({
+            "clip": clip["clip"],
+            "start_seconds": clip["start_seconds"],
+            "end_seconds": clip["end_seconds"],
+            "possession": record["possession"],
+            "summary": record["summary"],
+            "actions": record["actions"],
+            "confidence": record["confidence"],
+            "text": clip.get("text"),
+            "events": sorted((
+                {"seconds": e["seconds"], "type": e["type"], "team": e["team"], "description": e["description"]}
+                for i, e in enumerate(events) if e["window"] == window and i not in drops
+            ), key=lambda e: e["seconds"]),
+        })
+    return rows
+
+
+def write_store(data_dir: Path, rows: list) -> dict:
+    """Write 1.6_timeline.jsonl and 1.6_events.npz; returns a small summary"""
+    data_dir = Path(data_dir)
+    events = sorted(
+        ((event, row_index, row["confidence"]) for row_index, row in enumerate(rows) for event in row["events"]),
+        key=lambda item: item[0]["seconds"],
+    )
+    teams = sorted({event["team"] for event, _, _ in events if event["team"]}
+                   | {row["possession"] for row in rows if row["possession"]})
+
+    type_codes = np.array([EVENT_TYPES.index(event["type"]) for event, _, _ in events], dtype=np.int16)
+    seconds = np.array([event["seconds"] for event, _, _ in events], dtype=np.float64)
+    # Per-type index: event positions grouped by type, time-sorted within each type
+    type_order = np.lexsort((seconds, type_codes)).astype(np.int32)
+    type_offsets = np.searchsorted(type_codes[type_order], np.arange(len(EVENT_TYPES) + 1)).astype(np.int64)
+
+    arrays = {
+        "seconds": seconds,
+        "type": type_codes,
+        "team": np.array([teams.index(event["team"]) if event["team"] else -1 for event, _, _ in events],
+                         dtype=np.int16),
+        "clip_row": np.array([row_index for _, row_index, _ in events], dtype=np.int32),
+        "confidence": np.array([np.nan if confidence is None else confidence for _, _, confidence in events],
+                               dtype=np.float32),
+        "description": np.array([event["description"] for event, _, _ in events], dtype=np.str_),
+        "type_order": type_order,
+        "type_offsets": type_offsets,
+        "event_types": np.array(EVENT_TYPES),
+        "teams": np.array(teams, dtype=np.str_),
+    }
+
+    # Swapped in whole so readers never see half a store
+    atomic_write_text(data_dir / TIMELINE_FILE, "".join(json.dumps(row) + "\n" for row in rows))
+    buffer = io.BytesIO()
+    np.savez_compressed(buffer, **arrays)
+    atomic_write_bytes(data_dir / EVENTS_FILE, buffer.getvalue())
+
+    return {"clips": len(rows), "events": len(events), "teams": teams}
+
+
+class TimelineStore:
+    """Read side of the store; see the module docstring for the query API"""
+
+    def __init__(self, rows: list, arrays: dict):
+        self.rows = rows
+        self.arrays = arrays
+        self.teams = [str(team) for team in arrays["teams"]]
+        self.row_starts = np.array([row["start_seconds"] for row in rows], dtype=np.float64)
+        self.row_ends = np.array([row["end_seconds"] for row in rows], dtype=np.float64)
+
+    @classmethod
+    def require(cls, data_dir: Path):
+        """Store for a match directory; FileNotFoundError if 1.6 hasn't built one"""
+        store = cls.load(data_dir)
+        if store is None:
+            raise FileNotFoundError(f"Timeline store not found in {data_dir} ({TIMELINE_FILE}, {EVENTS_FILE}) - "
+                                    f"re-run 1.6: python 1.6_synthesis.py {Path(data_dir).name}")
+        return store
+
+    @classmethod
+    def load(cls, data_dir: Path):
+        """Store for a match directory, or None if 1.6 hasn't built one"""
+        data_dir = Path(data_dir)
+        if not (data_dir / TIMELINE_FILE).exists() or not (data_dir / EVENTS_FILE).exists():
+            return None
+        with open(data_dir / TIMELINE_FILE) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+        with np.load(data_dir / EVENTS_FILE) as npz:
+            arrays = {name: npz[name] for name in npz.files}
+        return cls(rows, arrays)
+
+    def _event(self, i) -> dict:
+        a = self.arrays
+        team = int(a["team"][i])
+        confidence = float(a["confidence"][i])
+        seconds = float(a["seconds"][i])
+        return {
+            "seconds": seconds,
+            "timestamp": _clock(seconds),
+            "type": EVENT_TYPES[int(a["type"][i])],
+            "team": self.teams[team] if team >= 0 else None,
+            "description": str(a["description"][i]),
+            "confidence": None if np.isnan(confidence) else confidence,
+            "clip": self.rows[int(a["clip_row"][i])]["clip"],
+        }
+
+    def _event_indexes(self, start=None, end=None, types=None, team=None) -> np.ndarray:
+        a = self.arrays
+        lo = -np.inf if start is None else start
+        hi = np.inf if end is None else end
+        if types:
+            parts = []
+            for event_type in types:
+                code = EVENT_TYPES.index(event_type)
+                group = a["type_order"][a["type_offsets"][code]:a["type_offsets"][code + 1]]
+                group_seconds = a["seconds"][group]
+                parts.append(group[np.searchsorted(group_seconds, lo, 'left'):np.searchsorted(group_seconds, hi, 'left')])
+            indexes = np.sort(np.concatenate(parts)) if parts else np.array([], dtype=np.int32)
+        else:
+            indexes = np.arange(np.searchsorted(a["seconds"], lo, 'left'), np.searchsorted(a["seconds"], hi, 'left'))
+        if team is not None:
+            code = self.teams.index(team) if team in self.teams else -2
+            indexes = indexes[a["team"][indexes] == code]
+        return indexes
+
+    def events(self, start=None, end=None, types=None, team=None) -> list:
+        """Events with start <= seconds < end, optionally of some types / one team, in time order"""
+        return [self._event(i) for i in self._event_indexes(start, end, types, team)]
+
+    def count_events(self, start=None, end=None, types=None, team=None) -> Counter:
+        """Event counts by type for the same filters as events()"""
+        codes = self.arrays["type"][self._event_indexes(start, end, types, team)]
+        return Counter({EVENT_TYPES[code]: int(n) for code, n in zip(*np.unique(codes, return_counts=True))})
+
+    def row_text(self, row: dict) -> str:
+        """One clip as its 1.6_complete_timeline.txt entry: summary, then its events in match time"""
+        if row.get("text"):
+            return row["text"]
+        text = row["summary"].rstrip('.')
+        if row["events"]:
+            text += ". Key events: " + ", ".join(f"{_clock(e['seconds'])} {e['description']}" for e in row["events"])
+        return text
+
+    def timeline_text(self, start=None, end=None) -> str:
+        """Timeline lines ("MM:SS - ...") for the clips starting in [start, end)"""
+        lo = 0 if start is None else int(np.searchsorted(self.row_starts, start, 'left'))
+        hi = len(self.rows) if end is None else int(np.searchsorted(self.row_starts, end, 'left'))
+        return "\n".join(f"{_clock(row['start_seconds'])} - {self.row_text(row)}" for row in self.rows[lo:hi])
+
+    def clips(self, start=None, end=None) -> list:
+        """Timeline rows overlapping [start, end)"""
+        mask = np.ones(len(self.rows), dtype=bool)
+        if start is not None:
+            mask &= self.row_ends > start
+        if end is not None:
+            mask &= self.row_starts < end
+        return [self.rows[i] for i in np.flatnonzero(mask)]
+
+
+def _clock(seconds) -> str:
+    return f"{int(seconds) // 60:02d}:{int(seconds) % 60:02d}"
+
+
+def _seconds(value):
+    minutes, seconds = value.split(':')
+    return int(minutes) * 60 + int(seconds)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Query a match timeline store")
+    parser.add_argument("match_id")
+    parser.add_argument("--from", dest="start", help="MM:SS")
+    parser.add_argument("--to", dest="end", help="MM:SS")
+    parser.add_argument("--type", help=f"Comma-separated: {', '.join(EVENT_TYPES)}")
+    parser.add_argument("--team")
+    args = parser.parse_args()
+
+    store = TimelineStore.load(Path("../outputs") / args.match_id)
+    if store is None:
+        print(f"❌ No timeline store for {args.match_id} - run 1.6_synthesis.py first")
+        sys.exit(1)
+
+    start = _seconds(args.start) if args.start else None
+    end = _seconds(args.end) if args.end else None
+    types = args.type.split(',') if args.type else None
+    for event in store.events(start, end, types, args.team):
+        print(f"{event['timestamp']} - {event['type'].upper()}: {event['team'] or '?'} - {event['description']}")
+    counts = store.count_events(start, end, types, args.team)
+    print(f"📊 {sum(counts.values())} events: " + ", ".join(f"{t} {n}" for t, n in counts.most_common()))
+
+
+if __name__ == "__main__":
+    main()
@@ -5,11 +5,12 @@ Uses the discovered highlights endpoint with AI events
 """
 
 import requests
-import json
 import re
 from datetime import datetime
 from urllib.parse import urlparse
 
+from stage_journal import atomic_write_json
+
 class VeoEventExtractor:
     def __init__(self):
         self.session = requests.Session()
@@ -158,8 +159,7 @@ class VeoEventExtractor:
             match_id = self.extract_match_id_from_url(veo_url)
             output_file = f"veo_events_{match_id}_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json"
         
-        with open(output_file, 'w') as f:
-            json.dump(formatted_data, f, indent=2)
+        atomic_write_json(output_file, formatted_data)
         
         print(f"💾 Saved to: {output_file}")
         
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Resumable, download-while-segmenting video ingest used by 1.2_download_video
+
+- yt-dlp writes video.mp4.part and resumes it with HTTP Range requests after a
+  dropped connection (--continue); a journal (video_download.json) records every
+  attempt so a crashed or killed run picks up where the bytes stopped instead
+  of fetching 3GB from zero.
+- While the .part file grows, its bytes are tailed into a single stream-copy
+  `ffmpeg -f segment` (clip_stream.stream_segments), so the early 1.4_clips
+  exist while the rest of the match is still downloading.
+
+Streaming needs the MP4 index (moov atom) at the front of the file. If the
+source is not streamable ffmpeg stops straight away, the download carries on,
+and 1.4_make_clips segments the finished file as usual.
+"""
+
+import os
+import json
+import time
+import subprocess
+import threading
+from datetime import datetime
+from pathlib import Path
+
+from clip_stream import SEGMENT_SECONDS, stream_segments, write_segments_json
+from stage_journal import atomic_write_json
+
+JOURNAL_FILENAME = "video_download.json"
+DOWNLOAD_ATTEMPTS = 5
+TAIL_CHUNK_BYTES = 1024 * 1024
+
+
+class DownloadJournal:
+    """Small JSON record of a video download that survives crashes and restarts"""
+
+    def __init__(self, match_dir: Path, url: str, video_format: str):
+        self.path = Path(match_dir) / JOURNAL_FILENAME
+        self.lock = threading.Lock()
+        self.data = {}
+        if self.path.exists():
+            try:
+                with open(self.path) as f:
+                    self.data = json.load(f)
+            except (json.JSONDecodeError, OSError):
+                self.data = {}
+
+        # A different URL/format means the partial bytes belong to another video
+        if self.data.get("url") != url or self.data.get("format") != video_format:
+            self.data = {"url": url, "format": video_format, "status": "pending", "attempts": []}
+
+    @property
+    def complete(self) -> bool:
+        return self.data.get("status") == "complete"
+
+    def update(self, **fields):
+        with self.lock:
+            self.data.update(fields)
+            self.data["updated_at"] = datetime.now().isoformat()
+            atomic_write_json(self.path, self.data)
+
+    def record_attempt(self, resumed_from: int, returncode: int, bytes_on_disk: int):
+        attempts = self.data.get("attempts", []) + [{
+            "resumed_from_bytes": resumed_from,
+            "returncode": returncode,
+            "bytes_on_disk": bytes_on_disk,
+            "finished_at": datetime.now().isoformat(),
+        }]
+        self.update(attempts=attempts, bytes_on_disk=bytes_on_disk)
+
+
+def part_path(video_path: Path) -> Path:
+    """Where yt-dlp keeps the bytes of an unfinished download"""
+    return video_path.with_name(video_path.name + ".part")
+
+
+def _bytes_on_disk(video_path: Path) -> int:
+    for path in (part_path(video_path), video_path):
+        if path.exists():
+            return path.stat().st_size
+    return 0
+
+
+def resumable_download(url, video_path, journal, video_format="standard-1080p",
+                       max_attempts=DOWNLOAD_ATTEMPTS):
+    """Download with yt-dlp, resuming the .part file after each failure. Returns True on success."""
+    video_path = Path(video_path)
+
+    if journal.complete and video_path.exists() and video_path.stat().st_size == journal.data.get("bytes_on_disk"):
+        print(f"♻️  Video already downloaded ({video_path.stat().st_size / 1024**2:.1f}MB) - skipping")
+        return True
+
+    cmd = [
+        'yt-dlp', '-f', video_format,
+        '--continue',              # resume video.mp4.part with Range requests
+        '--part',
+        '--no-mtime',
+        '--retries', '10',
+        '--fragment-retries', '10',
+        '-o', str(video_path), url,
+    ]
+
+    for attempt in range(1, max_attempts + 1):
+        resumed_from = _bytes_on_disk(video_path)
+        if resumed_from:
+            print(f"🔁 Resuming download from {resumed_from / 1024**2:.1f}MB (attempt {attempt}/{max_attempts})")
+        journal.update(status="downloading", part_file=part_path(video_path).name)
+
+        returncode = subprocess.run(cmd).returncode
+        journal.record_attempt(resumed_from, returncode, _bytes_on_disk(video_path))
+
+        if returncode == 0 and video_path.exists() and video_path.stat().st_size > 0:
+            journal.update(status="complete", bytes_on_disk=video_path.stat().st_size)
+            return True
+
+        if attempt < max_attempts:
+            wait_seconds = min(2 ** attempt, 60)
+            print(f"⚠️  Download interrupted (exit {returncode}), retrying in {wait_seconds}s...")
+            time.sleep(wait_seconds)
+
+    journal.update(status="failed")
+    return False
+
+
+def _tail_into(video_path: Path, download_done: threading.Event):
+    """Feed function that copies the growing .part file into ffmpeg's stdin"""
+
+    def feed(stdin):
+        # Open whichever name exists; the open handle keeps working after yt-dlp renames .part
+        source = None
+        while source is None:
+            for path in (part_path(video_path), video_path):
+                if path.exists():
+                    source = open(path, 'rb')
+                    break
+            else:
+                if download_done.is_set():
+                    return
+                time.sleep(0.5)
+
+        with source:
+            position = 0
+            while True:
+                chunk = source.read(TAIL_CHUNK_BYTES)
+                if chunk:
+                    stdin.write(chunk)
+                    position += len(chunk)
+                    continue
+                if os.fstat(source.fileno()).st_size < position:
+                    # Server refused Range and yt-dlp restarted the file - bytes no longer line up
+                    print("⚠️  Partial download was restarted - stopping streamed segmentation")
+                    return
+                if download_done.is_set():
+                    # One last read picks up anything written just before the download finished
+                    chunk = source.read()
+                    if chunk:
+                        stdin.write(chunk)
+                    return
+                time.sleep(0.5)
+
+    return feed
+
+
+def ingest_video(url, match_dir, video_format="standard-1080p", on_clip=None):
+    """Download video.mp4 while cutting it into 1.4_clips as the bytes arrive
+
+    `on_clip` is called with each clip's info dict (see clip_stream) as soon as
+    the clip is on disk. Returns (downloaded, segmented): when segmented is
+    False, 1.4_make_clips has to cut the finished video itself.
+    """
+    match_dir = Path(match_dir)
+    video_path = match_dir / "video.mp4"
+    clips_dir = match_dir / "1.4_clips"
+    journal = DownloadJournal(match_dir, url, video_format)
+
+    download_done = threading.Event()
+    download_ok = []
+
+    def download():
+        try:
+            download_ok.append(resumable_download(url, video_path, journal, video_format))
+        finally:
+            download_done.set()
+
+    downloader = threading.Thread(target=download, daemon=True)
+    start_time = time.time()
+    downloader.start()
+
+    clips = []
+    segmented = False
+    try:
+        for clip in stream_segments(video_path, clips_dir, SEGMENT_SECONDS,
+                                    feed=_tail_into(video_path, download_done)):
+            clips.append(clip)
+            if len(clips) == 1:
+                print(f"🎬 First clip ready {time.time() - start_time:.1f}s into the download")
+            elif len(clips) % 50 == 0:
+                print(f"  📊 {len(clips)} clips cut while downloading")
+            if on_clip:
+                on_clip(clip)
+    except subprocess.CalledProcessError as e:
+        error_lines = (e.stderr or '').strip().splitlines()
+        print(f"⚠️  Streamed segmentation stopped ({error_lines[-1] if error_lines else e}) - "
+              f"1.4 will segment after the download")
+
+    downloader.join()
+    downloaded = bool(download_ok and download_ok[0])
+
+    if downloaded and clips:
+        # The last clip must reach the end of the video, otherwise the feed stopped early
+        duration = _probe_duration(video_path)
+        segmented = duration is not None and clips[-1]["end_seconds"] >= duration - SEGMENT_SECONDS
+        if segmented:
+            write_segments_json(clips_dir, clips, duration, SEGMENT_SECONDS, segmented_during_download=True)
+            print(f"✅ {len(clips)} clips cut during download ({time.time() - start_time:.1f}s total)")
+        else:
+            print("⚠️  Streamed clips do not cover the whole video - 1.4 will re-segment")
+
+    return downloaded, segmented
+
+
+def _probe_duration(video_path: Path):
+    cmd = ['ffprobe', '-v', 'quiet', '-print_format', 'json', '-show_format', str(video_path)]
+    try:
+        result = subprocess.run(cmd, capture_output=True, text=True, check=True)
+        return float(json.loads(result.stdout)['format']['duration'])
+    except (subprocess.CalledProcessError, FileNotFoundError, KeyError, ValueError):
+        return None
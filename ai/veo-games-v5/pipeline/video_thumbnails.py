@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+Scrubber thumbnails for the webapp player
+
+One frame every THUMB_STRIDE_SECONDS, scaled to 160x90 and tiled 10x10 into
+JPEG sprite sheets by ffmpeg's tile filter, plus a WebVTT track pointing
+each time range at its tile (sprite_001.jpg#xywh=x,y,w,h).
+
+sprite_filter() is one branch of a filter graph, so any stage that already
+decodes the whole match can split its frames and make the sprites in the same
+pass - clip_triage.py does this when 1.4 runs it, and 3.15_make_thumbnails.py
+reuses that output instead of decoding again. sprites.json next to the sheets
+records the settings and the video they came from.
+"""
+
+import os
+import json
+import math
+import shutil
+import subprocess
+from pathlib import Path
+
+from stage_journal import atomic_write_json, atomic_write_text
+
+THUMB_STRIDE_SECONDS = 2
+THUMB_WIDTH, THUMB_HEIGHT = 160, 90
+SPRITE_COLUMNS, SPRITE_ROWS = 10, 10
+SPRITE_PATTERN = "sprite_%03d.jpg"
+SPRITE_INFO = "sprites.json"
+VTT_FILENAME = "thumbnails.vtt"
+
+
+def enabled() -> bool:
+    return os.getenv('CLANN_THUMBNAILS', '1') != '0'
+
+
+def sprite_settings() -> dict:
+    return {"stride_seconds": THUMB_STRIDE_SECONDS, "width": THUMB_WIDTH, "height": THUMB_HEIGHT,
+            "columns": SPRITE_COLUMNS, "rows": SPRITE_ROWS}
+
+
+def sprite_filter(source_label: str, output_label: str) -> str:
+    """Filter graph branch: decoded frames in, one sprite sheet per SPRITE_COLUMNS x SPRITE_ROWS thumbnails out"""
+    return (f"[{source_label}]fps=1/{THUMB_STRIDE_SECONDS},"
+            f"scale={THUMB_WIDTH}:{THUMB_HEIGHT}:force_original_aspect_ratio=decrease,"
+            f"pad={THUMB_WIDTH}:{THUMB_HEIGHT}:(ow-iw)/2:(oh-ih)/2,"
+            f"tile={SPRITE_COLUMNS}x{SPRITE_ROWS}[{output_label}]")
+
+
+def sprite_output_args(output_label: str, sprites_dir: Path) -> list:
+    """ffmpeg output arguments writing the sheets of sprite_filter() into sprites_dir"""
+    return ['-map', f'[{output_label}]', '-q:v', '5', '-fps_mode', 'passthrough',
+            str(Path(sprites_dir) / SPRITE_PATTERN)]
+
+
+def sprite_command(video_path, sprites_dir) -> list:
+    """Stand-alone pass for when no other stage's decode can be shared"""
+    return ['ffmpeg', '-hide_banner', '-loglevel', 'error', '-nostdin', '-i', str(video_path),
+            '-filter_complex', sprite_filter('0:v:0', 'sprites')] + sprite_output_args('sprites', sprites_dir)
+
+
+def video_signature(video_path) -> dict:
+    stat = Path(video_path).stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def record_sprites(sprites_dir, video_path, duration: float):
+    """Write sprites.json once a pass has produced the sheets"""
+    info = {"settings": sprite_settings(), "video": video_signature(video_path),
+            "duration_seconds": round(duration, 2),
+            "sheets": len(list(Path(sprites_dir).glob("sprite_*.jpg")))}
+    atomic_write_json(Path(sprites_dir) / SPRITE_INFO, info)
+    return info
+
+
+def reusable_sprites(sprites_dir, video_path):
+    """sprites.json of an earlier pass over this same video with these settings, or None"""
+    try:
+        with open(Path(sprites_dir) / SPRITE_INFO, 'r') as f:
+            info = json.load(f)
+    except (OSError, json.JSONDecodeError):
+        return None
+    if info.get("settings") != sprite_settings() or info.get("video") != video_signature(video_path):
+        return None
+    if info.get("sheets", 0) < 1 or len(list(Path(sprites_dir).glob("sprite_*.jpg"))) != info["sheets"]:
+        return None
+    return info
+
+
+def copy_sprites(source_dir, target_dir):
+    target_dir = Path(target_dir)
+    target_dir.mkdir(parents=True, exist_ok=True)
+    for path in sorted(Path(source_dir).glob("sprite_*.jpg")):
+        shutil.copy2(path, target_dir / path.name)
+
+
+def write_vtt(out_dir, duration: float, sheets: int) -> int:
+    """WebVTT track over the sheets in out_dir; returns the number of cues"""
+    per_sheet = SPRITE_COLUMNS * SPRITE_ROWS
+    count = min(max(1, math.ceil(duration / THUMB_STRIDE_SECONDS)), sheets * per_sheet)
+    lines = ["WEBVTT", ""]
+    for i in range(count):
+        start = i * THUMB_STRIDE_SECONDS
+        end = min(start + THUMB_STRIDE_SECONDS, duration) if duration > start else start + THUMB_STRIDE_SECONDS
+        sheet, cell = divmod(i, per_sheet)
+        row, column = divmod(cell, SPRITE_COLUMNS)
+        lines += [f"{_vtt_time(start)} --> {_vtt_time(end)}",
+                  f"{SPRITE_PATTERN % (sheet + 1)}#xywh={column * THUMB_WIDTH},{row * THUMB_HEIGHT},"
+                  f"{THUMB_WIDTH},{THUMB_HEIGHT}", ""]
+    atomic_write_text(Path(out_dir) / VTT_FILENAME, "\n".join(lines))
+    return count
+
+
+def _vtt_time(seconds: float) -> str:
+    millis = int(round(seconds * 1000))
+    hours, millis = divmod(millis, 3600_000)
+    minutes, millis = divmod(millis, 60_000)
+    return f"{hours:02d}:{minutes:02d}:{millis // 1000:02d}.{millis % 1000:03d}"
+
+
+def make_sprites(video_path, sprites_dir) -> bool:
+    result = subprocess.run(sprite_command(video_path, sprites_dir), capture_output=True, text=True)
+    if result.returncode != 0:
+        print(f"❌ Sprite pass failed: {result.stderr.strip()[-300:]}")
+        return False
+    return True
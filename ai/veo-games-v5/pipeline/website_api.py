@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Website API client used by 3.7_api_upload.py
+
+One pooled requests.Session per (base URL, token) per process, so a batch
+run or a bulk push reuses connections instead of a TCP/TLS handshake per
+call. Every POST:
+- has a (connect, read) timeout
+- is retried with full-jitter exponential backoff on connection errors,
+  timeouts, 408/425/429/5xx (Retry-After honoured); the upload routes just
+  set the game's S3 keys, so repeating one is safe, and each carries an
+  Idempotency-Key derived from route + payload for servers that dedupe
+- reports its latency and retries to telemetry.py
+
+push_games() sends the artifacts of many games concurrently (one worker per
+game, CLANN_API_WORKERS at a time, default 8); a game's own artifacts go in
+order - events, metadata, tactical, video - since the metadata route also
+rewrites the events.
+
+Set the base URL to fake_website_api.py to try it offline.
+"""
+
+import os
+import json
+import time
+import random
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+
+import telemetry
+
+RETRYABLE_STATUS = {408, 425, 429, 500, 502, 503, 504}
+CONNECT_TIMEOUT_SECONDS = 5
+READ_TIMEOUT_SECONDS = 60
+MAX_ATTEMPTS = 5
+
+# core_files key in 3.5_s3_core_locations.json -> artifact name, in upload order
+ARTIFACTS = (
+    ("web_events_array_json", "events"),
+    ("match_metadata_json", "metadata"),
+    ("tactical_analysis_json", "tactical"),
+    ("video_mp4", "video"),
+)
+
+_clients = {}
+_clients_lock = threading.Lock()
+
+
+def _env_int(name: str, default: int) -> int:
+    try:
+        return max(1, int(os.getenv(name, default)))
+    except ValueError:
+        return default
+
+
+class APIError(Exception):
+    """A call that failed for good (non-retryable status, or out of attempts)"""
+
+    def __init__(self, message, status=None, attempts=1):
+        super().__init__(message)
+        self.status = status
+        self.attempts = attempts
+
+
+class WebsiteAPI:
+    """Pooled, retrying client for the /api/games/<id>/upload-* routes; see get_api_client()"""
+
+    def __init__(self, base_url: str, auth_token: str = None, pool_size: int = None):
+        self.base_url = base_url.rstrip('/')
+        self.auth_token = auth_token
+        pool_size = pool_size or _env_int('CLANN_API_WORKERS', 8)
+        self.session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=2, pool_maxsize=pool_size)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers['Content-Type'] = 'application/json'
+        if auth_token:
+            self.session.headers['Authorization'] = f'Bearer {auth_token}'
+
+    def post(self, path: str, payload: dict) -> tuple:
+        """POST with retries; returns (response JSON or {}, attempts). Raises APIError."""
+        url = f"{self.base_url}{path}"
+        body = json.dumps(payload, sort_keys=True)
+        headers = {'Idempotency-Key': hashlib.sha256(f"{path}\n{body}".encode()).hexdigest()[:32]}
+        attempt = 0
+        while True:
+            attempt += 1
+            started = time.monotonic()
+            retry_after = None
+            try:
+                response = self.session.post(url, data=body, headers=headers,
+                                             timeout=(CONNECT_TIMEOUT_SECONDS, READ_TIMEOUT_SECONDS))
+                telemetry.observe("api.post", time.monotonic() - started)
+                if response.status_code < 400:
+                    try:
+                        return response.json(), attempt
+                    except ValueError:
+                        return {}, attempt
+                if response.status_code not in RETRYABLE_STATUS:
+                    raise APIError(f"{response.status_code}: {response.text[:300]}", response.status_code, attempt)
+                error = APIError(f"{response.status_code}: {response.text[:300]}", response.status_code, attempt)
+                retry_after = _retry_after(response)
+            except (requests.ConnectionError, requests.Timeout) as e:
+                telemetry.observe("api.post", time.monotonic() - started)
+                error = APIError(f"{type(e).__name__}: {e}", attempts=attempt)
+
+            if attempt >= MAX_ATTEMPTS:
+                raise error
+            telemetry.count("retries", kind="api.post")
+            backoff = random.uniform(0, min(20.0, 0.5 * 2 ** attempt))
+            time.sleep(max(backoff, retry_after or 0))
+
+    # ---- the upload routes -------------------------------------------------
+
+    def artifact_request(self, game_id: str, artifact: str, s3_url: str) -> tuple:
+        """(path, payload) for one artifact; no-auth mode uses the *-test routes"""
+        filename = s3_url.split('/')[-1]
+        test = self.auth_token is None
+        if artifact == "events":
+            if test:
+                return (f"/api/games/{game_id}/upload-analysis-file-test",
+                        {'s3Key': s3_url, 'originalFilename': filename, 'fileType': 'events'})
+            return f"/api/games/{game_id}/upload-events", {'s3Key': s3_url, 'originalFilename': filename}
+        if artifact == "metadata":
+            return f"/api/games/{game_id}/upload-metadata{'-test' if test else ''}", {'metadataUrl': s3_url}
+        if artifact == "tactical":
+            return (f"/api/games/{game_id}/upload-tactical{'-test' if test else ''}",
+                    {'s3Key': s3_url, 'originalFilename': filename})
+        if artifact == "video":
+            # No test route for the video - it needs a token either way
+            return f"/api/games/{game_id}/upload-video", {'s3Key': s3_url}
+        raise ValueError(f"Unknown artifact '{artifact}'")
+
+    def upload_artifact(self, game_id: str, artifact: str, s3_url: str) -> dict:
+        """One artifact; returns {"ok", "attempts", "seconds", "error", "response"}"""
+        path, payload = self.artifact_request(game_id, artifact, s3_url)
+        started = time.monotonic()
+        try:
+            response, attempts = self.post(path, payload)
+            return {"ok": True, "attempts": attempts, "seconds": round(time.monotonic() - started, 2),
+                    "response": response}
+        except APIError as e:
+            telemetry.count("errors", kind=f"api.{artifact}")
+            return {"ok": False, "attempts": e.attempts, "seconds": round(time.monotonic() - started, 2),
+                    "error": str(e), "status": e.status}
+
+    def push_game(self, game_id: str, core_files: dict) -> dict:
+        """Every artifact of one game, in order; returns {artifact: result}"""
+        results = {}
+        for key, artifact in ARTIFACTS:
+            if core_files.get(key):
+                results[artifact] = self.upload_artifact(game_id, artifact, core_files[key])
+        return results
+
+
+def get_api_client(base_url: str, auth_token: str = None) -> WebsiteAPI:
+    """Process-wide client per (base URL, token) so its connections are reused"""
+    with _clients_lock:
+        key = (base_url.rstrip('/'), auth_token)
+        if key not in _clients:
+            _clients[key] = WebsiteAPI(base_url, auth_token)
+        return _clients[key]
+
+
+def push_games(client: WebsiteAPI, games: list, max_workers: int = None) -> list:
+    """games [{match_id, game_id, core_files}] -> the same dicts with "results" and "seconds" added"""
+    max_workers = max_workers or _env_int('CLANN_API_WORKERS', 8)
+
+    def push(game):
+        started = time.monotonic()
+        results = client.push_game(game["game_id"], game["core_files"])
+        return {**game, "results": results, "seconds": round(time.monotonic() - started, 2)}
+
+    with ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="api-push") as pool:
+        return list(pool.map(telemetry.bind(push), games))
+
+
+def print_push_summary(pushed: list):
+    """Table of artifact results per game ("=" - unchanged, not re-posted)"""
+    artifacts = [artifact for _, artifact in ARTIFACTS]
+
+    def icon(result):
+        if result is None:
+            return " -"
+        return "=" if result.get("unchanged") else "✅" if result["ok"] else "❌"
+
+    print(f"\n📊 API PUSH SUMMARY ({len(pushed)} games)")
+    print("=" * 100)
+    print(f"{'match':<40} {'game':<14} " + " ".join(f"{a:>8}" for a in artifacts) + f" {'tries':>6} {'secs':>6}")
+    for game in pushed:
+        results = game["results"]
+        cells = " ".join(f"{icon(results.get(a)):>7}" for a in artifacts)
+        attempts = sum(r["attempts"] for r in results.values())
+        print(f"{game['match_id'][:40]:<40} {str(game['game_id'])[:14]:<14} {cells} {attempts:>6} {game['seconds']:>6.1f}")
+    failed = [(game["match_id"], artifact, result["error"]) for game in pushed
+              for artifact, result in game["results"].items() if not result["ok"]]
+    sent = sum(len(game["results"]) for game in pushed)
+    unchanged = sum(bool(r.get("unchanged")) for game in pushed for r in game["results"].values())
+    print(f"✅ {sent - len(failed)}/{sent} artifacts accepted ({unchanged} unchanged, not re-posted)")
+    for match_id, artifact, error in failed:
+        print(f"   ❌ {match_id} {artifact}: {error}")
+
+
+def _retry_after(response):
+    try:
+        return float(response.headers.get('Retry-After', ''))
+    except ValueError:
+        return None
@@ -146,7 +146,7 @@ const getGameById = async (id) => {
      FROM games g
      JOIN teams t ON g.team_id = t.id
      JOIN users u ON g.uploaded_by = u.id
-     LEFT JOIN hls_conversions hls ON g.id = hls.game_id AND hls.status = 'completed'
+     LEFT JOIN hls_conversions hls ON g.id = hls.game_id AND hls.status = 'COMPLETE'
      WHERE g.id = $1`,
     [id]
   );